@@ -14,13 +14,38 @@ from airflow.utils.task_group import TaskGroup
 
 from extract_folder.gsheet_extractor import extract_agents
 from extract_folder.pg_extractor import extract_web_forms
-from extract_folder.utils import write_to_s3_parquet
+from extract_folder.pg_cdc import cdc_enabled, extract_web_forms_cdc
+from extract_folder.utils import build_daily_aggregates, write_to_s3_parquet
+from extract_folder.aggregates import AGGREGATES_TABLE, LOAD_KEYS, aggregates_enabled
+from extract_folder.metrics import print_stage_breakdown
+from extract_folder.profiling import print_profiles, profiling_enabled, set_profile
+from extract_folder.lake_checks import (
+    LAKE_CHECKS_STRICT,
+    format_lake_checks,
+    run_lake_checks,
+)
+from extract_folder.reconcile import (
+    RECONCILE_STRICT,
+    format_reconciliation,
+    reconcile,
+)
 from extract_folder.s3_extractor import (
     extract_customers,
     extract_call_logs,
     extract_social_media,
 )
-from snowflakes.snowflake_load import load_s3_parquet_to_snowflake
+from snowflakes.snowflake_load import load_report, load_s3_parquet_to_snowflake
+
+
+def enable_profiling(context):
+    """
+    Turn on the profilers named by the run's `profile` param, e.g.
+    "cpu,memory", before the task runs. PIPELINE_PROFILE applies otherwise.
+    """
+    modes = context["params"].get("profile")
+    if modes:
+        set_profile(modes)
+
 
 default_args = {
     "owner": "data_engineering",
@@ -30,6 +55,7 @@ default_args = {
     "retries": 2,
     "retry_delay": timedelta(minutes=5),
     "execution_timeout": timedelta(hours=2),
+    "on_execute_callback": enable_profiling,
 }
 
 
@@ -43,7 +69,7 @@ def extract_and_load_customers(**context):
         customers_count = int(df["total_rows"].iloc[0])
     else:
         customers_count = 0
-        context["ti"].xcom_push(key="customers_count", value=customers_count)
+    context["ti"].xcom_push(key="customers_count", value=customers_count)
 
 
 def extract_and_load_agents(**context):
@@ -61,7 +87,7 @@ def extract_and_load_call_logs(**context):
 
     df = extract_call_logs()
     if not df.empty:
-        write_to_s3_parquet(df, "call_logs", exec_date)
+        write_to_s3_parquet(df, "call_logs", partition_date=exec_date)
         context["ti"].xcom_push(key="call_logs_count", value=len(df))
 
 
@@ -79,88 +105,139 @@ def extract_and_load_social_media(**context):
 
 def extract_and_load_web_forms(**context):
     """Extract web forms from Postgres for execution date and load to S3."""
-    rows_written = extract_web_forms(table_name_path="web_forms", chunk_size=50_000)
+    if cdc_enabled():
+        # Only rows changed since the last run, tagged for a delta MERGE
+        rows_written = extract_web_forms_cdc(
+            table_name_path="web_forms", exec_date=context["ds"], chunk_size=50_000
+        )
+    else:
+        rows_written = extract_web_forms(table_name_path="web_forms")
 
     context["ti"].xcom_push(key="web_forms_count", value=rows_written)
 
 
+def build_aggregates(**context):
+    """
+    Merge the partial aggregates the daily extracts wrote into one file per
+    event day, when AGGREGATES_ENABLED is on.
+    """
+    if not aggregates_enabled():
+        return 0
+    partitions = {context["ds"], datetime.now().date().isoformat()}
+    result = build_daily_aggregates(partitions)
+    context["ti"].xcom_push(key="aggregate_rows", value=result["rows"])
+    return result["rows"]
+
+
+def check_staging_lake(**context):
+    """
+    Key, null-rate and reference checks over this run's staging partitions,
+    run locally before any warehouse load.
+    """
+    partitions = {context["ds"], datetime.now().date().isoformat()}
+    result = run_lake_checks(partitions)
+
+    print(f"Staging lake checks for {context['ds']}:")
+    print(format_lake_checks(result))
+    context["ti"].xcom_push(key="lake_checks", value=result)
+
+    if result["status"] == "failed":
+        failed = [
+            f"{r['table']} {r['check']}"
+            for r in result["checks"]
+            if r["status"] == "failed"
+        ]
+        if LAKE_CHECKS_STRICT:
+            raise ValueError(f"Staging lake checks failed: {failed}")
+        print(f"WARNING: staging lake checks failed: {failed}")
+
+
 # ======================= SNOWFLAKES LOAD FUNTIONS ===========================
 
+# Load task -> warehouse table, for collecting the load reports
+LOAD_TASKS = {
+    "static_data.load_customers_snowflake": "customers",
+    "static_data.load_agents_snowflake": "agents",
+    "daily_data.load_call_logs_snowflake": "call_logs",
+    "daily_data.load_social_media_snowflake": "social_media",
+    "daily_data.load_web_forms_snowflake": "web_forms",
+}
+
+
+def _push_load_report(context, table_name):
+    """Share the COPY/MERGE counts of the load with validate_pipeline."""
+    context["ti"].xcom_push(key="load_report", value=load_report(table_name))
 
-def load_customers_to_snowflake():
+
+def load_customers_to_snowflake(**context):
     load_s3_parquet_to_snowflake("customers", unique_keys=["CUSTOMER_ID"])
+    _push_load_report(context, "customers")
 
 
-def load_agents_to_snowflake():
+def load_agents_to_snowflake(**context):
     load_s3_parquet_to_snowflake("agents", unique_keys=["ID"])
+    _push_load_report(context, "agents")
 
 
-def load_call_logs_to_snowflake():
+def load_call_logs_to_snowflake(**context):
     load_s3_parquet_to_snowflake("call_logs", unique_keys=["CALL_ID"])
+    _push_load_report(context, "call_logs")
 
 
-def load_media_data_to_snowflake():
+def load_media_data_to_snowflake(**context):
     load_s3_parquet_to_snowflake("social_media", unique_keys=["SOCIAL_MEDIA"])
+    _push_load_report(context, "social_media")
 
 
-def load_web_forms_to_snowflake():
+def load_web_forms_to_snowflake(**context):
     load_s3_parquet_to_snowflake("web_forms", unique_keys=["WEB_FORM_ID"])
+    _push_load_report(context, "web_forms")
+
+
+def load_aggregates_to_snowflake(**context):
+    if aggregates_enabled():
+        load_s3_parquet_to_snowflake(AGGREGATES_TABLE, unique_keys=LOAD_KEYS)
 
 
 ##########################################################################################################
 
 
 def validate_pipeline(**context):
-    """Validate that all extractions completed successfully."""
+    """
+    Reconcile the rows staged for this run (Parquet footers) with the rows
+    each load copied and merged, per table and partition.
+    """
     ti = context["ti"]
 
-    s3_counts = {
-        "call_logs": ti.xcom_pull(task_id="extract_call_logs", key="call_logs_count")
-        or 0,
-        "social_media": ti.xcom_pull(
-            task_id="extract_social_media", key="social_media_count"
-        )
-        or 0,
-        "web_forms": ti.xcom_pull(task_id="extract_web_forms", key="web_forms_count")
-        or 0,
-    }
-
-    sf_counts = {
-        "call_logs": ti.xcom_pull(
-            task_id="load_call_logs_snowflake", key="call_logs_snowflake_rows"
-        )
-        or 0,
-        "social_media": ti.xcom_pull(
-            task_id="load_social_media_snowflake", key="social_media_snowflake_rows"
-        )
-        or 0,
-        "web_forms": ti.xcom_pull(
-            task_id="load_web_forms_snowflake", key="web_forms_snowflake_rows"
-        )
-        or 0,
-    }
-
-    print(f"""
-    ========================================
-    PIPELINE VALIDATION SUMMARY
-    ========================================
-    Execution Date: {context['ds']}
-    
-    Daily Data:
-    - Call Logs: {s3_counts['call_logs']:,} records
-    - Social Media: {s3_counts['social_media']:,} records
-    - Web Forms: {s3_counts['web_forms']:,} records
-
-    Total S3: {sum(s3_counts.values()):,}
-
-    Snowflake Staging:
-    - Call Logs: {sf_counts['call_logs']:,} records
-    - Social Media: {sf_counts['social_media']:,} records
-    - Web Forms: {sf_counts['web_forms']:,} records
-
-    Total Snowflake: {sum(sf_counts.values()):,}
-    ========================================
-    """)
+    load_reports = {}
+    for task_id, table in LOAD_TASKS.items():
+        report = ti.xcom_pull(task_ids=task_id, key="load_report")
+        if report:
+            load_reports[table] = report
+
+    # Daily data is partitioned by the run's date, static data by the day
+    # it was extracted
+    partitions = {context["ds"], datetime.now().date().isoformat()}
+    result = reconcile(partitions, load_reports)
+
+    print(f"Pipeline reconciliation for {context['ds']}:")
+    print(format_reconciliation(result))
+    ti.xcom_push(key="reconciliation", value=result)
+
+    stages = print_stage_breakdown(run_id=context["run_id"])
+    ti.xcom_push(key="stage_breakdown", value=stages)
+    if profiling_enabled():
+        print_profiles(context["run_id"])
+
+    if result["status"] == "mismatch":
+        mismatched = [
+            table
+            for table, entry in result["tables"].items()
+            if entry["status"] == "mismatch"
+        ]
+        if RECONCILE_STRICT:
+            raise ValueError(f"Loaded rows differ from staged rows for: {mismatched}")
+        print(f"WARNING: loaded rows differ from staged rows for: {mismatched}")
 
 
 with DAG(
@@ -172,6 +249,9 @@ with DAG(
     catchup=False,
     max_active_runs=1,
     tags=["telecom", "customer-experience", "raw-layer"],
+    # cpu, sample and/or memory, comma-separated, to profile the extract and
+    # load functions of a manual run
+    params={"profile": ""},
 ):
 
     start = EmptyOperator(task_id="start")
@@ -242,9 +322,50 @@ with DAG(
             python_callable=load_web_forms_to_snowflake,
         )
 
+        # Daily Aggregates Tasks
+        build_aggregates_task = PythonOperator(
+            task_id="build_aggregates",
+            python_callable=build_aggregates,
+        )
+
+        load_aggregates_task = PythonOperator(
+            task_id="load_aggregates_snowflake",
+            python_callable=load_aggregates_to_snowflake,
+        )
+
         extract_call_logs_task >> load_call_logs_task
         extract_social_media_task >> load_social_media_task
         extract_web_forms_task >> load_web_forms_task
+        (
+            [extract_call_logs_task, extract_social_media_task, extract_web_forms_task]
+            >> build_aggregates_task
+            >> load_aggregates_task
+        )
+
+    # Staged data is checked once every extract is done, before any load
+    lake_checks_task = PythonOperator(
+        task_id="lake_checks",
+        python_callable=check_staging_lake,
+    )
+
+    (
+        [
+            extract_customers_task,
+            extract_agents_task,
+            extract_call_logs_task,
+            extract_social_media_task,
+            extract_web_forms_task,
+        ]
+        >> lake_checks_task
+        >> [
+            load_customers_task,
+            load_agents_task,
+            load_call_logs_task,
+            load_social_media_task,
+            load_web_forms_task,
+            load_aggregates_task,
+        ]
+    )
 
     validate = PythonOperator(
         task_id="validate_pipeline",
@@ -254,10 +375,19 @@ with DAG(
     with TaskGroup(
         "dbt_transform", tooltip="dbt transformations: Staging >> Transformed"
     ) as dbt_group:
-        # Test source data quality
+        # Test source data quality, only over rows loaded for this run
         dbt_test_sources = BashOperator(
             task_id="dbt_test_sources",
-            bash_command="cd /opt/airflow/dbt && dbt test --select source:*",
+            bash_command=(
+                "cd /opt/airflow/dbt && dbt test --select source:* "
+                '--vars \'{"test_window_start": "{{ ds }}"}\''
+            ),
+        )
+
+        # Incremental models over staging: merge only the newly loaded rows
+        dbt_run_sources = BashOperator(
+            task_id="dbt_run_sources",
+            bash_command="cd /opt/airflow/dbt && dbt run --select path:models/source",
         )
 
         dbt_run_transformed = BashOperator(
@@ -270,7 +400,12 @@ with DAG(
             bash_command="cd /opt/airflow/dbt && dbt test --select transformed.*",
         )
 
-        dbt_test_sources >> dbt_run_transformed >> dbt_test_transformed
+        (
+            dbt_test_sources
+            >> dbt_run_sources
+            >> dbt_run_transformed
+            >> dbt_test_transformed
+        )
 
     success_notification = BashOperator(
         task_id="send_success_notification",
@@ -0,0 +1,5 @@
+"""
+Benchmarks for the CoreTelecoms extract and load pipeline.
+
+`benchmarks.run` is the entry point; see its module docstring for usage.
+"""
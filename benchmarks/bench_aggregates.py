@@ -0,0 +1,207 @@
+"""
+Measure the daily complaint aggregates against queries over the raw rows.
+
+    python -m benchmarks.bench_aggregates --rows 50000 --days 3
+    BENCH_SNOWFLAKE_LATENCY_MS=150 python -m benchmarks.bench_aggregates
+
+Stages the synthetic call logs, social media and web forms twice in fresh
+interpreters, once with AGGREGATES_ENABLED off and once on. The second run
+then builds the daily aggregates and loads them into the stand-in
+warehouse. Both answer the same dashboard questions with DuckDB: complaints
+per agent per day, distinct customers per source per day and the median
+call duration per day. The off run scans the staged rows and the on run
+reads the aggregate files.
+
+The report shows the extract time and its overhead, the rows and files
+each question reads, and its seconds. It also shows the worst relative
+error of the sketched answers. The per-agent counts must match exactly.
+"""
+
+import sys
+import json
+import time
+import argparse
+
+from datetime import date
+from pathlib import Path
+
+from benchmarks.harness import REPO_ROOT, STAGES, run_child, setup
+from benchmarks.run import ensure_data
+
+SOURCES = {
+    "call_logs": "call_start_time",
+    "social_medias": "request_date",
+    "web_forms": "request_date",
+}
+
+
+def raw_answers(lake_checks):
+    con = lake_checks.connection()
+    scans, read = [], 0
+    for table, column in SOURCES.items():
+        files = lake_checks.partition_files(table)
+        read += len(files)
+        scans.append(
+            f"SELECT '{table}' AS source, "
+            f"strftime(CAST({column} AS TIMESTAMP), '%Y-%m-%d') AS day, "
+            f"CAST(agent_id AS VARCHAR) AS agent, customer_id, "
+            f"{'epoch(CAST(call_end_time AS TIMESTAMP) - CAST(call_start_time AS TIMESTAMP))' if table == 'call_logs' else 'NULL'} AS duration "
+            f"FROM {lake_checks.scan(files)}"
+        )
+    con.execute(f"CREATE OR REPLACE TEMP VIEW raw AS {' UNION ALL '.join(scans)}")
+    rows = con.execute("SELECT COUNT(*) FROM raw").fetchone()[0]
+    per_agent = con.execute(
+        "SELECT day, agent, COUNT(*) FROM raw GROUP BY 1, 2"
+    ).fetchall()
+    distinct = con.execute(
+        "SELECT source, day, COUNT(DISTINCT customer_id) FROM raw GROUP BY 1, 2"
+    ).fetchall()
+    median = con.execute(
+        "SELECT day, median(duration) FROM raw WHERE source = 'call_logs' GROUP BY 1"
+    ).fetchall()
+    return rows, read, per_agent, distinct, median
+
+
+def aggregate_answers(lake_checks, table):
+    con = lake_checks.connection()
+    files = lake_checks.partition_files(table)
+    con.execute(
+        f"CREATE OR REPLACE TEMP VIEW agg AS SELECT * FROM read_parquet("
+        f"[{', '.join(repr(f) for f in files)}], hive_partitioning = false)"
+    )
+    rows = con.execute("SELECT COUNT(*) FROM agg").fetchone()[0]
+    per_agent = con.execute(
+        "SELECT event_date, value, SUM(complaints) FROM agg "
+        "WHERE dimension = 'agent' GROUP BY 1, 2"
+    ).fetchall()
+    distinct = con.execute(
+        "SELECT source, event_date, distinct_customers FROM agg "
+        "WHERE dimension = 'all'"
+    ).fetchall()
+    median = con.execute(
+        "SELECT event_date, p50_duration_seconds FROM agg "
+        "WHERE dimension = 'all' AND source = 'call_logs'"
+    ).fetchall()
+    return rows, len(files), per_agent, distinct, median
+
+
+def child(work_dir, enabled):
+    warehouse = setup(work_dir, f"bench-aggregates-{enabled}", fresh=True)["snowflake"]
+
+    import lake_checks
+    import snowflake_load
+    from aggregates import AGGREGATES_TABLE, LOAD_KEYS
+    from utils import build_daily_aggregates
+
+    with open(work_dir / "data" / "manifest.json") as f:
+        manifest = json.load(f)
+
+    started = time.perf_counter()
+    for name in ("call_logs", "social_media", "web_forms"):
+        STAGES[name](work_dir, manifest)
+    result = {"extract_seconds": time.perf_counter() - started}
+
+    if enabled:
+        started = time.perf_counter()
+        built = build_daily_aggregates(manifest["days"] + [str(date.today())])
+        result["build_seconds"] = time.perf_counter() - started
+        result["build_days"] = len(built["event_dates"])
+
+        before = len(warehouse.statements)
+        started = time.perf_counter()
+        result["loaded"] = snowflake_load.load_s3_parquet_to_snowflake(
+            AGGREGATES_TABLE, unique_keys=LOAD_KEYS
+        )
+        result["load_seconds"] = time.perf_counter() - started
+        result["load_statements"] = len(warehouse.statements) - before
+
+    started = time.perf_counter()
+    answers = (
+        aggregate_answers(lake_checks, AGGREGATES_TABLE)
+        if enabled
+        else raw_answers(lake_checks)
+    )
+    result["query_seconds"] = time.perf_counter() - started
+    result["rows_read"], result["files_read"] = answers[0], answers[1]
+    result["per_agent"] = {f"{d}|{a}": n for d, a, n in answers[2]}
+    result["distinct"] = {f"{s}|{d}": n for s, d, n in answers[3]}
+    result["median"] = {str(d): m for d, m in answers[4]}
+    print(json.dumps(result, default=float))
+    return 0
+
+
+def run(work_dir, enabled):
+    return run_child(
+        "benchmarks.bench_aggregates",
+        "--child",
+        "--work-dir",
+        work_dir,
+        *(["--enabled"] if enabled else []),
+        env={"AGGREGATES_ENABLED": "true" if enabled else "false"},
+    )
+
+
+def worst_error(exact, estimate):
+    errors = [
+        abs(estimate[k] - v) / v
+        for k, v in exact.items()
+        if v and estimate.get(k) is not None
+    ]
+    return max(errors) if errors else 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Daily aggregates benchmark")
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--files", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--child", action="store_true")
+    parser.add_argument("--enabled", action="store_true")
+    parser.add_argument("--work-dir", default=str(REPO_ROOT / ".bench" / "aggregates"))
+    args = parser.parse_args(argv)
+    work_dir = Path(args.work_dir).resolve()
+
+    if args.child:
+        return child(work_dir, args.enabled)
+
+    work_dir.mkdir(parents=True, exist_ok=True)
+    ensure_data(work_dir, args.rows, args.days, args.files, args.seed)
+
+    raw, agg = run(work_dir, False), run(work_dir, True)
+    overhead = agg["extract_seconds"] / raw["extract_seconds"] - 1
+    print(f"{args.rows:,} rows per source over {args.days} day(s)\n")
+    print(
+        f"Extract: {raw['extract_seconds']:.2f}s without aggregates, "
+        f"{agg['extract_seconds']:.2f}s with ({overhead:+.0%})"
+    )
+    print(
+        f"Build:   {agg['build_seconds']:.2f}s for {agg['build_days']} event day(s); "
+        f"load: {agg['loaded']:,} rows in {agg['load_statements']} statements, "
+        f"{agg['load_seconds']:.2f}s\n"
+    )
+    header = f"{'READS':<12}{'ROWS':>12}{'FILES':>7}{'SECONDS':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, r in (("raw rows", raw), ("aggregates", agg)):
+        print(
+            f"{name:<12}{r['rows_read']:>12,}{r['files_read']:>7,}{r['query_seconds']:>9.3f}"
+        )
+    print(
+        f"\nDistinct customers per source and day: worst error "
+        f"{worst_error(raw['distinct'], agg['distinct']):.1%}"
+    )
+    print(
+        f"Median call duration per day: worst error "
+        f"{worst_error(raw['median'], agg['median']):.1%}"
+    )
+
+    if raw["per_agent"] != agg["per_agent"]:
+        print("Per-agent complaint counts differ from the raw rows")
+        return 1
+    print("Per-agent complaint counts match the raw rows")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
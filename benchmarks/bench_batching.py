@@ -0,0 +1,119 @@
+"""
+Compare fixed chunk sizes with adaptive, memory-budgeted batching.
+
+    python -m benchmarks.bench_batching --rows 500000 --budgets 64,256,1024
+
+Generates one customers CSV and one web forms table, then extracts both in a
+fresh interpreter per configuration: fixed chunk sizes, and the adaptive
+batcher under each memory budget. Each configuration reports its peak RSS,
+wall time, and per reader the batch sizes it chose and how far RSS grew above
+where it started.
+"""
+
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+from datetime import date
+from pathlib import Path
+
+from benchmarks.harness import REPO_ROOT, run_child, setup
+
+DAY = date(2025, 11, 20)
+
+
+def child(work_dir, chunk_size):
+    setup(work_dir, "bench-batching", fresh=True)
+
+    summaries = []
+
+    class Collect(logging.Handler):
+        def emit(self, record):
+            # A lone dict argument becomes record.args itself
+            if isinstance(record.args, dict) and "reader" in record.args:
+                summaries.append(record.args)
+
+    logging.getLogger("batching").addHandler(Collect())
+
+    from metrics import peak_rss_bytes
+    from pg_extractor import extract_web_forms
+    from s3_extractor import extract_customers
+
+    started = time.perf_counter()
+    extract_customers(chunk_size=chunk_size or None)
+    extract_web_forms("web_forms", exec_date=DAY, chunk_size=chunk_size or None)
+    seconds = time.perf_counter() - started
+
+    print(
+        json.dumps(
+            {"seconds": seconds, "peak_rss": peak_rss_bytes(), "readers": summaries}
+        )
+    )
+    return 0
+
+
+def run_config(work_dir, chunk_size, budget_mb):
+    return run_child(
+        "benchmarks.bench_batching",
+        "--child",
+        "--work-dir",
+        work_dir,
+        "--chunk-size",
+        chunk_size,
+        env={"BATCH_MEMORY_BUDGET_MB": budget_mb} if budget_mb else None,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Adaptive batching benchmark")
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--fixed", default="50000,200000")
+    parser.add_argument("--budgets", default="64,256,1024")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=0)
+    parser.add_argument("--child", action="store_true")
+    parser.add_argument("--work-dir", default=str(REPO_ROOT / ".bench" / "batching"))
+    args = parser.parse_args(argv)
+    work_dir = Path(args.work_dir).resolve()
+
+    if args.child:
+        return child(work_dir, args.chunk_size)
+
+    from benchmarks.generators import write_customers, write_web_forms
+
+    shutil.rmtree(work_dir, ignore_errors=True)
+    source = work_dir / "data" / "source"
+    source.mkdir(parents=True)
+    write_customers(source, args.rows, seed=args.seed)
+    write_web_forms(work_dir / "data" / "postgres.db", args.rows, [DAY], 10_000)
+
+    configs = [(f"fixed {n}", int(n), None) for n in args.fixed.split(",") if n]
+    configs += [
+        (f"adaptive {mb} MB", 0, int(mb)) for mb in args.budgets.split(",") if mb
+    ]
+
+    print(
+        f"{'CONFIG':<20}{'SECONDS':>9}{'PEAK RSS MB':>13}  "
+        f"{'READER':<40}{'BATCHES':>8}{'MIN':>9}{'MAX':>9}{'RSS +MB':>9}"
+    )
+    for name, chunk_size, budget_mb in configs:
+        result = run_config(work_dir, chunk_size, budget_mb)
+        for i, reader in enumerate(result["readers"]):
+            lead = (
+                f"{name:<20}{result['seconds']:>9.2f}"
+                f"{result['peak_rss'] / 1024**2:>13.1f}"
+                if i == 0
+                else " " * 42
+            )
+            print(
+                f"{lead}  {reader['reader']:<40}{reader['batches']:>8}"
+                f"{reader['min_rows']:>9,}{reader['max_rows']:>9,}"
+                f"{reader['peak_rss_growth_mb']:>9.1f}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""
+Compare full web form extraction with the incremental CDC modes.
+
+    python -m benchmarks.bench_cdc --rows 100000 --days 3 --change-pct 1
+
+Generates the per-day web form tables, then runs: a full extraction of every
+day, a first watermark run (everything is new), a re-run with no changes, and,
+after updating, late-inserting and deleting a share of rows, a watermark run
+and a trigger run against a sqlite version of the change table. Every pass
+reports rows staged and their operation mix; the last pass also loads the
+deltas to show the MERGE that applies them.
+"""
+
+import sys
+import time
+import shutil
+import sqlite3
+import argparse
+import numpy as np
+import pandas as pd
+
+from collections import Counter
+from datetime import date
+from pathlib import Path
+
+from benchmarks.harness import DEST_BUCKET, REPO_ROOT, setup
+
+END = date(2025, 11, 20)
+
+
+def sqlite_change_capture(db_path, tables, change_table):
+    """
+    The trigger-mode change table and triggers, in sqlite's dialect.
+    """
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {change_table} ("
+        "change_id INTEGER PRIMARY KEY AUTOINCREMENT, table_name TEXT, op TEXT, "
+        "row_data TEXT, changed_at TEXT DEFAULT CURRENT_TIMESTAMP)"
+    )
+    for table in tables:
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        for op, event, ref in (("I", "INSERT", "NEW"), ("U", "UPDATE", "NEW")) + (
+            ("D", "DELETE", "OLD"),
+        ):
+            pairs = ", ".join(f"'{c}', {ref}.\"{c}\"" for c in columns)
+            conn.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_{op} AFTER {event} ON {table} "
+                f"BEGIN INSERT INTO {change_table} (table_name, op, row_data) "
+                f"VALUES ('{table}', '{op}', json_object({pairs})); END"
+            )
+    conn.commit()
+    conn.close()
+
+
+def mutate(db_path, tables, pct, seed):
+    """
+    Update pct% of the last day's rows, late-insert pct% into the day before
+    and delete pct% of the last day. Returns the number of each.
+    """
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(db_path)
+    try:
+        last, previous = tables[-1], tables[-2]
+        total = conn.execute(f"SELECT COUNT(*) FROM {last}").fetchone()[0]
+        n = max(1, int(total * pct / 100))
+        rowids = rng.choice(np.arange(1, total + 1), size=2 * n, replace=False)
+        updated, deleted = rowids[:n].tolist(), rowids[n:].tolist()
+
+        conn.executemany(
+            f"UPDATE {last} SET resolution_status = 'Resolved', "
+            "updated_at = datetime('now') WHERE rowid = ?",
+            [(r,) for r in updated],
+        )
+        late = pd.read_sql(f"SELECT * FROM {previous} LIMIT {n}", conn)
+        late["request_id"] = [f"WF-LATE-{i:08d}" for i in range(n)]
+        late["updated_at"] = pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
+        late.to_sql(previous, conn, if_exists="append", index=False)
+        conn.executemany(f"DELETE FROM {last} WHERE rowid = ?", [(r,) for r in deleted])
+        conn.commit()
+    finally:
+        conn.close()
+    return {"updated": n, "inserted": n, "deleted": n}
+
+
+def staged_ops(work_dir, before):
+    """
+    Operation mix of the CDC files written since `before` was listed.
+    """
+    base = work_dir / "s3" / DEST_BUCKET / "staging" / "web_forms"
+    files = set(base.rglob("*.parquet")) if base.exists() else set()
+    ops = Counter()
+    for path in files - before:
+        frame = pd.read_parquet(path)
+        ops.update(frame["_op"] if "_op" in frame else ["full"] * len(frame))
+    return files, dict(ops)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Web forms CDC benchmark")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--change-pct", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--work-dir", default=str(REPO_ROOT / ".bench" / "cdc"))
+    args = parser.parse_args(argv)
+
+    from benchmarks.generators import business_days, write_web_forms
+
+    work_dir = Path(args.work_dir).resolve()
+    shutil.rmtree(work_dir, ignore_errors=True)
+    (work_dir / "data" / "source").mkdir(parents=True)
+    db_path = work_dir / "data" / "postgres.db"
+    days = business_days(END, args.days)
+    tables = write_web_forms(db_path, args.rows, days, customers=10_000)
+
+    standins = setup(
+        work_dir, "bench-cdc", env={"WEB_FORMS_CDC_LOOKBACK_DAYS": args.days - 1}
+    )
+
+    import pg_cdc
+    from pg_extractor import extract_web_forms
+    from snowflake_load import load_s3_parquet_to_snowflake
+
+    def full():
+        return sum(extract_web_forms("web_forms", exec_date=day) for day in days)
+
+    def cdc(mode):
+        return lambda: pg_cdc.extract_web_forms_cdc("web_forms", END, mode=mode)
+
+    passes = [
+        ("full", full),
+        ("watermark_first", cdc("watermark")),
+        ("watermark_rerun", cdc("watermark")),
+        ("mutate", None),
+        ("watermark_delta", cdc("watermark")),
+        ("trigger_delta", cdc("trigger")),
+    ]
+
+    files, results, changes = set(), [], None
+    for name, run in passes:
+        if run is None:
+            sqlite_change_capture(db_path, tables, pg_cdc.WEB_FORMS_CDC_CHANGE_TABLE)
+            changes = mutate(db_path, tables, args.change_pct, args.seed)
+            continue
+        started = time.perf_counter()
+        rows = run()
+        seconds = time.perf_counter() - started
+        files, ops = staged_ops(work_dir, files)
+        results.append((name, rows, seconds, ops))
+
+    statements = standins["snowflake"].statements
+    loaded = len(statements)
+    base = work_dir / "s3" / DEST_BUCKET / "staging" / "web_forms"
+    deltas = sorted(str(p.relative_to(base)) for p in files if "cdc-" in p.name)
+    load_s3_parquet_to_snowflake("web_forms", unique_keys=["REQUEST_ID"], files=deltas)
+    merge = next(s for s in statements[loaded:] if s.startswith("MERGE"))
+
+    print(f"changes applied: {changes}")
+    print(f"{'PASS':<18}{'ROWS':>10}{'SECONDS':>10}  OPS")
+    for name, rows, seconds, ops in results:
+        print(f"{name:<18}{rows:>10,}{seconds:>10.2f}  {ops}")
+    print("MERGE clauses: " + ", ".join(part for part in merge.split(" WHEN ")[1:]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
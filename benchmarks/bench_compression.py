@@ -0,0 +1,118 @@
+"""
+Time extraction of compressed source files against plain ones.
+
+    python -m benchmarks.bench_compression --rows 5000 --days 3
+    BENCH_S3_LATENCY_MS=20 python -m benchmarks.bench_compression --stages customers,call_logs
+
+Generates the synthetic S3 sources once, then copies them into one work
+directory per variant: plain, gzip, zstd and bz2 with their suffixes, and
+gzip without a suffix, which the readers have to recognise by its magic
+bytes. Every stage runs in a fresh interpreter against each variant. The
+report shows the source bytes transferred, rows, wall time, rows/s and
+peak RSS per variant, and checks that every variant extracted the same
+number of rows as the plain files.
+"""
+
+import bz2
+import sys
+import gzip
+import shutil
+import argparse
+
+from pathlib import Path
+
+from benchmarks.harness import REPO_ROOT
+from benchmarks.run import ensure_data, run_stage_child
+
+S3_STAGES = "customers,call_logs,social_media"
+
+
+def _zstd(data):
+    import zstandard
+
+    return zstandard.ZstdCompressor(level=3).compress(data)
+
+
+# Variant -> (compress bytes, suffix added to each key)
+VARIANTS = {
+    "plain": (None, ""),
+    "gzip": (lambda data: gzip.compress(data, compresslevel=6), ".gz"),
+    "zstd": (_zstd, ".zst"),
+    "bz2": (bz2.compress, ".bz2"),
+    "gzip, no suffix": (lambda data: gzip.compress(data, compresslevel=6), ""),
+}
+
+
+def make_variant(data_dir, variant_dir, compress, suffix):
+    """
+    Copy the generated sources into variant_dir/data, compressing each file.
+    """
+    shutil.rmtree(variant_dir, ignore_errors=True)
+    target = variant_dir / "data"
+    target.mkdir(parents=True)
+    shutil.copy(data_dir / "manifest.json", target / "manifest.json")
+    source = data_dir / "source"
+    for path in source.rglob("*"):
+        if not path.is_file():
+            continue
+        out = target / "source" / path.relative_to(source)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        if compress is None:
+            shutil.copy(path, out)
+        else:
+            out.with_name(out.name + suffix).write_bytes(compress(path.read_bytes()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compressed sources benchmark")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--files", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--stages", default=S3_STAGES)
+    parser.add_argument("--work-dir", default=str(REPO_ROOT / ".bench" / "compression"))
+    args = parser.parse_args(argv)
+
+    work_dir = Path(args.work_dir).resolve()
+    work_dir.mkdir(parents=True, exist_ok=True)
+    ensure_data(work_dir, args.rows, args.days, args.files, args.seed)
+    stages = args.stages.split(",")
+
+    results = {}
+    for name, (compress, suffix) in VARIANTS.items():
+        try:
+            variant_dir = work_dir / "variants" / name.replace(", ", "-")
+            make_variant(work_dir / "data", variant_dir, compress, suffix)
+        except ImportError as e:
+            print(f"Skipping {name}: {e}")
+            continue
+        runs = [
+            run_stage_child(s, variant_dir, f"bench-compression-{s}") for s in stages
+        ]
+        results[name] = {
+            "bytes": sum(r["bytes"] for r in runs),
+            "rows": sum(r["rows"] for r in runs),
+            "seconds": sum(r["seconds"] for r in runs),
+            "peak_rss_mb": max(r["peak_rss_mb"] for r in runs),
+        }
+
+    plain = results["plain"]
+    print(f"{args.rows:,} rows per source, stages {args.stages}")
+    header = f"{'VARIANT':<18}{'SOURCE MB':>10}{'RATIO':>7}{'ROWS':>9}{'SECONDS':>9}{'ROWS/S':>10}{'PEAK RSS MB':>13}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        print(
+            f"{name:<18}{r['bytes'] / 1e6:>10.2f}{plain['bytes'] / r['bytes']:>6.1f}x"
+            f"{r['rows']:>9,}{r['seconds']:>9.2f}{r['rows'] / r['seconds']:>10,.0f}"
+            f"{r['peak_rss_mb']:>13.1f}"
+        )
+    mismatched = [n for n, r in results.items() if r["rows"] != plain["rows"]]
+    if mismatched:
+        print(f"Row counts differ from the plain files for: {', '.join(mismatched)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""
+Measure how parse/normalize throughput scales with CPU pool workers.
+
+    python -m benchmarks.bench_cpu_pool --rows 400000 --workers 0,2,4,8
+
+Builds customer CSV chunks and social media JSON documents in memory and runs
+the extractors' chunk transforms (s3_extractor._customer_frame and
+_try_social_media_frame) inline (0 workers) and through cpu_pool.CpuPool with
+each worker count. Pools are warmed up before timing, so process start-up is
+excluded; payloads and results cross processes through the shared-memory
+handoff. Speed-up is bounded by the cores of the machine running it.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import functools
+import numpy as np
+
+from datetime import date
+from pathlib import Path
+
+from benchmarks.harness import REPO_ROOT, setup
+
+DAY = date(2025, 11, 20)
+
+
+def customer_chunks(rows, chunk_size, seed):
+    """
+    (header, records) pairs as iter_csv_records yields them.
+    """
+    from benchmarks.generators import customers_frame
+
+    rng = np.random.default_rng(seed)
+    data = customers_frame(rng, 0, rows).to_csv(index=False).encode()
+    header, _, body = data.partition(b"\n")
+    lines = body.splitlines(keepends=True)
+    return [
+        (header + b"\n", b"".join(lines[i : i + chunk_size]))
+        for i in range(0, len(lines), chunk_size)
+    ]
+
+
+def social_documents(rows, files, seed):
+    """
+    (key, body) pairs of social media JSON documents.
+    """
+    from benchmarks.generators import social_media_records
+
+    rng = np.random.default_rng(seed)
+    per_file = max(1, rows // files)
+    return [
+        (
+            f"social_medias/media_complaint_day_{DAY}.json",
+            json.dumps(
+                social_media_records(rng, i * per_file, per_file, DAY, 10_000)
+            ).encode(),
+        )
+        for i in range(files)
+    ]
+
+
+def streams(documents):
+    """
+    (key, stream, size) items as _social_media_sources yields them, fresh
+    for every pass since a stream is read once.
+    """
+    return [(key, io.BytesIO(body), len(body)) for key, body in documents]
+
+
+def measure(func, items, workers):
+    import cpu_pool
+
+    if callable(items):
+        warm_up = [items()[0] for _ in range(max(workers, 1))]
+        items = items()
+    else:
+        warm_up = items[:1] * workers
+
+    if workers <= 1:
+        started = time.perf_counter()
+        frames = [func(*item) for item in items]
+        return frames, time.perf_counter() - started
+
+    pool = cpu_pool.CpuPool(workers=workers)
+    try:
+        # Start every worker and import the transform before timing
+        list(pool.imap(func, warm_up))
+        started = time.perf_counter()
+        frames = list(pool.imap(func, items))
+        return frames, time.perf_counter() - started
+    finally:
+        pool.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CPU pool scaling benchmark")
+    parser.add_argument("--rows", type=int, default=400_000)
+    parser.add_argument("--chunk-size", type=int, default=25_000)
+    parser.add_argument("--social-rows", type=int, default=4_000)
+    parser.add_argument("--social-files", type=int, default=16)
+    parser.add_argument("--workers", default="0,2,4,8")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--work-dir", default=str(REPO_ROOT / ".bench" / "cpu_pool"))
+    args = parser.parse_args(argv)
+
+    work_dir = Path(args.work_dir).resolve()
+    shutil.rmtree(work_dir, ignore_errors=True)
+    (work_dir / "data" / "source").mkdir(parents=True)
+    setup(work_dir, "bench-cpu-pool")
+
+    from s3_extractor import _customer_frame, _try_social_media_frame
+
+    workloads = [
+        (
+            "customers_csv",
+            _customer_frame,
+            customer_chunks(args.rows, args.chunk_size, args.seed),
+        ),
+        (
+            "social_media_json",
+            _try_social_media_frame,
+            functools.partial(
+                streams,
+                social_documents(args.social_rows, args.social_files, args.seed),
+            ),
+        ),
+    ]
+
+    print(f"cores available: {os.cpu_count()}")
+    print(
+        f"{'WORKLOAD':<20}{'WORKERS':>8}{'ROWS':>10}{'SECONDS':>10}"
+        f"{'ROWS/S':>12}{'SPEEDUP':>9}"
+    )
+    for name, func, items in workloads:
+        baseline = None
+        for workers in (int(w) for w in args.workers.split(",")):
+            frames, seconds = measure(func, items, workers)
+            rows = sum(len(f) for f in frames if f is not None)
+            rate = rows / seconds if seconds else 0.0
+            baseline = baseline or rate
+            print(
+                f"{name:<20}{workers:>8}{rows:>10,}{seconds:>10.2f}"
+                f"{rate:>12,.0f}{rate / baseline:>8.2f}x"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+Measure extract-side dedup on overlapping source files and re-appends.
+
+    python -m benchmarks.bench_dedup --rows 200000 --overlap-pct 30
+
+Writes a customers CSV and a call logs CSV and extracts them. Then it adds a
+second customers file that repeats overlap-pct% of the first file, changes
+1% of its rows and appends new ones, plus an exact copy of the call logs
+file under another name, and extracts again. Every pass reports the rows
+read, the duplicates dropped and the rows staged. The staged tables are then
+loaded with the warehouse dedup on and off. Finally the exact and Bloom
+indexes are timed on the same rows and their persisted sizes compared.
+"""
+
+import sys
+import time
+import shutil
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+
+from datetime import date
+from pathlib import Path
+
+from benchmarks.harness import DEST_BUCKET, REPO_ROOT, setup
+
+DAY = date(2025, 11, 20)
+
+
+def staged_rows(work_dir, table):
+    base = work_dir / "s3" / DEST_BUCKET / "staging" / table
+    if not base.exists():
+        return 0
+    return sum(len(pd.read_parquet(p)) for p in base.rglob("*.parquet"))
+
+
+def overlapping_customers(source, rows, pct, seed):
+    """
+    A second customers file: pct% of the first file unchanged, 1% of those
+    with a changed address, and as many new customers.
+    """
+    rng = np.random.default_rng(seed)
+    first = pd.read_csv(source / "customers" / "customers_dataset_0.csv")
+    repeated = first.sample(n=int(rows * pct / 100), random_state=seed)
+    changed = repeated.sample(frac=0.01, random_state=seed + 1).index
+    repeated.loc[changed, "address"] = rng.integers(1000, 2000, len(changed))
+    fresh = first.sample(n=len(repeated), random_state=seed + 2).copy()
+    fresh["customer_id"] = [f"CUSTNEW{i}" for i in range(len(fresh))]
+    pd.concat([repeated, fresh]).to_csv(
+        source / "customers" / "customers_dataset_1.csv", index=False
+    )
+    return len(repeated) - len(changed), len(changed), len(fresh)
+
+
+def index_costs(rows, seed):
+    """
+    (kind, seconds to check, add and re-check the rows, persisted bytes, rows
+    re-seen) for each index.
+    """
+    import dedup
+
+    rng = np.random.default_rng(seed)
+    keys = rng.integers(0, 2**63, rows, dtype=np.uint64)
+    digests = rng.integers(0, 2**63, rows, dtype=np.uint64)
+    results = []
+    for kind, index_cls in dedup.INDEXES.items():
+        index = index_cls()
+        started = time.perf_counter()
+        fresh = ~index.seen(keys, digests)
+        index.add(keys[fresh], digests[fresh])
+        seen = index.seen(keys, digests)
+        seconds = time.perf_counter() - started
+        results.append((kind, seconds, len(index.to_bytes()), int(seen.sum())))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract-side dedup benchmark")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--overlap-pct", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--work-dir", default=str(REPO_ROOT / ".bench" / "dedup"))
+    args = parser.parse_args(argv)
+
+    from benchmarks.generators import write_call_logs, write_customers
+
+    work_dir = Path(args.work_dir).resolve()
+    shutil.rmtree(work_dir, ignore_errors=True)
+    source = work_dir / "data" / "source"
+    source.mkdir(parents=True)
+    write_customers(source, args.rows, seed=args.seed)
+    (call_log,) = write_call_logs(source, args.rows, [DAY], customers=args.rows)
+
+    standins = setup(
+        work_dir,
+        "bench-dedup",
+        env={"DEDUP_MODE": "drop", "DEDUP_BLOOM_CAPACITY": 4 * args.rows},
+    )
+
+    from s3_extractor import extract_call_logs, extract_customers
+    import snowflake_load
+    from snowflake_load import load_s3_parquet_to_snowflake
+    from utils import DEST_BUCKET, write_to_s3_parquet
+
+    reports = {}
+
+    class Collect(logging.Handler):
+        def emit(self, record):
+            if record.msg.startswith("-" * 24 + " Dedup %s:"):
+                table, duplicates, rows = record.args[:3]
+                reports[table] = (rows, duplicates)
+
+    logging.getLogger("dedup").addHandler(Collect())
+
+    def run_pass():
+        results = []
+        for table, extract in (
+            ("customers", extract_customers),
+            ("call_logs", extract_call_logs),
+        ):
+            before = staged_rows(work_dir, table)
+            started = time.perf_counter()
+            df = extract()
+            if table == "call_logs" and not df.empty:
+                write_to_s3_parquet(df, "call_logs", mode="append")
+            seconds = time.perf_counter() - started
+            rows, duplicates = reports.pop(table, (0, 0))
+            staged = staged_rows(work_dir, table) - before
+            results.append((table, seconds, rows, duplicates, staged))
+        return results
+
+    passes = [("first", run_pass())]
+    kept, changed, fresh = overlapping_customers(
+        source, args.rows, args.overlap_pct, args.seed
+    )
+    shutil.copy(source / call_log, source / call_log.replace(".csv", "_copy.csv"))
+    passes.append(("overlap", run_pass()))
+
+    print(
+        f"second customers file: {kept:,} repeated, {changed:,} changed, "
+        f"{fresh:,} new; call logs re-delivered as a copy"
+    )
+    print(
+        f"{'PASS':<10}{'TABLE':<12}{'SECONDS':>9}{'READ':>10}{'DUPLICATES':>12}"
+        f"{'RATE':>8}{'STAGED':>10}"
+    )
+    for name, results in passes:
+        for table, seconds, rows, duplicates, staged in results:
+            rate = duplicates / rows if rows else 0.0
+            print(
+                f"{name:<10}{table:<12}{seconds:>9.2f}{rows:>10,}{duplicates:>12,}"
+                f"{rate:>8.1%}{staged:>10,}"
+            )
+
+    print(f"{'WAREHOUSE DEDUP':<18}{'TABLE':<12}{'STATEMENTS':>11}")
+    statements = standins["snowflake"].statements
+    for enabled in (True, False):
+        for table, keys in (("customers", ["CUSTOMER_ID"]), ("call_logs", ["CALL_ID"])):
+            # Both settings load every staged file
+            snowflake_load.s3_client.delete_object(
+                Bucket=DEST_BUCKET,
+                Key=f"{snowflake_load.LOADED_FILES_PREFIX}/{table}.json",
+            )
+            before = len(statements)
+            load_s3_parquet_to_snowflake(table, unique_keys=keys, dedup=enabled)
+            state = "on" if enabled else "off"
+            print(f"{state:<18}{table:<12}{len(statements) - before:>11}")
+
+    print(f"{'INDEX':<8}{'ROWS':>10}{'SECONDS':>9}{'BYTES':>12}{'RE-SEEN':>10}")
+    for kind, seconds, size, seen in index_costs(args.rows, args.seed):
+        print(f"{kind:<8}{args.rows:>10,}{seconds:>9.2f}{size:>12,}{seen:>10,}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Time the local lake checks on the newest partition against the whole lake.
+
+    python -m benchmarks.bench_lake_checks --days 30 --rows-per-day 200000
+
+Stages one customers partition and `days` daily call log partitions, with a
+few orphan customer ids and a repeated call id planted in the newest day.
+The checks then run three times: over the newest partition with a cold
+metadata cache, again with a warm one, and over every partition. Each run
+reports its time, the files it opened and what it found.
+"""
+
+import sys
+import time
+import shutil
+import argparse
+import numpy as np
+
+from datetime import date, timedelta
+from pathlib import Path
+
+from benchmarks.harness import REPO_ROOT, setup
+
+END = date(2025, 11, 20)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lake checks benchmark")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--rows-per-day", type=int, default=200_000)
+    parser.add_argument("--files-per-day", type=int, default=4)
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--work-dir", default=str(REPO_ROOT / ".bench" / "lake_checks"))
+    args = parser.parse_args(argv)
+
+    work_dir = Path(args.work_dir).resolve()
+    shutil.rmtree(work_dir, ignore_errors=True)
+    (work_dir / "data" / "source").mkdir(parents=True)
+    setup(work_dir, "bench-lake-checks")
+
+    from benchmarks.generators import call_logs_frame, customers_frame
+    from lake_checks import format_lake_checks, partition_files, run_lake_checks
+    from utils import add_metadata, clean_column_names, write_chunk_to_s3_parquet
+
+    rng = np.random.default_rng(args.seed)
+    customers = clean_column_names(customers_frame(rng, 0, args.customers))
+    write_chunk_to_s3_parquet(
+        add_metadata(customers, "customers"), "customers", "customers-00000", END
+    )
+
+    days = [END - timedelta(days=i) for i in range(args.days)][::-1]
+    per_file = args.rows_per_day // args.files_per_day
+    start = 0
+    for day in days:
+        for part in range(args.files_per_day):
+            block = clean_column_names(
+                call_logs_frame(rng, start, per_file, day, args.customers)
+            )
+            if day == END and part == 0:
+                block.loc[:4, "customer_id"] = [f"GHOST{i}" for i in range(5)]
+                block.loc[5, "call_id"] = block.loc[6, "call_id"]
+            write_chunk_to_s3_parquet(
+                add_metadata(block, "call_logs"), "call_logs", f"part-{part:05d}", day
+            )
+            start += per_file
+
+    tables = ["customers", "call_logs"]
+    print(
+        f"{args.days} days x {args.rows_per_day:,} call logs, "
+        f"{args.customers:,} customers"
+    )
+    print(f"{'SCAN':<22}{'SECONDS':>9}{'FILES':>7}{'FAILED':>8}")
+    for label, partitions in (
+        ("newest day (cold)", [END]),
+        ("newest day (warm)", [END]),
+        ("all partitions", None),
+    ):
+        started = time.perf_counter()
+        result = run_lake_checks(partitions, tables=tables)
+        seconds = time.perf_counter() - started
+        files = sum(len(partition_files(t, partitions)) for t in tables)
+        failed = sum(r["status"] == "failed" for r in result["checks"])
+        print(f"{label:<22}{seconds:>9.2f}{files:>7}{failed:>8}")
+    print(format_lake_checks(run_lake_checks([END], tables=tables)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""
+Measure log volume and logging overhead on the listing and chunk loops.
+
+    python -m benchmarks.bench_logging --history 100000 --files 1000 --chunks 20000
+
+"legacy" reproduces the previous behaviour: a synchronous file handler, an
+eager f-string per listed file (NEW/SKIP) and one INFO line per chunk.
+"current" is log_config as the pipeline now uses it: async queue handler,
+one summary line per listing and sampled per-chunk progress.
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "extract_folder"))
+
+
+def _root_with(handler):
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+
+
+def _legacy_setup(path):
+    handler = logging.FileHandler(path, mode="a", encoding="utf-8")
+    handler.setFormatter(
+        logging.Formatter(
+            "{asctime} - {levelname} - {message}",
+            style="{",
+            datefmt="%Y-%m-%d %H:%M",
+        )
+    )
+    _root_with(handler)
+    return handler.close
+
+
+def _current_setup(path, fmt):
+    import log_config
+
+    log_config.LOG_FILE = str(path)
+    log_config.LOG_FORMAT = fmt
+    log_config.LOG_ASYNC = True
+    # Drop the legacy handler, so the pipeline's goes on the root logger
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    log_config.configure_logging(force=True)
+    return log_config.shutdown_logging
+
+
+def _listing(files, tracker):
+    keys = [f"customers/file_{i:07d}.csv" for i in range(files)]
+    listed = [{"key": k, "size": 1} for k in keys]
+    tracker = {k: {"processed_date": "2025-11-20"} for k in keys[: files // 2]} | {
+        f"history/file_{i:07d}.csv": {"processed_date": "2025-01-01"}
+        for i in range(tracker)
+    }
+    return listed, tracker
+
+
+def legacy_listing(logger, listed, tracker, chunks):
+    for file_info in listed:
+        if file_info["key"] not in tracker:
+            logger.info(
+                f"-------------------------- NEW: {file_info['key']} processed -----------------------"
+            )
+        else:
+            logger.info(
+                f"SKIP: {file_info['key']} already processed on {tracker[file_info['key']]['processed_date']})"
+            )
+    for chunk_num in range(1, chunks + 1):
+        logger.info(f"------------------------- Streamed Chunk {chunk_num}: 50000 rows")
+
+
+def current_listing(logger, listed, tracker, chunks):
+    from log_config import LogSummary, log_sampled
+
+    new = LogSummary(logger, "NEW files under customers/")
+    skipped = LogSummary(logger, "SKIP files under customers/ already processed")
+    for file_info in listed:
+        if file_info["key"] not in tracker:
+            new.add(file_info["key"])
+        else:
+            skipped.add(file_info["key"], tracker[file_info["key"]]["processed_date"])
+    new.flush(prefix="customers/")
+    skipped.flush(prefix="customers/")
+    for chunk_num in range(1, chunks + 1):
+        log_sampled(
+            logger,
+            "bench_chunks",
+            "------------------------- Streamed Chunk %d: %d rows",
+            chunk_num,
+            50_000,
+            every=10,
+        )
+
+
+def measure(name, setup, loop, listed, tracker, chunks, out_dir, repeat):
+    path = out_dir / f"{name}.log"
+    teardown = setup(path)
+    logger = logging.getLogger(f"bench.{name}")
+    started = time.perf_counter()
+    for _ in range(repeat):
+        loop(logger, listed, tracker, chunks)
+    in_loop = time.perf_counter() - started
+    teardown()
+    with open(path, "rb") as f:
+        data = f.read()
+    return {
+        "mode": name,
+        "loop_seconds": in_loop / repeat,
+        "lines": data.count(b"\n") // repeat,
+        "bytes": len(data) // repeat,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Logging overhead benchmark")
+    parser.add_argument("--files", type=int, default=1_000, help="listed files")
+    parser.add_argument("--history", type=int, default=100_000, help="tracker size")
+    parser.add_argument("--chunks", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--format", default="text", choices=["text", "json"])
+    args = parser.parse_args(argv)
+
+    listed, tracker = _listing(args.files, args.history)
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = Path(tmp)
+        legacy = measure(
+            "legacy",
+            _legacy_setup,
+            legacy_listing,
+            listed,
+            tracker,
+            args.chunks,
+            out_dir,
+            args.repeat,
+        )
+        current = measure(
+            "current",
+            lambda path: _current_setup(path, args.format),
+            current_listing,
+            listed,
+            tracker,
+            args.chunks,
+            out_dir,
+            args.repeat,
+        )
+
+    print(f"{'MODE':<10}{'LOOP MS':>10}{'LINES':>10}{'BYTES':>12}")
+    for r in (legacy, current):
+        print(
+            f"{r['mode']:<10}{r['loop_seconds'] * 1e3:>10.1f}{r['lines']:>10,}{r['bytes']:>12,}"
+        )
+    print(
+        f"\nlog volume: {current['bytes'] / legacy['bytes']:.1%} of legacy, "
+        f"loop overhead: {current['loop_seconds'] / legacy['loop_seconds']:.1%} of legacy"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("LOG_FILE", os.devnull)
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""
+Measure end-to-end latency and per-batch overhead of micro-batch ingestion.
+
+    python -m benchmarks.bench_microbatch --duration 30 --interval 5
+    python -m benchmarks.bench_microbatch --duration 30 --interval 5 --queue
+
+A producer thread keeps landing call log CSVs in the stand-in source bucket
+and appending rows to today's web form table, while microbatch.MicroBatcher
+polls (or consumes S3 event notifications from a directory-backed queue),
+stages and loads them into the recording Snowflake stand-in. Latency is
+measured from the object's creation (or the row poll) to the end of its load.
+"""
+
+import sys
+import shutil
+import sqlite3
+import argparse
+import threading
+import numpy as np
+
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks.harness import REPO_ROOT, SOURCE_BUCKET, setup
+
+QUEUE_URL = "https://sqs.local/000000000000/bench-source-events"
+
+
+def produce(s3, db_path, stop, files_per_sec, rows_per_file, seed):
+    """
+    Land one call log file and a block of web form rows every 1/files_per_sec.
+    """
+    from benchmarks.generators import call_logs_frame, web_forms_frame
+
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(db_path)
+    seq = 0
+    try:
+        while not stop.is_set():
+            day = datetime.now(timezone.utc).date()
+            start = seq * rows_per_file
+            csv = call_logs_frame(rng, start, rows_per_file, day, 10_000).to_csv(
+                index=False
+            )
+            s3.put_object(
+                Bucket=SOURCE_BUCKET,
+                Key=f"call logs/call_logs_day_{day}_{seq:05d}.csv",
+                Body=csv,
+            )
+            web_forms_frame(rng, start, rows_per_file, day, 10_000).to_sql(
+                f"web_form_request_{day.strftime('%Y_%m_%d')}",
+                conn,
+                if_exists="append",
+                index=False,
+            )
+            conn.commit()
+            seq += 1
+            stop.wait(1 / files_per_sec)
+    finally:
+        conn.close()
+    return seq
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-batch ingestion benchmark")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--interval", type=float, default=5.0, help="flush seconds")
+    parser.add_argument("--max-mb", type=float, default=64.0, help="flush size")
+    parser.add_argument("--poll", type=float, default=0.5, help="poll seconds")
+    parser.add_argument("--files-per-sec", type=float, default=2.0)
+    parser.add_argument("--rows-per-file", type=int, default=500)
+    parser.add_argument("--queue", action="store_true", help="consume S3 events")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--work-dir", default=str(REPO_ROOT / ".bench" / "microbatch"))
+    args = parser.parse_args(argv)
+
+    work_dir = Path(args.work_dir).resolve()
+    shutil.rmtree(work_dir, ignore_errors=True)
+    (work_dir / "data" / "source").mkdir(parents=True)
+    db_path = work_dir / "data" / "postgres.db"
+    sqlite3.connect(db_path).close()
+
+    standins = setup(
+        work_dir, "bench-microbatch", env={"BENCH_S3_LATENCY_MS": args.latency_ms}
+    )
+
+    from benchmarks.standins import LocalQueue
+    import microbatch
+
+    s3 = standins["s3"]
+    if args.queue:
+        queue = LocalQueue(work_dir / "queue")
+        s3.notify(SOURCE_BUCKET, queue, QUEUE_URL)
+        microbatch.sqs_client = queue
+        s3_source = microbatch.QueuePoller(QUEUE_URL)
+    else:
+        s3_source = microbatch.S3Poller()
+
+    batcher = microbatch.MicroBatcher(
+        [s3_source, microbatch.WebFormsPoller()],
+        interval=args.interval,
+        max_bytes=int(args.max_mb * 1024**2),
+        poll_seconds=args.poll,
+        unique_keys={"call_logs": ["CALL_ID"], "web_forms": ["REQUEST_ID"]},
+    )
+
+    stop = threading.Event()
+    produced = {}
+    producer = threading.Thread(
+        target=lambda: produced.update(
+            files=produce(
+                s3, db_path, stop, args.files_per_sec, args.rows_per_file, args.seed
+            )
+        )
+    )
+    producer.start()
+    threading.Timer(args.duration, stop.set).start()
+    history = batcher.run(run_seconds=args.duration + args.interval)
+    producer.join()
+
+    statements = len(standins["snowflake"].statements)
+    latencies = np.array([b["latency_max_seconds"] for b in history] or [0.0])
+    means = np.array([b["latency_mean_seconds"] for b in history] or [0.0])
+    flush = np.array([b["flush_seconds"] for b in history] or [0.0])
+    load = np.array([b["load_seconds"] for b in history] or [0.0])
+
+    print(f"mode:                 {'S3 events via queue' if args.queue else 'listing'}")
+    print(f"files produced:       {produced.get('files', 0)}")
+    print(f"batches:              {len(history)}")
+    print(
+        f"items / rows loaded:  {sum(b['items'] for b in history)} / "
+        f"{sum(b['rows'] for b in history):,}"
+    )
+    print(f"latency mean:         {means.mean():.2f}s")
+    print(
+        f"latency p95 (batch max): {np.percentile(latencies, 95):.2f}s, "
+        f"max {latencies.max():.2f}s"
+    )
+    print(
+        f"flush per batch:      mean {flush.mean():.3f}s, max {flush.max():.3f}s "
+        f"(load {load.mean():.3f}s), {flush.mean() / args.interval:.1%} of interval"
+    )
+    print(f"warehouse statements: {statements / max(len(history), 1):.1f} per batch")
+    print(f"S3 requests:          {dict(s3.calls)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
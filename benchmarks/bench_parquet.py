@@ -0,0 +1,191 @@
+"""
+Measure Parquet encoding profiles on the synthetic staging tables.
+
+    python -m benchmarks.bench_parquet --rows 500000 --tables call_logs,customers
+
+Builds each table the way the extractors stage it (cleaned column names,
+ingestion metadata) and encodes it with the table's current profile and with
+one setting changed at a time: codec and level, sort keys, row-group size,
+dictionary encoding and statistics. Every variant reports the file size, the
+encode time, the time to read it back, the bytes a COPY loading all columns
+scans, and the bytes a reader that prunes row groups by min/max statistics
+scans for a 1% range of the sort key. Codecs marked * cannot be written
+through awswrangler and are shown for comparison only.
+"""
+
+import io
+import sys
+import time
+import shutil
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from datetime import date
+from pathlib import Path
+
+from benchmarks.harness import REPO_ROOT, prepare_environment
+
+DAY = date(2025, 11, 20)
+TABLES = ("customers", "call_logs", "social_medias", "web_forms")
+
+
+def staged_frame(table, rows, seed):
+    from benchmarks import generators
+    from utils import add_metadata, clean_column_names
+
+    rng = np.random.default_rng(seed)
+    customers = max(1, rows // 10)
+    if table == "customers":
+        df = generators.customers_frame(rng, 0, rows)
+    elif table == "call_logs":
+        df = generators.call_logs_frame(rng, 0, rows, DAY, customers)
+    elif table == "web_forms":
+        df = generators.web_forms_frame(rng, 0, rows, DAY, customers)
+    else:
+        records = generators.social_media_records(rng, 0, rows, DAY, customers)
+        df = pd.json_normalize(records)
+    # Staged in arrival order, not key order
+    df = df.sample(frac=1, random_state=seed).reset_index(drop=True)
+    return add_metadata(clean_column_names(df), table).drop(columns=["ingestion_date"])
+
+
+def variants(base):
+    """
+    (label, profile) pairs: the table's profile, then one change each.
+    """
+    rows = [("current", base)]
+    for codec, level in (
+        ("none", None),
+        ("snappy", None),
+        ("lz4", None),
+        ("gzip", None),
+        ("zstd", 1),
+        ("zstd", 3),
+        ("zstd", 9),
+    ):
+        label = f"{codec}{'' if level is None else f'-{level}'}"
+        rows.append((label, dict(base, compression=codec, compression_level=level)))
+    rows.append(("unsorted", dict(base, sort_by=[])))
+    for size in (16_384, 131_072, 1_048_576):
+        rows.append((f"rowgroup-{size // 1024}k", dict(base, row_group_rows=size)))
+    for setting in (True, False):
+        rows.append(
+            (
+                f"dictionary-{'all' if setting else 'off'}",
+                dict(base, dictionary=setting),
+            )
+        )
+    rows.append(("statistics-off", dict(base, statistics=False)))
+    return rows
+
+
+def encode(df, profile):
+    """
+    Parquet bytes of `df` written as the pipeline writes it.
+    """
+    from parquet_profiles import sort_frame, writer_args
+
+    df = sort_frame(df, profile)
+    args = writer_args(df, profile)
+    options = dict(args["pyarrow_additional_kwargs"])
+    table_args = options.pop("write_table_args", {})
+    buffer = io.BytesIO()
+    pq.write_table(
+        pa.Table.from_pandas(df, preserve_index=False),
+        buffer,
+        compression=args["compression"] or "none",
+        coerce_timestamps="ms",
+        allow_truncated_timestamps=True,
+        flavor="spark",
+        **options,
+        **table_args,
+    )
+    return buffer.getvalue()
+
+
+def scanned_bytes(body, key, low, high):
+    """
+    (bytes of all column chunks, bytes of the row groups whose statistics on
+    `key` may hold values in [low, high]).
+    """
+    metadata = pq.ParquetFile(io.BytesIO(body)).metadata
+    names = [metadata.schema.column(i).name for i in range(metadata.num_columns)]
+    total = pruned = 0
+    for i in range(metadata.num_row_groups):
+        group = metadata.row_group(i)
+        size = sum(
+            group.column(c).total_compressed_size for c in range(group.num_columns)
+        )
+        total += size
+        stats = group.column(names.index(key)).statistics if key in names else None
+        if stats is None or not stats.has_min_max:
+            pruned += size
+        elif not (stats.max < low or stats.min > high):
+            pruned += size
+    return total, pruned
+
+
+def key_range(df, key):
+    """
+    A 1% slice of `key`'s sorted values, the shape of an incremental lookup.
+    """
+    values = np.sort(df[key].astype(str).to_numpy())
+    middle = len(values) // 2
+    return values[middle], values[min(len(values) - 1, middle + len(values) // 100)]
+
+
+def measure(df, profile, low, high, key):
+    started = time.perf_counter()
+    body = encode(df, profile)
+    encode_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    pq.read_table(io.BytesIO(body))
+    read_seconds = time.perf_counter() - started
+    total, pruned = scanned_bytes(body, key, low, high)
+    return len(body), encode_seconds, read_seconds, total, pruned
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parquet encoding profile matrix")
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--tables", default=",".join(TABLES))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--work-dir", default=str(REPO_ROOT / ".bench" / "parquet"))
+    args = parser.parse_args(argv)
+
+    work_dir = Path(args.work_dir).resolve()
+    shutil.rmtree(work_dir, ignore_errors=True)
+    work_dir.mkdir(parents=True)
+    prepare_environment(work_dir, "bench-parquet")
+
+    from parquet_profiles import CODECS, profile_for
+
+    for table in args.tables.split(","):
+        rows = args.rows if table != "social_medias" else args.rows // 10
+        df = staged_frame(table, rows, args.seed)
+        base = profile_for(table)
+        key = (base["sort_by"] or [df.columns[0]])[0]
+        low, high = key_range(df, key)
+
+        print(f"\n{table}: {len(df):,} rows, sort key {key}")
+        print(
+            f"{'PROFILE':<17}{'MB':>8}{'RATIO':>7}{'ENCODE S':>10}{'READ S':>8}"
+            f"{'COPY MB':>9}{'1% RANGE MB':>13}"
+        )
+        raw = None
+        for label, profile in variants(base):
+            size, encode_s, read_s, total, pruned = measure(df, profile, low, high, key)
+            raw = raw or measure(df, dict(base, compression="none"), low, high, key)[0]
+            mark = "" if profile["compression"] in CODECS else "*"
+            print(
+                f"{label + mark:<17}{size / 1e6:>8.2f}{raw / size:>7.2f}"
+                f"{encode_s:>10.2f}{read_s:>8.2f}{total / 1e6:>9.2f}{pruned / 1e6:>13.2f}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
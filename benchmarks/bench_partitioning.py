@@ -0,0 +1,170 @@
+"""
+Compare partition layouts for staged call logs.
+
+    python -m benchmarks.bench_partitioning --rows 50000 --days 3
+    BENCH_S3_LATENCY_MS=20 python -m benchmarks.bench_partitioning --buckets 16
+
+For each layout, a fresh interpreter extracts and stages the synthetic call
+logs. The layouts are ingestion_date only, plus event date, plus hour, and
+plus customer_id buckets. Each interpreter then answers two by-call-date
+questions against the staged files:
+
+- a local DuckDB count of one event hour of the last day, over the files
+  left after pruning the listing
+- a Snowflake COPY of the last event day, pruned with a PATTERN
+
+The report shows the files written, the write time, and the files opened,
+rows and seconds for each question. The counts must agree across layouts.
+Without event partitions, both questions read every file.
+"""
+
+import sys
+import json
+import time
+import argparse
+
+from pathlib import Path
+
+from benchmarks.harness import REPO_ROOT, run_child, setup
+from benchmarks.run import ensure_data
+
+
+def layouts(buckets):
+    return {
+        "ingestion_date": {},
+        "+event_date": {"event_date": True},
+        "+event_hour": {"event_date": True, "hour": True},
+        f"+{buckets} buckets": {"event_date": True, "hour": True, "buckets": buckets},
+    }
+
+
+def child(work_dir, hour):
+    warehouse = setup(work_dir, "bench-partitioning", fresh=True)["snowflake"]
+
+    import lake_checks
+    import snowflake_load
+    from s3_extractor import extract_call_logs
+    from utils import write_to_s3_parquet
+    from partitioning import layout_for
+
+    with open(work_dir / "data" / "manifest.json") as f:
+        day = json.load(f)["days"][-1]
+
+    df = extract_call_logs()
+    started = time.perf_counter()
+    write_to_s3_parquet(df, "call_logs")
+    write_seconds = time.perf_counter() - started
+    written = len(lake_checks.partition_files("call_logs"))
+
+    # One hour of one call date, read locally
+    layout = layout_for("call_logs")
+    where = {}
+    if "event_date" in layout.columns:
+        where["event_date"] = [day]
+    if "event_hour" in layout.columns:
+        where["event_hour"] = [hour]
+    started = time.perf_counter()
+    files = lake_checks.partition_files("call_logs", where=where)
+    hour_rows = (
+        lake_checks.connection()
+        .execute(
+            f"SELECT COUNT(*) FROM {lake_checks.scan(files)} "
+            f"WHERE strftime(CAST(call_start_time AS TIMESTAMP), '%Y-%m-%d %H') = ?",
+            [f"{day} {hour}"],
+        )
+        .fetchone()[0]
+    )
+    hour_seconds = time.perf_counter() - started
+
+    # One call date, loaded into the warehouse
+    before = len(warehouse.statements)
+    started = time.perf_counter()
+    snowflake_load.load_s3_parquet_to_snowflake(
+        "call_logs",
+        ["CALL_ID"],
+        partitions={"event_date": [day]} if "event_date" in layout.columns else None,
+    )
+    report = snowflake_load.load_report("call_logs")
+    print(
+        json.dumps(
+            {
+                "written": written,
+                "write_seconds": write_seconds,
+                "hour_files": len(files),
+                "hour_rows": hour_rows,
+                "hour_seconds": hour_seconds,
+                "copy_files": len(report["files"]),
+                "copy_rows": report["copied_rows"],
+                "copy_seconds": time.perf_counter() - started,
+                "statements": len(warehouse.statements) - before,
+            }
+        )
+    )
+    return 0
+
+
+def run(work_dir, layout, hour):
+    return run_child(
+        "benchmarks.bench_partitioning",
+        "--child",
+        "--work-dir",
+        work_dir,
+        "--hour",
+        hour,
+        env={
+            "PARTITION_LAYOUTS": json.dumps({"call_logs": layout}),
+            # Measure the COPY path, not the small-table one
+            "SNOWFLAKE_SMALL_TABLE_ROWS": "0",
+        },
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Partition layout benchmark")
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--files", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--buckets", type=int, default=8)
+    parser.add_argument("--hour", default="09")
+    parser.add_argument("--child", action="store_true")
+    parser.add_argument(
+        "--work-dir", default=str(REPO_ROOT / ".bench" / "partitioning")
+    )
+    args = parser.parse_args(argv)
+    work_dir = Path(args.work_dir).resolve()
+
+    if args.child:
+        return child(work_dir, args.hour)
+
+    work_dir.mkdir(parents=True, exist_ok=True)
+    ensure_data(work_dir, args.rows, args.days, args.files, args.seed)
+
+    results = {
+        name: run(work_dir, layout, args.hour)
+        for name, layout in layouts(args.buckets).items()
+    }
+    print(f"{args.rows:,} call logs over {args.days} day(s)")
+    header = (
+        f"{'LAYOUT':<16}{'FILES':>7}{'WRITE S':>9}"
+        f"{'HOUR FILES':>12}{'ROWS':>8}{'SECONDS':>9}"
+        f"{'DAY FILES':>11}{'ROWS':>9}{'SECONDS':>9}"
+    )
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        print(
+            f"{name:<16}{r['written']:>7,}{r['write_seconds']:>9.2f}"
+            f"{r['hour_files']:>12,}{r['hour_rows']:>8,}{r['hour_seconds']:>9.3f}"
+            f"{r['copy_files']:>11,}{r['copy_rows']:>9,}{r['copy_seconds']:>9.3f}"
+        )
+
+    hour_rows = {r["hour_rows"] for r in results.values()}
+    if len(hour_rows) != 1:
+        print("Layouts disagree on the rows of the queried hour")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
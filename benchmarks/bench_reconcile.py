@@ -0,0 +1,121 @@
+"""
+Time footer-based reconciliation against counting rows by reading the data.
+
+    python -m benchmarks.bench_reconcile --files 2000 --rows-per-file 5000
+    BENCH_S3_LATENCY_MS=20 python -m benchmarks.bench_reconcile --files 2000
+
+Stages one day of call logs as many chunk files, loads them into the
+recording Snowflake stand-in, then reconciles the partition from the Parquet
+footers. The same counts are then taken by reading every file in full. The
+report shows both timings, the bytes each approach fetched and the
+reconciliation status. Finally one staged file is replaced with a shorter
+one and reconciled again, which should report a mismatch.
+"""
+
+import sys
+import json
+import time
+import shutil
+import argparse
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from datetime import date
+from pathlib import Path
+
+from benchmarks.harness import DEST_BUCKET, REPO_ROOT, setup
+
+DAY = date(2025, 11, 20)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reconciliation benchmark")
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--rows-per-file", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--work-dir", default=str(REPO_ROOT / ".bench" / "reconcile"))
+    args = parser.parse_args(argv)
+
+    work_dir = Path(args.work_dir).resolve()
+    shutil.rmtree(work_dir, ignore_errors=True)
+    (work_dir / "data" / "source").mkdir(parents=True)
+    standins = setup(work_dir, "bench-reconcile")
+    s3 = standins["s3"]
+
+    from benchmarks.generators import call_logs_frame
+    from reconcile import format_reconciliation, reconcile
+    from snowflake_load import load_report, load_s3_parquet_to_snowflake
+    from utils import add_metadata, clean_column_names, write_chunk_to_s3_parquet
+
+    rng = np.random.default_rng(args.seed)
+    block = add_metadata(
+        clean_column_names(
+            call_logs_frame(rng, 0, args.rows_per_file, DAY, args.rows_per_file)
+        ),
+        "call_logs",
+    )
+    paths = []
+    for i in range(args.files):
+        block["call_id"] = [f"CALL{i}-{j}" for j in range(len(block))]
+        paths.extend(
+            write_chunk_to_s3_parquet(block, "call_logs", f"part-{i:05d}", DAY)
+        )
+    load_s3_parquet_to_snowflake("call_logs", unique_keys=["CALL_ID"])
+    reports = {"call_logs": load_report("call_logs")}
+
+    def timed_requests(func):
+        before = sum(s3.calls.values())
+        started = time.perf_counter()
+        value = func()
+        return value, time.perf_counter() - started, sum(s3.calls.values()) - before
+
+    result, footer_seconds, footer_requests = timed_requests(
+        lambda: reconcile([DAY], reports, tables=["call_logs"])
+    )
+    entry = result["tables"]["call_logs"]
+
+    def read_everything():
+        rows = fetched = 0
+        for path in paths:
+            key = path.split(f"s3://{DEST_BUCKET}/", 1)[1]
+            body = s3.get_object(Bucket=DEST_BUCKET, Key=key)["Body"].read()
+            fetched += len(body)
+            rows += pq.read_table(pa.BufferReader(body)).num_rows
+        return rows, fetched
+
+    (rows, data_bytes), full_seconds, full_requests = timed_requests(read_everything)
+    footer_bytes = _reconcile_bytes(work_dir)
+
+    print(
+        f"{args.files:,} files, {entry['staged_rows']:,} rows staged, "
+        f"{entry['copied_rows']:,} copied"
+    )
+    print(f"{'METHOD':<18}{'SECONDS':>9}{'REQUESTS':>10}{'MB FETCHED':>12}{'ROWS':>12}")
+    print(
+        f"{'footers':<18}{footer_seconds:>9.2f}{footer_requests:>10,}"
+        f"{footer_bytes / 1e6:>12.1f}{entry['staged_rows']:>12,}"
+    )
+    print(
+        f"{'full read':<18}{full_seconds:>9.2f}{full_requests:>10,}"
+        f"{data_bytes / 1e6:>12.1f}{rows:>12,}"
+    )
+    print(format_reconciliation(result))
+
+    # A file rewritten after it was loaded no longer matches its COPY count
+    write_chunk_to_s3_parquet(block.head(10), "call_logs", "part-00000", DAY)
+    print(format_reconciliation(reconcile([DAY], reports, tables=["call_logs"])))
+    return 0
+
+
+def _reconcile_bytes(work_dir):
+    """
+    Footer bytes fetched by the last reconciliation, from its metrics record.
+    """
+    with open(work_dir / "metrics.jsonl") as f:
+        records = [json.loads(line) for line in f]
+    return [r for r in records if r["stage"] == "reconcile"][-1]["bytes"]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
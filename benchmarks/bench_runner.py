@@ -0,0 +1,116 @@
+"""
+Time the pipeline runner with one worker against several.
+
+    python -m benchmarks.bench_runner --rows 10000 --days 3 --workers 4
+    BENCH_S3_LATENCY_MS=20 python -m benchmarks.bench_runner --rows 10000
+
+Generates the synthetic sources, then runs the full graph (every extract,
+the lake checks, every load and the reconciliation) over the generated
+dates twice, each in a fresh interpreter against an empty destination:
+once with a single worker, which is the old sequential order, and once
+with `--workers`. Agents are left out, as they need Google Sheets. Each
+run prints its per-step report; the summary compares wall times. How much
+overlap is possible depends on the cores available and on the simulated
+S3 latency, since parsing is CPU-bound and waiting on requests is not.
+"""
+
+import sys
+import json
+import time
+import shutil
+import argparse
+
+from pathlib import Path
+
+from benchmarks.harness import LOAD_TABLES, REPO_ROOT, child_output, setup
+
+SOURCES = "customers,call_logs,social_media,web_forms"
+
+
+def child(work_dir, workers):
+    setup(work_dir, f"bench-runner-{workers}", fresh=True)
+
+    import runner
+
+    # The synthetic data keys social media and web forms on other columns
+    for source, (func, table, _, per_date) in runner.SOURCES.items():
+        keys = LOAD_TABLES.get(runner.STAGING_TABLES[source])
+        if keys:
+            runner.SOURCES[source] = (func, table, keys, per_date)
+
+    with open(work_dir / "data" / "manifest.json") as f:
+        days = json.load(f)["days"]
+    started = time.perf_counter()
+    steps = runner.run_pipeline(
+        sources=SOURCES.split(","),
+        start=days[0],
+        end=days[-1],
+        workers=workers,
+    )
+    print(
+        json.dumps(
+            {
+                "seconds": time.perf_counter() - started,
+                "failed": [s.name for s in steps if s.status != "ok"],
+            }
+        )
+    )
+    return 0
+
+
+def run(work_dir, workers):
+    output = child_output(
+        "benchmarks.bench_runner",
+        "--child",
+        "--work-dir",
+        work_dir,
+        "--workers",
+        workers,
+    )
+    lines = output.strip().splitlines()
+    first = next(i for i, line in enumerate(lines) if line.startswith("STEP"))
+    last = next(i for i, line in enumerate(lines) if line.startswith("Wall time"))
+    print("\n".join(lines[first : last + 1]))
+    return json.loads(lines[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pipeline runner benchmark")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--child", action="store_true")
+    parser.add_argument("--work-dir", default=str(REPO_ROOT / ".bench" / "runner"))
+    args = parser.parse_args(argv)
+    work_dir = Path(args.work_dir).resolve()
+
+    if args.child:
+        return child(work_dir, args.workers)
+
+    from benchmarks.generators import generate_all
+
+    shutil.rmtree(work_dir, ignore_errors=True)
+    manifest = generate_all(
+        work_dir / "data", args.rows, days=args.days, seed=args.seed
+    )
+    print(f"{args.rows:,} rows per source over {', '.join(manifest['days'])}\n")
+
+    results = {}
+    for workers in (1, args.workers):
+        print(f"--- {workers} worker(s)")
+        results[workers] = run(work_dir, workers)
+        print()
+
+    print(f"{'WORKERS':<10}{'SECONDS':>9}{'SPEEDUP':>9}  NOT OK")
+    for workers, r in results.items():
+        print(
+            f"{workers:<10}{r['seconds']:>9.2f}"
+            f"{results[1]['seconds'] / r['seconds']:>8.2f}x  "
+            f"{', '.join(r['failed']) or '-'}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+Compare listing-order extraction with the largest-first scheduler on a skewed
+set of customer files.
+
+    python -m benchmarks.bench_scheduler --files 40 --workers 4 --split-mb 4
+
+Writes many small and mid-sized customer CSVs plus one giant file that sorts
+last in the listing. First the makespan is simulated with the scheduler's
+cost model, calibrated by a real run, for: listing order; largest first;
+and largest first with tiny files batched and the giant file split into
+byte ranges. Then the async extractor runs the listing-order and scheduled
+plans for real, each in a fresh interpreter, and reports wall time. How far
+the real run gets from the simulation depends on the cores available, since
+CSV parsing is CPU-bound.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import numpy as np
+
+from pathlib import Path
+
+from benchmarks.harness import REPO_ROOT, run_child, setup
+
+
+def write_skewed(source, files, giant_rows, seed):
+    """
+    `files` customer CSVs with log-normal row counts, plus a giant one.
+    Returns the row count of every file.
+    """
+    from benchmarks.generators import customers_frame
+
+    rng = np.random.default_rng(seed)
+    counts = np.clip(rng.lognormal(7, 1.5, files).astype(int), 20, giant_rows // 4)
+    names = [f"customers_{i:03d}.csv" for i in range(files)]
+    names.append("customers_zz_full_export.csv")
+    counts = counts.tolist() + [giant_rows]
+    folder = source / "customers"
+    folder.mkdir(parents=True)
+    offset = 0
+    for name, rows in zip(names, counts):
+        customers_frame(rng, offset, rows).to_csv(folder / name, index=False)
+        offset += rows
+    return counts
+
+
+def child(work_dir, workers, scheduled):
+    setup(
+        work_dir,
+        "bench-scheduler",
+        fresh=True,
+        env={
+            "SCHEDULER_ENABLED": "true" if scheduled else "false",
+            "ASYNC_DOWNLOAD_CONCURRENCY": workers,
+        },
+    )
+
+    from s3_extractor import extract_customers
+
+    started = time.perf_counter()
+    extract_customers(use_async=True)
+    print(json.dumps({"seconds": time.perf_counter() - started}))
+    return 0
+
+
+def run(work_dir, workers, scheduled, split_mb):
+    result = run_child(
+        "benchmarks.bench_scheduler",
+        "--child",
+        "--work-dir",
+        work_dir,
+        "--workers",
+        workers,
+        *(["--scheduled"] if scheduled else []),
+        env={"SCHEDULE_SPLIT_MB": split_mb},
+    )
+    return result["seconds"]
+
+
+def simulate(work_dir, workers, split_mb):
+    """
+    Simulated makespan of each plan, with the rate learned by a real run.
+    """
+    setup(
+        work_dir, "bench-scheduler-sim", fresh=True, env={"SCHEDULE_SPLIT_MB": split_mb}
+    )
+
+    import scheduler
+    from s3_extractor import extract_customers, s3_client
+    from utils import SOURCE_BUCKET, get_new_source_files
+
+    files = get_new_source_files("customers/", ".csv")
+    extract_customers()
+    throughput = scheduler.Throughput.load()
+
+    def plan(**kwargs):
+        return scheduler.plan(files, "customers", throughput, workers=workers, **kwargs)
+
+    saved = scheduler.SCHEDULE_SPLIT_BYTES, scheduler.SCHEDULE_SMALL_FILE_BYTES
+    scheduler.SCHEDULE_SPLIT_BYTES, scheduler.SCHEDULE_SMALL_FILE_BYTES = (
+        float("inf"),
+        0,
+    )
+    lpt = plan()
+    scheduler.SCHEDULE_SPLIT_BYTES, scheduler.SCHEDULE_SMALL_FILE_BYTES = saved
+    full = plan(client=s3_client, bucket=SOURCE_BUCKET, splittable=True)
+    return throughput.bytes_per_second("customers"), [
+        ("listing order", plan(enabled=False)),
+        ("largest first", lpt),
+        ("+ batch & split", full),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LPT file scheduling benchmark")
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--giant-rows", type=int, default=400_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--split-mb", type=float, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--child", action="store_true")
+    parser.add_argument("--scheduled", action="store_true")
+    parser.add_argument("--work-dir", default=str(REPO_ROOT / ".bench" / "scheduler"))
+    args = parser.parse_args(argv)
+    work_dir = Path(args.work_dir).resolve()
+
+    if args.child:
+        return child(work_dir, args.workers, args.scheduled)
+
+    shutil.rmtree(work_dir, ignore_errors=True)
+    source = work_dir / "data" / "source"
+    counts = write_skewed(source, args.files, args.giant_rows, args.seed)
+    sizes = [p.stat().st_size for p in (source / "customers").iterdir()]
+    print(
+        f"{len(sizes)} files, {sum(sizes) / 1e6:.1f} MB, largest {max(sizes) / 1e6:.1f} MB "
+        f"({max(counts):,} rows, listed last); cores available: {os.cpu_count()}"
+    )
+
+    rate, plans = simulate(work_dir, args.workers, args.split_mb)
+
+    from scheduler import makespan
+
+    print(f"calibrated rate: {rate / 1e6:.1f} MB/s per worker")
+    print(f"{'PLAN':<18}{'TASKS':>7}{'SIMULATED MAKESPAN':>20}")
+    for name, tasks in plans:
+        print(f"{name:<18}{len(tasks):>7}{makespan(tasks, args.workers):>19.2f}s")
+
+    print(f"{'REAL RUN':<18}{'WORKERS':>8}{'SECONDS':>10}")
+    for name, scheduled in (("listing order", False), ("scheduled", True)):
+        seconds = run(work_dir, args.workers, scheduled, args.split_mb)
+        print(f"{name:<18}{args.workers:>8}{seconds:>10.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
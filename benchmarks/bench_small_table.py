@@ -0,0 +1,106 @@
+"""
+Time the small-table fast path against the full COPY load.
+
+    python -m benchmarks.bench_small_table --rows 300,5000,50000
+    BENCH_SNOWFLAKE_LATENCY_MS=150 python -m benchmarks.bench_small_table
+
+Stages a synthetic agents sheet of each size the way the DAG does, then
+loads it twice into an empty stand-in warehouse: once with the path chosen
+from SNOWFLAKE_SMALL_TABLE_ROWS and SNOWFLAKE_SMALL_TABLE_BYTES, and once
+with the fast path turned off. The report shows the path taken, statements,
+seconds and merged rows of each load. The stand-in answers instantly, so
+set BENCH_SNOWFLAKE_LATENCY_MS to a realistic per-statement round trip to
+see what the saved statements are worth.
+"""
+
+import sys
+import time
+import shutil
+import argparse
+
+from pathlib import Path
+
+from benchmarks.harness import REPO_ROOT, setup
+
+
+def agents_frame(rows, seed):
+    import numpy as np
+    import pandas as pd
+
+    from utils import add_metadata, clean_column_names
+
+    rng = np.random.default_rng(seed)
+    states = ["Lagos", "Abuja", "Kano", "Rivers", "Oyo", "Enugu"]
+    df = pd.DataFrame(
+        {
+            "id": np.arange(1, rows + 1),
+            "NAME": [f"Agent {i}" for i in range(1, rows + 1)],
+            "experience": rng.choice(["Junior", "Mid", "Senior"], rows),
+            "state": rng.choice(states, rows),
+        }
+    )
+    return add_metadata(clean_column_names(df), "agents")
+
+
+def load(warehouse, small):
+    import snowflake_load
+
+    limit = snowflake_load.SNOWFLAKE_SMALL_TABLE_ROWS
+    if not small:
+        snowflake_load.SNOWFLAKE_SMALL_TABLE_ROWS = 0
+    warehouse.tables.clear()
+    # An empty warehouse has loaded nothing on either path
+    snowflake_load.s3_client.delete_object(
+        Bucket=snowflake_load.DEST_BUCKET,
+        Key=f"{snowflake_load.LOADED_FILES_PREFIX}/agents.json",
+    )
+    before = len(warehouse.statements)
+    started = time.perf_counter()
+    try:
+        merged = snowflake_load.load_s3_parquet_to_snowflake("agents", ["ID"])
+    finally:
+        snowflake_load.SNOWFLAKE_SMALL_TABLE_ROWS = limit
+    return {
+        "path": snowflake_load.load_report("agents")["path"],
+        "statements": len(warehouse.statements) - before,
+        "seconds": time.perf_counter() - started,
+        "merged": merged,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Small-table load benchmark")
+    parser.add_argument("--rows", default="300,5000,50000")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--work-dir", default=str(REPO_ROOT / ".bench" / "small_table"))
+    args = parser.parse_args(argv)
+
+    work_dir = Path(args.work_dir).resolve()
+    shutil.rmtree(work_dir, ignore_errors=True)
+    (work_dir / "data" / "source").mkdir(parents=True)
+    warehouse = setup(work_dir, "bench-small-table")["snowflake"]
+
+    from utils import write_to_s3_parquet
+
+    header = f"{'ROWS':>8}  {'AUTO PATH':<12}{'STMTS':>6}{'SECONDS':>9}  {'COPY PATH':<12}{'STMTS':>6}{'SECONDS':>9}{'SPEEDUP':>9}"
+    lines = [header, "-" * len(header)]
+    failed = False
+    for rows in [int(r) for r in args.rows.split(",")]:
+        write_to_s3_parquet(agents_frame(rows, args.seed), "agents", mode="overwrite")
+        auto, full = load(warehouse, small=True), load(warehouse, small=False)
+        failed |= auto["merged"] != full["merged"]
+        lines.append(
+            f"{rows:>8,}  {auto['path']:<12}{auto['statements']:>6}{auto['seconds']:>9.3f}"
+            f"  {full['path']:<12}{full['statements']:>6}{full['seconds']:>9.3f}"
+            f"{full['seconds'] / auto['seconds']:>8.1f}x"
+        )
+
+    print("\n".join(lines))
+    if failed:
+        print("Merged row counts differ between the two paths")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+Measure the local source cache on a re-run of the S3 extractors.
+
+    python -m benchmarks.bench_source_cache --rows 100000 --days 3
+
+Runs customers, call logs and social media extraction three times against the
+same sources, emptying the destination bucket and tracker in between as a
+backfill or manual re-run would: without the cache, with a cold cache and with
+a warm one. --latency-ms adds a per-request delay so the network cost shows.
+"""
+
+import sys
+import time
+import shutil
+import argparse
+from pathlib import Path
+
+from benchmarks.harness import DEST_BUCKET, REPO_ROOT, STAGES, setup
+from benchmarks.run import ensure_data
+
+PASSES = ("no_cache", "cold", "warm")
+EXTRACT_STAGES = ("customers", "call_logs", "social_media")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Source cache benchmark")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--files", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--work-dir", default=str(REPO_ROOT / ".bench" / "cache"))
+    args = parser.parse_args(argv)
+
+    work_dir = Path(args.work_dir).resolve()
+    work_dir.mkdir(parents=True, exist_ok=True)
+    manifest = ensure_data(work_dir, args.rows, args.days, args.files, args.seed)
+    cache_dir = work_dir / "source_cache"
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    shutil.rmtree(work_dir / "s3", ignore_errors=True)
+
+    standins = setup(
+        work_dir,
+        "bench-source-cache",
+        env={"SOURCE_CACHE_DIR": cache_dir, "BENCH_S3_LATENCY_MS": args.latency_ms},
+    )
+
+    import source_cache
+
+    results = []
+    for name in PASSES:
+        shutil.rmtree(work_dir / "s3" / DEST_BUCKET, ignore_errors=True)
+        source_cache._cache = None
+        source_cache.SOURCE_CACHE_DIR = None if name == "no_cache" else cache_dir
+        before = source_cache.stats()
+        gets = standins["s3"].calls["get_object"]
+
+        started = time.perf_counter()
+        rows = sum(STAGES[s](work_dir, manifest)[0] for s in EXTRACT_STAGES)
+        seconds = time.perf_counter() - started
+
+        after = source_cache.stats()
+        results.append(
+            {
+                "pass": name,
+                "rows": rows,
+                "seconds": seconds,
+                "gets": standins["s3"].calls["get_object"] - gets,
+                "hits": after["hits"] - before["hits"],
+                "misses": after["misses"] - before["misses"],
+                "downloaded": after["bytes_downloaded"] - before["bytes_downloaded"],
+            }
+        )
+
+    print(
+        f"{'PASS':<10}{'ROWS':>10}{'SECONDS':>10}{'S3 GETS':>10}"
+        f"{'HITS':>7}{'MISSES':>8}{'DOWNLOADED MB':>15}"
+    )
+    for r in results:
+        print(
+            f"{r['pass']:<10}{r['rows']:>10,}{r['seconds']:>10.2f}{r['gets']:>10}"
+            f"{r['hits']:>7}{r['misses']:>8}{r['downloaded'] / 1e6:>15.2f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
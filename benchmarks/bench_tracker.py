@@ -0,0 +1,140 @@
+"""
+Stress the processed-files tracker with concurrent writers.
+
+    python -m benchmarks.bench_tracker --writers 8 --batches 20 --files 5
+    BENCH_S3_LATENCY_MS=10 python -m benchmarks.bench_tracker --writers 16
+
+Starts `--writers` extractor processes against one stand-in S3 bucket. At
+the same moment, each one marks `--batches` batches of `--files` new
+source files as processed. This runs twice: once with the conditional
+commits of mark_source_files_as_processed, and once with plain
+unconditional puts, which is the old read-modify-write. The report shows
+how many entries each mode expected and kept, how many were lost, the
+conflicts that were retried and the wall time. The conditional mode must
+lose nothing.
+"""
+
+import sys
+import json
+import time
+import shutil
+import argparse
+import subprocess
+
+from datetime import date
+from pathlib import Path
+
+from benchmarks.harness import REPO_ROOT, setup
+
+MODES = ("conditional", "unconditional")
+
+
+def child(work_dir, writer, batches, files, mode, start_at):
+    s3 = setup(work_dir, f"bench-tracker-{mode}-{writer}")["s3"]
+
+    import utils
+
+    if mode == "unconditional":
+        save = utils.save_processed_files_tracker
+        utils.save_processed_files_tracker = lambda data, etag=None, create=False: save(
+            data
+        )
+
+    time.sleep(max(start_at - time.time(), 0))
+    started = time.perf_counter()
+    for batch in range(batches):
+        utils.mark_source_files_as_processed(
+            [
+                {"key": f"stress/w{writer}/b{batch}/f{i}.csv", "size": 1}
+                for i in range(files)
+            ],
+            date.today(),
+        )
+    print(
+        json.dumps(
+            {
+                "seconds": time.perf_counter() - started,
+                "conflicts": s3.calls["put_object"] - batches,
+            }
+        )
+    )
+    return 0
+
+
+def run_mode(work_dir, args, mode):
+    shutil.rmtree(work_dir, ignore_errors=True)
+    (work_dir / "data" / "source").mkdir(parents=True)
+    start_at = time.time() + 3
+    children = [
+        subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.bench_tracker", "--child"]
+            + ["--work-dir", str(work_dir), "--writer", str(writer)]
+            + ["--batches", str(args.batches), "--files", str(args.files)]
+            + ["--mode", mode, "--start-at", str(start_at)],
+            cwd=REPO_ROOT,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        for writer in range(args.writers)
+    ]
+    results = []
+    for proc in children:
+        out, err = proc.communicate()
+        if proc.returncode != 0:
+            sys.stderr.write(err)
+            raise RuntimeError(f"Tracker benchmark writer failed ({mode})")
+        results.append(json.loads(out.strip().splitlines()[-1]))
+
+    tracker_path = work_dir / "s3" / "bench-dest" / "metadata"
+    with open(tracker_path / "processed_source_files.json") as f:
+        kept = len(json.load(f))
+    return {
+        "expected": args.writers * args.batches * args.files,
+        "kept": kept,
+        "conflicts": sum(r["conflicts"] for r in results),
+        "seconds": max(r["seconds"] for r in results),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tracker concurrency benchmark")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--files", type=int, default=5)
+    parser.add_argument("--child", action="store_true")
+    parser.add_argument("--writer", type=int, default=0)
+    parser.add_argument("--mode", choices=MODES, default="conditional")
+    parser.add_argument("--start-at", type=float, default=0.0)
+    parser.add_argument("--work-dir", default=str(REPO_ROOT / ".bench" / "tracker"))
+    args = parser.parse_args(argv)
+    work_dir = Path(args.work_dir).resolve()
+
+    if args.child:
+        return child(
+            work_dir, args.writer, args.batches, args.files, args.mode, args.start_at
+        )
+
+    print(
+        f"{args.writers} writers x {args.batches} batches x {args.files} files, "
+        f"all starting together\n"
+    )
+    header = f"{'MODE':<15}{'EXPECTED':>9}{'KEPT':>7}{'LOST':>7}{'CONFLICTS':>11}{'SECONDS':>9}"
+    print(header)
+    print("-" * len(header))
+    results = {}
+    for mode in MODES:
+        r = results[mode] = run_mode(work_dir / mode, args, mode)
+        print(
+            f"{mode:<15}{r['expected']:>9,}{r['kept']:>7,}"
+            f"{r['expected'] - r['kept']:>7,}{r['conflicts']:>11,}{r['seconds']:>9.2f}"
+        )
+    conditional = results["conditional"]
+    if conditional["kept"] != conditional["expected"]:
+        print("Conditional commits lost tracker entries")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""
+Check warehouse sizing and query tags on the loader's statements.
+
+    python -m benchmarks.bench_warehouse --rows 20000 --days 3
+    python -m benchmarks.bench_warehouse --sizing-bytes 65536 --threads 2
+
+Stages the synthetic call logs, social media and web forms once, then loads
+them into the stand-in warehouse in fresh interpreters, with three settings:
+
+- fixed: SNOWFLAKE_WAREHOUSE_SIZING off, the configured warehouse as is
+- resize: the loader resizes SNOWFLAKE_WAREHOUSE for each load
+- mapped: the loader switches between the SNOWFLAKE_WAREHOUSES of each size
+
+The data is far smaller than a production load, so `--sizing-bytes` and
+`--threads` (the threads of an XSMALL) scale the size steps down with it.
+
+The report shows, per load, the files and bytes listed, the size and
+warehouse chosen and the statements sent. Per setting, it shows the
+resizes, the suspends and the state the warehouses are left in. Every
+statement must carry a QUERY_TAG with the run, table and stage, every
+sized warehouse must end suspended, and a resized one must get back the
+XSMALL the stand-in starts it at.
+"""
+
+import sys
+import json
+import argparse
+
+from pathlib import Path
+
+from benchmarks.harness import (
+    REPO_ROOT,
+    DEST_BUCKET,
+    LOAD_TABLES,
+    STAGES,
+    run_child,
+    setup,
+)
+from benchmarks.run import ensure_data
+
+MAPPED = {"XSMALL": "LOAD_XS", "SMALL": "LOAD_S", "MEDIUM": "LOAD_M"}
+
+SETTINGS = {
+    "fixed": {"SNOWFLAKE_WAREHOUSE_SIZING": "false"},
+    "resize": {"SNOWFLAKE_WAREHOUSE_SIZING": "true"},
+    "mapped": {
+        "SNOWFLAKE_WAREHOUSE_SIZING": "true",
+        "SNOWFLAKE_WAREHOUSES": json.dumps(MAPPED),
+    },
+}
+
+
+def stage_sources(work_dir):
+    setup(work_dir, "bench-warehouse", fresh=True)
+
+    with open(work_dir / "data" / "manifest.json") as f:
+        manifest = json.load(f)
+    for name in ("call_logs", "social_media", "web_forms"):
+        STAGES[name](work_dir, manifest)
+    print(json.dumps({"staged": True}))
+    return 0
+
+
+def load_tables(work_dir, setting, threads):
+    warehouse = setup(work_dir, f"bench-warehouse-{setting}")["snowflake"]
+
+    import snowflake_load
+
+    snowflake_load.XSMALL_THREADS = threads
+    if setting == "mapped":
+        for size, name in MAPPED.items():
+            warehouse.warehouse(name)["size"] = size
+    staged = work_dir / "s3" / DEST_BUCKET / "staging"
+    loads, missing = [], 0
+    for table, keys in LOAD_TABLES.items():
+        if not (staged / table).exists():
+            continue
+        # Each setting loads the same staged files into a fresh warehouse
+        snowflake_load.s3_client.delete_object(
+            Bucket=DEST_BUCKET, Key=f"{snowflake_load.LOADED_FILES_PREFIX}/{table}.json"
+        )
+        before = len(warehouse.statements)
+        snowflake_load.load_s3_parquet_to_snowflake(table, unique_keys=keys)
+        report = snowflake_load.load_report(table)
+        for tag in warehouse.tags[before:]:
+            tag = json.loads(tag) if tag else {}
+            missing += not (
+                tag.get("run") and tag.get("table") == table and tag.get("stage")
+            )
+        loads.append(
+            {
+                "table": table,
+                "files": len(report["files"]),
+                "bytes": sum(
+                    p.stat().st_size for p in (staged / table).rglob("*.parquet")
+                ),
+                "size": report.get("warehouse_size", "-"),
+                "warehouse": report.get("warehouse", warehouse.current_warehouse),
+                "statements": len(warehouse.statements) - before,
+            }
+        )
+
+    print(
+        json.dumps(
+            {
+                "loads": loads,
+                "untagged": missing,
+                "warehouses": warehouse.warehouses,
+                "stages": sorted({json.loads(t)["stage"] for t in warehouse.tags if t}),
+            }
+        )
+    )
+    return 0
+
+
+def run(work_dir, setting=None, extra_env=None, threads=8):
+    return run_child(
+        "benchmarks.bench_warehouse",
+        "--child",
+        "--work-dir",
+        work_dir,
+        "--threads",
+        threads,
+        *(["--setting", setting] if setting else []),
+        env={
+            "SNOWFLAKE_WAREHOUSE": "LOAD_WH",
+            # Every load takes the COPY path, with its LIST
+            "SNOWFLAKE_SMALL_TABLE_ROWS": "0",
+            **(extra_env or {}),
+        },
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warehouse sizing benchmark")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--files", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--sizing-bytes", type=int, default=16 * 1024)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--setting")
+    parser.add_argument("--child", action="store_true")
+    parser.add_argument("--work-dir", default=str(REPO_ROOT / ".bench" / "warehouse"))
+    args = parser.parse_args(argv)
+    work_dir = Path(args.work_dir).resolve()
+
+    if args.child:
+        if args.setting:
+            return load_tables(work_dir, args.setting, args.threads)
+        return stage_sources(work_dir)
+
+    work_dir.mkdir(parents=True, exist_ok=True)
+    ensure_data(work_dir, args.rows, args.days, args.files, args.seed)
+    run(work_dir)
+
+    results = {
+        name: run(
+            work_dir,
+            name,
+            dict(env, SNOWFLAKE_SIZING_BYTES=str(args.sizing_bytes)),
+            args.threads,
+        )
+        for name, env in SETTINGS.items()
+    }
+
+    print(
+        f"{args.rows:,} rows per source over {args.days} day(s); a size step per "
+        f"{args.sizing_bytes:,} bytes, {args.threads} thread(s) per XSMALL\n"
+    )
+    header = f"{'SETTING':<9}{'TABLE':<15}{'FILES':>7}{'BYTES':>11}{'SIZE':>8}  {'WAREHOUSE':<22}{'STMTS':>6}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        for load in r["loads"]:
+            print(
+                f"{name:<9}{load['table']:<15}{load['files']:>7,}{load['bytes']:>11,}"
+                f"{load['size']:>8}  {str(load['warehouse']):<22}{load['statements']:>6}"
+            )
+
+    failed = False
+    print()
+    for name, r in results.items():
+        states = ", ".join(
+            f"{w} {s['size']} {s['state'].lower()} "
+            f"({s['resizes']} resize(s), {s['suspends']} suspend(s))"
+            for w, s in sorted(r["warehouses"].items())
+        )
+        print(f"{name:<9}{states}")
+        if r["untagged"]:
+            print(f"{name:<9}{r['untagged']} statement(s) without run, table and stage")
+            failed = True
+        if name != "fixed" and any(
+            s["state"] != "SUSPENDED" for s in r["warehouses"].values()
+        ):
+            print(f"{name:<9}a sized warehouse was left running")
+            failed = True
+        if name == "resize" and any(
+            s["size"] != "XSMALL" for s in r["warehouses"].values()
+        ):
+            print(f"{name:<9}a resized warehouse kept the load's size")
+            failed = True
+
+    print(f"\nTagged stages: {', '.join(results['resize']['stages'])}")
+    if failed:
+        return 1
+    print(
+        "Every statement is tagged and every sized warehouse ends suspended, "
+        "at its own size"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+"""
+Seeded synthetic data generators for every source the pipeline reads.
+
+Each generator writes in blocks so that 100M-row datasets never have to fit in
+memory, and the same (seed, rows) pair always produces byte-identical output.
+"""
+
+import json
+import sqlite3
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+BLOCK_ROWS = 500_000
+
+CATEGORIES = np.array(
+    ["Billing", "Network Failure", "Poor Service", "Dropped Calls", "Payments"]
+)
+STATUSES = np.array(["Resolved", "In-Progress", "Pending", "Escalated"])
+CHANNELS = np.array(["Twitter", "Facebook", "Instagram", "TikTok"])
+GENDERS = np.array(["M", "F"])
+
+
+def _blocks(rows, block_rows=BLOCK_ROWS):
+    start = 0
+    while start < rows:
+        yield start, min(block_rows, rows - start)
+        start += block_rows
+
+
+def _ids(prefix, start, n):
+    return np.char.add(prefix, np.arange(start, start + n).astype(str))
+
+
+def _timestamps(rng, day, n):
+    base = np.datetime64(datetime.combine(day, datetime.min.time()))
+    return base + rng.integers(0, 86_400, n).astype("timedelta64[s]")
+
+
+def customers_frame(rng, start, n):
+    """One block of customer master data, with source-style column names."""
+    signup = np.datetime64("2020-01-01") + rng.integers(0, 1_800, n).astype(
+        "timedelta64[D]"
+    )
+    return pd.DataFrame(
+        {
+            "customer_id": _ids("CUST", start, n),
+            "Name": _ids("Customer ", start, n),
+            "Gender": rng.choice(GENDERS, n),
+            "DATE of biRTH": np.datetime64("1960-01-01")
+            + rng.integers(0, 15_000, n).astype("timedelta64[D]"),
+            "signup_date": signup,
+            "email": np.char.add(_ids("user", start, n), "@example.com"),
+            "address": rng.integers(1, 999, n).astype(str),
+        }
+    )
+
+
+def call_logs_frame(rng, start, n, day, customers):
+    """One block of call center logs for `day`."""
+    started = _timestamps(rng, day, n)
+    return pd.DataFrame(
+        {
+            "call ID": _ids("CALL", start, n),
+            "customeR iD": np.char.add(
+                "CUST", rng.integers(0, customers, n).astype(str)
+            ),
+            "COMPLAINT_catego ry": rng.choice(CATEGORIES, n),
+            "agent ID": rng.integers(1, 500, n),
+            "resolutionstatus": rng.choice(STATUSES, n),
+            "call_start_time": started,
+            "call_end_time": started
+            + rng.integers(30, 3_600, n).astype("timedelta64[s]"),
+            "callLogsGenerationDate": str(day),
+        }
+    )
+
+
+def social_media_records(rng, start, n, day, customers):
+    """One block of nested social media complaint records for `day`."""
+    channels = rng.choice(CHANNELS, n)
+    categories = rng.choice(CATEGORIES, n)
+    statuses = rng.choice(STATUSES, n)
+    customer_ids = rng.integers(0, customers, n)
+    agents = rng.integers(1, 500, n)
+    followers = rng.integers(0, 100_000, n)
+    tag_counts = rng.integers(0, 3, n)
+    requested = _timestamps(rng, day, n).astype(str)
+    return [
+        {
+            "complaint_id": f"SM{start + i}",
+            "customer_id": f"CUST{customer_ids[i]}",
+            "agent_id": int(agents[i]),
+            "media_channel": channels[i],
+            "complaint_category": categories[i],
+            "resolution_status": statuses[i],
+            "request_date": requested[i],
+            "user": {
+                "handle": f"@user{customer_ids[i]}",
+                "followers": int(followers[i]),
+            },
+            "tags": [f"tag{j}" for j in range(tag_counts[i])],
+            "MediaComplaintGenerationDate": str(day),
+        }
+        for i in range(n)
+    ]
+
+
+def web_forms_frame(rng, start, n, day, customers):
+    """One block of rows for a Postgres `web_form_request_<day>` table."""
+    requested = _timestamps(rng, day, n)
+    return pd.DataFrame(
+        {
+            "request_id": _ids("WF", start, n),
+            "customer_id": np.char.add(
+                "CUST", rng.integers(0, customers, n).astype(str)
+            ),
+            "complaint_category": rng.choice(CATEGORIES, n),
+            "agent_id": rng.integers(1, 500, n),
+            "resolution_status": rng.choice(STATUSES, n),
+            "request_date": requested.astype(str),
+            "resolution_date": (
+                requested + rng.integers(60, 86_400, n).astype("timedelta64[s]")
+            ).astype(str),
+            "webFormGenerationDate": str(day),
+            "updated_at": requested.astype(str),
+        }
+    )
+
+
+def _split(rows, files):
+    base, extra = divmod(rows, files)
+    return [base + (i < extra) for i in range(files)]
+
+
+# ==================== DATASET WRITERS ====================
+def write_csv_files(out_dir, prefix, names, rows, files, make_frame, seed):
+    """
+    Write `rows` rows split over `files` CSV files under out_dir/prefix.
+    Returns the written object keys.
+    """
+    rng = np.random.default_rng(seed)
+    keys = []
+    offset = 0
+    for name, file_rows in zip(names, _split(rows, files)):
+        key = f"{prefix}{name}"
+        path = out_dir / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", newline="") as f:
+            for i, (start, n) in enumerate(_blocks(file_rows)):
+                make_frame(rng, offset + start, n).to_csv(f, index=False, header=i == 0)
+        offset += file_rows
+        keys.append(key)
+    return keys
+
+
+def write_customers(out_dir, rows, files=1, seed=0):
+    names = [f"customers_dataset_{i}.csv" for i in range(files)]
+    return write_csv_files(
+        out_dir, "customers/", names, rows, files, customers_frame, seed
+    )
+
+
+def write_call_logs(out_dir, rows, days, customers, seed=1):
+    keys = []
+    id_base = 0
+    for i, (day, day_rows) in enumerate(zip(days, _split(rows, len(days)))):
+        keys += write_csv_files(
+            out_dir,
+            "call logs/",
+            [f"call_logs_day_{day}.csv"],
+            day_rows,
+            1,
+            lambda rng, start, n, day=day, base=id_base: call_logs_frame(
+                rng, base + start, n, day, customers
+            ),
+            seed + i,
+        )
+        id_base += day_rows
+    return keys
+
+
+def write_social_media(out_dir, rows, days, customers, seed=2):
+    """
+    Write one JSON array of nested complaint records per day, streamed in blocks.
+    """
+    rng = np.random.default_rng(seed)
+    keys = []
+    offset = 0
+    for day, file_rows in zip(days, _split(rows, len(days))):
+        key = f"social_medias/media_complaint_day_{day}.json"
+        path = out_dir / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            f.write("[")
+            first = True
+            for start, n in _blocks(file_rows, 100_000):
+                for record in social_media_records(
+                    rng, offset + start, n, day, customers
+                ):
+                    f.write(("" if first else ",\n") + json.dumps(record))
+                    first = False
+            f.write("]")
+        offset += file_rows
+        keys.append(key)
+    return keys
+
+
+def write_web_forms(db_path, rows, days, customers, seed=3):
+    """
+    Create one `customer_complaints.web_form_request_<YYYY_MM_DD>` table per day.
+    """
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(db_path)
+    tables = []
+    offset = 0
+    try:
+        for day, day_rows in zip(days, _split(rows, len(days))):
+            table = f"web_form_request_{day.strftime('%Y_%m_%d')}"
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+            for start, n in _blocks(day_rows):
+                web_forms_frame(rng, offset + start, n, day, customers).to_sql(
+                    table, conn, if_exists="append", index=False
+                )
+            offset += day_rows
+            tables.append(table)
+        conn.commit()
+    finally:
+        conn.close()
+    return tables
+
+
+def business_days(end, count):
+    return [end - timedelta(days=count - 1 - i) for i in range(count)]
+
+
+def generate_all(out_dir, rows, days=3, files=1, seed=42, end=date(2025, 11, 20)):
+    """
+    Generate every source at the given scale into out_dir and return a manifest.
+
+    `rows` is the per-source row count; customers gets a tenth of it so that the
+    foreign keys in call logs, social media and web forms actually repeat.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    customers = max(rows // 10, 1)
+    day_list = business_days(end, days)
+
+    manifest = {
+        "rows": rows,
+        "seed": seed,
+        "days": [str(d) for d in day_list],
+        "customers": write_customers(out_dir / "source", customers, files, seed),
+        "call_logs": write_call_logs(
+            out_dir / "source", rows, day_list, customers, seed + 1
+        ),
+        "social_media": write_social_media(
+            out_dir / "source", rows, day_list, customers, seed + 2
+        ),
+        "web_forms": write_web_forms(
+            out_dir / "postgres.db", rows, day_list, customers, seed + 3
+        ),
+    }
+    with open(out_dir / "manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
@@ -0,0 +1,257 @@
+"""
+Wire the local stand-ins into the real pipeline modules and run one stage.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import subprocess
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SOURCE_BUCKET = "bench-source"
+DEST_BUCKET = "bench-dest"
+
+# Unique keys of the synthetic datasets, per staging table
+LOAD_TABLES = {
+    "customers": ["CUSTOMER_ID"],
+    "call_logs": ["CALL_ID"],
+    "social_medias": ["COMPLAINT_ID"],
+    "web_forms": ["REQUEST_ID"],
+}
+
+
+def prepare_environment(work_dir, run_id):
+    """
+    Point configuration at the stand-ins. Must run before any pipeline import,
+    because the pipeline modules read their settings at import time.
+    """
+    aws_config = work_dir / "aws_config"
+    aws_config.write_text(
+        "[default]\nregion = eu-north-1\n"
+        "[profile source]\nregion = eu-north-1\n"
+        "aws_access_key_id = bench\naws_secret_access_key = bench\n"
+    )
+    os.environ.update(
+        {
+            "AWS_CONFIG_FILE": str(aws_config),
+            "AWS_SHARED_CREDENTIALS_FILE": str(aws_config),
+            "AWS_ACCESS_KEY_ID": "bench",
+            "AWS_SECRET_ACCESS_KEY": "bench",
+            "AWS_REGION": "eu-north-1",
+            "SOURCE_BUCKET": SOURCE_BUCKET,
+            "DEST_BUCKET": DEST_BUCKET,
+            "METRICS_FILE": str(work_dir / "metrics.jsonl"),
+            "PIPELINE_RUN_ID": run_id,
+            "WEB_FORMS_KEY_COLUMN": "rowid",
+            "LAKE_CHECKS_ROOT": str(work_dir / "s3" / DEST_BUCKET),
+        }
+    )
+    for folder in ("extract_folder", "snowflakes"):
+        path = str(REPO_ROOT / folder)
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    os.chdir(work_dir)
+
+
+def install(work_dir):
+    """
+    Replace every network client in the pipeline modules with a stand-in.
+    Returns the stand-in objects so callers can inspect recorded calls.
+    """
+    from benchmarks.standins import (
+        LocalS3,
+        LocalWrangler,
+        FakeSSM,
+        FakeSnowflakeConnection,
+        sqlite_postgres,
+    )
+
+    import awswrangler as wr
+    import snowflake.connector
+    import utils
+    import checkpoint
+    import dedup
+    import scheduler
+    import pg_cdc
+    import reconcile
+    import lake_checks
+    import s3_extractor
+    import pg_extractor
+    import microbatch
+    import snowflake_load
+
+    s3_root = work_dir / "s3"
+    s3_root.mkdir(exist_ok=True)
+    source_link = s3_root / SOURCE_BUCKET
+    if not source_link.exists():
+        source_link.symlink_to(work_dir / "data" / "source")
+
+    s3 = LocalS3(s3_root, latency=float(os.getenv("BENCH_S3_LATENCY_MS", "0")) / 1000)
+    wrangler = LocalWrangler(s3)
+    ssm = FakeSSM()
+    warehouse = FakeSnowflakeConnection(
+        s3,
+        DEST_BUCKET,
+        latency=float(os.getenv("BENCH_SNOWFLAKE_LATENCY_MS", "0")) / 1000,
+    )
+
+    utils.s3_client_1 = utils.s3_client_2 = s3
+    utils.ssm_client_1 = utils.ssm_client_2 = ssm
+    checkpoint.s3_client_1 = s3
+    dedup.s3_client_1 = s3
+    scheduler.s3_client_1 = s3
+    pg_cdc.s3_client_1 = s3
+    reconcile.s3_client_1 = s3
+    lake_checks.s3_client_1 = s3
+    s3_extractor.s3_client = s3
+    s3_extractor.ssm_client = ssm
+    pg_extractor.ssm_client_2 = ssm
+    microbatch.s3_client = s3
+    snowflake_load.s3_client = s3
+    pg_extractor.psycopg2.connect = sqlite_postgres(work_dir / "data" / "postgres.db")
+
+    wr.s3.to_parquet = wrangler.to_parquet
+    wr.s3.list_objects = wrangler.list_objects
+    wr.s3.does_object_exist = wrangler.does_object_exist
+    snowflake.connector.connect = warehouse
+
+    return {"s3": s3, "ssm": ssm, "snowflake": warehouse}
+
+
+def setup(work_dir, run_id, fresh=False, env=None):
+    """
+    prepare_environment, then `env` on top of it, then install. With
+    `fresh`, the local S3 (the destination and every tracker) is emptied
+    first. Returns the stand-ins.
+    """
+    prepare_environment(work_dir, run_id)
+    os.environ.update({name: str(value) for name, value in (env or {}).items()})
+    if fresh:
+        shutil.rmtree(work_dir / "s3", ignore_errors=True)
+    return install(work_dir)
+
+
+# ==================== CHILD PROCESSES ====================
+def child_output(module, *args, env=None):
+    """
+    Stdout of `python -m module *args` run from the repo root in a fresh
+    interpreter, so every run imports the pipeline with its own settings
+    and has its own peak RSS. `env` is added to this process's environment.
+    A failed child has its stderr echoed and raises.
+    """
+    result = subprocess.run(
+        [sys.executable, "-m", module, *map(str, args)],
+        cwd=REPO_ROOT,
+        env=dict(
+            os.environ, **{name: str(value) for name, value in (env or {}).items()}
+        ),
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise RuntimeError(f"{module} {' '.join(map(str, args))} failed")
+    return result.stdout
+
+
+def run_child(module, *args, env=None):
+    """
+    child_output, decoded from the JSON object the child prints last.
+    """
+    return json.loads(child_output(module, *args, env=env).strip().splitlines()[-1])
+
+
+def _source_bytes(work_dir, prefix):
+    base = work_dir / "data" / "source" / prefix
+    return sum(p.stat().st_size for p in base.rglob("*") if p.is_file())
+
+
+# ==================== STAGES ====================
+def stage_customers(work_dir, manifest):
+    from s3_extractor import extract_customers
+
+    df = extract_customers()
+    rows = int(df["total_rows"].iloc[0]) if not df.empty else 0
+    return rows, _source_bytes(work_dir, "customers")
+
+
+def stage_call_logs(work_dir, manifest):
+    from s3_extractor import extract_call_logs
+    from utils import write_to_s3_parquet
+
+    df = extract_call_logs()
+    if not df.empty:
+        write_to_s3_parquet(df, "call_logs")
+    return len(df), _source_bytes(work_dir, "call logs")
+
+
+def stage_social_media(work_dir, manifest):
+    from s3_extractor import extract_social_media
+
+    rows = extract_social_media()
+    return rows, _source_bytes(work_dir, "social_medias")
+
+
+def stage_web_forms(work_dir, manifest):
+    from pg_extractor import extract_web_forms
+
+    rows = 0
+    for day in manifest["days"]:
+        rows += extract_web_forms(table_name_path="web_forms", exec_date=day)
+    return rows, (work_dir / "data" / "postgres.db").stat().st_size
+
+
+def stage_snowflake_load(work_dir, manifest):
+    from snowflake_load import load_s3_parquet_to_snowflake
+
+    staged = work_dir / "s3" / DEST_BUCKET / "staging"
+    rows = 0
+    for table, keys in LOAD_TABLES.items():
+        if (staged / table).exists():
+            rows += load_s3_parquet_to_snowflake(table, unique_keys=keys)
+    size = sum(p.stat().st_size for p in staged.rglob("*.parquet"))
+    return rows, size
+
+
+STAGES = {
+    "customers": stage_customers,
+    "call_logs": stage_call_logs,
+    "social_media": stage_social_media,
+    "web_forms": stage_web_forms,
+    "snowflake_load": stage_snowflake_load,
+}
+
+
+def run_stage(name, work_dir, run_id):
+    """
+    Run one benchmark stage in this process and return its measurements.
+    Meant to be called in a fresh interpreter so peak RSS is per stage.
+    """
+    work_dir = Path(work_dir).resolve()
+    prepare_environment(work_dir, f"{run_id}:{name}")
+    standins = install(work_dir)
+
+    from metrics import peak_rss_bytes, stage_breakdown
+
+    with open(work_dir / "data" / "manifest.json") as f:
+        manifest = json.load(f)
+
+    started = time.perf_counter()
+    rows, size = STAGES[name](work_dir, manifest)
+    seconds = time.perf_counter() - started
+
+    return {
+        "stage": name,
+        "rows": rows,
+        "bytes": size,
+        "seconds": round(seconds, 4),
+        "rows_per_sec": round(rows / seconds, 1) if seconds else 0,
+        "mb_per_sec": round(size / 1e6 / seconds, 3) if seconds else 0,
+        "peak_rss_mb": round(peak_rss_bytes() / 1e6, 1),
+        "statements": len(standins["snowflake"].statements),
+        "s3_calls": dict(standins["s3"].calls),
+        "breakdown": stage_breakdown(os.environ["PIPELINE_RUN_ID"]),
+    }
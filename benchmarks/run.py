@@ -0,0 +1,198 @@
+"""
+Reproducible end-to-end benchmark for the extractors and the Snowflake loader.
+
+    python -m benchmarks.run --rows 100000 --days 3
+    python -m benchmarks.run --rows 100000 --save-baseline
+    python -m benchmarks.run --rows 100000 --baseline benchmarks/baseline.json
+    python -m benchmarks.run --rows 100000 --async --s3-latency-ms 30
+
+Data is generated once per (rows, days, files, seed) into the work directory,
+every stage runs in its own interpreter against the local stand-ins, and the
+results are compared with the stored baseline for the same scale.
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.harness import REPO_ROOT, STAGES, run_child, run_stage
+
+DEFAULT_BASELINE = REPO_ROOT / "benchmarks" / "baseline.json"
+
+# Metric name -> direction in which a change counts as a regression
+COMPARED = {"rows_per_sec": -1, "mb_per_sec": -1, "peak_rss_mb": 1, "statements": 1}
+
+
+def ensure_data(work_dir, rows, days, files, seed):
+    from benchmarks.generators import generate_all
+
+    data_dir = work_dir / "data"
+    manifest_path = data_dir / "manifest.json"
+    wanted = {"rows": rows, "seed": seed, "days": days, "files": files}
+    if manifest_path.exists():
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("spec") == wanted:
+            return manifest
+
+    shutil.rmtree(data_dir, ignore_errors=True)
+    print(f"Generating synthetic data: {wanted}")
+    manifest = generate_all(data_dir, rows, days=days, files=files, seed=seed)
+    manifest["spec"] = wanted
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def reset_destination(work_dir):
+    """Start every run from an empty destination bucket and no tracker."""
+    shutil.rmtree(work_dir / "s3", ignore_errors=True)
+    for name in ("metrics.jsonl", "process_etl.log"):
+        (work_dir / name).unlink(missing_ok=True)
+
+
+def run_stage_child(stage, work_dir, run_id):
+    return run_child(
+        "benchmarks.run", "--child", stage, "--work-dir", work_dir, "--run-id", run_id
+    )
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare each stage with the baseline; returns (stage, metric, old, new, verdict).
+    """
+    rows = []
+    for stage, current in results.items():
+        previous = baseline.get(stage)
+        if not previous:
+            continue
+        for metric, direction in COMPARED.items():
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if change * direction > tolerance:
+                verdict = "REGRESSION"
+            elif change * direction < -tolerance:
+                verdict = "improved"
+            else:
+                verdict = "ok"
+            rows.append((stage, metric, old, new, change, verdict))
+    return rows
+
+
+def print_report(results, comparison):
+    header = f"{'STAGE':<16}{'ROWS':>12}{'SECONDS':>10}{'ROWS/S':>12}{'MB/S':>9}{'PEAK RSS MB':>13}{'STMTS':>7}"
+    print(header)
+    print("-" * len(header))
+    for stage, r in results.items():
+        print(
+            f"{stage:<16}{r['rows']:>12,}{r['seconds']:>10.2f}{r['rows_per_sec']:>12,.0f}"
+            f"{r['mb_per_sec']:>9.2f}{r['peak_rss_mb']:>13.1f}{r['statements']:>7}"
+        )
+    if comparison:
+        print("\nAgainst baseline:")
+        for stage, metric, old, new, change, verdict in comparison:
+            print(
+                f"  {stage:<16}{metric:<14}{old:>12,.1f} -> {new:>12,.1f} ({change:+.1%}) {verdict}"
+            )
+
+
+def print_profiles(work_dir, run_id, results):
+    """
+    Hotspots of each stage, from the profiles its child process wrote.
+    """
+    os.environ.setdefault("LOG_FILE", str(work_dir / "process_etl.log"))
+    sys.path.insert(0, str(REPO_ROOT / "extract_folder"))
+    import profiling
+
+    for stage in results:
+        print()
+        profiling.print_profiles(f"{run_id}:{stage}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000, help="rows per source")
+    parser.add_argument("--days", type=int, default=3, help="daily files/tables")
+    parser.add_argument("--files", type=int, default=1, help="customer CSV files")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument(
+        "--async", dest="use_async", action="store_true", help="async extractors"
+    )
+    parser.add_argument(
+        "--s3-latency-ms", type=float, default=0.0, help="delay per S3 request"
+    )
+    parser.add_argument("--cpu-workers", type=int, default=0, help="CPU pool processes")
+    parser.add_argument("--profile", help="profilers: cpu, sample, memory or all")
+    parser.add_argument("--work-dir", default=str(REPO_ROOT / ".bench"))
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--run-id", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    work_dir = Path(args.work_dir).resolve()
+
+    if args.child:
+        print(json.dumps(run_stage(args.child, work_dir, args.run_id), default=str))
+        return 0
+
+    # Stage children inherit these through the environment
+    os.environ["ASYNC_EXTRACT"] = "true" if args.use_async else "false"
+    os.environ["BENCH_S3_LATENCY_MS"] = str(args.s3_latency_ms)
+    os.environ["CPU_POOL_WORKERS"] = str(args.cpu_workers)
+    if args.profile:
+        os.environ["PIPELINE_PROFILE"] = args.profile
+        os.environ["PROFILE_DIR"] = str(work_dir.resolve() / "profiles")
+
+    work_dir.mkdir(parents=True, exist_ok=True)
+    ensure_data(work_dir, args.rows, args.days, args.files, args.seed)
+    reset_destination(work_dir)
+
+    run_id = datetime.now().strftime("bench-%Y%m%dT%H%M%S")
+    results = {}
+    for stage in args.stages.split(","):
+        results[stage] = run_stage_child(stage, work_dir, run_id)
+
+    scale_key = f"rows={args.rows},days={args.days},files={args.files},seed={args.seed}"
+    if args.use_async:
+        scale_key += ",async"
+    if args.cpu_workers > 1:
+        scale_key += f",cpu_workers={args.cpu_workers}"
+    if args.s3_latency_ms:
+        scale_key += f",s3_latency_ms={args.s3_latency_ms:g}"
+    if args.profile:
+        scale_key += f",profile={args.profile}"
+    baseline_path = Path(args.baseline)
+    baselines = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+
+    comparison = compare(results, baselines.get(scale_key, {}), args.tolerance)
+    print_report(results, comparison)
+    if args.profile:
+        print_profiles(work_dir, run_id, results)
+
+    with open(work_dir / f"{run_id}.json", "w") as f:
+        json.dump({"scale": scale_key, "results": results}, f, indent=2, default=str)
+
+    if args.save_baseline:
+        baselines[scale_key] = {
+            stage: {k: r[k] for k in ("rows", "bytes", "seconds", *COMPARED)}
+            for stage, r in results.items()
+        }
+        baseline_path.write_text(json.dumps(baselines, indent=2) + "\n")
+        print(f"\nBaseline for {scale_key} saved to {baseline_path}")
+
+    regressions = [c for c in comparison if c[-1] == "REGRESSION"]
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
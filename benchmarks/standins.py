@@ -0,0 +1,806 @@
+"""
+Local stand-ins for S3, SSM, Postgres and Snowflake.
+
+They implement only the slice of each client API the pipeline calls, backed by
+the local filesystem and sqlite, so the real extractor and loader code can be
+benchmarked end to end without network access or cloud credentials.
+"""
+
+import io
+import os
+import json
+import fcntl
+import time
+import re
+import sqlite3
+import hashlib
+import threading
+import uuid
+
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from urllib.parse import quote_plus
+from pathlib import Path
+from types import SimpleNamespace
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from botocore.exceptions import ClientError
+
+
+class NoSuchKey(ClientError):
+    def __init__(self, key, operation="GetObject"):
+        super().__init__(
+            {"Error": {"Code": "NoSuchKey", "Message": f"{key} does not exist"}},
+            operation,
+        )
+
+
+class PreconditionFailed(ClientError):
+    def __init__(self, key, operation="PutObject"):
+        super().__init__(
+            {
+                "Error": {
+                    "Code": "PreconditionFailed",
+                    "Message": f"At least one of the preconditions failed for {key}",
+                }
+            },
+            operation,
+        )
+
+
+def split_s3_path(path):
+    bucket, _, key = path.replace("s3://", "", 1).partition("/")
+    return bucket, key
+
+
+# ==================== S3 ====================
+class _Body(io.RawIOBase):
+    """Streaming body over a local file, like botocore's StreamingBody."""
+
+    def __init__(self, path, start=0, length=None):
+        self._f = open(path, "rb")
+        self._f.seek(start)
+        self._remaining = length
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = len(buffer)
+        if self._remaining is not None:
+            size = min(size, self._remaining)
+        data = self._f.read(size)
+        buffer[: len(data)] = data
+        if self._remaining is not None:
+            self._remaining -= len(data)
+        return len(data)
+
+    def read(self, amt=-1):
+        if amt is None or amt < 0:
+            amt = -1 if self._remaining is None else self._remaining
+        elif self._remaining is not None:
+            amt = min(amt, self._remaining)
+        data = self._f.read(amt)
+        if self._remaining is not None:
+            self._remaining -= len(data)
+        return data
+
+    def iter_chunks(self, chunk_size=1024 * 1024):
+        while chunk := self.read(chunk_size):
+            yield chunk
+
+    def iter_lines(self, chunk_size=1024 * 1024, keepends=False):
+        pending = b""
+        for chunk in self.iter_chunks(chunk_size):
+            lines = (pending + chunk).splitlines(True)
+            pending = b""
+            for line in lines:
+                if line.endswith(b"\n"):
+                    yield line if keepends else line.rstrip(b"\r\n")
+                else:
+                    pending = line
+        if pending:
+            yield pending
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+
+class LocalS3:
+    """
+    Disk-backed subset of the boto3 S3 client: objects live at root/bucket/key.
+    Conditional writes (IfMatch / IfNoneMatch) follow S3 semantics. `latency`
+    adds a fixed delay to every request to stand in for network round trips.
+    """
+
+    def __init__(self, root, latency=0.0):
+        self.root = Path(root)
+        self.latency = latency
+        self.notifications = []
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.calls = Counter()
+        self.exceptions = SimpleNamespace(NoSuchKey=NoSuchKey)
+        self._lock = threading.RLock()
+        self._etags = {}
+
+    def _request(self, operation):
+        self.calls[operation] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _path(self, bucket, key):
+        return self.root / bucket / key
+
+    @contextmanager
+    def _bucket_lock(self, bucket):
+        """
+        Make a conditional write's check and replace atomic across the
+        processes sharing this root, as S3 does for concurrent writers.
+        """
+        with open(self.root / f".{bucket}.lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _etag(self, path):
+        stat = path.stat()
+        cache_key = (str(path), stat.st_mtime_ns, stat.st_size)
+        etag = self._etags.get(cache_key)
+        if etag is None:
+            digest = hashlib.md5()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+            etag = self._etags[cache_key] = f'"{digest.hexdigest()}"'
+        return etag
+
+    def _meta(self, path, key):
+        stat = path.stat()
+        return {
+            "Key": key,
+            "Size": stat.st_size,
+            "LastModified": datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+            "ETag": self._etag(path),
+        }
+
+    def _keys(self, bucket, prefix=""):
+        base = self.root / bucket
+        keys = []
+        for dirpath, _, filenames in os.walk(base, followlinks=True):
+            for name in filenames:
+                if name.startswith(".tmp-"):
+                    continue
+                key = os.path.relpath(os.path.join(dirpath, name), base)
+                key = key.replace(os.sep, "/")
+                if key.startswith(prefix):
+                    keys.append(key)
+        return sorted(keys)
+
+    def list_objects_v2(
+        self,
+        Bucket,
+        Prefix="",
+        StartAfter="",
+        ContinuationToken=None,
+        MaxKeys=1000,
+        **kwargs,
+    ):
+        self._request("list_objects_v2")
+        after = ContinuationToken or StartAfter
+        keys = [k for k in self._keys(Bucket, Prefix) if k > after]
+        page = keys[:MaxKeys]
+        response = {
+            "Contents": [self._meta(self._path(Bucket, k), k) for k in page],
+            "KeyCount": len(page),
+            "IsTruncated": len(keys) > MaxKeys,
+        }
+        if response["IsTruncated"]:
+            response["NextContinuationToken"] = page[-1]
+        if not page:
+            del response["Contents"]
+        return response
+
+    def get_paginator(self, operation):
+        assert operation == "list_objects_v2", operation
+        return SimpleNamespace(paginate=self._paginate)
+
+    def _paginate(self, **kwargs):
+        token = None
+        while True:
+            page = self.list_objects_v2(ContinuationToken=token, **kwargs)
+            yield page
+            if not page["IsTruncated"]:
+                break
+            token = page["NextContinuationToken"]
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self._request("head_object")
+        path = self._path(Bucket, Key)
+        if not path.is_file():
+            raise NoSuchKey(Key, "HeadObject")
+        meta = self._meta(path, Key)
+        return {
+            "ContentLength": meta["Size"],
+            "ETag": meta["ETag"],
+            "LastModified": meta["LastModified"],
+        }
+
+    def get_object(self, Bucket, Key, Range=None, IfMatch=None, **kwargs):
+        self._request("get_object")
+        path = self._path(Bucket, Key)
+        if not path.is_file():
+            raise NoSuchKey(Key)
+        meta = self._meta(path, Key)
+        if IfMatch is not None and IfMatch != meta["ETag"]:
+            raise PreconditionFailed(Key, "GetObject")
+
+        start, length = 0, meta["Size"]
+        if Range:
+            first, _, last = Range.replace("bytes=", "").partition("-")
+            start = int(first)
+            end = min(int(last), meta["Size"] - 1) if last else meta["Size"] - 1
+            length = max(end - start + 1, 0)
+        return {
+            "Body": _Body(path, start, length),
+            "ContentLength": length,
+            "ETag": meta["ETag"],
+            "LastModified": meta["LastModified"],
+        }
+
+    def put_object(
+        self, Bucket, Key, Body=b"", IfMatch=None, IfNoneMatch=None, **kwargs
+    ):
+        self._request("put_object")
+        if isinstance(Body, str):
+            Body = Body.encode("utf-8")
+        elif hasattr(Body, "read"):
+            Body = Body.read()
+        path = self._path(Bucket, Key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        with self._lock, self._bucket_lock(Bucket):
+            exists = path.is_file()
+            if IfNoneMatch == "*" and exists:
+                raise PreconditionFailed(Key)
+            if IfMatch is not None and (not exists or self._etag(path) != IfMatch):
+                raise PreconditionFailed(Key)
+            tmp = path.with_name(f".tmp-{uuid.uuid4().hex}")
+            tmp.write_bytes(bytes(Body))
+            os.replace(tmp, path)
+            etag = self._etag(path)
+        self._notify(Bucket, Key, len(Body), etag)
+        return {"ETag": etag}
+
+    def notify(self, bucket, queue, queue_url, prefix=""):
+        """
+        Send an S3 ObjectCreated event to `queue` for every put under prefix,
+        like a bucket notification configuration targeting SQS.
+        """
+        self.notifications.append((bucket, prefix, queue, queue_url))
+
+    def _notify(self, bucket, key, size, etag):
+        for target, prefix, queue, queue_url in self.notifications:
+            if target != bucket or not key.startswith(prefix):
+                continue
+            record = {
+                "eventSource": "aws:s3",
+                "eventTime": datetime.now(timezone.utc).isoformat(),
+                "eventName": "ObjectCreated:Put",
+                "s3": {
+                    "bucket": {"name": bucket},
+                    "object": {
+                        "key": quote_plus(key, safe="/"),
+                        "size": size,
+                        "eTag": etag.strip('"'),
+                    },
+                },
+            }
+            queue.send_message(
+                QueueUrl=queue_url, MessageBody=json.dumps({"Records": [record]})
+            )
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        self._request("delete_object")
+        try:
+            self._path(Bucket, Key).unlink()
+        except FileNotFoundError:
+            pass
+        return {}
+
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        for item in Delete.get("Objects", []):
+            self.delete_object(Bucket, item["Key"])
+        return {}
+
+
+# ==================== AWSWRANGLER ====================
+class LocalWrangler:
+    """
+    Replacements for the awswrangler.s3 functions the pipeline calls,
+    writing Hive-partitioned Parquet datasets into a LocalS3 store.
+    """
+
+    def __init__(self, s3):
+        self.s3 = s3
+
+    def _write_file(self, df, path, compression, options=None):
+        options = dict(options or {})
+        table_args = options.pop("write_table_args", {})
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        buffer = io.BytesIO()
+        pq.write_table(
+            table, buffer, compression=compression or "none", **options, **table_args
+        )
+        bucket, key = split_s3_path(path)
+        self.s3.put_object(Bucket=bucket, Key=key, Body=buffer.getvalue())
+        return path
+
+    def _delete_prefix(self, path):
+        bucket, prefix = split_s3_path(path)
+        for key in self.s3._keys(bucket, prefix):
+            self.s3.delete_object(Bucket=bucket, Key=key)
+
+    def to_parquet(
+        self,
+        df,
+        path=None,
+        dataset=False,
+        mode=None,
+        partition_cols=None,
+        compression="snappy",
+        filename_prefix=None,
+        boto3_session=None,
+        pyarrow_additional_kwargs=None,
+        **kwargs,
+    ):
+        options = pyarrow_additional_kwargs
+        if not dataset:
+            return {"paths": [self._write_file(df, path, compression, options)]}
+
+        path = path.rstrip("/") + "/"
+        mode = mode or "append"
+        if mode == "overwrite":
+            self._delete_prefix(path)
+
+        tag = {"gzip": "gz"}.get(compression, compression)
+        suffix = f".{tag}.parquet" if compression else ".parquet"
+        name = f"{filename_prefix or ''}{uuid.uuid4().hex}{suffix}"
+        paths, partitions = [], {}
+        groups = (
+            df.groupby(partition_cols, sort=False, dropna=False)
+            if partition_cols
+            else [((), df)]
+        )
+        for values, group in groups:
+            values = values if isinstance(values, tuple) else (values,)
+            subdir = "".join(f"{c}={v}/" for c, v in zip(partition_cols or [], values))
+            if mode == "overwrite_partitions" and subdir:
+                self._delete_prefix(path + subdir)
+            data = group.drop(columns=partition_cols or [])
+            paths.append(
+                self._write_file(data, path + subdir + name, compression, options)
+            )
+            partitions[path + subdir] = [str(v) for v in values]
+        return {"paths": paths, "partitions_values": partitions}
+
+    def list_objects(self, path, suffix=None, boto3_session=None, **kwargs):
+        bucket, prefix = split_s3_path(path)
+        keys = self.s3._keys(bucket, prefix)
+        if suffix:
+            keys = [k for k in keys if k.endswith(suffix)]
+        return [f"s3://{bucket}/{k}" for k in keys]
+
+    def does_object_exist(self, path, boto3_session=None, **kwargs):
+        bucket, key = split_s3_path(path)
+        return self.s3._path(bucket, key).is_file()
+
+
+class LocalQueue:
+    """
+    Directory-backed subset of the boto3 SQS client. Every message is a file;
+    receiving claims it with an atomic rename, deleting removes the claim.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.calls = Counter()
+
+    def _dir(self, queue_url):
+        path = self.root / queue_url.rstrip("/").rsplit("/", 1)[-1]
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def send_message(self, QueueUrl, MessageBody, **kwargs):
+        self.calls["send_message"] += 1
+        message_id = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        path = self._dir(QueueUrl) / f"{message_id}.msg"
+        tmp = path.with_name(f".tmp-{message_id}")
+        tmp.write_text(MessageBody)
+        os.replace(tmp, path)
+        return {"MessageId": message_id}
+
+    def receive_message(
+        self, QueueUrl, MaxNumberOfMessages=1, WaitTimeSeconds=0, **kwargs
+    ):
+        self.calls["receive_message"] += 1
+        deadline = time.monotonic() + WaitTimeSeconds
+        directory = self._dir(QueueUrl)
+        while True:
+            messages = []
+            for path in sorted(directory.glob("*.msg"))[:MaxNumberOfMessages]:
+                claimed = path.with_suffix(f".inflight-{uuid.uuid4().hex[:8]}")
+                try:
+                    os.rename(path, claimed)
+                except FileNotFoundError:
+                    continue
+                messages.append(
+                    {
+                        "MessageId": path.stem,
+                        "ReceiptHandle": claimed.name,
+                        "Body": claimed.read_text(),
+                    }
+                )
+            if messages or time.monotonic() >= deadline:
+                return {"Messages": messages} if messages else {}
+            time.sleep(0.05)
+
+    def delete_message_batch(self, QueueUrl, Entries, **kwargs):
+        self.calls["delete_message_batch"] += 1
+        directory = self._dir(QueueUrl)
+        for entry in Entries:
+            (directory / entry["ReceiptHandle"]).unlink(missing_ok=True)
+        return {"Successful": [{"Id": e["Id"]} for e in Entries], "Failed": []}
+
+
+# ==================== SSM / POSTGRES ====================
+class FakeSSM:
+    """SSM Parameter Store stand-in returning fixed values."""
+
+    def __init__(self, values=None):
+        self.values = values or {}
+        self.calls = Counter()
+
+    def _value(self, name):
+        return self.values.get(name, name.rsplit("/", 1)[-1])
+
+    def get_parameter(self, Name, WithDecryption=False):
+        self.calls["get_parameter"] += 1
+        return {"Parameter": {"Name": Name, "Value": self._value(Name)}}
+
+    def get_parameters(self, Names, WithDecryption=False):
+        self.calls["get_parameters"] += 1
+        return {
+            "Parameters": [{"Name": n, "Value": self._value(n)} for n in Names],
+            "InvalidParameters": [],
+        }
+
+
+class PgStyleCursor(sqlite3.Cursor):
+    """
+    sqlite cursor taking psycopg2's %s placeholders and usable as a context
+    manager, as psycopg2 cursors are.
+    """
+
+    def execute(self, sql, params=()):
+        return super().execute(sql.replace("%s", "?"), params or ())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PgStyleConnection(sqlite3.Connection):
+    def cursor(self, factory=PgStyleCursor, name=None):
+        # A psycopg2 named (server-side) cursor; sqlite cursors already stream
+        return super().cursor(factory)
+
+
+def sqlite_postgres(db_path, schema="customer_complaints"):
+    """
+    Return a psycopg2.connect replacement that opens the generated sqlite
+    database under the `customer_complaints` schema name.
+    """
+
+    def connect(*args, **kwargs):
+        conn = sqlite3.connect(
+            ":memory:", check_same_thread=False, factory=PgStyleConnection
+        )
+        conn.execute(f"ATTACH DATABASE ? AS {schema}", (str(db_path),))
+        return conn
+
+    return connect
+
+
+# ==================== SNOWFLAKE ====================
+class FakeSnowflakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self._rows = []
+        self.rowcount = None
+        self.sfqid = None
+        self.description = None
+
+    def execute(self, sql, params=None, _statement_params=None):
+        self.conn.record(sql, _statement_params)
+        self._rows, self.rowcount = self.conn.respond(sql)
+        self.description = self.conn.description
+        self.sfqid = f"fake-{len(self.conn.statements)}"
+        return self
+
+    def executemany(self, sql, seq_of_params, _statement_params=None):
+        rows = list(seq_of_params)
+        self.conn.record(sql, _statement_params)
+        self._rows, self.rowcount = self.conn.insert(sql, rows)
+        return self
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def close(self):
+        pass
+
+
+class FakeSnowflakeConnection:
+    """
+    Records every statement and answers LIST / DESCRIBE / COPY / COUNT / MERGE
+    from the Parquet files in the LocalS3 staging area. Bulk INSERTs add
+    their rows to the target table. `latency` seconds are added to every
+    statement, as a warehouse round trip.
+
+    `tags` holds the QUERY_TAG each statement ran with, and `warehouses`
+    the size, state, auto-suspend, resizes and suspends of every warehouse:
+    statements other than LIST, DESCRIBE and SHOW resume the session's
+    warehouse, as with AUTO_RESUME. SHOW WAREHOUSES LIKE answers with the
+    sizes spelled as Snowflake shows them.
+    """
+
+    SHOWN_SIZES = {
+        "XSMALL": "X-Small",
+        "SMALL": "Small",
+        "MEDIUM": "Medium",
+        "LARGE": "Large",
+        "XLARGE": "X-Large",
+        "XXLARGE": "2X-Large",
+        "XXXLARGE": "3X-Large",
+        "X4LARGE": "4X-Large",
+        "X5LARGE": "5X-Large",
+        "X6LARGE": "6X-Large",
+    }
+
+    def __init__(
+        self,
+        s3,
+        bucket,
+        stage_name="TELECOM_SNOWFLAKE_STAGE",
+        prefix="staging/",
+        latency=0.0,
+    ):
+        self.s3 = s3
+        self.bucket = bucket
+        self.stage_name = stage_name
+        self.prefix = prefix
+        self.latency = latency
+        self.statements = []
+        self.tags = []
+        self.tables = {}
+        self.warehouses = {}
+        self.current_warehouse = None
+        self.description = None
+        self.connect_kwargs = {}
+        self._staged = {}
+
+    def __call__(self, **kwargs):
+        self.connect_kwargs = kwargs
+        self.current_warehouse = kwargs.get("warehouse")
+        return self
+
+    def warehouse(self, name):
+        return self.warehouses.setdefault(
+            name.upper(),
+            {
+                "size": "XSMALL",
+                "state": "SUSPENDED",
+                "auto_suspend": 600,
+                "resizes": 0,
+                "suspends": 0,
+            },
+        )
+
+    def record(self, sql, statement_params=None):
+        self.statements.append(" ".join(sql.split()))
+        session = self.connect_kwargs.get("session_parameters") or {}
+        self.tags.append(
+            (statement_params or {}).get("QUERY_TAG") or session.get("QUERY_TAG")
+        )
+
+    def cursor(self):
+        return FakeSnowflakeCursor(self)
+
+    def close(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def _stage_files(self, location, sql=""):
+        location = location.strip("'")
+        stage_path = location.split(f"@{self.stage_name}", 1)[-1].strip("/")
+        keys = self.s3._keys(self.bucket, self.prefix + stage_path)
+        keys = [k for k in keys if k.endswith(".parquet")]
+        # COPY and LIST match PATTERN against the whole storage location
+        pattern = re.search(r"PATTERN = '([^']+)'", sql)
+        if pattern:
+            keys = [
+                k
+                for k in keys
+                if re.fullmatch(pattern.group(1), f"s3://{self.bucket}/{k}")
+            ]
+        return keys
+
+    def insert(self, sql, rows):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.current_warehouse:
+            self.warehouse(self.current_warehouse)["state"] = "STARTED"
+        match = re.match(r"INSERT INTO (\w+)", " ".join(sql.split()).upper())
+        if match:
+            table = self.tables.setdefault(match.group(1), {"columns": [], "rows": 0})
+            table["rows"] += len(rows)
+        return [], len(rows)
+
+    def respond(self, sql):
+        if self.latency:
+            time.sleep(self.latency)
+        text = " ".join(sql.split())
+        upper = text.upper()
+        self.description = None
+
+        match = re.match(r"SHOW WAREHOUSES LIKE '(\w+)'$", upper)
+        if match:
+            names = ["name", "state", "type", "size", "auto_suspend"]
+            self.description = [(name, None) for name in names]
+            warehouse = self.warehouse(match.group(1))
+            row = (
+                match.group(1),
+                warehouse["state"],
+                "STANDARD",
+                self.SHOWN_SIZES[warehouse["size"]],
+                warehouse["auto_suspend"],
+            )
+            return [row], 1
+
+        match = re.match(r"USE WAREHOUSE (\w+)$", upper)
+        if match:
+            self.current_warehouse = match.group(1)
+            return [], 0
+
+        match = re.match(r"ALTER WAREHOUSE (\w+) SUSPEND$", upper)
+        if match:
+            warehouse = self.warehouse(match.group(1))
+            if warehouse["state"] == "SUSPENDED":
+                raise RuntimeError(f"Warehouse {match.group(1)} is already suspended")
+            warehouse["state"] = "SUSPENDED"
+            warehouse["suspends"] += 1
+            return [], 0
+
+        match = re.match(
+            r"ALTER WAREHOUSE (\w+) SET WAREHOUSE_SIZE = '(\w+)'(?: AUTO_SUSPEND = (\d+))?",
+            upper,
+        )
+        if match:
+            warehouse = self.warehouse(match.group(1))
+            warehouse["resizes"] += warehouse["size"] != match.group(2)
+            warehouse["size"] = match.group(2)
+            if match.group(3):
+                warehouse["auto_suspend"] = int(match.group(3))
+            return [], 0
+
+        # Metadata statements run without a warehouse
+        if self.current_warehouse and not upper.startswith(("LIST ", "DESCRIBE ")):
+            self.warehouse(self.current_warehouse)["state"] = "STARTED"
+
+        if upper.startswith("LIST "):
+            keys = self._stage_files(text.split()[1], text)
+            rows = []
+            for key in keys:
+                meta = self.s3._meta(self.s3._path(self.bucket, key), key)
+                rows.append(
+                    (
+                        f"s3://{self.bucket}/{key}",
+                        meta["Size"],
+                        meta["ETag"].strip('"'),
+                        meta["LastModified"].strftime("%a, %d %b %Y %H:%M:%S GMT"),
+                    )
+                )
+            return rows, len(rows)
+
+        match = re.match(
+            r"CREATE OR REPLACE TEMPORARY TABLE (\w+) USING TEMPLATE", upper
+        )
+        if match:
+            location = re.search(r"LOCATION => '([^']+)'", text).group(1)
+            keys = self._stage_files(location)
+            listed = re.search(r"FILES => \(([^)]*)\)", text)
+            if listed:
+                names = re.findall(r"'([^']+)'", listed.group(1))
+                keys = [k for k in keys if any(k.endswith("/" + n) for n in names)]
+            schema = pq.read_schema(self.s3._path(self.bucket, keys[0]))
+            self.tables[match.group(1)] = {"columns": list(schema.names), "rows": 0}
+            self._staged[match.group(1)] = keys
+            return [], 0
+
+        match = re.match(r"CREATE OR REPLACE TEMPORARY TABLE (\w+) \((.*)\)$", text)
+        if match:
+            columns = re.findall(r'"([^"]+)" \w+', match.group(2))
+            self.tables[match.group(1).upper()] = {"columns": columns, "rows": 0}
+            return [], 0
+
+        match = re.match(
+            r"CREATE OR REPLACE TEMPORARY TABLE (\w+) AS .* FROM (\w+)", upper
+        )
+        if match:
+            source = self.tables.get(match.group(2), {"columns": [], "rows": 0})
+            self.tables[match.group(1)] = dict(
+                source, columns=source["columns"] + ["RN"]
+            )
+            return [], 0
+
+        match = re.match(r"COPY INTO (\w+)", upper)
+        if match:
+            table = self.tables.setdefault(match.group(1), {"columns": [], "rows": 0})
+            location = re.search(r"FROM '([^']+)'", text)
+            keys = (
+                self._stage_files(location.group(1), text)
+                if location
+                else self._staged.get(match.group(1), [])
+            )
+            listed = re.search(r"FILES = \(([^)]*)\)", text)
+            if listed:
+                names = re.findall(r"'([^']+)'", listed.group(1))
+                keys = [k for k in keys if any(k.endswith("/" + n) for n in names)]
+            results = []
+            for key in keys:
+                rows = pq.read_metadata(self.s3._path(self.bucket, key)).num_rows
+                table["rows"] += rows
+                results.append(
+                    (f"s3://{self.bucket}/{key}", "LOADED", rows, rows, 1, 0)
+                )
+            return results, len(results)
+
+        match = re.match(r"DESCRIBE TABLE (\w+)", upper)
+        if match:
+            columns = self.tables.get(match.group(1), {"columns": []})["columns"]
+            return [(c, "VARCHAR") for c in columns], len(columns)
+
+        match = re.match(r"ALTER TABLE (\w+) DROP COLUMN (\w+)", upper)
+        if match and match.group(1) in self.tables:
+            table = self.tables[match.group(1)]
+            table["columns"] = [
+                c for c in table["columns"] if c.upper() != match.group(2)
+            ]
+            return [], 0
+
+        match = re.match(r"SELECT COUNT\(\*\) FROM (\w+)", upper)
+        if match:
+            return [(self.tables.get(match.group(1), {"rows": 0})["rows"],)], 1
+
+        match = re.match(r"MERGE INTO (\w+) .* USING (\w+)", upper)
+        if match:
+            # Every source row counts as an insert
+            rows = self.tables.get(match.group(2), {"rows": 0})["rows"]
+            target = self.tables.setdefault(match.group(1), {"columns": [], "rows": 0})
+            target["rows"] += rows
+            return [(rows, 0)], rows
+
+        return [], 0
@@ -0,0 +1,19 @@
+{#
+    Restrict an incremental model to rows ingested since its last run.
+    Staging tables carry ingestion_timestamp in every row (ingestion_date only
+    exists as the S3 partition folder), so the watermark is taken on it.
+    `incremental_lookback_hours` re-reads a small overlap; the merge on the
+    model's unique_key makes that overlap idempotent.
+#}
+{% macro incremental_window(column="ingestion_timestamp") %}
+    {% if is_incremental() %}
+    WHERE {{ column }} >= (
+        SELECT DATEADD(
+            hour,
+            -{{ var("incremental_lookback_hours") }},
+            COALESCE(MAX({{ column }}), '1900-01-01'::TIMESTAMP_NTZ)
+        )
+        FROM {{ this }}
+    )
+    {% endif %}
+{% endmacro %}
@@ -1,6 +1,9 @@
+{{ config(unique_key="id") }}
+
 WITH stage AS (
     SELECT *
     FROM {{ source("staging", "agents") }}
+    {{ incremental_window() }}
 )
 
 SELECT *
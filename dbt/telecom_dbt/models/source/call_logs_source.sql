@@ -1,6 +1,9 @@
+{{ config(unique_key="call_id") }}
+
 WITH stage AS (
     SELECT *
     FROM {{ source("staging", "call_logs") }}
+    {{ incremental_window() }}
 )
 
 SELECT *
@@ -1,6 +1,9 @@
+{{ config(unique_key="customer_id") }}
+
 WITH stage AS (
     SELECT *
     FROM {{ source("staging", "customers") }}
+    {{ incremental_window() }}
 )
 
 SELECT *
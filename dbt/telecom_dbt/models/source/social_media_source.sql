@@ -1,6 +1,9 @@
+{{ config(unique_key="social_media") }}
+
 WITH stage AS (
     SELECT *
     FROM {{ source("staging", "social_media") }}
+    {{ incremental_window() }}
 )
 
 SELECT *
@@ -1,6 +1,9 @@
+{{ config(unique_key="web_form_id") }}
+
 WITH stage AS (
     SELECT *
     FROM {{ source("staging", "web_forms") }}
+    {{ incremental_window() }}
 )
 
 SELECT *
@@ -0,0 +1,330 @@
+import os
+import logging
+import numpy as np
+import pandas as pd
+
+from log_config import configure_logging
+
+configure_logging(__name__)
+logger = logging.getLogger(__name__)
+
+
+# Aggregates Constants: with AGGREGATES_ENABLED every staged batch of the
+# complaint sources also writes its partial aggregates, which
+# build_daily_aggregates merges into one file per event day under
+# staging/AGGREGATES_TABLE/ for the Snowflake loader
+AGGREGATES_ENABLED = os.getenv("AGGREGATES_ENABLED", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+AGGREGATES_TABLE = os.getenv("AGGREGATES_TABLE", "complaint_aggregates")
+AGGREGATES_PREFIX = "aggregates/partials"
+# Each distinct-customer sketch holds 2**precision one-byte registers, with a
+# standard error of 1.04 / sqrt(2**precision): 3.3% at the default 10
+AGGREGATES_HLL_PRECISION = int(os.getenv("AGGREGATES_HLL_PRECISION", "10"))
+
+# Source columns after clean_column_names, first match wins. A channel
+# without a column is the source's own name
+AGGREGATE_SOURCES = {
+    "call_logs": {
+        "channel": "call",
+        "time": ["call_start_time"],
+        "end": ["call_end_time"],
+        "agent": ["agent_id"],
+        "category": ["complaint_catego_ry", "complaint_category"],
+        "status": ["resolutionstatus", "resolution_status"],
+        "customer": ["customer_id"],
+    },
+    "social_medias": {
+        "channel": ["media_channel"],
+        "time": ["request_date"],
+        "end": [],
+        "agent": ["agent_id"],
+        "category": ["complaint_category"],
+        "status": ["resolution_status"],
+        "customer": ["customer_id"],
+    },
+    "web_forms": {
+        "channel": "web_form",
+        "time": ["request_date"],
+        "end": ["resolution_date"],
+        "agent": ["agent_id"],
+        "category": ["complaint_category"],
+        "status": ["resolution_status"],
+        "customer": ["customer_id"],
+    },
+}
+
+# Set by the extractors' dedup in flag mode on rows that were already
+# staged; the warehouse never merges them, so they are not counted either
+DEDUP_FLAG_COLUMN = "_duplicate"
+
+# Dimensions each day is broken down by; "all" is the day's total. The
+# per-customer rows carry no sketches: one customer is one distinct customer,
+# and a percentile of a handful of calls says little
+DIMENSIONS = ("all", "agent", "channel", "category", "customer")
+UNSKETCHED = {"customer"}
+KEYS = ["event_date", "source", "dimension", "value"]
+# Unique keys of AGGREGATES_TABLE in the warehouse
+LOAD_KEYS = [key.upper() for key in KEYS]
+UNKNOWN = "unknown"
+
+# Log-spaced duration histogram from 1 second to a week: 128 edges 11% apart,
+# so a percentile read from it is within about 5% of the exact one
+DURATION_EDGES = np.geomspace(1, 7 * 86_400, 128)
+PERCENTILES = {"p50": 0.5, "p90": 0.9, "p95": 0.95}
+
+
+def aggregates_enabled(table=None):
+    """
+    Whether partial aggregates are written, for `table` if given.
+    """
+    return AGGREGATES_ENABLED and (table is None or table in AGGREGATE_SOURCES)
+
+
+def _column(df, candidates):
+    if isinstance(candidates, str):
+        return None
+    for name in candidates:
+        if name in df.columns:
+            return df[name]
+    return None
+
+
+def _labels(values, index):
+    if values is None:
+        return pd.Series(UNKNOWN, index=index, dtype=object)
+    return values.astype("string").fillna(UNKNOWN).astype(object)
+
+
+# ==================== SKETCHES ====================
+def _bit_length(x):
+    n = np.zeros(len(x), dtype=np.int64)
+    x = x.copy()
+    for shift in (32, 16, 8, 4, 2, 1):
+        big = x >= (np.uint64(1) << np.uint64(shift))
+        n[big] += shift
+        x[big] >>= np.uint64(shift)
+    return n + (x > 0)
+
+
+def hll_positions(values, precision=None):
+    """
+    HyperLogLog register index and rank of each value: the top `precision`
+    bits of its 64-bit hash pick the register, the position of the first
+    set bit in the rest is the rank.
+    """
+    p = precision or AGGREGATES_HLL_PRECISION
+    text = values.astype("string").fillna("").to_numpy(dtype=object)
+    hashed = pd.util.hash_array(text)
+    index = (hashed >> np.uint64(64 - p)).astype(np.int64)
+    rest = hashed << np.uint64(p)
+    rank = np.where(rest == 0, 64 - p + 1, 65 - _bit_length(rest))
+    return index, rank.astype(np.uint8)
+
+
+def hll_estimate(registers):
+    """
+    Distinct count estimate of each row of a 2-D register array, with the
+    linear-counting correction for small counts.
+    """
+    registers = np.atleast_2d(registers)
+    m = registers.shape[1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.power(2.0, -registers.astype(np.float64)).sum(axis=1)
+    zeros = (registers == 0).sum(axis=1)
+    small = (raw <= 2.5 * m) & (zeros > 0)
+    linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where(small, linear, raw).round().astype(np.int64)
+
+
+def _unpack(blobs, dtype):
+    """
+    Stack equally sized binary sketches into a 2-D array.
+    """
+    blobs = list(blobs)
+    return np.frombuffer(b"".join(blobs), dtype=dtype).reshape(len(blobs), -1)
+
+
+def _pack(rows):
+    return [row.tobytes() for row in rows]
+
+
+def duration_percentiles(bins, low, high, q):
+    """
+    The `q` quantile of each row of a 2-D duration histogram, interpolated
+    geometrically inside its bin and kept within the row's [low, high].
+    """
+    bins = np.atleast_2d(bins)
+    total = bins.sum(axis=1)
+    cumulative = bins.cumsum(axis=1)
+    target = np.maximum(q * total, 1)
+    position = (cumulative < target[:, None]).sum(axis=1).clip(0, bins.shape[1] - 1)
+    before = np.where(
+        position > 0, cumulative[np.arange(len(bins)), position - 1], 0
+    ).astype(np.float64)
+    inside = bins[np.arange(len(bins)), position].astype(np.float64)
+    edges = np.concatenate([[0.5], DURATION_EDGES, [DURATION_EDGES[-1] * 1.11]])
+    lower, upper = edges[position], edges[position + 1]
+    fraction = np.where(inside > 0, (target - before) / np.maximum(inside, 1), 0)
+    value = lower * np.power(upper / lower, fraction.clip(0, 1))
+    value = np.clip(value, low, high)
+    return np.where(total > 0, value, np.nan)
+
+
+# ==================== PARTIALS ====================
+def partial_aggregates(df, table):
+    """
+    Mergeable aggregates of the new rows in one batch of `table`: a row per
+    event date, dimension and value with the complaint and resolved counts,
+    duration count, sum, min and max, and (except per customer) a
+    HyperLogLog sketch of the customers and a duration histogram, both as
+    bytes.
+    """
+    spec = AGGREGATE_SOURCES[table]
+    if DEDUP_FLAG_COLUMN in df.columns:
+        df = df[~df[DEDUP_FLAG_COLUMN].fillna(False).astype(bool)]
+    times = _column(df, spec["time"])
+    if times is None:
+        raise ValueError(f"No event time column in {table} batch")
+    times = pd.to_datetime(times, errors="coerce")
+    ends = _column(df, spec["end"])
+    status = _column(df, spec["status"])
+    customers = _column(df, spec["customer"])
+
+    rows = pd.DataFrame(
+        {
+            "event_date": times.dt.strftime("%Y-%m-%d").fillna(UNKNOWN),
+            "resolved": (
+                status.astype("string").str.strip().str.lower().eq("resolved")
+                if status is not None
+                else pd.Series(False, index=df.index)
+            )
+            .fillna(False)
+            .astype(np.int64),
+        },
+        index=df.index,
+    )
+    if ends is not None:
+        seconds = (pd.to_datetime(ends, errors="coerce") - times).dt.total_seconds()
+        rows["duration"] = seconds.where(seconds >= 0)
+    else:
+        rows["duration"] = np.nan
+    durations = rows["duration"].to_numpy()
+    timed = ~np.isnan(durations)
+    duration_bins = np.searchsorted(DURATION_EDGES, np.nan_to_num(durations), "right")
+    if customers is not None:
+        hll_index, hll_rank = hll_positions(customers)
+        known = customers.notna().to_numpy()
+    m = 1 << AGGREGATES_HLL_PRECISION
+
+    frames = []
+    for dimension in DIMENSIONS:
+        if dimension == "all":
+            rows["value"] = "all"
+        elif dimension == "channel" and isinstance(spec["channel"], str):
+            rows["value"] = spec["channel"]
+        else:
+            rows["value"] = _labels(_column(df, spec[dimension]), df.index)
+        groups = rows.groupby(["event_date", "value"], sort=True)
+        codes = groups.ngroup().to_numpy()
+        out = groups.agg(
+            complaints=("resolved", "size"),
+            resolved=("resolved", "sum"),
+            duration_count=("duration", "count"),
+            duration_sum=("duration", "sum"),
+            duration_min=("duration", "min"),
+            duration_max=("duration", "max"),
+        ).reset_index()
+        out.insert(1, "source", table)
+        out.insert(2, "dimension", dimension)
+
+        if dimension in UNSKETCHED:
+            out["customers_hll"] = None
+            out["duration_bins"] = None
+        else:
+            registers = np.zeros((len(out), m), dtype=np.uint8)
+            if customers is not None:
+                np.maximum.at(
+                    registers, (codes[known], hll_index[known]), hll_rank[known]
+                )
+            histogram = np.zeros((len(out), len(DURATION_EDGES) + 1), dtype=np.int64)
+            np.add.at(histogram, (codes[timed], duration_bins[timed]), 1)
+            out["customers_hll"] = _pack(registers)
+            out["duration_bins"] = _pack(histogram)
+        frames.append(out)
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def merge_partials(partials):
+    """
+    Merge partial aggregates with the same keys: counts and sums add,
+    min and max carry over, sketches take the register-wise max and the
+    histograms add. Mergeable again with further partials.
+    """
+    groups = partials.groupby(KEYS, sort=True)
+    codes = groups.ngroup().to_numpy()
+    merged = groups.agg(
+        complaints=("complaints", "sum"),
+        resolved=("resolved", "sum"),
+        duration_count=("duration_count", "sum"),
+        duration_sum=("duration_sum", "sum"),
+        duration_min=("duration_min", "min"),
+        duration_max=("duration_max", "max"),
+    ).reset_index()
+
+    for column, dtype, combine in (
+        ("customers_hll", np.uint8, np.maximum),
+        ("duration_bins", np.int64, np.add),
+    ):
+        sketched = partials[column].notna().to_numpy()
+        values = [None] * len(merged)
+        if sketched.any():
+            stacked = _unpack(partials.loc[sketched, column], dtype)
+            result = np.zeros((len(merged), stacked.shape[1]), dtype=dtype)
+            combine.at(result, codes[sketched], stacked)
+            for code in np.unique(codes[sketched]):
+                values[code] = result[code].tobytes()
+        merged[column] = values
+    return merged
+
+
+def finalize(merged):
+    """
+    Dashboard rows from merged aggregates: counts, resolution rate, the
+    distinct customers estimate and duration average and percentiles. The
+    sketches are dropped; merge the partials again to roll up further.
+    """
+    out = merged[KEYS + ["complaints", "resolved"]].copy()
+    out["resolution_rate"] = (out["resolved"] / out["complaints"]).round(4)
+
+    sketched = merged["customers_hll"].notna().to_numpy()
+    distinct = np.where(merged["dimension"].eq("customer"), 1, 0).astype(np.int64)
+    if sketched.any():
+        distinct[sketched] = hll_estimate(
+            _unpack(merged.loc[sketched, "customers_hll"], np.uint8)
+        )
+    out["distinct_customers"] = distinct
+
+    count = merged["duration_count"].to_numpy()
+    out["duration_count"] = count
+    out["avg_duration_seconds"] = np.where(
+        count > 0, merged["duration_sum"] / np.maximum(count, 1), np.nan
+    ).round(1)
+    out["min_duration_seconds"] = merged["duration_min"]
+    out["max_duration_seconds"] = merged["duration_max"]
+
+    has_bins = merged["duration_bins"].notna().to_numpy()
+    for name, q in PERCENTILES.items():
+        values = np.full(len(merged), np.nan)
+        if has_bins.any():
+            values[has_bins] = duration_percentiles(
+                _unpack(merged.loc[has_bins, "duration_bins"], np.int64),
+                merged.loc[has_bins, "duration_min"].to_numpy(),
+                merged.loc[has_bins, "duration_max"].to_numpy(),
+                q,
+            )
+        out[f"{name}_duration_seconds"] = np.round(values, 1)
+    return out
@@ -0,0 +1,183 @@
+import os
+import asyncio
+import tempfile
+import logging
+import functools
+import contextvars
+
+from concurrent.futures import ThreadPoolExecutor
+from botocore.client import BaseClient
+from log_config import configure_logging
+from metrics import stage
+from source_cache import get_cache, open_source
+from cpu_pool import CPU_POOL_DIR, CPU_POOL_COPY_BYTES, get_pool, spool
+
+try:
+    from aiobotocore.session import get_session
+except ImportError:
+    get_session = None
+
+configure_logging(__name__)
+logger = logging.getLogger(__name__)
+
+
+# Engine Constants
+ASYNC_EXTRACT = os.getenv("ASYNC_EXTRACT", "false").lower() == "true"
+CONCURRENCY = {
+    "download": int(os.getenv("ASYNC_DOWNLOAD_CONCURRENCY", "16")),
+    "parse": int(os.getenv("ASYNC_PARSE_WORKERS", str(os.cpu_count() or 4))),
+    "upload": int(os.getenv("ASYNC_UPLOAD_CONCURRENCY", "8")),
+}
+
+
+def async_enabled(flag=None):
+    """
+    Resolve an extractor's use_async argument against ASYNC_EXTRACT.
+    """
+    return ASYNC_EXTRACT if flag is None else flag
+
+
+class AsyncS3:
+    """
+    Non-blocking S3 reads. Uses aiobotocore when it is installed and the
+    wrapped client is a real boto3 client; otherwise the blocking client runs
+    in worker threads, which also keeps any stand-in client in effect.
+    """
+
+    def __init__(self, client, session=None):
+        self.client = client
+        self.session = session
+        self._context = None
+        self._native = None
+
+    async def __aenter__(self):
+        if (
+            get_session is not None
+            and self.session is not None
+            and isinstance(self.client, BaseClient)
+        ):
+            credentials = self.session.get_credentials().get_frozen_credentials()
+            self._context = get_session().create_client(
+                "s3",
+                region_name=self.session.region_name,
+                aws_access_key_id=credentials.access_key,
+                aws_secret_access_key=credentials.secret_key,
+                aws_session_token=credentials.token,
+            )
+            self._native = await self._context.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._context is not None:
+            await self._context.__aexit__(*exc)
+
+    async def get_file(self, bucket, key, etag=None, size=None):
+        """
+        The object spooled a block at a time into a temporary file, which is
+        returned rewound; the body is never held in memory whole.
+        """
+        if self._native is not None and get_cache() is None:
+            response = await self._native.get_object(Bucket=bucket, Key=key)
+            f = tempfile.TemporaryFile(dir=CPU_POOL_DIR)
+            try:
+                async with response["Body"] as body:
+                    while block := await body.read(CPU_POOL_COPY_BYTES):
+                        await asyncio.to_thread(f.write, block)
+            except BaseException:
+                f.close()
+                raise
+            f.seek(0)
+            return f
+        return await asyncio.to_thread(
+            _spool_source, self.client, bucket, key, etag, size
+        )
+
+
+def _spool_source(client, bucket, key, etag, size):
+    with open_source(client, bucket, key, etag=etag, size=size) as stream:
+        return spool(stream)
+
+
+class Engine:
+    """
+    Drives many source objects through download, parse and upload at once.
+
+    Each stage has its own semaphore, so e.g. 16 downloads can be in flight
+    while at most `parse` objects are being parsed. Downloads are spooled to
+    temporary files rather than held in memory. Parsing runs in the CPU
+    pool when it is enabled, otherwise in a thread pool off the event loop;
+    uploads and other blocking calls run in threads.
+    """
+
+    def __init__(self, s3, limits=None):
+        self.s3 = s3
+        limits = {**CONCURRENCY, **(limits or {})}
+        self.limits = {name: asyncio.Semaphore(n) for name, n in limits.items()}
+        self.executor = ThreadPoolExecutor(
+            max_workers=limits["parse"], thread_name_prefix="parse"
+        )
+
+    async def download(self, bucket, file_info, **labels):
+        """
+        The object as a temporary file, rewound; the caller closes it, which
+        removes it.
+        """
+        async with self.limits["download"]:
+            with stage("s3_download", **labels) as span:
+                f = await self.s3.get_file(
+                    bucket,
+                    file_info["key"],
+                    etag=file_info.get("etag"),
+                    size=file_info.get("size"),
+                )
+                span.add(bytes=os.fstat(f.fileno()).st_size, files=1)
+            return f
+
+    async def parse(self, func, *args, **kwargs):
+        async with self.limits["parse"]:
+            pool = get_pool()
+            if pool is not None and not kwargs:
+                return await asyncio.wrap_future(pool.submit(func, *args))
+            call = functools.partial(func, *args, **kwargs)
+            context = contextvars.copy_context()
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, context.run, call
+            )
+
+    async def upload(self, func, *args, **kwargs):
+        async with self.limits["upload"]:
+            return await asyncio.to_thread(func, *args, **kwargs)
+
+    async def blocking(self, limit, func, *args, **kwargs):
+        """
+        Run a blocking call under one of the stage limits, e.g. a chunked
+        streaming reader that downloads, parses and uploads as it goes.
+        """
+        async with self.limits[limit]:
+            return await asyncio.to_thread(func, *args, **kwargs)
+
+    async def map(self, handler, items):
+        """
+        Run handler(item) for every item concurrently; results keep item order.
+        """
+        return await asyncio.gather(*(handler(item) for item in items))
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+def run(pipeline, client, session=None, limits=None):
+    """
+    Run `pipeline(engine)`, a coroutine function, from synchronous code such
+    as an extract_* entry point or an Airflow task.
+    """
+
+    async def main():
+        async with AsyncS3(client, session) as s3:
+            engine = Engine(s3, limits)
+            try:
+                return await pipeline(engine)
+            finally:
+                engine.close()
+
+    return asyncio.run(main())
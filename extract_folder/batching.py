@@ -0,0 +1,179 @@
+import os
+import logging
+
+from log_config import configure_logging
+from metrics import current_rss_bytes
+
+configure_logging(__name__)
+logger = logging.getLogger(__name__)
+
+
+# Batching Constants
+BATCH_MEMORY_BUDGET = int(os.getenv("BATCH_MEMORY_BUDGET_MB", "512")) * 1024**2
+BATCH_MIN_ROWS = int(os.getenv("BATCH_MIN_ROWS", "1000"))
+BATCH_MAX_ROWS = int(os.getenv("BATCH_MAX_ROWS", "1000000"))
+# Rows read before anything is known about the row width
+BATCH_PROBE_ROWS = int(os.getenv("BATCH_PROBE_ROWS", "10000"))
+# Writes shorter than this waste round trips, longer ones delay checkpoints
+BATCH_TARGET_WRITE_SECONDS = float(os.getenv("BATCH_TARGET_WRITE_SECONDS", "10"))
+# Peak memory of a batch relative to its DataFrame: the raw text, the parsed
+# frame, the metadata copy and the Parquet buffer are alive at once
+BATCH_MEMORY_AMPLIFICATION = float(os.getenv("BATCH_MEMORY_AMPLIFICATION", "3"))
+
+_SAMPLE_ROWS = 1000
+
+
+class AdaptiveBatcher:
+    """
+    Chooses how many rows the next batch of one reader should hold.
+
+    The first size comes from an estimated row width (e.g. Postgres column
+    statistics) or, without one, a small probe batch. After every batch the
+    row width is re-measured from the DataFrame, the RSS growth since the
+    reader started is compared with the memory budget, and the write time
+    with BATCH_TARGET_WRITE_SECONDS; the next batch is resized to fit both,
+    by at most 2x up per step and immediately down when over budget.
+
+    Readers take it wherever they took a fixed chunk_size and read
+    `batcher.rows` before each batch.
+    """
+
+    def __init__(
+        self,
+        name,
+        budget_bytes=None,
+        row_bytes=None,
+        min_rows=None,
+        max_rows=None,
+        target_seconds=None,
+    ):
+        self.name = name
+        self.budget = budget_bytes or BATCH_MEMORY_BUDGET
+        self.row_bytes = row_bytes
+        self.min_rows = min_rows or BATCH_MIN_ROWS
+        self.max_rows = max_rows or BATCH_MAX_ROWS
+        self.target_seconds = target_seconds or BATCH_TARGET_WRITE_SECONDS
+        self.amplification = BATCH_MEMORY_AMPLIFICATION
+        self.baseline_rss = self.last_rss = current_rss_bytes()
+        self.peak_used = 0
+        self.sizes = []
+        self.rows = self._clamp(
+            self._memory_fit() if row_bytes else max(self.min_rows, BATCH_PROBE_ROWS)
+        )
+        logger.info(
+            "------------------------ %s: first batch %d rows (budget %d MB%s) ------------------------",
+            name,
+            self.rows,
+            self.budget // 1024**2,
+            f", ~{row_bytes:.0f} B/row estimated" if row_bytes else ", probing",
+        )
+
+    def _clamp(self, rows):
+        return int(min(self.max_rows, max(self.min_rows, rows)))
+
+    def _memory_fit(self):
+        return self.budget / (self.row_bytes * self.amplification)
+
+    def observe(self, frame, seconds=None):
+        """
+        Record a finished batch, and the seconds its write took, and return
+        the size for the next one.
+        """
+        rows = len(frame)
+        if not rows:
+            return self.rows
+        self.sizes.append(rows)
+
+        sample = frame.head(_SAMPLE_ROWS)
+        width = float(sample.memory_usage(deep=True, index=False).sum()) / len(sample)
+        self.row_bytes = (
+            width if self.row_bytes is None else (self.row_bytes + width) / 2
+        )
+
+        rss = current_rss_bytes()
+        used, grew = rss - self.baseline_rss, rss > self.last_rss
+        self.last_rss = rss
+        self.peak_used = max(self.peak_used, used)
+        footprint = rows * self.row_bytes
+        # RSS growth says little about batches too small to move it
+        if used > 0 and footprint * self.amplification >= self.budget / 10:
+            observed = used / footprint
+            self.amplification = min(
+                10.0, max(1.5, (self.amplification + observed) / 2)
+            )
+
+        wanted = self._memory_fit()
+        if seconds:
+            wanted = min(wanted, rows * self.target_seconds / seconds)
+        if used > self.budget and grew:
+            # Over budget and still growing: shrink right away, with headroom
+            wanted = min(wanted, self.rows * 0.8 * self.budget / used)
+        elif used > self.budget:
+            # Freed memory is not always returned to the OS; hold the size
+            wanted = min(wanted, self.rows)
+        else:
+            wanted = min(wanted, self.rows * 2)
+
+        previous, self.rows = self.rows, self._clamp(wanted)
+        if abs(self.rows - previous) >= previous / 4:
+            logger.info(
+                "%s: batch size %d -> %d rows (%.0f B/row, x%.1f memory, RSS +%d MB)",
+                self.name,
+                previous,
+                self.rows,
+                self.row_bytes,
+                self.amplification,
+                max(used, 0) // 1024**2,
+            )
+        return self.rows
+
+    def summary(self):
+        """
+        The batch sizes chosen so far, for logs and benchmarks.
+        """
+        sizes = self.sizes or [0]
+        return {
+            "reader": self.name,
+            "batches": len(self.sizes),
+            "rows": sum(self.sizes),
+            "min_rows": min(sizes),
+            "max_rows": max(sizes),
+            "next_rows": self.rows,
+            "row_bytes": round(float(self.row_bytes or 0), 1),
+            "amplification": round(float(self.amplification), 2),
+            "peak_rss_growth_mb": round(max(self.peak_used, 0) / 1024**2, 1),
+        }
+
+    def report(self):
+        logger.info("------------------------ Batch sizes: %s", self.summary())
+        return self.summary()
+
+
+class FixedBatcher(AdaptiveBatcher):
+    """
+    A constant batch size, for callers that pass an explicit chunk_size.
+    """
+
+    def __init__(self, name, rows):
+        self.name = name
+        self.rows = rows
+        self.row_bytes = None
+        self.amplification = 1.0
+        self.baseline_rss = self.last_rss = current_rss_bytes()
+        self.peak_used = 0
+        self.sizes = []
+
+    def observe(self, frame, seconds=None):
+        if len(frame):
+            self.sizes.append(len(frame))
+        self.peak_used = max(self.peak_used, current_rss_bytes() - self.baseline_rss)
+        return self.rows
+
+
+def batcher_for(name, chunk_size=None, row_bytes=None):
+    """
+    A FixedBatcher when chunk_size is given, otherwise an AdaptiveBatcher.
+    """
+    if chunk_size:
+        return FixedBatcher(name, chunk_size)
+    return AdaptiveBatcher(name, row_bytes=row_bytes)
@@ -0,0 +1,138 @@
+import json
+import logging
+import threading
+
+from datetime import datetime, date
+from log_config import configure_logging
+from utils import s3_client_1, DEST_BUCKET, EXECUTION_DATE
+
+configure_logging(__name__)
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_PREFIX = "metadata/checkpoints"
+
+
+class Checkpoint:
+    """
+    Completed chunks of one extraction, persisted in the destination bucket so an
+    Airflow retry resumes at the first incomplete chunk instead of starting over.
+
+    For every source (an S3 object or a Postgres table) it records the ordered
+    (chunk index, byte offset or row offset after the chunk, output objects)
+    tuples already written. The ingestion date (the run's date, default
+    EXECUTION_DATE) is pinned on first use so a retry that crosses midnight
+    still overwrites the same output objects.
+    """
+
+    def __init__(self, name, data=None, ingestion_date=None):
+        self.name = name
+        self.key = f"{CHECKPOINT_PREFIX}/{name}.json"
+        data = data or {}
+        self.ingestion_date = date.fromisoformat(
+            data.get("ingestion_date", (ingestion_date or EXECUTION_DATE).isoformat())
+        )
+        self.sources = data.get("sources", {})
+        # Sources may be extracted concurrently by the async engine
+        self._lock = threading.RLock()
+
+    @classmethod
+    def load(cls, name, ingestion_date=None):
+        """
+        Load the checkpoint for `name`, or start an empty one for
+        `ingestion_date`.
+        """
+        try:
+            obj = s3_client_1.get_object(
+                Bucket=DEST_BUCKET, Key=f"{CHECKPOINT_PREFIX}/{name}.json"
+            )
+            checkpoint = cls(name, json.loads(obj["Body"].read()))
+            logger.info(
+                "------------------------ Resuming %s from checkpoint: %d chunks already written ------------------------",
+                name,
+                sum(len(s["chunks"]) for s in checkpoint.sources.values()),
+            )
+            return checkpoint
+        except s3_client_1.exceptions.NoSuchKey:
+            return cls(name, ingestion_date=ingestion_date)
+
+    def save(self):
+        with self._lock:
+            s3_client_1.put_object(
+                Bucket=DEST_BUCKET,
+                Key=self.key,
+                Body=json.dumps(
+                    {
+                        "ingestion_date": self.ingestion_date.isoformat(),
+                        "updated": datetime.now().isoformat(),
+                        "sources": self.sources,
+                    }
+                ),
+                ContentType="application/json",
+            )
+
+    def _source(self, source, version=None, **settings):
+        """
+        State for one source. It is reset when the source object changed
+        (`version`) or the chunking settings differ from the earlier attempt.
+        """
+        with self._lock:
+            state = self.sources.get(source)
+            if (
+                state is None
+                or state.get("version") != version
+                or any(state.get(k) != v for k, v in settings.items())
+            ):
+                state = self.sources[source] = {
+                    "version": version,
+                    **settings,
+                    "chunks": [],
+                    "complete": False,
+                }
+            return state
+
+    def resume_point(self, source, version=None, **settings):
+        """
+        Where to restart `source`: (chunks done, offset after them, rows done).
+        """
+        state = self._source(source, version, **settings)
+        if not state["chunks"]:
+            return 0, 0, 0
+        last = state["chunks"][-1]
+        return last["chunk"], last["offset"], sum(c["rows"] for c in state["chunks"])
+
+    def is_complete(self, source, version=None, **settings):
+        return self._source(source, version, **settings)["complete"]
+
+    def record(self, source, chunk, offset, output, rows):
+        """
+        Record a written chunk and persist the checkpoint immediately.
+        """
+        with self._lock:
+            self.sources[source]["chunks"].append(
+                {"chunk": chunk, "offset": offset, "output": output, "rows": rows}
+            )
+            self.save()
+
+    def outputs(self):
+        """
+        Every object recorded as written, across sources.
+        """
+        with self._lock:
+            return [
+                path
+                for state in self.sources.values()
+                for chunk in state["chunks"]
+                for path in chunk["output"] or []
+            ]
+
+    def complete(self, source):
+        with self._lock:
+            self.sources[source]["complete"] = True
+            self.save()
+
+    def clear(self):
+        """
+        Drop the checkpoint once the run's outputs are committed.
+        """
+        s3_client_1.delete_object(Bucket=DEST_BUCKET, Key=self.key)
+        self.sources = {}
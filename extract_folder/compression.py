@@ -0,0 +1,226 @@
+import io
+import bz2
+import gzip
+import json
+import logging
+
+from contextlib import contextmanager
+from log_config import configure_logging
+from source_cache import open_source, read_range
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+configure_logging(__name__)
+logger = logging.getLogger(__name__)
+
+
+# File suffix -> codec of a compressed source object
+SUFFIXES = {
+    ".gz": "gzip",
+    ".gzip": "gzip",
+    ".zst": "zstd",
+    ".zstd": "zstd",
+    ".bz2": "bz2",
+}
+
+# Leading bytes of each codec's frames, for objects without a suffix
+MAGIC = {
+    "gzip": b"\x1f\x8b",
+    "zstd": b"\x28\xb5\x2f\xfd",
+    "bz2": b"BZh",
+}
+MAGIC_BYTES = max(len(m) for m in MAGIC.values())
+
+_SKIP_BLOCK = 1 << 20
+
+
+# ==================== DETECTION ====================
+def codec_for(key):
+    """
+    Codec named by the key's suffix, e.g. "gzip" for calls.csv.gz, or None.
+    """
+    for suffix, codec in SUFFIXES.items():
+        if key.lower().endswith(suffix):
+            return codec
+    return None
+
+
+def strip_suffix(key):
+    """
+    The key without its compression suffix: calls.csv.gz -> calls.csv.
+    """
+    if codec_for(key):
+        return key[: key.rindex(".")]
+    return key
+
+
+def matches_extension(key, extension):
+    """
+    Whether the key is an `extension` file, compressed or not.
+    """
+    return strip_suffix(key).endswith(extension)
+
+
+def sniff(head):
+    """
+    Codec whose magic bytes start `head`, or None for plain data.
+    """
+    for codec, magic in MAGIC.items():
+        if head[: len(magic)] == magic:
+            return codec
+    return None
+
+
+# ==================== STREAMS ====================
+class _Prefixed:
+    """
+    A stream with bytes already read from it put back in front.
+    """
+
+    def __init__(self, head, stream):
+        self.head = head
+        self.stream = stream
+
+    def read(self, size=-1):
+        if not self.head:
+            return self.stream.read(size)
+        if size is None or size < 0:
+            data, self.head = self.head + self.stream.read(), b""
+            return data
+        data, self.head = self.head[:size], self.head[size:]
+        if len(data) < size:
+            data += self.stream.read(size - len(data))
+        return data
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def close(self):
+        if hasattr(self.stream, "close"):
+            self.stream.close()
+
+
+def _read_head(stream):
+    head = b""
+    while len(head) < MAGIC_BYTES:
+        block = stream.read(MAGIC_BYTES - len(head))
+        if not block:
+            break
+        head += block
+    return head
+
+
+def decompressing(stream, codec):
+    """
+    Readable stream of the decompressed bytes of `stream`, which is read
+    block by block as the result is consumed.
+    """
+    if codec == "gzip":
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    if codec == "bz2":
+        return bz2.BZ2File(stream, mode="rb")
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Reading .zst sources needs the zstandard package")
+        return io.BufferedReader(
+            zstandard.ZstdDecompressor().stream_reader(stream, read_across_frames=True)
+        )
+    raise ValueError(f"Unknown compression codec: {codec}")
+
+
+def autodetect(stream, codec=None):
+    """
+    `stream` decompressed when `codec` is set or its first bytes are a known
+    magic number, else `stream` itself with those bytes put back.
+    """
+    if codec is None:
+        head = _read_head(stream)
+        codec = sniff(head)
+        stream = _Prefixed(head, stream)
+    return decompressing(stream, codec) if codec else stream
+
+
+def _skip(stream, count):
+    while count > 0:
+        block = stream.read(min(count, _SKIP_BLOCK))
+        if not block:
+            break
+        count -= len(block)
+
+
+@contextmanager
+def open_decompressed(client, bucket, key, etag=None, size=None, start=0):
+    """
+    Like source_cache.open_source, but positioned at byte `start` of the
+    decompressed content. A compressed object cannot be read from the
+    middle, so resuming one re-reads and discards its first `start` bytes;
+    a plain object is still opened with a ranged GET.
+    """
+    codec = codec_for(key)
+    if codec is None and start:
+        codec = sniff(
+            read_range(client, bucket, key, 0, MAGIC_BYTES - 1, etag=etag, size=size)
+        )
+    if codec is None and start:
+        with open_source(client, bucket, key, etag=etag, size=size, start=start) as s:
+            yield s
+        return
+
+    with open_source(client, bucket, key, etag=etag, size=size) as raw:
+        stream = autodetect(raw, codec)
+        _skip(stream, start)
+        yield stream
+
+
+def is_compressed(client, bucket, file_info):
+    """
+    Whether a listed source object is compressed, by suffix or magic bytes.
+    """
+    if codec_for(file_info["key"]):
+        return True
+    head = read_range(
+        client,
+        bucket,
+        file_info["key"],
+        0,
+        MAGIC_BYTES - 1,
+        etag=file_info.get("etag"),
+        size=file_info.get("size"),
+    )
+    return sniff(head) is not None
+
+
+# ==================== JSON ====================
+def iter_json_items(stream):
+    """
+    The items of a JSON document: each element of a top-level array, parsed
+    one at a time with ijson when it is installed, or the document itself
+    when it is not an array.
+    """
+    if ijson is None:
+        data = json.load(stream)
+        yield from data if isinstance(data, list) else [data]
+        return
+
+    head = b""
+    while not head.strip():
+        block = stream.read(64)
+        if not block:
+            return
+        head += block
+    stream = _Prefixed(head, stream)
+    if head.lstrip()[:1] == b"[":
+        yield from ijson.items(stream, "item", use_float=True)
+    else:
+        yield json.load(stream)
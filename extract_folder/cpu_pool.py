@@ -0,0 +1,242 @@
+import os
+import uuid
+import atexit
+import shutil
+import logging
+import tempfile
+import threading
+import multiprocessing
+
+import pandas as pd
+import pyarrow as pa
+
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from log_config import configure_logging
+
+configure_logging(__name__)
+logger = logging.getLogger(__name__)
+
+
+# CPU Pool Constants: 0 workers keeps parsing in the calling thread
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", "0"))
+CPU_POOL_START_METHOD = os.getenv("CPU_POOL_START_METHOD", "forkserver")
+# Handoff files live in RAM-backed /dev/shm where available
+CPU_POOL_DIR = os.getenv("CPU_POOL_DIR") or (
+    "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+)
+# Smaller payloads are cheaper to pickle than to hand off through a file
+CPU_POOL_MIN_HANDOFF_BYTES = int(os.getenv("CPU_POOL_MIN_HANDOFF_BYTES", "65536"))
+# Streams are copied into a handoff file this many bytes at a time
+CPU_POOL_COPY_BYTES = int(os.getenv("CPU_POOL_COPY_BYTES", str(1024 * 1024)))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def pool_enabled(workers=None):
+    """
+    True when CPU-bound transforms should run in worker processes.
+    """
+    return (CPU_POOL_WORKERS if workers is None else workers) > 1
+
+
+# ==================== SHARED-MEMORY HANDOFF ====================
+class _Handoff:
+    """
+    A payload parked in a memory-backed file. Only the path is pickled; the
+    receiver maps the file, DataFrames as an Arrow IPC file, and gets a
+    stream back as an open file.
+    """
+
+    __slots__ = ("kind", "path", "size")
+
+    def __init__(self, kind, path, size):
+        self.kind = kind
+        self.path = path
+        self.size = size
+
+    def __reduce__(self):
+        return (_Handoff, (self.kind, self.path, self.size))
+
+
+def _pack(value, directory):
+    if isinstance(value, pd.DataFrame):
+        path = os.path.join(directory, f"{uuid.uuid4().hex}.arrow")
+        table = pa.Table.from_pandas(value, preserve_index=False)
+        with pa.OSFile(path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        return _Handoff("arrow", path, os.path.getsize(path))
+
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        if len(value) < CPU_POOL_MIN_HANDOFF_BYTES:
+            return bytes(value)
+        path = os.path.join(directory, f"{uuid.uuid4().hex}.bin")
+        with open(path, "wb") as f:
+            f.write(value)
+        return _Handoff("bytes", path, len(value))
+
+    if hasattr(value, "read"):
+        path = os.path.join(directory, f"{uuid.uuid4().hex}.bin")
+        with open(path, "wb") as f:
+            shutil.copyfileobj(value, f, CPU_POOL_COPY_BYTES)
+        return _Handoff("stream", path, os.path.getsize(path))
+
+    return value
+
+
+def spool(stream):
+    """
+    Copy a stream, a block at a time, into an anonymous file in CPU_POOL_DIR
+    and return that file rewound. The file is removed when it is closed.
+    """
+    f = tempfile.TemporaryFile(dir=CPU_POOL_DIR)
+    shutil.copyfileobj(stream, f, CPU_POOL_COPY_BYTES)
+    f.seek(0)
+    return f
+
+
+def _unpack(value):
+    if not isinstance(value, _Handoff):
+        return value
+    try:
+        if value.kind == "arrow":
+            with pa.memory_map(value.path) as source:
+                return pa.ipc.open_file(source).read_all().to_pandas()
+        if value.kind == "stream":
+            # Stays readable after the unlink below
+            return open(value.path, "rb")
+        with open(value.path, "rb") as f:
+            return f.read()
+    finally:
+        os.unlink(value.path)
+
+
+def _discard(value):
+    if isinstance(value, _Handoff):
+        os.unlink(value.path)
+
+
+def _call(func, args, directory):
+    """
+    Worker side: map the inputs, run the transform, park a DataFrame result.
+    """
+    args = [_unpack(a) for a in args]
+    try:
+        result = func(*args)
+    finally:
+        for a in args:
+            if hasattr(a, "read") and hasattr(a, "close"):
+                a.close()
+    return _pack(result, directory)
+
+
+# ==================== POOL ====================
+class CpuPool:
+    """
+    Runs CPU-bound transforms (CSV/JSON parsing, normalization, metadata)
+    in worker processes, so chunks are processed on every core instead of
+    one thread under the GIL.
+
+    Large bytes and DataFrames cross the process boundary as files in
+    CPU_POOL_DIR: bytes as-is, DataFrames as Arrow IPC, memory-mapped on the
+    receiving side. A readable stream, e.g. an S3 body, is copied into its
+    file a block at a time and reaches the worker as an open file, so it is
+    never read whole. Only file paths are pickled. Results come back in
+    submission order.
+    """
+
+    def __init__(self, workers=None, start_method=None, directory=None):
+        self.workers = workers or CPU_POOL_WORKERS or os.cpu_count() or 1
+        self.directory = tempfile.mkdtemp(
+            prefix="cpu-pool-", dir=directory or CPU_POOL_DIR
+        )
+        context = multiprocessing.get_context(start_method or CPU_POOL_START_METHOD)
+        if context.get_start_method() == "forkserver":
+            context.set_forkserver_preload(["pandas", "pyarrow"])
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=context
+        )
+        logger.info(
+            "------------------------ CPU pool started: %d worker(s), handoff in %s ------------------------",
+            self.workers,
+            self.directory,
+        )
+
+    def submit(self, func, *args):
+        """
+        Run func(*args) in a worker. `func` must be a module-level function.
+        Returns a Future for the (unpacked) result.
+        """
+        packed = [_pack(a, self.directory) for a in args]
+        future = Future()
+
+        def done(inner):
+            try:
+                result = inner.result()
+                if future.cancelled():
+                    _discard(result)
+                else:
+                    future.set_result(_unpack(result))
+            except BaseException as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            finally:
+                # Inputs a failed or cancelled task never read
+                for a in packed:
+                    if isinstance(a, _Handoff) and os.path.exists(a.path):
+                        os.unlink(a.path)
+
+        self.executor.submit(_call, func, packed, self.directory).add_done_callback(
+            done
+        )
+        return future
+
+    def imap(self, func, items, inflight=None):
+        """
+        Yield func(*item) for every item in input order, with at most
+        `inflight` items (default two per worker) submitted but not yet
+        consumed, so a long input is never fully buffered.
+        """
+        inflight = inflight or 2 * self.workers
+        pending = deque()
+        try:
+            for item in items:
+                pending.append(self.submit(func, *item))
+                if len(pending) >= inflight:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def get_pool():
+    """
+    The process-wide pool, started on first use, or None when disabled.
+    """
+    global _pool
+    if not pool_enabled():
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = CpuPool()
+            atexit.register(_pool.close)
+        return _pool
+
+
+def imap(func, items):
+    """
+    func(*item) for every item in order: in the pool when it is enabled,
+    otherwise inline.
+    """
+    pool = get_pool()
+    if pool is None:
+        return (func(*item) for item in items)
+    return pool.imap(func, items)
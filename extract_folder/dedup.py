@@ -0,0 +1,393 @@
+import io
+import os
+import logging
+import threading
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from contextlib import contextmanager
+from utils import s3_client_1, DEST_BUCKET
+from log_config import configure_logging
+from metrics import stage
+
+configure_logging(__name__)
+logger = logging.getLogger(__name__)
+
+
+# Dedup Constants
+# off, drop (never stage a row already staged) or flag (stage it with
+# DEDUP_FLAG_COLUMN set, for the loader to skip)
+DEDUP_MODE = os.getenv("DEDUP_MODE", "off").lower()
+# exact (sorted key/content hashes, no false positives) or bloom (fixed size,
+# may treat a new row as staged at DEDUP_BLOOM_FP_RATE)
+DEDUP_INDEX = os.getenv("DEDUP_INDEX", "exact").lower()
+DEDUP_BLOOM_CAPACITY = int(os.getenv("DEDUP_BLOOM_CAPACITY", "50000000"))
+DEDUP_BLOOM_FP_RATE = float(os.getenv("DEDUP_BLOOM_FP_RATE", "0.0001"))
+
+DEDUP_PREFIX = "metadata/dedup"
+DEDUP_FLAG_COLUMN = "_duplicate"
+
+# Unique key of each staging table; the first alternative whose columns are
+# all present is used (names after clean_column_names)
+DEDUP_KEYS = {
+    "customers": [["customer_id"]],
+    "call_logs": [["call_id"]],
+    "social_medias": [["complaint_id"], ["social_media"]],
+    "web_forms": [["web_form_id"], ["request_id"]],
+}
+
+# Columns that differ between two stagings of the same source row
+VOLATILE_COLUMNS = {
+    "source_system",
+    "ingestion_timestamp",
+    "ingestion_date",
+    DEDUP_FLAG_COLUMN,
+    "_op",
+    "_change_seq",
+}
+
+
+def dedup_enabled(mode=None):
+    return (mode or DEDUP_MODE) in ("drop", "flag")
+
+
+def _hashes(frame):
+    """
+    One uint64 per row, independent of the index.
+    """
+    try:
+        return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    except TypeError:
+        # Unhashable cells (lists, dicts) left by JSON normalization
+        return pd.util.hash_pandas_object(frame.astype(str), index=False).to_numpy()
+
+
+# ==================== INDEXES ====================
+class ExactIndex:
+    """
+    The content hash last staged for every key hash: persisted as sorted
+    uint64 arrays (16 bytes per key), plus the keys staged by this run.
+    A row is a duplicate only if its key was staged with the same content, so
+    a changed row still reaches the MERGE as an update.
+    """
+
+    suffix = "parquet"
+
+    def __init__(self, keys=None, digests=None):
+        self.keys = np.empty(0, np.uint64) if keys is None else keys
+        self.digests = np.empty(0, np.uint64) if digests is None else digests
+        self.pending = {}
+
+    @classmethod
+    def from_bytes(cls, body):
+        frame = pd.read_parquet(io.BytesIO(body))
+        return cls(
+            frame["key"].to_numpy(np.uint64), frame["digest"].to_numpy(np.uint64)
+        )
+
+    def seen(self, keys, digests):
+        found = np.zeros(len(keys), bool)
+        if len(self.keys):
+            pos = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+            found = (self.keys[pos] == keys) & (self.digests[pos] == digests)
+        if self.pending:
+            found |= np.fromiter(
+                (
+                    self.pending.get(k) == d
+                    for k, d in zip(keys.tolist(), digests.tolist())
+                ),
+                bool,
+                len(keys),
+            )
+        return found
+
+    def add(self, keys, digests):
+        self.pending.update(zip(keys.tolist(), digests.tolist()))
+
+    def __len__(self):
+        return len(self.keys) + len(self.pending)
+
+    def to_bytes(self):
+        if self.pending:
+            new_keys = np.fromiter(self.pending.keys(), np.uint64, len(self.pending))
+            new_digests = np.fromiter(
+                self.pending.values(), np.uint64, len(self.pending)
+            )
+            keep = ~np.isin(self.keys, new_keys)
+            keys = np.concatenate([self.keys[keep], new_keys])
+            digests = np.concatenate([self.digests[keep], new_digests])
+            order = np.argsort(keys, kind="stable")
+            self.keys, self.digests, self.pending = keys[order], digests[order], {}
+        buffer = io.BytesIO()
+        pd.DataFrame({"key": self.keys, "digest": self.digests}).to_parquet(
+            buffer, index=False
+        )
+        return buffer.getvalue()
+
+
+class BloomIndex:
+    """
+    A Bloom filter over (key, content) hashes. Its size is fixed by
+    DEDUP_BLOOM_CAPACITY however many runs it has seen; a row can be reported
+    as staged when it is not, at about DEDUP_BLOOM_FP_RATE. Prefer flag mode
+    with it if a lost row is worse than a duplicate.
+    """
+
+    suffix = "bloom.npz"
+
+    def __init__(self, bits=None, hashes=None, count=0):
+        if bits is None:
+            size = int(
+                -DEDUP_BLOOM_CAPACITY * np.log(DEDUP_BLOOM_FP_RATE) / np.log(2) ** 2
+            )
+            bits = np.zeros((size + 7) // 8, np.uint8)
+            hashes = max(1, round(size / DEDUP_BLOOM_CAPACITY * np.log(2)))
+        self.bits = bits
+        self.hashes = hashes
+        self.count = count
+
+    @classmethod
+    def from_bytes(cls, body):
+        data = np.load(io.BytesIO(body))
+        return cls(data["bits"], int(data["hashes"]), int(data["count"]))
+
+    def _positions(self, keys, digests):
+        combined = keys * np.uint64(0x9E3779B97F4A7C15) ^ digests
+        h1 = combined & np.uint64(0xFFFFFFFF)
+        h2 = (combined >> np.uint64(32)) | np.uint64(1)
+        size = np.uint64(len(self.bits) * 8)
+        steps = np.arange(self.hashes, dtype=np.uint64)
+        return (h1[:, None] + steps[None, :] * h2[:, None]) % size
+
+    def seen(self, keys, digests):
+        positions = self._positions(keys, digests)
+        hits = self.bits[positions >> np.uint64(3)] & (
+            np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)
+        )
+        return (hits != 0).all(axis=1)
+
+    def add(self, keys, digests):
+        positions = self._positions(keys, digests).ravel()
+        np.bitwise_or.at(
+            self.bits,
+            positions >> np.uint64(3),
+            np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8),
+        )
+        self.count += len(keys)
+
+    def __len__(self):
+        return self.count
+
+    def to_bytes(self):
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer, bits=self.bits, hashes=self.hashes, count=self.count
+        )
+        return buffer.getvalue()
+
+
+INDEXES = {"exact": ExactIndex, "bloom": BloomIndex}
+
+
+def _load_index(table, index_cls):
+    try:
+        obj = s3_client_1.get_object(
+            Bucket=DEST_BUCKET, Key=f"{DEDUP_PREFIX}/{table}.{index_cls.suffix}"
+        )
+        return index_cls.from_bytes(obj["Body"].read())
+    except s3_client_1.exceptions.NoSuchKey:
+        return index_cls()
+
+
+# ==================== DEDUPLICATOR ====================
+class Deduplicator:
+    """
+    Extract-side dedup for one staging table. Every batch is checked against
+    the rows staged by earlier runs (a persisted key index) and by this run
+    (in memory); rows already staged with the same key and content are
+    dropped, or flagged in DEDUP_FLAG_COLUMN, before they are written.
+
+    Writers go through batch(), which adds a batch's rows to the index only
+    once it is written, and the index is persisted by commit() at the end of
+    the run, so a failed write or run that is retried does not see its own
+    rows as duplicates.
+    """
+
+    def __init__(self, table, keys=None, mode=None, index=None):
+        self.table = table
+        self.mode = (mode or DEDUP_MODE).lower()
+        self.alternatives = [keys] if keys else DEDUP_KEYS.get(table, [])
+        self.index = index
+        self.rows = 0
+        self.duplicates = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._missing_logged = False
+
+    @classmethod
+    def load(cls, table, keys=None, mode=None, kind=None):
+        """
+        The deduplicator for `table` with its persisted index, or a
+        pass-through one when dedup is off.
+        """
+        mode = (mode or DEDUP_MODE).lower()
+        if not dedup_enabled(mode):
+            return cls(table, keys, mode)
+
+        index = _load_index(table, INDEXES[kind or DEDUP_INDEX])
+        logger.info(
+            "------------------------ Dedup for %s: %s mode, %d keys indexed ------------------------",
+            table,
+            mode,
+            len(index),
+        )
+        return cls(table, keys, mode, index)
+
+    def _keys_for(self, frame):
+        for keys in self.alternatives:
+            if all(k in frame.columns for k in keys):
+                return keys
+        if not self._missing_logged:
+            logger.warning(
+                "No unique key columns %s in %s; rows are staged without dedup",
+                self.alternatives,
+                self.table,
+            )
+            self._missing_logged = True
+        return None
+
+    def _check(self, frame):
+        """
+        (`frame` without or flagging the rows already staged, the hashes of
+        its new rows and the row counts), without changing the index.
+        """
+        if self.index is None or frame is None or frame.empty:
+            return frame, None
+        keys = self._keys_for(frame)
+        if keys is None:
+            return frame, None
+
+        with stage("dedup", table=self.table) as span:
+            content = [c for c in frame.columns if c not in VOLATILE_COLUMNS]
+            key_hashes = _hashes(frame[keys])
+            digests = _hashes(frame[content])
+            # Repeats inside the batch, then rows staged before
+            repeated = pd.DataFrame({"k": key_hashes, "d": digests}).duplicated()
+            with self._lock:
+                duplicate = repeated.to_numpy() | self.index.seen(key_hashes, digests)
+            fresh = ~duplicate
+            span.add(rows=len(frame), duplicates=int(duplicate.sum()))
+        staged = (key_hashes[fresh], digests[fresh], len(frame), int(duplicate.sum()))
+
+        if self.mode == "flag":
+            frame = frame.copy()
+            frame[DEDUP_FLAG_COLUMN] = duplicate
+        elif duplicate.any():
+            frame = frame[fresh].reset_index(drop=True)
+        return frame, staged
+
+    def _add(self, staged):
+        if staged is None:
+            return
+        key_hashes, digests, rows, duplicates = staged
+        with self._lock:
+            self.index.add(key_hashes, digests)
+            self._dirty = self._dirty or len(key_hashes) > 0
+            self.rows += rows
+            self.duplicates += duplicates
+
+    def apply(self, frame):
+        """
+        Return `frame` without the rows already staged (drop mode) or with
+        them flagged (flag mode), and count its rows as staged.
+        """
+        frame, staged = self._check(frame)
+        self._add(staged)
+        return frame
+
+    @contextmanager
+    def batch(self, frame):
+        """
+        apply() for a batch about to be written: yields the rows to write,
+        and counts them as staged only when the block exits without an
+        exception. A failed write leaves nothing in the index for its retry
+        to drop.
+        """
+        frame, staged = self._check(frame)
+        yield frame
+        self._add(staged)
+
+    def restore(self, paths):
+        """
+        Add the rows of objects an earlier attempt of this run wrote before
+        it failed, as recorded in its checkpoint. They were never committed
+        to the index, so without this a resumed run would stage them again.
+        """
+        if self.index is None:
+            return
+        for path in paths:
+            bucket, key = path.removeprefix("s3://").split("/", 1)
+            body = s3_client_1.get_object(Bucket=bucket, Key=key)["Body"].read()
+            frame = pq.read_table(io.BytesIO(body)).to_pandas()
+            keys = self._keys_for(frame)
+            if keys is None or frame.empty:
+                continue
+            content = [c for c in frame.columns if c not in VOLATILE_COLUMNS]
+            with self._lock:
+                self.index.add(_hashes(frame[keys]), _hashes(frame[content]))
+                self._dirty = True
+
+    def commit(self):
+        """
+        Persist the index with this run's rows, after they are staged.
+        """
+        if self.index is None or not self._dirty:
+            return
+        with self._lock:
+            body = self.index.to_bytes()
+            s3_client_1.put_object(
+                Bucket=DEST_BUCKET,
+                Key=f"{DEDUP_PREFIX}/{self.table}.{self.index.suffix}",
+                Body=body,
+            )
+            self._dirty = False
+
+    def rollback(self):
+        """
+        Forget the rows seen since the last commit, e.g. when their write
+        failed and will be retried.
+        """
+        if self.index is None or not self._dirty:
+            return
+        with self._lock:
+            self.index = _load_index(self.table, type(self.index))
+            self._dirty = False
+
+    def summary(self):
+        return {
+            "table": self.table,
+            "mode": self.mode,
+            "rows": self.rows,
+            "duplicates": self.duplicates,
+            "duplicate_rate": (
+                round(self.duplicates / self.rows, 4) if self.rows else 0.0
+            ),
+            "indexed": len(self.index) if self.index is not None else 0,
+        }
+
+    def report(self):
+        """
+        Log the duplicate rate of this run and return the summary.
+        """
+        summary = self.summary()
+        if self.index is not None:
+            logger.info(
+                "------------------------ Dedup %s: %d of %d rows already staged (%.2f%%), %s ------------------------",
+                self.table,
+                summary["duplicates"],
+                summary["rows"],
+                100 * summary["duplicate_rate"],
+                "dropped" if self.mode == "drop" else "flagged",
+            )
+        return summary
@@ -11,21 +11,16 @@ import gspread
 from dotenv import load_dotenv
 from google.oauth2.service_account import Credentials
 from utils import clean_column_names, add_metadata
+from log_config import configure_logging
+from metrics import stage, timed
 
 load_dotenv()
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="{asctime} - {levelname} - {message}",
-    style="{",
-    datefmt="%Y-%m-%d %H:%M",
-    filename="process_etl.log",
-    encoding="utf-8",
-    filemode="a",
-)
+configure_logging(__name__)
 logger = logging.getLogger(__name__)
 
 
+@timed("extract_agents")
 def extract_agents():
     """
     Extract agents data from a Google Sheet and return DataFrame.
@@ -43,12 +38,17 @@ def extract_agents():
             service_account,
             scopes=["https://www.googleapis.com/auth/spreadsheets.readonly"],
         )
-        client = gspread.authorize(creds)
-        sheet = client.open_by_key(sheet_id).worksheet(sheet_name)
-        data = sheet.get_all_records()
-        df = pd.DataFrame(data)
-        df = clean_column_names(df)
-        df = add_metadata(df, "agents")
+        with stage("sheets_fetch", table="agents") as span:
+            client = gspread.authorize(creds)
+            sheet = client.open_by_key(sheet_id).worksheet(sheet_name)
+            data = sheet.get_all_records()
+            span.add(rows=len(data))
+
+        with stage("normalize", table="agents") as span:
+            df = pd.DataFrame(data)
+            df = clean_column_names(df)
+            df = add_metadata(df, "agents")
+            span.add(rows=len(df))
 
         logger.info(
             f"......................... Loaded {len(df)} agents....................."
@@ -0,0 +1,353 @@
+import os
+import json
+import time
+import logging
+import threading
+import duckdb
+
+from log_config import configure_logging
+from metrics import stage, current_run_id
+from utils import s3_client_1, DEST_BUCKET
+from dedup import DEDUP_KEYS, DEDUP_FLAG_COLUMN, VOLATILE_COLUMNS
+from partitioning import layout_for
+
+configure_logging(__name__)
+logger = logging.getLogger(__name__)
+
+
+# Lake Checks Constants
+LAKE_CHECKS_MAX_NULL_RATE = float(os.getenv("LAKE_CHECKS_MAX_NULL_RATE", "0.01"))
+# Share of child rows allowed to reference a missing parent; a complaint can
+# be staged a day before its customer
+LAKE_CHECKS_MAX_ORPHAN_RATE = float(os.getenv("LAKE_CHECKS_MAX_ORPHAN_RATE", "0.01"))
+# Share of rows allowed to repeat a key already in the partitions
+LAKE_CHECKS_MAX_DUPLICATE_RATE = float(os.getenv("LAKE_CHECKS_MAX_DUPLICATE_RATE", "0"))
+LAKE_CHECKS_THREADS = int(os.getenv("LAKE_CHECKS_THREADS", "4"))
+# Fail the task on a failed check, so no warehouse credits are spent on it.
+# Off by default: failed checks are reported and the loads still run
+LAKE_CHECKS_STRICT = os.getenv("LAKE_CHECKS_STRICT", "false").lower() == "true"
+# Read staging from this local directory (bucket layout) instead of S3
+LAKE_CHECKS_ROOT = os.getenv("LAKE_CHECKS_ROOT")
+
+LAKE_CHECKS_PREFIX = "metadata/lake_checks"
+
+# Columns that must be filled, besides the table's key
+REQUIRED_COLUMNS = {
+    "call_logs": ["customer_id"],
+    "social_medias": ["customer_id"],
+    "web_forms": ["customer_id"],
+}
+
+# Tables whose staged rows are exploded from list fields by
+# safely_normalize_json, so several rows share a key. Their grain is the key
+# plus the row's content, the pair the extract-side dedup compares
+EXPLODED_TABLES = {"social_medias"}
+
+# (child table, child column, parent table, parent column)
+REFERENCES = [
+    ("call_logs", "customer_id", "customers", "customer_id"),
+    ("social_medias", "customer_id", "customers", "customer_id"),
+    ("web_forms", "customer_id", "customers", "customer_id"),
+]
+
+_conn = None
+_conn_lock = threading.Lock()
+
+
+# ==================== ENGINE ====================
+def connection():
+    """
+    The process's DuckDB connection, created on first use. Parquet footers
+    it has read are cached, so checks over the same files parse each footer
+    once.
+    """
+    global _conn
+    with _conn_lock:
+        if _conn is None:
+            conn = duckdb.connect()
+            conn.execute(f"SET threads = {LAKE_CHECKS_THREADS}")
+            conn.execute("SET parquet_metadata_cache = true")
+            if not LAKE_CHECKS_ROOT:
+                conn.execute("INSTALL httpfs")
+                conn.execute("LOAD httpfs")
+                conn.execute("SET enable_http_metadata_cache = true")
+                conn.execute(
+                    "CREATE SECRET lake (TYPE s3, KEY_ID ?, SECRET ?, REGION ?)",
+                    [
+                        os.getenv("AWS_ACCESS_KEY_ID"),
+                        os.getenv("AWS_SECRET_ACCESS_KEY"),
+                        os.getenv("AWS_REGION", "eu-north-1"),
+                    ],
+                )
+            _conn = conn
+        return _conn
+
+
+def _location(key):
+    if LAKE_CHECKS_ROOT:
+        return os.path.join(LAKE_CHECKS_ROOT, key)
+    return f"s3://{DEST_BUCKET}/{key}"
+
+
+def partition_files(table, partitions=None, where=None):
+    """
+    Parquet files under staging/{table}/, only those of the given
+    ingestion_date partitions when `partitions` is set, and of the
+    sub-partitions selected by `where` (e.g. {"event_hour": ["09"]}) in the
+    table's layout. Pruning happens here, on the listing, so files of other
+    partitions are never opened.
+    """
+    layout = layout_for(table)
+    if partitions is None:
+        prefixes = [f"staging/{table}/"]
+    else:
+        prefixes = [
+            f"staging/{table}/ingestion_date={p}/"
+            for p in sorted(set(map(str, partitions)))
+        ]
+    paginator = s3_client_1.get_paginator("list_objects_v2")
+    return [
+        _location(obj["Key"])
+        for prefix in prefixes
+        for page in paginator.paginate(Bucket=DEST_BUCKET, Prefix=prefix)
+        for obj in page.get("Contents", [])
+        if obj["Key"].endswith(".parquet") and layout.matches(obj["Key"], where)
+    ]
+
+
+def scan(files):
+    """
+    A read_parquet() table expression over `files`, with ingestion_date
+    and the layout's other partition columns recovered from the Hive-style
+    paths.
+    """
+    listed = ", ".join("'" + f.replace("'", "''") + "'" for f in files)
+    return f"read_parquet([{listed}], hive_partitioning = true, union_by_name = true)"
+
+
+def _columns(files):
+    rows = connection().execute(f"DESCRIBE SELECT * FROM {scan(files)}").fetchall()
+    return [row[0] for row in rows]
+
+
+def staged_rows(files, columns):
+    """
+    A table expression over `files` without the rows the extract dedup
+    flagged as already staged (DEDUP_MODE=flag); the loader skips those.
+    """
+    if DEDUP_FLAG_COLUMN not in columns:
+        return scan(files)
+    return f'(SELECT * FROM {scan(files)} WHERE "{DEDUP_FLAG_COLUMN}" IS NOT TRUE)'
+
+
+def row_grain(table, keys, columns):
+    """
+    Columns that identify one staged row of `table`: its unique key, plus
+    the content columns for tables exploded from list fields.
+    """
+    if table not in EXPLODED_TABLES:
+        return keys
+    skip = VOLATILE_COLUMNS | set(keys) | set(layout_for(table).columns)
+    content = [c for c in columns if c not in skip]
+    return keys + content
+
+
+# ==================== CHECKS ====================
+def _result(table, check, value, threshold, rows, detail=None):
+    return {
+        "table": table,
+        "check": check,
+        "status": "ok" if value <= threshold else "failed",
+        "value": value,
+        "threshold": threshold,
+        "rows": rows,
+        "detail": detail,
+    }
+
+
+def check_unique(table, source, keys, name=None):
+    """
+    Share of rows of `source` (a table expression, see staged_rows) that
+    repeat a key of another row.
+    """
+    cols = ", ".join(f'"{k}"' for k in keys)
+    rows, distinct = (
+        connection()
+        .execute(f"SELECT COUNT(*), COUNT(DISTINCT ({cols})) FROM {source}")
+        .fetchone()
+    )
+    duplicates = rows - distinct
+    return _result(
+        table,
+        f"unique({name or ', '.join(keys)})",
+        round(duplicates / rows, 6) if rows else 0.0,
+        LAKE_CHECKS_MAX_DUPLICATE_RATE,
+        rows,
+        {"duplicates": duplicates},
+    )
+
+
+def check_nulls(table, source, columns):
+    """
+    Null rate of each column, failing on the worst one.
+    """
+    counts = ", ".join(f'COUNT("{c}")' for c in columns)
+    row = connection().execute(f"SELECT COUNT(*), {counts} FROM {source}").fetchone()
+    rows = row[0]
+    rates = {
+        c: (1 - filled / rows) if rows else 0.0 for c, filled in zip(columns, row[1:])
+    }
+    worst = max(rates, key=rates.get)
+    return _result(
+        table,
+        f"null_rate({', '.join(columns)})",
+        round(rates[worst], 6),
+        LAKE_CHECKS_MAX_NULL_RATE,
+        rows,
+        {"rates": rates},
+    )
+
+
+def check_reference(table, source, column, parent, parent_files, parent_column):
+    """
+    Share of rows of `source` whose `column` has no match in the parent
+    table. Only the key column of the parent is read.
+    """
+    rows, orphans, sample = connection().execute(f"""
+            SELECT COUNT(*),
+                   COUNT(*) FILTER (WHERE p.key IS NULL),
+                   LIST(DISTINCT c."{column}") FILTER (WHERE p.key IS NULL)[1:5]
+            FROM {source} c
+            LEFT JOIN (
+                SELECT DISTINCT "{parent_column}" AS key FROM {scan(parent_files)}
+            ) p ON c."{column}" = p.key
+            WHERE c."{column}" IS NOT NULL
+            """).fetchone()
+    rate = orphans / rows if rows else 0.0
+    return _result(
+        table,
+        f"references({column} -> {parent}.{parent_column})",
+        round(rate, 6),
+        LAKE_CHECKS_MAX_ORPHAN_RATE,
+        rows,
+        {"orphans": orphans, "sample": sample},
+    )
+
+
+def _skipped(table, check, reason):
+    return {"table": table, "check": check, "status": "skipped", "detail": reason}
+
+
+def check_table(table, partitions, parents, where=None):
+    """
+    Key uniqueness, null rates and references of one table's new partitions.
+    `parents` maps a parent table to its files (all partitions).
+    """
+    files = partition_files(table, partitions, where)
+    if not files:
+        return [_skipped(table, "all", "no staged files in the partitions")]
+
+    columns = _columns(files)
+    source = staged_rows(files, columns)
+    results = []
+    keys = next(
+        (k for k in DEDUP_KEYS.get(table, []) if all(c in columns for c in k)), None
+    )
+    if keys:
+        grain = row_grain(table, keys, columns)
+        name = ", ".join(keys) + (" + content" if grain != keys else "")
+        results.append(check_unique(table, source, grain, name))
+    else:
+        results.append(_skipped(table, "unique", "no key columns"))
+
+    required = [
+        c for c in (keys or []) + REQUIRED_COLUMNS.get(table, []) if c in columns
+    ]
+    if required:
+        results.append(check_nulls(table, source, required))
+
+    for child, column, parent, parent_column in REFERENCES:
+        if child != table:
+            continue
+        check = f"references({column} -> {parent}.{parent_column})"
+        if column not in columns:
+            results.append(_skipped(table, check, f"no {column} column"))
+        elif not parents.get(parent):
+            results.append(_skipped(table, check, f"{parent} is not staged"))
+        else:
+            results.append(
+                check_reference(
+                    table, source, column, parent, parents[parent], parent_column
+                )
+            )
+    return results
+
+
+def run_lake_checks(partitions, tables=None, where=None):
+    """
+    Run the checks over the given ingestion_date partitions (None for all)
+    of each staging table, before anything is loaded into the warehouse.
+    `where` maps a table to its sub-partition filter (see partition_files),
+    e.g. to check one event hour of call logs. Parent tables of
+    references are read in full (their key column only). Each table is
+    recorded as a "lake_checks" metrics stage; the result is stored under
+    metadata/lake_checks/ and returned.
+    """
+    started = time.perf_counter()
+    tables = tables or ["customers", "call_logs", "social_medias", "web_forms"]
+    parents = {
+        parent: partition_files(parent)
+        for child, _, parent, _ in REFERENCES
+        if child in tables
+    }
+
+    checks = []
+    for table in tables:
+        with stage("lake_checks", table=table) as span:
+            results = check_table(table, partitions, parents, (where or {}).get(table))
+            span.add(
+                rows=max((r.get("rows") or 0 for r in results), default=0),
+                failed=sum(r["status"] == "failed" for r in results),
+            )
+        for r in results:
+            log = logger.warning if r["status"] == "failed" else logger.info
+            log(
+                "------------------------ Lake check %s %s: %s (%s) ------------------------",
+                r["table"],
+                r["check"],
+                r["status"],
+                r.get("value", r.get("detail")),
+            )
+        checks += results
+
+    result = {
+        "run_id": current_run_id(),
+        "partitions": (
+            sorted(set(map(str, partitions))) if partitions is not None else "all"
+        ),
+        "status": ("failed" if any(r["status"] == "failed" for r in checks) else "ok"),
+        "checks": checks,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    s3_client_1.put_object(
+        Bucket=DEST_BUCKET,
+        Key=f"{LAKE_CHECKS_PREFIX}/{result['run_id']}.json",
+        Body=json.dumps(result, indent=2, default=str),
+    )
+    return result
+
+
+def format_lake_checks(result):
+    """
+    Render lake check results as a fixed-width text table.
+    """
+    header = f"{'TABLE':<16}{'CHECK':<52}{'ROWS':>11}{'VALUE':>10}  STATUS"
+    lines = [header, "-" * len(header)]
+    for r in result["checks"]:
+        value = r.get("value")
+        lines.append(
+            f"{r['table']:<16}{r['check']:<52}{r.get('rows') or 0:>11,}"
+            f"{'-' if value is None else f'{value:g}':>10}  {r['status']}"
+        )
+    lines.append(f"Overall: {result['status']} in {result['seconds']:.2f}s")
+    return "\n".join(lines)
@@ -0,0 +1,218 @@
+import os
+import json
+import queue
+import atexit
+import logging
+import threading
+
+from collections import defaultdict
+from logging.handlers import QueueHandler, QueueListener
+
+# Logging Constants
+LOG_FILE = os.getenv("LOG_FILE", "process_etl.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_ASYNC = os.getenv("LOG_ASYNC", "true").lower() in ("1", "true", "yes")
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "100"))
+LOG_SUMMARY_SAMPLES = int(os.getenv("LOG_SUMMARY_SAMPLES", "5"))
+
+_lock = threading.Lock()
+_listener = None
+_configured = False
+# The pipeline's handler, whether it sits on the root logger, and the
+# loggers it is attached to
+_front = None
+_owns_root = False
+_attached = set()
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line, including any fields passed with `extra=`.
+    """
+
+    def format(self, record):
+        payload = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class _LazyQueueHandler(QueueHandler):
+    """
+    Hand the record to the listener thread untouched, so `%` formatting of the
+    message (and of tracebacks) happens off the calling thread. Records never
+    leave the process, so nothing has to be made picklable here.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def _formatter():
+    if LOG_FORMAT == "json":
+        return JsonFormatter()
+    return logging.Formatter(
+        "{asctime} - {levelname} - {message}", style="{", datefmt="%Y-%m-%d %H:%M"
+    )
+
+
+def _host_configured(root):
+    # Handlers someone else put on the root logger, e.g. Airflow's task log
+    return any(not getattr(h, "_pipeline_handler", False) for h in root.handlers)
+
+
+def _attach(name):
+    target = logging.getLogger(name or None)
+    if target.name in _attached:
+        return
+    for existing in list(target.handlers):
+        # Left behind by an earlier import of this module
+        if getattr(existing, "_pipeline_handler", False):
+            target.removeHandler(existing)
+    target.addHandler(_front)
+    target.setLevel(LOG_LEVEL)
+    _attached.add(target.name)
+
+
+def _detach_all():
+    for name in _attached:
+        logging.getLogger(None if name == "root" else name).removeHandler(_front)
+    _attached.clear()
+
+
+def configure_logging(name=None, force=False):
+    """
+    Configure the pipeline's logging once per process.
+
+    Every module calls this on import with its own name. The first call (or
+    force=True) builds the file handler; with LOG_ASYNC it runs on a
+    background QueueListener thread and callers only pay for enqueueing the
+    record. The handler and LOG_LEVEL go on the root logger when it has no
+    handlers of its own or the caller runs as __main__. Inside a host that
+    already configured logging, such as an Airflow task, only the calling
+    module's logger gets them and the host keeps its handlers and level.
+    """
+    global _front, _listener, _configured, _owns_root
+    with _lock:
+        root = logging.getLogger()
+        if force or not _configured:
+            reattach = set(_attached)
+            if _front is not None:
+                _detach_all()
+            if _listener is not None:
+                _listener.stop()
+                _listener = None
+
+            handler = logging.FileHandler(LOG_FILE, mode="a", encoding="utf-8")
+            handler.setFormatter(_formatter())
+
+            if LOG_ASYNC:
+                log_queue = queue.SimpleQueue()
+                _front = _LazyQueueHandler(log_queue)
+                _listener = QueueListener(
+                    log_queue, handler, respect_handler_level=True
+                )
+                _listener.start()
+            else:
+                _front = handler
+            _front._pipeline_handler = True
+            _owns_root = not _host_configured(root)
+            _configured = True
+            for attached in reattach:
+                if attached != "root" and not _owns_root:
+                    _attach(attached)
+
+        if name == "__main__" and not _owns_root:
+            # A script run directly owns the process's logging
+            _detach_all()
+            _owns_root = True
+
+        if _owns_root:
+            _attach(None)
+        elif name:
+            _attach(name)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+atexit.register(shutdown_logging)
+
+
+# ==================== SAMPLED / AGGREGATED MESSAGES ====================
+_sample_counts = defaultdict(int)
+
+
+def log_sampled(logger, key, msg, *args, level=logging.INFO, every=None):
+    """
+    Log the first occurrence of `key` and then one in every `every`,
+    with the occurrence number appended. For per-file or per-chunk progress.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    every = every or LOG_SAMPLE_EVERY
+    with _lock:
+        _sample_counts[key] += 1
+        count = _sample_counts[key]
+    if count == 1 or count % every == 0:
+        logger.log(level, msg + " (#%d)", *args, count)
+
+
+class LogSummary:
+    """
+    Collect per-item messages and emit a single summary line, e.g.
+
+        skipped = LogSummary(logger, "already processed")
+        for key in keys:
+            skipped.add(key)
+        skipped.flush(prefix="customers/")
+
+    Individual items are only logged at DEBUG, and only if DEBUG is enabled.
+    """
+
+    def __init__(self, logger, what, level=logging.INFO, samples=None):
+        self.logger = logger
+        self.what = what
+        self.level = level
+        self.samples = LOG_SUMMARY_SAMPLES if samples is None else samples
+        self.count = 0
+        self.examples = []
+        self._debug = logger.isEnabledFor(logging.DEBUG)
+
+    def add(self, item, detail=None):
+        self.count += 1
+        if len(self.examples) < self.samples:
+            self.examples.append(item)
+        if self._debug:
+            self.logger.debug("%s: %s %s", self.what, item, detail or "")
+
+    def flush(self, **fields):
+        if self.count:
+            self.logger.log(
+                self.level,
+                "%d %s (e.g. %s)",
+                self.count,
+                self.what,
+                ", ".join(map(str, self.examples)),
+                extra={"summary": self.what, "count": self.count, **fields},
+            )
+        count, self.count, self.examples = self.count, 0, []
+        return count
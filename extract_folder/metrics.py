@@ -0,0 +1,408 @@
+import os
+import sys
+import json
+import time
+import logging
+import resource
+import functools
+import threading
+import contextvars
+
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from profiling import profile
+
+logger = logging.getLogger(__name__)
+
+
+# Metrics Constants
+METRICS_FILE = os.getenv("METRICS_FILE", "pipeline_metrics.jsonl")
+METRICS_PORT = os.getenv("METRICS_PORT")
+RSS_SAMPLE_INTERVAL = float(os.getenv("METRICS_RSS_INTERVAL", "0.5"))
+
+COUNTERS = ("rows", "bytes", "files", "chunks")
+
+_lock = threading.Lock()
+# Open spans of the current thread or asyncio task, innermost last
+_spans = contextvars.ContextVar("metrics_spans", default=())
+_open_spans = set()
+_sampler = None
+
+# Process-wide totals, exposed on the Prometheus endpoint
+_stage_seconds = defaultdict(float)
+_stage_calls = defaultdict(int)
+_stage_counters = defaultdict(float)
+
+
+def current_run_id():
+    """
+    Identify the pipeline run the metrics belong to.
+    Airflow exports AIRFLOW_CTX_DAG_RUN_ID into every task process.
+    """
+    return (
+        os.getenv("PIPELINE_RUN_ID")
+        or os.getenv("AIRFLOW_CTX_DAG_RUN_ID")
+        or datetime.now().date().isoformat()
+    )
+
+
+# ==================== MEMORY SAMPLING ====================
+def current_rss_bytes():
+    """
+    Resident set size of this process right now (falls back to the peak).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes():
+    """
+    Peak resident set size of this process since it started.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports kilobytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _sample_rss_forever():
+    while True:
+        time.sleep(RSS_SAMPLE_INTERVAL)
+        rss = current_rss_bytes()
+        with _lock:
+            for span in _open_spans:
+                span.peak_rss = max(span.peak_rss, rss)
+
+
+def _ensure_sampler():
+    global _sampler
+    if _sampler is None:
+        _sampler = threading.Thread(
+            target=_sample_rss_forever, name="rss-sampler", daemon=True
+        )
+        _sampler.start()
+
+
+# ==================== SPANS ====================
+class Span:
+    """
+    One timed execution of a pipeline stage with its row/byte/file/chunk counters.
+    """
+
+    def __init__(self, name, labels, parent=None):
+        self.name = name
+        self.labels = labels
+        self.parent = parent
+        self.counters = defaultdict(float)
+        self.peak_rss = current_rss_bytes()
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    def add(self, **counts):
+        """Increment counters on this span, e.g. span.add(rows=500, chunks=1)."""
+        with _lock:
+            for counter, value in counts.items():
+                self.counters[counter] += value
+                _stage_counters[(self.name, counter)] += value
+
+    def record(self, status):
+        seconds = self.seconds
+        rows = self.counters.get("rows", 0)
+        size = self.counters.get("bytes", 0)
+        return {
+            "ts": datetime.now().isoformat(),
+            "run_id": current_run_id(),
+            "pid": os.getpid(),
+            "stage": self.name,
+            "parent": self.parent,
+            "labels": self.labels,
+            "status": status,
+            "seconds": round(seconds, 6),
+            "peak_rss_bytes": self.peak_rss,
+            **{c: self.counters.get(c, 0) for c in COUNTERS},
+            **{c: v for c, v in self.counters.items() if c not in COUNTERS},
+            "rows_per_sec": round(rows / seconds, 2) if seconds else None,
+            "mb_per_sec": round(size / 1e6 / seconds, 3) if seconds else None,
+        }
+
+
+def _span_stack():
+    return _spans.get()
+
+
+def current_span():
+    """Innermost open span on this thread or task, or None."""
+    stack = _span_stack()
+    return stack[-1] if stack else None
+
+
+def current_labels():
+    """Labels of every open span on this thread or task, inner ones winning."""
+    labels = {}
+    for span in _span_stack():
+        labels.update(span.labels)
+    return labels
+
+
+def incr(counter, value=1):
+    """
+    Increment a counter on the innermost open span of this thread or task.
+    """
+    span = current_span()
+    if span is not None:
+        span.add(**{counter: value})
+
+
+def _finish(span, status):
+    span.seconds += time.perf_counter() - span.started
+    span.peak_rss = max(span.peak_rss, current_rss_bytes())
+    with _lock:
+        _open_spans.discard(span)
+        _stage_seconds[span.name] += span.seconds
+        _stage_calls[span.name] += 1
+    emit(span.record(status))
+
+
+@contextmanager
+def stage(name, **labels):
+    """
+    Time a block as a named stage:
+
+        with stage("csv_parse", table="customers") as span:
+            ...
+            span.add(rows=len(df), bytes=size)
+    """
+    stack = _span_stack()
+    span = Span(name, labels, parent=stack[-1].name if stack else None)
+    token = _spans.set(stack + (span,))
+    with _lock:
+        _open_spans.add(span)
+    _ensure_sampler()
+
+    status = "ok"
+    try:
+        yield span
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        _spans.reset(token)
+        _finish(span, status)
+
+
+def timed(name=None, **labels):
+    """
+    Decorator form of `stage`; defaults to the function name. The call is
+    also profiled when PIPELINE_PROFILE is set.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name or func.__name__, **labels):
+                with profile(name or func.__name__, current_run_id()):
+                    return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def iter_stage(name, iterable, **labels):
+    """
+    Time only the work done inside `next()` of a lazy iterable, such as a chunked
+    CSV or SQL reader, and emit one record for the whole iteration.
+    """
+    stack = _span_stack()
+    span = Span(name, labels, parent=stack[-1].name if stack else None)
+    with _lock:
+        _open_spans.add(span)
+    _ensure_sampler()
+
+    status = "ok"
+    iterator = iter(iterable)
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                span.seconds += time.perf_counter() - started
+                break
+            span.seconds += time.perf_counter() - started
+            # Chunked readers may yield (chunk, position) pairs
+            rows = item[0] if isinstance(item, tuple) else item
+            span.add(chunks=1, rows=len(rows) if hasattr(rows, "__len__") else 0)
+            yield item
+    except GeneratorExit:
+        # The consumer stopped early, e.g. after a limit; not a failure
+        raise
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        span.started = time.perf_counter()
+        _finish(span, status)
+
+
+# ==================== EXPORTERS ====================
+def emit(record, path=None):
+    """
+    Append one metrics record to the local JSON-lines file.
+    """
+    path = path or METRICS_FILE
+    line = json.dumps(record, default=str) + "\n"
+    try:
+        with _lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+    except OSError as e:
+        logger.warning(f"Could not write metrics to {path}: {e}")
+
+
+def render_prometheus():
+    """
+    Render process totals in the Prometheus text exposition format.
+    """
+    lines = [
+        "# HELP pipeline_stage_seconds_total Wall time spent in each stage.",
+        "# TYPE pipeline_stage_seconds_total counter",
+    ]
+    with _lock:
+        seconds = dict(_stage_seconds)
+        calls = dict(_stage_calls)
+        counters = dict(_stage_counters)
+
+    for name, value in sorted(seconds.items()):
+        lines.append(f'pipeline_stage_seconds_total{{stage="{name}"}} {value:.6f}')
+
+    lines += [
+        "# HELP pipeline_stage_calls_total Completed executions of each stage.",
+        "# TYPE pipeline_stage_calls_total counter",
+    ]
+    for name, value in sorted(calls.items()):
+        lines.append(f'pipeline_stage_calls_total{{stage="{name}"}} {value}')
+
+    for counter in sorted({c for _, c in counters}):
+        lines += [
+            f"# HELP pipeline_{counter}_total {counter.capitalize()} processed per stage.",
+            f"# TYPE pipeline_{counter}_total counter",
+        ]
+        for (name, c), value in sorted(counters.items()):
+            if c == counter:
+                lines.append(f'pipeline_{counter}_total{{stage="{name}"}} {value:g}')
+
+    lines += [
+        "# HELP pipeline_peak_rss_bytes Peak resident set size of the process.",
+        "# TYPE pipeline_peak_rss_bytes gauge",
+        f"pipeline_peak_rss_bytes {peak_rss_bytes()}",
+        "# HELP pipeline_rss_bytes Current resident set size of the process.",
+        "# TYPE pipeline_rss_bytes gauge",
+        f"pipeline_rss_bytes {current_rss_bytes()}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+class _PrometheusHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=None):
+    """
+    Serve /metrics for Prometheus from a daemon thread. Returns the server.
+    """
+    port = int(port or METRICS_PORT or 9108)
+    server = ThreadingHTTPServer(("0.0.0.0", port), _PrometheusHandler)
+    threading.Thread(
+        target=server.serve_forever, name="metrics-server", daemon=True
+    ).start()
+    logger.info(f"Prometheus metrics served on :{port}/metrics")
+    return server
+
+
+# ==================== RUN BREAKDOWN ====================
+def load_run_records(run_id=None, path=None):
+    """
+    Read all metrics records written for a run (all task processes).
+    """
+    run_id = run_id or current_run_id()
+    path = path or METRICS_FILE
+    records = []
+    if not os.path.exists(path):
+        return records
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("run_id") == run_id:
+                records.append(record)
+    return records
+
+
+def stage_breakdown(run_id=None, path=None):
+    """
+    Aggregate a run's records per stage, slowest first.
+    """
+    totals = {}
+    for record in load_run_records(run_id, path):
+        row = totals.setdefault(
+            record["stage"],
+            {"stage": record["stage"], "calls": 0, "seconds": 0.0, "errors": 0}
+            | {c: 0 for c in COUNTERS}
+            | {"peak_rss_bytes": 0},
+        )
+        row["calls"] += 1
+        row["seconds"] += record.get("seconds") or 0
+        row["errors"] += record.get("status") == "error"
+        row["peak_rss_bytes"] = max(row["peak_rss_bytes"], record["peak_rss_bytes"])
+        for c in COUNTERS:
+            row[c] += record.get(c) or 0
+
+    for row in totals.values():
+        seconds = row["seconds"]
+        row["rows_per_sec"] = row["rows"] / seconds if seconds else 0
+        row["mb_per_sec"] = row["bytes"] / 1e6 / seconds if seconds else 0
+
+    return sorted(totals.values(), key=lambda r: r["seconds"], reverse=True)
+
+
+def format_stage_breakdown(rows):
+    """
+    Render a stage breakdown as a fixed-width text table.
+    """
+    header = f"{'STAGE':<28}{'CALLS':>7}{'SECONDS':>11}{'ROWS':>13}{'ROWS/S':>12}{'MB/S':>9}{'PEAK RSS MB':>13}"
+    lines = [header, "-" * len(header)]
+    for r in rows:
+        lines.append(
+            f"{r['stage']:<28}{r['calls']:>7}{r['seconds']:>11.2f}{int(r['rows']):>13,}"
+            f"{r['rows_per_sec']:>12,.0f}{r['mb_per_sec']:>9.2f}{r['peak_rss_bytes'] / 1e6:>13.1f}"
+        )
+    return "\n".join(lines)
+
+
+def print_stage_breakdown(run_id=None, path=None):
+    """
+    Print the per-stage breakdown of a run and return the aggregated rows.
+    """
+    rows = stage_breakdown(run_id, path)
+    print(f"Stage breakdown for run {run_id or current_run_id()}:")
+    print(format_stage_breakdown(rows) if rows else "  (no metrics recorded)")
+    return rows
@@ -0,0 +1,523 @@
+import os
+import re
+import json
+import time
+import signal
+import logging
+import pandas as pd
+import psycopg2
+
+from datetime import datetime, timezone
+from urllib.parse import unquote_plus
+from dotenv import load_dotenv
+from utils import (
+    SOURCE_BUCKET,
+    session_source,
+    s3_client_2,
+    clean_column_names,
+    add_metadata,
+    load_processed_files_tracker,
+    mark_source_files_as_processed,
+    write_chunk_to_s3_parquet,
+)
+from s3_extractor import (
+    _parse_call_log,
+    _social_media_frame,
+    _social_media_partition_date,
+)
+from pg_extractor import (
+    get_db_credentials_from_ssm,
+    keyset_query,
+    last_key,
+    web_forms_key,
+)
+from checkpoint import Checkpoint
+from dedup import Deduplicator
+from source_cache import open_source
+from compression import matches_extension, strip_suffix
+from snowflake_load import load_s3_parquet_to_snowflake
+from log_config import configure_logging
+from metrics import METRICS_PORT, stage, start_metrics_server
+
+load_dotenv()
+
+configure_logging(__name__)
+logger = logging.getLogger(__name__)
+
+s3_client = s3_client_2
+sqs_client = session_source.client("sqs")
+
+
+# Micro-batch Constants
+MICROBATCH_INTERVAL = float(os.getenv("MICROBATCH_INTERVAL_SECONDS", "60"))
+MICROBATCH_MAX_BYTES = int(os.getenv("MICROBATCH_MAX_BYTES", str(64 * 1024**2)))
+MICROBATCH_POLL_SECONDS = float(os.getenv("MICROBATCH_POLL_SECONDS", "5"))
+MICROBATCH_QUEUE_URL = os.getenv("MICROBATCH_QUEUE_URL")
+MICROBATCH_PG_MAX_ROWS = int(os.getenv("MICROBATCH_PG_MAX_ROWS", "50000"))
+# Share of the interval a flush may take before it is reported as over budget
+MICROBATCH_OVERHEAD_BUDGET = float(os.getenv("MICROBATCH_OVERHEAD_BUDGET", "0.5"))
+
+# Source prefix -> staging folder, file suffix, Snowflake table (if named
+# differently from the folder) and merge keys
+S3_SOURCES = {
+    "call logs/": {"table": "call_logs", "suffix": ".csv", "unique_keys": ["CALL_ID"]},
+    "social_medias/": {
+        "table": "social_medias",
+        "suffix": ".json",
+        "warehouse_table": "social_media",
+        "unique_keys": ["SOCIAL_MEDIA"],
+    },
+}
+WEB_FORMS = {"table": "web_forms", "unique_keys": ["WEB_FORM_ID"]}
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _key_label(value):
+    """
+    A web forms key as part of an object name: zero-padded if an integer,
+    else its letters and digits.
+    """
+    if value is None:
+        return "start"
+    if isinstance(value, int):
+        return f"{value:012d}"
+    return re.sub(r"[^0-9A-Za-z]+", "", str(value))
+
+
+# ==================== SOURCES ====================
+class S3Poller:
+    """
+    Lists the source prefixes on every poll and returns objects not seen
+    before. Starts from the processed-files tracker, so files the daily DAG
+    already handled are not picked up again.
+    """
+
+    def __init__(self, prefixes=S3_SOURCES):
+        self.prefixes = prefixes
+        self.seen = set(load_processed_files_tracker())
+
+    def poll(self):
+        items = []
+        paginator = s3_client.get_paginator("list_objects_v2")
+        with stage("microbatch_poll", source="s3") as span:
+            for prefix, source in self.prefixes.items():
+                for page in paginator.paginate(Bucket=SOURCE_BUCKET, Prefix=prefix):
+                    for obj in page.get("Contents", []):
+                        key = obj["Key"]
+                        if key in self.seen or not matches_extension(
+                            key, source["suffix"]
+                        ):
+                            continue
+                        self.seen.add(key)
+                        items.append(
+                            {
+                                "prefix": prefix,
+                                "key": key,
+                                "size": obj["Size"],
+                                "etag": obj.get("ETag"),
+                                "last_modified": obj["LastModified"].isoformat(),
+                                "event_time": obj["LastModified"],
+                            }
+                        )
+            span.add(files=len(items))
+        return items
+
+    def ack(self, items):
+        pass
+
+
+class QueuePoller:
+    """
+    Consumes S3 ObjectCreated notifications from an SQS queue instead of
+    listing, so a poll costs one request however large the bucket is.
+    Messages are deleted only after their batch is loaded.
+    """
+
+    def __init__(self, queue_url=MICROBATCH_QUEUE_URL, prefixes=S3_SOURCES):
+        self.queue_url = queue_url
+        self.prefixes = prefixes
+
+    def _match(self, key):
+        for prefix, source in self.prefixes.items():
+            if key.startswith(prefix) and matches_extension(key, source["suffix"]):
+                return prefix
+        return None
+
+    def poll(self):
+        items = []
+        with stage("microbatch_poll", source="sqs") as span:
+            while True:
+                response = sqs_client.receive_message(
+                    QueueUrl=self.queue_url,
+                    MaxNumberOfMessages=10,
+                    WaitTimeSeconds=0 if items else 1,
+                )
+                messages = response.get("Messages", [])
+                if not messages:
+                    break
+                for message in messages:
+                    records = json.loads(message["Body"]).get("Records", [])
+                    matched = []
+                    for record in records:
+                        if not record.get("eventName", "").startswith("ObjectCreated"):
+                            continue
+                        obj = record["s3"]["object"]
+                        key = unquote_plus(obj["key"])
+                        prefix = self._match(key)
+                        if prefix is None:
+                            continue
+                        event_time = datetime.fromisoformat(
+                            record["eventTime"].replace("Z", "+00:00")
+                        )
+                        matched.append(
+                            {
+                                "prefix": prefix,
+                                "key": key,
+                                "size": obj.get("size", 0),
+                                "etag": f'"{obj["eTag"]}"' if obj.get("eTag") else None,
+                                "last_modified": event_time.isoformat(),
+                                "event_time": event_time,
+                            }
+                        )
+                    if matched:
+                        matched[-1]["receipt"] = message["ReceiptHandle"]
+                        items += matched
+                    else:
+                        # Test events and other prefixes: nothing to load
+                        self._delete([message["ReceiptHandle"]])
+            span.add(files=len(items))
+        return items
+
+    def _delete(self, receipts):
+        for i in range(0, len(receipts), 10):
+            sqs_client.delete_message_batch(
+                QueueUrl=self.queue_url,
+                Entries=[
+                    {"Id": str(n), "ReceiptHandle": r}
+                    for n, r in enumerate(receipts[i : i + 10])
+                ],
+            )
+
+    def ack(self, items):
+        receipts = [item["receipt"] for item in items if item.get("receipt")]
+        if receipts:
+            self._delete(receipts)
+
+
+class WebFormsPoller:
+    """
+    Reads rows added to today's web_form_request_<date> table since the last
+    poll, after the last WEB_FORMS_KEY_COLUMN value read. The last key is
+    kept in a checkpoint so a restarted process continues where it stopped.
+    """
+
+    def __init__(self, max_rows=MICROBATCH_PG_MAX_ROWS):
+        self.max_rows = max_rows
+        self.checkpoint = Checkpoint.load("microbatch/web_forms")
+        self.conn = None
+        # Last key read per table, including rows not yet flushed
+        self.positions = {}
+
+    def poll(self):
+        day = _now().date()
+        table_name = f"web_form_request_{day.strftime('%Y_%m_%d')}"
+        key = web_forms_key()
+        if table_name not in self.positions:
+            chunk, after, _ = self.checkpoint.resume_point(table_name, key=key)
+            self.positions = {table_name: after if chunk else None}
+        after = self.positions[table_name]
+        query, params = keyset_query(table_name, after, limit=self.max_rows)
+        with stage("microbatch_poll", source="postgres") as span:
+            try:
+                if self.conn is None:
+                    self.conn = psycopg2.connect(**get_db_credentials_from_ssm())
+                df = pd.read_sql(query, self.conn, params=params or None)
+            except Exception as e:
+                # Usually the day's table does not exist yet
+                logger.debug("No web forms from %s: %s", table_name, e)
+                if self.conn is not None:
+                    self.conn.rollback()
+                return []
+            span.add(rows=len(df))
+        if df.empty:
+            return []
+        self.positions[table_name] = last = last_key(df)
+        return [
+            {
+                "prefix": "web_forms",
+                "key": f"{table_name}:{after}",
+                "table_name": table_name,
+                "after": after,
+                "last_key": last,
+                "frame": df,
+                "partition_date": day,
+                "size": int(df.memory_usage(deep=True).sum()),
+                "event_time": _now(),
+            }
+        ]
+
+    def ack(self, items):
+        key = web_forms_key()
+        for item in items:
+            table_name = item["table_name"]
+            # Keep only the current day's table in the checkpoint
+            self.checkpoint.sources = {
+                k: v for k, v in self.checkpoint.sources.items() if k == table_name
+            }
+            chunk, _, _ = self.checkpoint.resume_point(table_name, key=key)
+            self.checkpoint.record(
+                table_name,
+                chunk + 1,
+                item["last_key"],
+                item["output"],
+                len(item["frame"]),
+            )
+
+
+# ==================== BATCHES ====================
+class MicroBatcher:
+    """
+    Long-running ingestion loop that runs alongside the daily DAG.
+
+    Polls its sources every MICROBATCH_POLL_SECONDS and flushes the pending
+    items once the oldest has waited MICROBATCH_INTERVAL seconds or they add up
+    to MICROBATCH_MAX_BYTES. A flush stages each item as its own Parquet object,
+    marks the source files processed and loads exactly those objects into
+    Snowflake, so a load is proportional to the batch, not the table.
+    """
+
+    def __init__(
+        self,
+        sources,
+        interval=MICROBATCH_INTERVAL,
+        max_bytes=MICROBATCH_MAX_BYTES,
+        poll_seconds=MICROBATCH_POLL_SECONDS,
+        unique_keys=None,
+    ):
+        self.sources = sources
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.poll_seconds = poll_seconds
+        # Staging folder -> Snowflake table
+        self.warehouse_tables = {
+            s["table"]: s.get("warehouse_table", s["table"])
+            for s in [*S3_SOURCES.values(), WEB_FORMS]
+        }
+        # Snowflake table -> merge keys
+        self.unique_keys = {
+            **{
+                self.warehouse_tables[s["table"]]: s["unique_keys"]
+                for s in [*S3_SOURCES.values(), WEB_FORMS]
+            },
+            **(unique_keys or {}),
+        }
+        self.dedup = {}
+        self.pending = []
+        self.batches = 0
+        self.stopping = False
+        self.history = []
+
+    @classmethod
+    def from_env(cls):
+        s3_source = QueuePoller() if MICROBATCH_QUEUE_URL else S3Poller()
+        return cls([s3_source, WebFormsPoller()])
+
+    def poll(self):
+        for source in self.sources:
+            for item in source.poll():
+                item["source"] = source
+                item["discovered"] = time.monotonic()
+                self.pending.append(item)
+
+    def due(self):
+        if not self.pending:
+            return False
+        waited = time.monotonic() - min(i["discovered"] for i in self.pending)
+        size = sum(i["size"] for i in self.pending)
+        return waited >= self.interval or size >= self.max_bytes
+
+    def _stage_item(self, item):
+        """
+        Extract one pending item and write it to staging. Returns (table,
+        paths written). Part names come from the item, so a retried flush
+        overwrites the objects of its failed attempt.
+        """
+        if item["prefix"] == "web_forms":
+            table, partition_date = WEB_FORMS["table"], item["partition_date"]
+            df = add_metadata(clean_column_names(item["frame"]), "web_forms")
+            part = f"mb-{item['table_name']}-{_key_label(item['after'])}"
+        else:
+            table = S3_SOURCES[item["prefix"]]["table"]
+            with open_source(
+                s3_client,
+                SOURCE_BUCKET,
+                item["key"],
+                etag=item.get("etag"),
+                size=item["size"],
+            ) as stream:
+                if table == "social_medias":
+                    partition_date = _social_media_partition_date(item["key"])
+                    df = _social_media_frame(item["key"], stream, item["size"])
+                else:
+                    partition_date = _now().date()
+                    df = add_metadata(
+                        clean_column_names(_parse_call_log(stream, item["size"])),
+                        table,
+                    )
+            if df is None:
+                return table, []
+            stem = os.path.splitext(os.path.basename(strip_suffix(item["key"])))[0]
+            etag = (item.get("etag") or "").strip('"')
+            part = f"mb-{stem}-{etag[:12]}" if etag else f"mb-{stem}"
+
+        if table not in self.dedup:
+            self.dedup[table] = Deduplicator.load(table)
+        df = self.dedup[table].apply(df)
+        item["rows"] = len(df)
+        if df.empty:
+            return table, []
+        return table, write_chunk_to_s3_parquet(df, table, part, partition_date)
+
+    def flush(self):
+        items, self.pending = self.pending, []
+        batch_id = f"{_now():%Y%m%dT%H%M%S}-{self.batches:06d}"
+        started = time.monotonic()
+
+        try:
+            return self._flush(items, batch_id, started)
+        except Exception:
+            # Keep the items so the next flush retries them
+            self.pending = items + self.pending
+            for dedup in self.dedup.values():
+                dedup.rollback()
+            raise
+
+    def _flush(self, items, batch_id, started):
+        with stage("microbatch_flush") as span:
+            staged = {}
+            with stage("microbatch_extract"):
+                for item in items:
+                    table, paths = self._stage_item(item)
+                    item["output"] = paths
+                    for path in paths:
+                        relative = path.split(f"/staging/{table}/", 1)[1]
+                        staged.setdefault(table, []).append(relative)
+            extracted = time.monotonic()
+
+            s3_items = [i for i in items if i["prefix"] != "web_forms"]
+            if s3_items:
+                mark_source_files_as_processed(s3_items, _now().date())
+
+            with stage("microbatch_load"):
+                for folder, files in staged.items():
+                    table = self.warehouse_tables[folder]
+                    load_s3_parquet_to_snowflake(
+                        table,
+                        unique_keys=self.unique_keys[table],
+                        files=files,
+                        folder=folder,
+                    )
+            loaded = time.monotonic()
+
+            for dedup in self.dedup.values():
+                dedup.commit()
+            for source in self.sources:
+                source.ack([i for i in items if i["source"] is source])
+
+            finished = _now()
+            latencies = [(finished - i["event_time"]).total_seconds() for i in items]
+            rows = sum(i.get("rows", 0) for i in items)
+            span.add(
+                rows=rows,
+                files=len(items),
+                bytes=sum(i["size"] for i in items),
+                latency_max_seconds=max(latencies),
+                latency_sum_seconds=sum(latencies),
+            )
+
+        seconds = time.monotonic() - started
+        summary = {
+            "batch_id": batch_id,
+            "items": len(items),
+            "rows": rows,
+            "tables": sorted(staged),
+            "extract_seconds": round(extracted - started, 3),
+            "load_seconds": round(loaded - extracted, 3),
+            "flush_seconds": round(seconds, 3),
+            "latency_max_seconds": round(max(latencies), 3),
+            "latency_mean_seconds": round(sum(latencies) / len(latencies), 3),
+        }
+        self.history.append(summary)
+        self.batches += 1
+
+        logger.info(
+            "------------------------ Micro-batch %s: %d items, %d rows in %.2fs "
+            "(extract %.2fs, load %.2fs), end-to-end latency max %.1fs mean %.1fs ------------------------",
+            batch_id,
+            len(items),
+            rows,
+            seconds,
+            summary["extract_seconds"],
+            summary["load_seconds"],
+            summary["latency_max_seconds"],
+            summary["latency_mean_seconds"],
+        )
+        if seconds > self.interval * MICROBATCH_OVERHEAD_BUDGET:
+            logger.warning(
+                "************ Micro-batch %s took %.2fs, over the %.0f%% budget of the %.0fs interval ************",
+                batch_id,
+                seconds,
+                MICROBATCH_OVERHEAD_BUDGET * 100,
+                self.interval,
+            )
+        return summary
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def run(self, max_batches=None, run_seconds=None):
+        """
+        Poll and flush until stopped (SIGTERM/SIGINT), `max_batches` flushes
+        or `run_seconds` elapse. Pending items are flushed before returning.
+        """
+        deadline = time.monotonic() + run_seconds if run_seconds else None
+        logger.info(
+            "------------------------ Micro-batch ingestion: every %.0fs or %.0f MB, polling every %.1fs ------------------------",
+            self.interval,
+            self.max_bytes / 1024**2,
+            self.poll_seconds,
+        )
+        while not self.stopping:
+            self.poll()
+            if self.due():
+                try:
+                    self.flush()
+                except Exception as e:
+                    logger.exception(
+                        f"********************* Micro-batch failed, retrying next poll: {e} ******************"
+                    )
+            if max_batches and self.batches >= max_batches:
+                break
+            if deadline and time.monotonic() >= deadline:
+                break
+            time.sleep(self.poll_seconds)
+
+        if self.pending:
+            self.flush()
+        return self.history
+
+
+def main():
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    batcher = MicroBatcher.from_env()
+    signal.signal(signal.SIGTERM, batcher.stop)
+    signal.signal(signal.SIGINT, batcher.stop)
+    batcher.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import os
+import json
+import logging
+
+from log_config import configure_logging
+
+configure_logging(__name__)
+logger = logging.getLogger(__name__)
+
+
+# Parquet Constants
+# snappy for every table unless a profile says otherwise; zstd at level 1
+# writes files 2-3x smaller in about the same time (python -m
+# benchmarks.bench_parquet), so enable it per table in PARQUET_PROFILES
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "snappy").lower()
+PARQUET_COMPRESSION_LEVEL = os.getenv("PARQUET_COMPRESSION_LEVEL", "1")
+PARQUET_ROW_GROUP_ROWS = int(os.getenv("PARQUET_ROW_GROUP_ROWS", "131072"))
+# Columns whose distinct values are at most this share of the rows are
+# dictionary encoded when a profile says "auto"
+PARQUET_DICTIONARY_MAX_RATIO = float(os.getenv("PARQUET_DICTIONARY_MAX_RATIO", "0.1"))
+# JSON object of per-table overrides, e.g.
+# {"call_logs": {"compression": "zstd", "compression_level": 1}}
+PARQUET_PROFILES = os.getenv("PARQUET_PROFILES", "")
+
+# Codecs awswrangler can write, with the tag used in file names
+CODECS = {"snappy": "snappy", "zstd": "zstd", "gzip": "gz", "none": None}
+LEVELED_CODECS = {"zstd", "gzip"}
+
+DEFAULT_PROFILE = {
+    "compression": PARQUET_COMPRESSION,
+    "compression_level": (
+        int(PARQUET_COMPRESSION_LEVEL) if PARQUET_COMPRESSION_LEVEL else None
+    ),
+    # Columns rows are sorted by before writing: similar rows end up next to
+    # each other and row-group min/max statistics become selective
+    "sort_by": [],
+    "row_group_rows": PARQUET_ROW_GROUP_ROWS,
+    # True, False, "auto" or a list of columns
+    "dictionary": "auto",
+    # True, False or a list of columns
+    "statistics": True,
+    "data_page_size": None,
+}
+
+# Names after clean_column_names
+TABLE_PROFILES = {
+    "customers": {"sort_by": ["customer_id"]},
+    "call_logs": {"sort_by": ["call_id"]},
+    "social_medias": {"sort_by": ["complaint_id"]},
+    "web_forms": {"sort_by": ["request_id"]},
+    "agents": {"sort_by": ["id"]},
+}
+
+_SAMPLE_ROWS = 10_000
+
+
+def _overrides():
+    if not PARQUET_PROFILES:
+        return {}
+    try:
+        return json.loads(PARQUET_PROFILES)
+    except json.JSONDecodeError:
+        logger.error("PARQUET_PROFILES is not valid JSON; using the built-in profiles")
+        return {}
+
+
+def profile_for(table):
+    """
+    Encoding profile of `table`: DEFAULT_PROFILE, updated with the table's
+    TABLE_PROFILES entry and then its PARQUET_PROFILES override.
+    """
+    profile = dict(DEFAULT_PROFILE)
+    profile.update(TABLE_PROFILES.get(table, {}))
+    profile.update(_overrides().get(table, {}))
+    profile["compression"] = (profile["compression"] or "none").lower()
+    if profile["compression"] not in CODECS:
+        raise ValueError(
+            f"Unsupported Parquet codec {profile['compression']!r} for {table}; "
+            f"use one of {sorted(CODECS)}"
+        )
+    return profile
+
+
+def file_suffix(profile):
+    tag = CODECS[profile["compression"]]
+    return f".{tag}.parquet" if tag else ".parquet"
+
+
+def sort_frame(df, profile):
+    """
+    `df` sorted by the profile's sort keys that it has.
+    """
+    keys = [k for k in profile["sort_by"] if k in df.columns]
+    if not keys or len(df) < 2:
+        return df
+    return df.sort_values(keys, kind="stable", na_position="last").reset_index(
+        drop=True
+    )
+
+
+def dictionary_columns(df, profile):
+    """
+    The use_dictionary setting for `df`: with "auto", the columns whose
+    distinct values in a sample are at most PARQUET_DICTIONARY_MAX_RATIO of
+    its rows. High-cardinality columns such as ids gain nothing from a
+    dictionary and fall back to plain encoding after paying for it.
+    """
+    setting = profile["dictionary"]
+    if setting != "auto":
+        if isinstance(setting, list):
+            return [c for c in setting if c in df.columns]
+        return bool(setting)
+
+    sample = df.head(_SAMPLE_ROWS)
+    columns = []
+    for column in sample.columns:
+        try:
+            distinct = sample[column].nunique(dropna=True)
+        except TypeError:
+            # Lists and dicts left by JSON normalization
+            continue
+        if distinct <= max(1, PARQUET_DICTIONARY_MAX_RATIO * len(sample)):
+            columns.append(column)
+    return columns
+
+
+def writer_args(df, profile):
+    """
+    Keyword arguments for wr.s3.to_parquet that apply the profile to `df`.
+    """
+    options = {}
+    codec = profile["compression"]
+    if profile["compression_level"] is not None and codec in LEVELED_CODECS:
+        options["compression_level"] = profile["compression_level"]
+    options["use_dictionary"] = dictionary_columns(df, profile)
+    statistics = profile["statistics"]
+    options["write_statistics"] = (
+        [c for c in statistics if c in df.columns]
+        if isinstance(statistics, list)
+        else bool(statistics)
+    )
+    if profile["data_page_size"]:
+        options["data_page_size"] = profile["data_page_size"]
+    if profile["row_group_rows"]:
+        options["write_table_args"] = {"row_group_size": profile["row_group_rows"]}
+    return {
+        "compression": None if codec == "none" else codec,
+        "pyarrow_additional_kwargs": options,
+    }
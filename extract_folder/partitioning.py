@@ -0,0 +1,194 @@
+import os
+import re
+import json
+import logging
+import numpy as np
+import pandas as pd
+
+from log_config import configure_logging
+
+configure_logging(__name__)
+logger = logging.getLogger(__name__)
+
+
+# Partitioning Constants: JSON object of per-table layouts below the
+# ingestion_date partition, e.g.
+# {"call_logs": {"event_date": true, "hour": true, "buckets": 16}}
+# "event_date" is true for the table's EVENT_COLUMNS entry or a column name;
+# "buckets" hashes "bucket_column" (default customer_id) into that many
+# buckets. Tables without a layout keep ingestion_date only
+PARTITION_LAYOUTS = os.getenv("PARTITION_LAYOUTS", "")
+
+# Record time of each table, after clean_column_names
+EVENT_COLUMNS = {
+    "call_logs": "call_start_time",
+    "social_medias": "request_date",
+    "web_forms": "request_date",
+}
+
+# Partition value of rows without an event time or bucket column, read back
+# as NULL by DuckDB, Spark and Hive
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+_VALUE = re.compile(r"^[\w-]+$")
+
+
+class Layout:
+    """
+    Hive-style partition levels of one staging table:
+    ingestion_date=/[event_date=/[event_hour=/]][bucket=/]. The run date
+    stays on top, so everything keyed on it (checkpoints, reconciliation,
+    reruns) is unchanged, and the levels below let loads and checks by
+    event date, hour or customer skip the rest.
+    """
+
+    def __init__(
+        self, table, event_column=None, hour=False, buckets=0, bucket_column=None
+    ):
+        self.table = table
+        self.event_column = event_column
+        self.hour = bool(hour and event_column)
+        self.buckets = int(buckets or 0)
+        self.bucket_column = bucket_column or "customer_id"
+
+    @property
+    def columns(self):
+        """
+        Partition columns in path order.
+        """
+        columns = ["ingestion_date"]
+        if self.event_column:
+            columns.append("event_date")
+        if self.hour:
+            columns.append("event_hour")
+        if self.buckets:
+            columns.append("bucket")
+        return columns
+
+    @property
+    def nested(self):
+        return len(self.columns) > 1
+
+    def apply(self, df):
+        """
+        `df` with the sub-partition columns added from its records.
+        """
+        if not self.nested:
+            return df
+        df = df.copy()
+        if self.event_column:
+            times = pd.to_datetime(df[self.event_column], errors="coerce")
+            df["event_date"] = times.dt.strftime("%Y-%m-%d").fillna(NULL_PARTITION)
+            if self.hour:
+                df["event_hour"] = times.dt.strftime("%H").fillna(NULL_PARTITION)
+        if self.buckets:
+            df["bucket"] = bucket_values(df[self.bucket_column], self.buckets)
+        return df
+
+    def subpath(self, values):
+        """
+        Path of the levels below ingestion_date for one group's values.
+        """
+        return "".join(f"{c}={v}/" for c, v in zip(self.columns[1:], values))
+
+    def groups(self, df):
+        """
+        (subpath, rows) for each sub-partition of `df`, which apply() has
+        prepared; the partition columns are dropped from the rows.
+        """
+        sub = self.columns[1:]
+        if not sub:
+            yield "", df
+            return
+        for values, group in df.groupby(sub, sort=True):
+            values = values if isinstance(values, tuple) else (values,)
+            yield self.subpath(values), group.drop(columns=sub)
+
+    def _check(self, where):
+        unknown = set(where or {}) - set(self.columns)
+        if unknown:
+            raise ValueError(
+                f"{self.table} is not partitioned on {sorted(unknown)}; "
+                f"its levels are {self.columns}"
+            )
+
+    def matches(self, key, where):
+        """
+        Whether an object key lies in the partitions selected by `where`,
+        a mapping of partition column to allowed values.
+        """
+        self._check(where)
+        if not where:
+            return True
+        parts = dict(part.split("=", 1) for part in key.split("/")[:-1] if "=" in part)
+        return all(
+            parts.get(column) in {str(v) for v in values}
+            for column, values in where.items()
+        )
+
+    def pattern(self, where):
+        """
+        Regular expression over the staged file paths of the partitions
+        selected by `where`, for COPY and LIST ... PATTERN. Levels not in
+        `where` match any value.
+        """
+        self._check(where)
+        levels = []
+        for column in self.columns:
+            values = [str(v) for v in (where or {}).get(column, [])]
+            bad = [v for v in values if not _VALUE.match(v)]
+            if bad:
+                raise ValueError(f"Invalid {column} partition values: {bad}")
+            choice = f"({'|'.join(sorted(set(values)))})" if values else "[^/]+"
+            levels.append(f"{column}={choice}/")
+        return ".*/" + "".join(levels) + "[^/]+[.]parquet"
+
+
+def bucket_values(values, buckets):
+    """
+    Hash bucket of each value: a stable 64-bit hash of its text, modulo
+    `buckets`. Missing values get NULL_PARTITION.
+    """
+    text = values.astype("string")
+    hashed = pd.util.hash_array(text.fillna("").to_numpy(dtype=object))
+    result = pd.Series(
+        (hashed % np.uint64(buckets)).astype(str), index=values.index, dtype=object
+    )
+    result[text.isna().to_numpy()] = NULL_PARTITION
+    return result
+
+
+def bucket_for(value, buckets):
+    """
+    Bucket a single value lands in, e.g. to prune to one customer.
+    """
+    return bucket_values(pd.Series([value]), buckets).iloc[0]
+
+
+def _overrides():
+    if not PARTITION_LAYOUTS:
+        return {}
+    try:
+        return json.loads(PARTITION_LAYOUTS)
+    except json.JSONDecodeError:
+        logger.error("PARTITION_LAYOUTS is not valid JSON; using ingestion_date only")
+        return {}
+
+
+def layout_for(table):
+    """
+    Partition layout of `table` from PARTITION_LAYOUTS.
+    """
+    spec = _overrides().get(table, {})
+    event = spec.get("event_date")
+    if event is True:
+        event = EVENT_COLUMNS.get(table)
+        if event is None:
+            raise ValueError(f"No event time column known for {table}")
+    return Layout(
+        table,
+        event_column=event or None,
+        hour=spec.get("hour", False),
+        buckets=spec.get("buckets", 0),
+        bucket_column=spec.get("bucket_column"),
+    )
@@ -0,0 +1,395 @@
+import os
+import json
+import time
+import logging
+import numpy as np
+import pandas as pd
+import psycopg2
+
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from utils import clean_column_names, add_metadata, write_chunk_to_s3_parquet
+from utils import s3_client_1, DEST_BUCKET
+from pg_extractor import get_db_credentials_from_ssm, parse_exec_date
+from log_config import configure_logging
+from metrics import stage, timed, iter_stage
+
+configure_logging(__name__)
+logger = logging.getLogger(__name__)
+
+
+# CDC Constants
+# full (read whole day tables), auto, watermark, trigger or logical
+WEB_FORMS_CDC_MODE = os.getenv("WEB_FORMS_CDC_MODE", "full").lower()
+WEB_FORMS_CDC_COLUMN = os.getenv("WEB_FORMS_CDC_COLUMN", "updated_at")
+# When set, watermark mode tells inserts from updates by this column
+WEB_FORMS_CDC_CREATED_COLUMN = os.getenv("WEB_FORMS_CDC_CREATED_COLUMN")
+WEB_FORMS_CDC_LOOKBACK_DAYS = int(os.getenv("WEB_FORMS_CDC_LOOKBACK_DAYS", "2"))
+WEB_FORMS_CDC_CHANGE_TABLE = os.getenv("WEB_FORMS_CDC_CHANGE_TABLE", "web_form_changes")
+WEB_FORMS_CDC_SLOT = os.getenv("WEB_FORMS_CDC_SLOT", "web_forms_cdc")
+
+SCHEMA = "customer_complaints"
+TABLE_PREFIX = "web_form_request_"
+WATERMARK_PREFIX = "metadata/watermarks"
+CDC_MODES = ("watermark", "trigger", "logical")
+
+# Change log filled by a row trigger on each day table (trigger mode)
+CHANGE_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS {schema}.{change_table} (
+    change_id BIGSERIAL PRIMARY KEY,
+    table_name TEXT NOT NULL,
+    op CHAR(1) NOT NULL,
+    row_data JSONB NOT NULL,
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION {schema}.capture_web_form_change() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO {schema}.{change_table} (table_name, op, row_data)
+    VALUES (
+        TG_TABLE_NAME,
+        left(TG_OP, 1),
+        to_jsonb(CASE WHEN TG_OP = 'DELETE' THEN OLD ELSE NEW END)
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+TRIGGER_DDL = """
+CREATE OR REPLACE TRIGGER capture_web_form_changes
+AFTER INSERT OR UPDATE OR DELETE ON {schema}.{table}
+FOR EACH ROW EXECUTE FUNCTION {schema}.capture_web_form_change();
+"""
+
+
+def cdc_enabled(mode=None):
+    """
+    True when web forms should be extracted incrementally rather than by
+    reading whole day tables.
+    """
+    return (mode or WEB_FORMS_CDC_MODE) != "full"
+
+
+class Watermark:
+    """
+    Positions already extracted by one CDC mode, persisted in the destination
+    bucket: the last seen WEB_FORMS_CDC_COLUMN value per day table (watermark),
+    the last change_id (trigger) or the last confirmed LSN (logical).
+    """
+
+    def __init__(self, name, mode, data=None):
+        self.name = name
+        self.mode = mode
+        self.key = f"{WATERMARK_PREFIX}/{name}.json"
+        data = data or {}
+        self.positions = data.get("positions", {})
+        if data and data.get("mode") != mode:
+            logger.warning(
+                "------------------------ CDC mode changed from %s to %s: starting %s from scratch ------------------------",
+                data.get("mode"),
+                mode,
+                name,
+            )
+            self.positions = {}
+
+    @classmethod
+    def load(cls, name, mode):
+        """
+        Load the watermark for `name`, or start an empty one.
+        """
+        try:
+            obj = s3_client_1.get_object(
+                Bucket=DEST_BUCKET, Key=f"{WATERMARK_PREFIX}/{name}.json"
+            )
+            return cls(name, mode, json.loads(obj["Body"].read()))
+        except s3_client_1.exceptions.NoSuchKey:
+            return cls(name, mode)
+
+    def get(self, source):
+        return self.positions.get(source)
+
+    def advance(self, source, position):
+        """
+        Record `position` for `source` once its changes are written.
+        """
+        self.positions[source] = position
+        s3_client_1.put_object(
+            Bucket=DEST_BUCKET,
+            Key=self.key,
+            Body=json.dumps(
+                {
+                    "name": self.name,
+                    "mode": self.mode,
+                    "positions": self.positions,
+                    "updated_at": datetime.now(timezone.utc).isoformat(),
+                },
+                indent=2,
+            ),
+        )
+
+
+def install_change_capture(conn, tables):
+    """
+    Create the change table and trigger function, and attach the trigger to
+    each day table. Safe to run repeatedly, e.g. when a new day table appears.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            CHANGE_TABLE_DDL.format(
+                schema=SCHEMA, change_table=WEB_FORMS_CDC_CHANGE_TABLE
+            )
+        )
+        for table in tables:
+            cur.execute(TRIGGER_DDL.format(schema=SCHEMA, table=table))
+    conn.commit()
+    logger.info(
+        "------------------------ Change capture installed on %d table(s) ------------------------",
+        len(tables),
+    )
+
+
+def resolve_mode(conn, mode):
+    """
+    Pick the best available capture method for mode="auto": a logical
+    replication slot (wal2json), then the trigger change table, then the
+    watermark column.
+    """
+    if mode != "auto":
+        if mode not in CDC_MODES:
+            raise ValueError(f"Unknown CDC mode {mode!r}, expected one of {CDC_MODES}")
+        return mode
+
+    probes = [
+        (
+            "logical",
+            "SELECT 1 FROM pg_replication_slots WHERE slot_name = %s",
+            (WEB_FORMS_CDC_SLOT,),
+        ),
+        (
+            "trigger",
+            "SELECT to_regclass(%s)",
+            (f"{SCHEMA}.{WEB_FORMS_CDC_CHANGE_TABLE}",),
+        ),
+    ]
+    for candidate, sql, params in probes:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                row = cur.fetchone()
+        except Exception as e:
+            conn.rollback()
+            logger.debug("CDC mode %s not available: %s", candidate, e)
+            continue
+        if row and row[0] is not None:
+            return candidate
+    return "watermark"
+
+
+def _with_changes(frame, ops, seqs):
+    frame["_op"] = ops
+    frame["_change_seq"] = np.asarray(seqs, dtype="int64")
+    return frame
+
+
+def _watermark_changes(conn, tables, watermark, chunk_size):
+    """
+    Rows of each day table whose WEB_FORMS_CDC_COLUMN moved past the stored
+    watermark. Deletes are not visible in this mode, and a row committed late
+    with an older column value is missed; trigger and logical modes have
+    neither gap.
+    """
+    column = WEB_FORMS_CDC_COLUMN
+    for table in tables:
+        start = watermark.get(table)
+        query = f"SELECT * FROM {SCHEMA}.{table}"
+        if start is not None:
+            query += f" WHERE {column} > %s"
+        query += f" ORDER BY {column}"
+
+        try:
+            chunks = pd.read_sql(
+                query,
+                conn,
+                params=(start,) if start is not None else None,
+                chunksize=chunk_size,
+            )
+        except pd.errors.DatabaseError as e:
+            # Earlier day tables may be missing or already dropped
+            if table == tables[-1]:
+                raise
+            conn.rollback()
+            logger.warning("Skipping %s: %s", table, e)
+            continue
+
+        seq = time.time_ns()
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            if start is None:
+                ops = "I"
+            elif WEB_FORMS_CDC_CREATED_COLUMN:
+                created = chunk[WEB_FORMS_CDC_CREATED_COLUMN].astype(str)
+                ops = np.where(created > str(start), "I", "U")
+            else:
+                ops = "U"
+            position = str(chunk[column].max())
+            yield _with_changes(
+                chunk, ops, np.arange(seq, seq + len(chunk))
+            ), table, position
+            seq += len(chunk)
+
+
+def _trigger_changes(conn, watermark, chunk_size):
+    """
+    Rows of the trigger-maintained change table after the stored change_id.
+    """
+    source = WEB_FORMS_CDC_CHANGE_TABLE
+    last = watermark.get(source) or 0
+    while True:
+        log = pd.read_sql(
+            f"SELECT change_id, table_name, op, row_data "
+            f"FROM {SCHEMA}.{source} WHERE change_id > %s "
+            f"ORDER BY change_id LIMIT %s",
+            conn,
+            params=(last, chunk_size),
+        )
+        if log.empty:
+            return
+        last = int(log["change_id"].max())
+        log = log[log["table_name"].str.startswith(TABLE_PREFIX)]
+        records = [r if isinstance(r, dict) else json.loads(r) for r in log["row_data"]]
+        frame = pd.DataFrame.from_records(records)
+        yield _with_changes(frame, log["op"].to_numpy(), log["change_id"]), source, last
+
+
+def _lsn_to_int(lsn):
+    high, low = lsn.split("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+
+def _logical_changes(conn, chunk_size):
+    """
+    Changes decoded by wal2json (format version 2) from the replication slot.
+    Changes are peeked, and the slot only advances once the caller has
+    written them, so a failed run replays them.
+    """
+    while True:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT lsn::text, data FROM pg_logical_slot_peek_changes("
+                "%s, NULL, %s, 'format-version', '2', 'include-lsn', 'true', "
+                "'add-tables', %s)",
+                (WEB_FORMS_CDC_SLOT, chunk_size, f"{SCHEMA}.*"),
+            )
+            rows = cur.fetchall()
+        if not rows:
+            return
+
+        records, ops, seqs = [], [], []
+        for lsn, data in rows:
+            change = json.loads(data)
+            if change.get("action") not in ("I", "U", "D"):
+                continue
+            if not change.get("table", "").startswith(TABLE_PREFIX):
+                continue
+            fields = change.get("columns") or change.get("identity") or []
+            records.append({f["name"]: f["value"] for f in fields})
+            ops.append(change["action"])
+            seqs.append(_lsn_to_int(lsn))
+        frame = pd.DataFrame.from_records(records)
+        yield _with_changes(frame, ops, seqs), WEB_FORMS_CDC_SLOT, rows[-1][0]
+
+
+def _advance_slot(conn, lsn):
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT pg_replication_slot_advance(%s, %s)", (WEB_FORMS_CDC_SLOT, lsn)
+        )
+    conn.commit()
+
+
+def _purge_changes(conn, change_id):
+    """
+    Delete the change table's rows up to `change_id`, once they are staged
+    and the watermark is past them, so the table does not grow forever.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            f"DELETE FROM {SCHEMA}.{WEB_FORMS_CDC_CHANGE_TABLE} WHERE change_id <= %s",
+            (change_id,),
+        )
+    conn.commit()
+
+
+@timed("extract_web_forms_cdc")
+def extract_web_forms_cdc(
+    table_name_path="web_forms", exec_date=None, mode=None, chunk_size=50_000
+):
+    """
+    Extract only the web form rows that changed since the last run, tagged
+    with `_op` (I, U or D) and an increasing `_change_seq`, so the loader can
+    MERGE deltas instead of whole days.
+    """
+    exec_date = parse_exec_date(exec_date)
+    tables = [
+        f"{TABLE_PREFIX}{(exec_date - timedelta(days=k)).strftime('%Y_%m_%d')}"
+        for k in range(WEB_FORMS_CDC_LOOKBACK_DAYS, -1, -1)
+    ]
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+
+    conn = None
+    try:
+        db_config = get_db_credentials_from_ssm()
+        conn = psycopg2.connect(**db_config)
+
+        mode = resolve_mode(conn, mode or WEB_FORMS_CDC_MODE)
+        watermark = Watermark.load(table_name_path, mode)
+        logger.info(
+            f"...................... Extracting Web Form changes ({mode} mode) for {exec_date} ......................"
+        )
+
+        if mode == "logical":
+            changes = _logical_changes(conn, chunk_size)
+        elif mode == "trigger":
+            changes = _trigger_changes(conn, watermark, chunk_size)
+        else:
+            changes = _watermark_changes(conn, tables, watermark, chunk_size)
+
+        chunk_num = total_rows = 0
+        ops = Counter()
+        for frame, source, position in iter_stage("pg_cdc", changes, table="web_forms"):
+            if not frame.empty:
+                chunk_num += 1
+                with stage("normalize", table="web_forms") as span:
+                    frame = clean_column_names(frame)
+                    frame = add_metadata(frame, "web_forms")
+                    span.add(rows=len(frame))
+
+                write_chunk_to_s3_parquet(
+                    frame,
+                    table_name_path,
+                    f"cdc-{run_id}-{chunk_num:05d}",
+                    partition_date=exec_date,
+                )
+                total_rows += len(frame)
+                ops.update(frame["_op"])
+
+            if mode == "logical":
+                _advance_slot(conn, position)
+            watermark.advance(source, position)
+            if mode == "trigger":
+                _purge_changes(conn, position)
+
+        logger.info(
+            f"Extracted {total_rows} web form changes ({dict(ops)}) into our Data Lake (s3)"
+        )
+        return total_rows
+    except Exception as e:
+        logger.exception(
+            f"********************* Failed to extract web form changes for {exec_date}: {e} ******************"
+        )
+        raise
+    finally:
+        if conn:
+            conn.close()
@@ -4,28 +4,26 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 import gc
+import time
 import logging
 import pandas as pd
 import psycopg2
 import boto3
-import awswrangler as wr
 
 from datetime import datetime
-from utils import clean_column_names, add_metadata, EXECUTION_DATE, DEST_BUCKET
-from utils import ssm_client_2
+from utils import clean_column_names, add_metadata, EXECUTION_DATE
+from utils import ssm_client_2, write_chunk_to_s3_parquet
+from batching import batcher_for
+from checkpoint import Checkpoint
+from dedup import Deduplicator
+from source_cache import get_cache, cache_key, cached_frames
+from log_config import configure_logging, log_sampled
+from metrics import stage, timed, iter_stage
 from dotenv import load_dotenv
 
 load_dotenv()
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="{asctime} - {levelname} - {message}",
-    style="{",
-    datefmt="%Y-%m-%d %H:%M",
-    filename="process_etl.log",
-    encoding="utf-8",
-    filemode="a",
-)
+configure_logging(__name__)
 logger = logging.getLogger(__name__)
 
 session_dest = boto3.Session(
@@ -36,29 +34,42 @@ session_dest = boto3.Session(
 
 session_source = boto3.Session(profile_name="source", region_name="eu-north-1")
 
+# Monotonic key of the web form tables (primary key or sequence column).
+# Chunks are read in its order and a retry continues after the last key written
+WEB_FORMS_KEY_COLUMN = os.getenv("WEB_FORMS_KEY_COLUMN", "")
+# Last-modified column of the web form tables (pg_cdc's change column); its
+# max, the row count and the max key identify a table's contents for the
+# source cache. Empty leaves it out
+WEB_FORMS_UPDATED_COLUMN = os.getenv("WEB_FORMS_CDC_COLUMN", "updated_at")
+# In-memory overhead of one value on top of its Postgres width (object header
+# and pointer of a pandas string)
+PANDAS_VALUE_OVERHEAD = 56
+
+DB_PARAMETERS = {
+    "host": "/coretelecomms/database/db_host",
+    "port": "/coretelecomms/database/db_port",
+    "database": "/coretelecomms/database/db_name",
+    "user": "/coretelecomms/database/db_username",
+    "password": "/coretelecomms/database/db_password",
+}
+
 
 def get_db_credentials_from_ssm():
     """
     Retrieve Postgres credentials from AWS SSM Parameter Store.
     """
     try:
-        params = {
-            "host": ssm_client_2.get_parameter(
-                Name="/coretelecomms/database/db_host", WithDecryption=True
-            )["Parameter"]["Value"],
-            "port": ssm_client_2.get_parameter(
-                Name="/coretelecomms/database/db_port", WithDecryption=True
-            )["Parameter"]["Value"],
-            "database": ssm_client_2.get_parameter(
-                Name="/coretelecomms/database/db_name", WithDecryption=True
-            )["Parameter"]["Value"],
-            "user": ssm_client_2.get_parameter(
-                Name="/coretelecomms/database/db_username", WithDecryption=True
-            )["Parameter"]["Value"],
-            "password": ssm_client_2.get_parameter(
-                Name="/coretelecomms/database/db_password", WithDecryption=True
-            )["Parameter"]["Value"],
-        }
+        # One batched call instead of a round trip per parameter
+        with stage("ssm_lookup"):
+            response = ssm_client_2.get_parameters(
+                Names=list(DB_PARAMETERS.values()), WithDecryption=True
+            )
+            if response.get("InvalidParameters"):
+                raise KeyError(
+                    f"Missing SSM parameters: {response['InvalidParameters']}"
+                )
+            values = {p["Name"]: p["Value"] for p in response["Parameters"]}
+            params = {field: values[name] for field, name in DB_PARAMETERS.items()}
 
         logger.info("-" * 80)
         logger.info("Retrieved DB credentials from SSM")
@@ -69,70 +80,230 @@ def get_db_credentials_from_ssm():
         raise
 
 
-def extract_web_forms(
-    table_name_path="web_forms", exec_date="2025-11-23", chunk_size=50_000
-):
+def _table_version(conn, db_config, table_name):
     """
-    Query Postgres for web form table for the given execution date.
+    Cache key for a table's current contents, from its row count, max key and
+    max WEB_FORMS_UPDATED_COLUMN, read in one statement. Unlike the
+    pg_stat_user_tables counters, these are transactional: a table written
+    to since the last read gets a new key. Returns None (no caching) if the
+    query fails.
     """
+    key = web_forms_key()
+    columns = f"COUNT(*), MAX({key})"
+    if WEB_FORMS_UPDATED_COLUMN:
+        columns += f", MAX({WEB_FORMS_UPDATED_COLUMN})"
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT {columns} FROM customer_complaints.{table_name}")
+            row = cur.fetchone()
+    except Exception as e:
+        conn.rollback()
+        logger.debug("No version for %s: %s", table_name, e)
+        return None
+    return cache_key(
+        "postgres",
+        db_config["host"],
+        db_config["database"],
+        table_name,
+        key,
+        *row,
+    )
 
+
+def parse_exec_date(exec_date):
+    """
+    Normalize an execution date given as a date, YYYYMMDD int or string, or
+    YYYY-MM-DD string. None means EXECUTION_DATE.
+    """
     if exec_date is None:
-        exec_date = EXECUTION_DATE
-    elif isinstance(exec_date, int):
-        date_str = str(exec_date)
-        exec_date = datetime.strptime(date_str, "%Y%m%d").date()
-    elif isinstance(exec_date, str):
+        return EXECUTION_DATE
+    if isinstance(exec_date, int):
+        return datetime.strptime(str(exec_date), "%Y%m%d").date()
+    if isinstance(exec_date, str):
         if "-" in exec_date:
-            exec_date = datetime.strptime(exec_date, "%Y-%m-%d").date()
-        else:
-            exec_date = datetime.strptime(exec_date, "%Y%m%d").date()
+            return datetime.strptime(exec_date, "%Y-%m-%d").date()
+        return datetime.strptime(exec_date, "%Y%m%d").date()
+    return exec_date
+
 
+def _row_width(conn, table_name):
+    """
+    Estimated in-memory bytes of one row, from the column widths in pg_stats.
+    Returns None (probe a first batch instead) if the table is not analyzed.
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT SUM(avg_width), COUNT(*) FROM pg_stats "
+                "WHERE schemaname = 'customer_complaints' AND tablename = %s",
+                (table_name,),
+            )
+            width, columns = cur.fetchone()
+    except Exception as e:
+        conn.rollback()
+        logger.debug("No column statistics for %s: %s", table_name, e)
+        return None
+    if not columns:
+        return None
+    return float(width) + PANDAS_VALUE_OVERHEAD * columns
+
+
+def web_forms_key():
+    """
+    The configured WEB_FORMS_KEY_COLUMN. Raises if unset: without a monotonic
+    key a resumed read cannot tell which rows it already has.
+    """
+    if not WEB_FORMS_KEY_COLUMN:
+        raise ValueError(
+            "WEB_FORMS_KEY_COLUMN is not set; name the web form tables' "
+            "primary key or sequence column"
+        )
+    return WEB_FORMS_KEY_COLUMN
+
+
+def keyset_query(table_name, after=None, limit=None):
+    """
+    Query for the rows of `table_name` after key `after`, in key order, with
+    the key repeated as a leading "_resume_key" column. Returns (query, params).
+    """
+    key = web_forms_key()
+    query = (
+        f'SELECT {key} AS "_resume_key", t.* FROM customer_complaints.{table_name} t'
+    )
+    params = ()
+    if after is not None:
+        query += f" WHERE {key} > %s"
+        params = (after,)
+    query += f" ORDER BY {key}"
+    if limit:
+        query += f" LIMIT {int(limit)}"
+    return query, params
+
+
+def last_key(df):
+    """
+    Pop the "_resume_key" column of a keyset chunk and return its last value,
+    as a JSON-serializable checkpoint offset.
+    """
+    value = df.pop("_resume_key").iloc[-1]
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value.item() if hasattr(value, "item") else value
+
+
+def _fetch_frames(conn, query, batcher, params=()):
+    """
+    Stream query results through a server-side cursor as DataFrames of
+    `batcher.rows` rows, read again before every fetch.
+    """
+    with conn.cursor(name="web_forms_extract") as cur:
+        cur.itersize = batcher.rows
+        cur.execute(query, params)
+        rows = cur.fetchmany(batcher.rows)
+        columns = [d[0] for d in cur.description]
+        while rows:
+            yield pd.DataFrame.from_records(rows, columns=columns)
+            rows = cur.fetchmany(batcher.rows)
+
+
+@timed("extract_web_forms")
+def extract_web_forms(
+    table_name_path="web_forms", exec_date="2025-11-23", chunk_size=None
+):
+    """
+    Query Postgres for web form table for the given execution date. Chunks are
+    sized adaptively, starting from the table's column statistics, unless a
+    fixed chunk_size is given.
+    """
+
+    exec_date = parse_exec_date(exec_date)
     table_name = f"web_form_request_{exec_date.strftime('%Y_%m_%d')}"
 
     logger.info(
         f"...................... Extracting Web Forms from Postgres table: {table_name}......................"
     )
 
-    query = f"SELECT * FROM customer_complaints.{table_name}"
+    checkpoint = Checkpoint.load(f"{table_name_path}/{table_name}")
+    dedup = Deduplicator.load(table_name_path)
+    dedup.restore(checkpoint.outputs())
+    # Checkpoint offsets are the last key read; rows inserted or updated
+    # since a failed attempt do not shift what is left to read
+    key = web_forms_key()
+    chunk_num, after, total_rows = checkpoint.resume_point(
+        table_name, chunk_size=chunk_size, key=key
+    )
+    if not chunk_num:
+        after = None
+    else:
+        logger.info(
+            f"Resuming {table_name} after chunk {chunk_num} ({key} > {after}).................."
+        )
+    query, params = keyset_query(table_name, after)
 
-    total_rows = 0
-    conn = None
+    conn = chunks = chunk_iter = None
     try:
         db_config = get_db_credentials_from_ssm()
         conn = psycopg2.connect(**db_config)
 
-        chunk_iter = pd.read_sql(query, conn, chunksize=chunk_size)
+        batcher = batcher_for(
+            f"web_forms:{table_name}",
+            chunk_size,
+            row_bytes=None if chunk_size else _row_width(conn, table_name),
+        )
+        # A resumed read is a different result from the whole table's
+        digest = None
+        if get_cache() and after is None:
+            digest = _table_version(conn, db_config, table_name)
+        if digest:
+            chunks = cached_frames(
+                digest, lambda: _fetch_frames(conn, query, batcher), batcher.rows
+            )
+        else:
+            chunks = _fetch_frames(conn, query, batcher, params)
+
+        chunk_iter = iter_stage("pg_query", chunks, table="web_forms")
 
         for chunk_df in chunk_iter:
-            chunk_df = clean_column_names(chunk_df)
-            chunk_df = add_metadata(chunk_df, "web_forms")
+            chunk_num += 1
+            after = last_key(chunk_df)
+            with stage("normalize", table="web_forms") as span:
+                chunk_df = clean_column_names(chunk_df)
+                chunk_df = add_metadata(chunk_df, "web_forms")
+                span.add(rows=len(chunk_df))
 
-            total_rows += len(chunk_df)
-            logger.info(
-                f"Wrote chunk with {len(chunk_df)} rows so far: {total_rows} ......................."
-            )
+            # Rows count as staged for dedup once the chunk is written
+            with dedup.batch(chunk_df) as chunk_df:
+                if chunk_df.empty:
+                    checkpoint.record(table_name, chunk_num, after, None, 0)
+                    continue
+                total_rows += len(chunk_df)
 
-            if exec_date:
-                chunk_df = chunk_df.copy()
-                chunk_df["ingestion_date"] = exec_date
-
-            path = f"s3://{DEST_BUCKET}/staging/{table_name_path}/"
-            wr.s3.to_parquet(
-                df=chunk_df,
-                path=path,
-                boto3_session=session_dest,
-                dataset=True,
-                mode="append",
-                partition_cols=["ingestion_date"],
-                compression="snappy",
-            )
-            logger.info(
-                f"Successfully wrote {len(chunk_df)} rows to {path}..................."
+                started = time.perf_counter()
+                paths = write_chunk_to_s3_parquet(
+                    chunk_df,
+                    table_name_path,
+                    f"{table_name}-{chunk_num:05d}",
+                    partition_date=exec_date,
+                )
+                batcher.observe(chunk_df, time.perf_counter() - started)
+                checkpoint.record(table_name, chunk_num, after, paths, len(chunk_df))
+            log_sampled(
+                logger,
+                "web_forms_chunks",
+                "Wrote chunk with %d rows to %s, so far: %d .......................",
+                len(chunk_df),
+                ", ".join(paths),
+                total_rows,
+                every=10,
             )
 
             del chunk_df
             gc.collect()
 
+        dedup.commit()
+        dedup.report()
+        checkpoint.clear()
+        batcher.report()
         logger.info(
             f"Loaded {total_rows} web form records from {table_name} in our Data Lake (s3)"
         )
@@ -143,5 +314,9 @@ def extract_web_forms(
         )
         raise
     finally:
+        # Release the server-side cursor before its connection
+        for iterator in (chunk_iter, chunks):
+            if iterator is not None:
+                iterator.close()
         if conn:
             conn.close()
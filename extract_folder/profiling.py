@@ -0,0 +1,343 @@
+import os
+import re
+import sys
+import json
+import time
+import pstats
+import cProfile
+import logging
+import resource
+import itertools
+import threading
+import tracemalloc
+
+from collections import Counter
+from contextlib import contextmanager
+from log_config import configure_logging, LOG_FILE
+
+configure_logging(__name__)
+logger = logging.getLogger(__name__)
+
+
+# Profiling Constants: unset PIPELINE_PROFILE keeps profiling off. It takes a
+# comma-separated list of cpu (cProfile), sample (stack sampler) and memory
+# (tracemalloc), or all
+PIPELINE_PROFILE = os.getenv("PIPELINE_PROFILE", "")
+# Artifacts go to PROFILE_DIR/<run_id>/, by default next to the log file
+PROFILE_DIR = os.getenv("PROFILE_DIR") or os.path.join(
+    os.path.dirname(LOG_FILE) or ".", "profiles"
+)
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", "10"))
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "16"))
+
+MODES = ("cpu", "sample", "memory")
+
+_lock = threading.Lock()
+_local = threading.local()
+_sequence = itertools.count(1)
+_tracing_users = 0
+_owns_tracing = False
+
+
+def parse_modes(value):
+    """
+    The set of profilers named in a PIPELINE_PROFILE value.
+    """
+    modes = {m.strip().lower() for m in (value or "").split(",") if m.strip()}
+    if "all" in modes:
+        return set(MODES)
+    unknown = modes - set(MODES)
+    if unknown:
+        raise ValueError(f"Unknown profiling modes {sorted(unknown)}; use {MODES}")
+    return modes
+
+
+_modes = parse_modes(PIPELINE_PROFILE)
+
+
+def set_profile(value):
+    """
+    Switch the profilers for the rest of this process, e.g. from a DAG param.
+    """
+    global _modes
+    _modes = parse_modes(value)
+    if _modes:
+        logger.info(
+            "------------------------ Profiling on: %s ------------------------",
+            ", ".join(sorted(_modes)),
+        )
+
+
+def profiling_enabled():
+    return bool(_modes)
+
+
+def run_dir(run_id):
+    """
+    Artifact directory of a run; the run id is made safe for a path.
+    """
+    return os.path.join(PROFILE_DIR, re.sub(r"[^\w.-]+", "_", str(run_id)))
+
+
+# ==================== SAMPLER ====================
+def _frame_label(frame):
+    code = frame.f_code
+    return (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+class StackSampler(threading.Thread):
+    """
+    Records, each PROFILE_SAMPLE_INTERVAL, the stack of the thread that
+    created it and of every thread started after it, folded into
+    "thread;outer;...;inner" lines with a count: the input format of
+    flamegraph.pl and speedscope. Work handed to new pool threads is sampled
+    under the pool thread's name; threads that were already running, such
+    as the log writer or other stages, are left out.
+    """
+
+    def __init__(self, interval=None):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval or PROFILE_SAMPLE_INTERVAL
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+        self._ignored = {t.ident for t in threading.enumerate()} - {
+            threading.get_ident()
+        }
+
+    def run(self):
+        names = {}
+        self._ignored.add(self.ident)
+        while not self._stop_event.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident in self._ignored:
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def hotspots(self, top=None):
+        """
+        Innermost frames by share of samples ("self" time).
+        """
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        return [
+            {"frame": frame, "samples": count, "share": round(count / total, 4)}
+            for frame, count in leaves.most_common(top or PROFILE_TOP)
+        ]
+
+    def write_folded(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+# ==================== PROFILERS ====================
+def _cpu_hotspots(profiler, top=None):
+    stats = pstats.Stats(profiler)
+    rows = sorted(stats.stats.items(), key=lambda item: -item[1][2])
+    return [
+        {
+            "function": func,
+            "file": f"{os.path.basename(filename)}:{line}",
+            "calls": calls,
+            "tottime": round(tottime, 4),
+            "cumtime": round(cumtime, 4),
+        }
+        for (filename, line, func), (_, calls, tottime, cumtime, _) in rows[
+            : top or PROFILE_TOP
+        ]
+    ]
+
+
+def _start_tracing():
+    global _tracing_users, _owns_tracing
+    with _lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+            _owns_tracing = True
+        _tracing_users += 1
+        tracemalloc.reset_peak()
+        return tracemalloc.get_traced_memory()[0]
+
+
+def _stop_tracing(path, before):
+    """
+    Dump an allocation snapshot and return the memory summary. Stages that
+    overlap share tracemalloc, so their peaks include each other's.
+    """
+    global _tracing_users, _owns_tracing
+    with _lock:
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        _tracing_users -= 1
+        if _tracing_users == 0 and _owns_tracing:
+            tracemalloc.stop()
+            _owns_tracing = False
+    snapshot.dump(path)
+    # Leave out what the profilers themselves allocate
+    own = [
+        tracemalloc.Filter(False, module.__file__)
+        for module in (cProfile, pstats, tracemalloc, sys.modules[__name__])
+    ]
+    top = snapshot.filter_traces(own).statistics("lineno")[:PROFILE_TOP]
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "peak_traced_bytes": peak,
+        "retained_bytes": current - before,
+        # macOS reports bytes, Linux reports kilobytes
+        "peak_rss_bytes": peak_rss if sys.platform == "darwin" else peak_rss * 1024,
+        "top": [
+            {
+                "location": str(stat.traceback[0]),
+                "size": stat.size,
+                "count": stat.count,
+            }
+            for stat in top
+        ],
+    }
+
+
+@contextmanager
+def profile(name, run_id):
+    """
+    Profile a block with the enabled profilers and write its artifacts to
+    run_dir(run_id) as <name>-<pid>-<n>.pstats (cpu), .folded (sample) and
+    .tracemalloc (memory), plus a line in summary.jsonl with the top
+    hotspots. Does nothing when profiling is off or when the thread is
+    already inside a profiled block.
+    """
+    if not _modes or getattr(_local, "active", False):
+        yield
+        return
+
+    _local.active = True
+    modes = set(_modes)
+    cpu = sampler = None
+    traced_before = _start_tracing() if "memory" in modes else None
+    if "sample" in modes:
+        sampler = StackSampler()
+        sampler.start()
+    if "cpu" in modes:
+        cpu = cProfile.Profile()
+        try:
+            cpu.enable()
+        except ValueError as e:
+            # Only one deterministic profiler can run at a time on 3.12+
+            logger.warning("CPU profiler not started for %s: %s", name, e)
+            cpu = None
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        if cpu is not None:
+            cpu.disable()
+        if sampler is not None:
+            sampler.stop()
+        _local.active = False
+        try:
+            _write(name, run_id, seconds, cpu, sampler, traced_before, modes)
+        except Exception as e:
+            logger.warning("Could not write profile of %s: %s", name, e)
+
+
+def _write(name, run_id, seconds, cpu, sampler, traced_before, modes):
+    folder = run_dir(run_id)
+    os.makedirs(folder, exist_ok=True)
+    base = os.path.join(folder, f"{name}-{os.getpid()}-{next(_sequence)}")
+    record = {
+        "stage": name,
+        "pid": os.getpid(),
+        "seconds": round(seconds, 3),
+        "artifacts": [],
+    }
+    if cpu is not None:
+        cpu.dump_stats(base + ".pstats")
+        record["artifacts"].append(base + ".pstats")
+        record["cpu_hotspots"] = _cpu_hotspots(cpu)
+    if sampler is not None:
+        sampler.write_folded(base + ".folded")
+        record["artifacts"].append(base + ".folded")
+        record["samples"] = sampler.samples
+        record["sample_hotspots"] = sampler.hotspots()
+    if "memory" in modes:
+        record["memory"] = _stop_tracing(base + ".tracemalloc", traced_before)
+        record["artifacts"].append(base + ".tracemalloc")
+
+    with _lock, open(os.path.join(folder, "summary.jsonl"), "a") as f:
+        f.write(json.dumps(record, default=str) + "\n")
+    logger.info(
+        "------------------------ Profiled %s (%.2fs): %s ------------------------",
+        name,
+        seconds,
+        ", ".join(os.path.basename(a) for a in record["artifacts"]),
+    )
+
+
+# ==================== SUMMARY ====================
+def load_profiles(run_id):
+    """
+    Summary records of every profiled stage of a run, in all processes.
+    """
+    path = os.path.join(run_dir(run_id), "summary.jsonl")
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def format_profiles(records, top=5):
+    """
+    Render the top hotspots of each profiled stage as text.
+    """
+    lines = []
+    for r in records:
+        lines.append(f"{r['stage']} ({r['seconds']:.2f}s, pid {r['pid']})")
+        for h in r.get("cpu_hotspots", [])[:top]:
+            lines.append(
+                f"  cpu     {h['tottime']:>9.3f}s self {h['cumtime']:>9.3f}s cum "
+                f"{h['calls']:>9,} calls  {h['function']} ({h['file']})"
+            )
+        for h in r.get("sample_hotspots", [])[:top]:
+            lines.append(
+                f"  sample  {h['share']:>8.1%} of {r['samples']:,} samples  {h['frame']}"
+            )
+        memory = r.get("memory")
+        if memory:
+            lines.append(
+                f"  memory  peak traced {memory['peak_traced_bytes'] / 1e6:.1f} MB, "
+                f"retained {memory['retained_bytes'] / 1e6:.1f} MB, "
+                f"peak RSS {memory['peak_rss_bytes'] / 1e6:.1f} MB"
+            )
+            for m in memory["top"][:top]:
+                lines.append(
+                    f"          {m['size'] / 1e6:>8.2f} MB {m['count']:>9,} blocks  {m['location']}"
+                )
+    return "\n".join(lines)
+
+
+def print_profiles(run_id):
+    """
+    Print the hotspot summary of a run and return its records.
+    """
+    records = load_profiles(run_id)
+    print(f"Profiles for run {run_id} in {run_dir(run_id)}:")
+    print(format_profiles(records) if records else "  (no profiles recorded)")
+    return records
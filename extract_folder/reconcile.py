@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import logging
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from concurrent.futures import ThreadPoolExecutor
+from log_config import configure_logging
+from metrics import stage, current_run_id
+from utils import s3_client_1, DEST_BUCKET
+from snowflake_load import get_connection
+
+configure_logging(__name__)
+logger = logging.getLogger(__name__)
+
+
+# Reconcile Constants
+RECONCILE_WORKERS = int(os.getenv("RECONCILE_WORKERS", "32"))
+# Bytes read from the end of each file; one GET covers the footer of most
+RECONCILE_TAIL_BYTES = int(os.getenv("RECONCILE_TAIL_BYTES", "16384"))
+# Fail validation when loaded rows differ from staged rows. COPY rejects and
+# the warehouse dedup can make them differ legitimately, so by default a
+# mismatch is only reported
+RECONCILE_STRICT = os.getenv("RECONCILE_STRICT", "false").lower() == "true"
+
+RECONCILE_PREFIX = "metadata/reconcile"
+
+# Staging folder -> warehouse table. The social media load lists the stage
+# path social_media, which also matches the social_medias/ folder
+RECONCILE_TABLES = {
+    "customers": "customers",
+    "agents": "agents",
+    "call_logs": "call_logs",
+    "social_medias": "social_media",
+    "web_forms": "web_forms",
+}
+
+PARQUET_MAGIC = b"PAR1"
+
+
+# ==================== STAGED SIDE ====================
+def _get_range(key, start, end):
+    obj = s3_client_1.get_object(
+        Bucket=DEST_BUCKET, Key=key, Range=f"bytes={start}-{end}"
+    )
+    return obj["Body"].read()
+
+
+def footer_rows(key, size):
+    """
+    Row count of a Parquet object from its footer alone: one ranged GET of
+    the file's tail, and a second only when the footer is larger than that.
+    Returns (rows, bytes fetched).
+    """
+    tail = _get_range(key, max(0, size - RECONCILE_TAIL_BYTES), size - 1)
+    if len(tail) < 8 or tail[-4:] != PARQUET_MAGIC:
+        raise ValueError(f"s3://{DEST_BUCKET}/{key} is not a Parquet file")
+    length = int.from_bytes(tail[-8:-4], "little") + 8
+    fetched = len(tail)
+    if length > len(tail):
+        tail = _get_range(key, size - length, size - 1)
+        fetched += len(tail)
+    metadata = pq.read_metadata(pa.BufferReader(PARQUET_MAGIC + tail[-length:]))
+    return metadata.num_rows, fetched
+
+
+def list_partition(table, partition):
+    """
+    (key, size) of the Parquet objects in one ingestion_date partition.
+    """
+    prefix = f"staging/{table}/ingestion_date={partition}/"
+    paginator = s3_client_1.get_paginator("list_objects_v2")
+    return [
+        (obj["Key"], obj["Size"])
+        for page in paginator.paginate(Bucket=DEST_BUCKET, Prefix=prefix)
+        for obj in page.get("Contents", [])
+        if obj["Key"].endswith(".parquet")
+    ]
+
+
+def staged_counts(table, partitions, pool):
+    """
+    {partition: {s3 url: rows}} for the staged files of `table`, read from
+    the footers concurrently, and the footer bytes fetched.
+    """
+    objects = [
+        (p, key, size) for p in partitions for key, size in list_partition(table, p)
+    ]
+    results = pool.map(lambda o: footer_rows(o[1], o[2]), objects)
+    counts = {str(p): {} for p in partitions}
+    fetched = 0
+    for (partition, key, _), (rows, size) in zip(objects, results):
+        counts[str(partition)][f"s3://{DEST_BUCKET}/{key}"] = rows
+        fetched += size
+    return counts, fetched
+
+
+# ==================== LOADED SIDE ====================
+def target_rows(cursor, table):
+    """
+    Rows in the warehouse table. An unfiltered COUNT(*) is answered from
+    Snowflake's micro-partition metadata without scanning.
+    """
+    try:
+        cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        row = cursor.fetchone()
+        return int(row[0]) if row else None
+    except Exception as e:
+        logger.warning("Could not count rows in %s: %s", table, e)
+        return None
+
+
+def _compare(staged, report):
+    """
+    Status of one partition: its staged files against the COPY results.
+    """
+    if not staged:
+        return {"status": "empty", "staged_rows": 0, "files": 0}
+    result = {"staged_rows": sum(staged.values()), "files": len(staged)}
+    if report is None:
+        return dict(result, status="unverified")
+
+    copied = report.get("files", {})
+    missing = [url for url in staged if url not in copied]
+    mismatched = [url for url in staged if url in copied and copied[url] != staged[url]]
+    result.update(
+        copied_rows=sum(copied[url] for url in staged if url in copied),
+        missing_files=missing,
+        mismatched_files=mismatched,
+    )
+    if mismatched:
+        result["status"] = "mismatch"
+    elif missing:
+        # Not in this COPY: FORCE=FALSE skips files loaded by an earlier attempt
+        result["status"] = "not_copied"
+    else:
+        result["status"] = "ok"
+    return result
+
+
+# ==================== RECONCILIATION ====================
+def reconcile(partitions, load_reports=None, tables=None):
+    """
+    Compare, per table and ingestion_date partition, the rows staged for
+    the run (from Parquet footers, no data pages read) with the rows loaded
+    (per-file COPY results in `load_reports`, keyed by warehouse table, as
+    returned by snowflake_load.load_report) and the warehouse table's
+    metadata row count. Each table is recorded as a "reconcile" metrics
+    stage and the whole result is stored under metadata/reconcile/.
+    """
+    started = time.perf_counter()
+    load_reports = load_reports or {}
+    tables = tables or list(RECONCILE_TABLES)
+    partitions = sorted({str(p) for p in partitions})
+    result = {"run_id": current_run_id(), "partitions": partitions, "tables": {}}
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        with ThreadPoolExecutor(max_workers=RECONCILE_WORKERS) as pool:
+            for table in tables:
+                warehouse_table = RECONCILE_TABLES.get(table, table)
+                report = load_reports.get(warehouse_table)
+                with stage("reconcile", table=table) as span:
+                    counts, fetched = staged_counts(table, partitions, pool)
+                    per_partition = {
+                        p: _compare(files, report) for p, files in counts.items()
+                    }
+                    entry = {
+                        "warehouse_table": warehouse_table,
+                        "staged_rows": sum(
+                            r["staged_rows"] for r in per_partition.values()
+                        ),
+                        "files": sum(r["files"] for r in per_partition.values()),
+                        "copied_rows": sum(
+                            r.get("copied_rows", 0) for r in per_partition.values()
+                        ),
+                        "target_rows": target_rows(cursor, warehouse_table),
+                        "partitions": per_partition,
+                    }
+                    if report is not None:
+                        entry.update(
+                            {
+                                k: report.get(k, 0)
+                                for k in ("inserted", "updated", "deleted")
+                            }
+                        )
+                    entry["status"] = _table_status(per_partition.values())
+                    span.add(
+                        rows=entry["staged_rows"],
+                        files=entry["files"],
+                        bytes=fetched,
+                        copied_rows=entry["copied_rows"],
+                        mismatches=int(entry["status"] == "mismatch"),
+                    )
+                result["tables"][table] = entry
+    finally:
+        cursor.close()
+        conn.close()
+
+    result["status"] = _table_status(result["tables"].values())
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    s3_client_1.put_object(
+        Bucket=DEST_BUCKET,
+        Key=f"{RECONCILE_PREFIX}/{result['run_id']}.json",
+        Body=json.dumps(result, indent=2, default=str),
+    )
+    logger.info(
+        "------------------------ Reconciled %d table(s) over %s in %.2fs: %s ------------------------",
+        len(result["tables"]),
+        ", ".join(partitions),
+        result["seconds"],
+        result["status"],
+    )
+    return result
+
+
+def _table_status(entries):
+    statuses = {e["status"] for e in entries}
+    for status in ("mismatch", "not_copied", "unverified", "ok"):
+        if status in statuses:
+            return status
+    return "empty"
+
+
+def format_reconciliation(result):
+    """
+    Render a reconciliation result as a fixed-width text table.
+    """
+    header = f"{'TABLE':<16}{'PARTITION':<13}{'FILES':>7}{'STAGED':>12}{'COPIED':>12}{'TARGET':>12}  STATUS"
+    lines = [header, "-" * len(header)]
+    for table, entry in result["tables"].items():
+        target = entry["target_rows"]
+        for partition, row in entry["partitions"].items():
+            copied = row.get("copied_rows")
+            lines.append(
+                f"{table:<16}{partition:<13}{row['files']:>7}{row['staged_rows']:>12,}"
+                f"{'-' if copied is None else f'{copied:,}':>12}"
+                f"{'-' if target is None else f'{target:,}':>12}  {row['status']}"
+            )
+    lines.append(f"Overall: {result['status']} in {result['seconds']:.2f}s")
+    return "\n".join(lines)
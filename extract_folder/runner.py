@@ -0,0 +1,403 @@
+import os
+import sys
+import time
+import logging
+import argparse
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+from utils import EXECUTION_DATE, build_daily_aggregates, write_to_s3_parquet
+from s3_extractor import extract_customers, extract_call_logs, extract_social_media
+from gsheet_extractor import extract_agents
+from pg_extractor import extract_web_forms, parse_exec_date
+from pg_cdc import cdc_enabled, extract_web_forms_cdc
+from aggregates import (
+    AGGREGATE_SOURCES,
+    AGGREGATES_TABLE,
+    LOAD_KEYS,
+    aggregates_enabled,
+)
+from log_config import configure_logging
+from metrics import stage, current_run_id, print_stage_breakdown
+from profiling import print_profiles, profiling_enabled, set_profile
+
+load_dotenv()
+
+configure_logging(__name__)
+logger = logging.getLogger(__name__)
+
+
+# Runner Constants
+RUNNER_WORKERS = int(os.getenv("RUNNER_WORKERS", "4"))
+
+
+# ==================== EXTRACT STEPS ====================
+def _extract_customers(exec_date, use_async):
+    df = extract_customers(use_async=use_async, exec_date=exec_date)
+    return int(df["total_rows"].iloc[0]) if not df.empty else 0
+
+
+def _extract_agents(exec_date, use_async):
+    df = extract_agents()
+    if not df.empty:
+        write_to_s3_parquet(df, "agents", mode="overwrite", partition_date=exec_date)
+    return len(df)
+
+
+def _extract_call_logs(exec_date, use_async):
+    df = extract_call_logs(use_async=use_async, exec_date=exec_date)
+    if not df.empty:
+        write_to_s3_parquet(df, "call_logs", partition_date=exec_date)
+    return len(df)
+
+
+def _extract_social_media(exec_date, use_async):
+    return extract_social_media(use_async=use_async, exec_date=exec_date)
+
+
+def _extract_web_forms(exec_date, use_async):
+    if cdc_enabled():
+        return extract_web_forms_cdc(table_name_path="web_forms", exec_date=exec_date)
+    return extract_web_forms(table_name_path="web_forms", exec_date=exec_date)
+
+
+# Source -> (extract, warehouse table, unique keys, one extract per date).
+# The S3 and Google Sheets sources pick up whatever is new once per run;
+# web forms live in one Postgres table per day, so a date range extracts
+# each of them
+SOURCES = {
+    "customers": (_extract_customers, "customers", ["CUSTOMER_ID"], False),
+    "agents": (_extract_agents, "agents", ["ID"], False),
+    "call_logs": (_extract_call_logs, "call_logs", ["CALL_ID"], False),
+    "social_media": (_extract_social_media, "social_media", ["SOCIAL_MEDIA"], False),
+    "web_forms": (_extract_web_forms, "web_forms", ["WEB_FORM_ID"], True),
+}
+
+# Source -> its folder under staging/, as the checks and reconciliation name it
+STAGING_TABLES = {
+    "customers": "customers",
+    "agents": "agents",
+    "call_logs": "call_logs",
+    "social_media": "social_medias",
+    "web_forms": "web_forms",
+}
+
+
+def _aggregates(partitions):
+    return build_daily_aggregates(partitions)["rows"]
+
+
+# ==================== LOAD AND CHECK STEPS ====================
+# Imported on use: the warehouse modules need snowflakes/ on the path, which
+# an extract-only run does not
+def _load(table, unique_keys):
+    from snowflake_load import load_s3_parquet_to_snowflake
+
+    return load_s3_parquet_to_snowflake(table, unique_keys=unique_keys)
+
+
+def _lake_checks(partitions, tables):
+    from lake_checks import LAKE_CHECKS_STRICT, format_lake_checks, run_lake_checks
+
+    result = run_lake_checks(partitions, tables=tables)
+    print(format_lake_checks(result))
+    if result["status"] == "failed":
+        if LAKE_CHECKS_STRICT:
+            raise ValueError("Staging lake checks failed")
+        logger.warning("Staging lake checks failed; see the table above")
+    return sum(r.get("rows") or 0 for r in result["checks"])
+
+
+def _reconcile(partitions, tables):
+    from reconcile import (
+        RECONCILE_STRICT,
+        RECONCILE_TABLES,
+        format_reconciliation,
+        reconcile,
+    )
+    from snowflake_load import load_report
+
+    reports = {
+        RECONCILE_TABLES[t]: load_report(RECONCILE_TABLES[t])
+        for t in tables
+        if load_report(RECONCILE_TABLES[t])
+    }
+    result = reconcile(partitions, reports, tables=tables)
+    print(format_reconciliation(result))
+    if result["status"] == "mismatch":
+        if RECONCILE_STRICT:
+            raise ValueError("Loaded rows differ from staged rows")
+        logger.warning("Loaded rows differ from staged rows; see the table above")
+    return sum(entry["staged_rows"] for entry in result["tables"].values())
+
+
+# ==================== GRAPH ====================
+class Step:
+    """
+    One node of the run graph: a callable with the steps it waits for.
+    """
+
+    def __init__(self, name, func, deps=()):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.status = "pending"
+        self.rows = None
+        self.error = None
+        self.started = None
+        self.seconds = 0.0
+
+
+def date_range(start, end):
+    """
+    Every date from start to end, both included.
+    """
+    start, end = parse_exec_date(start), parse_exec_date(end)
+    if end < start:
+        raise ValueError(f"--to {end} is before --from {start}")
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def build_graph(sources, dates, load=True, checks=True, use_async=None):
+    """
+    Steps for extracting `sources` over `dates` and, with `load`, checking
+    the staged partitions and loading and reconciling each table. Sources
+    are independent of each other; the dates of one source run in order,
+    since they share its dedup index and checkpoints. As in the DAG, every
+    load waits for the lake checks, which wait for every extract. With
+    AGGREGATES_ENABLED, the daily aggregates are built once the complaint
+    sources are staged, and loaded like another table.
+    """
+    unknown = [s for s in sources if s not in SOURCES]
+    if unknown:
+        raise ValueError(f"Unknown sources {unknown}; choose from {list(SOURCES)}")
+
+    run_date = dates[-1]
+    steps, extracts = [], {}
+    for source in sources:
+        func, _, _, per_date = SOURCES[source]
+        previous = None
+        for day in dates if per_date else [run_date]:
+            name = f"extract:{source}" + (f"@{day}" if per_date else "")
+            step = Step(
+                name,
+                lambda func=func, day=day: func(day, use_async),
+                [previous] if previous else [],
+            )
+            steps.append(step)
+            previous = step
+        extracts[source] = previous
+
+    # Sources extracted once stage their rows in the run date's partition
+    partitions = [str(d) for d in dates]
+    aggregated = [s for s in sources if STAGING_TABLES[s] in AGGREGATE_SOURCES]
+    aggregates = None
+    if aggregates_enabled() and aggregated:
+        aggregates = Step(
+            "aggregates",
+            lambda: _aggregates(partitions),
+            [extracts[s] for s in aggregated],
+        )
+        steps.append(aggregates)
+
+    if not load:
+        return steps
+
+    tables = [STAGING_TABLES[s] for s in sources]
+    gate = None
+    if checks:
+        gate = Step(
+            "lake_checks",
+            lambda: _lake_checks(partitions, tables),
+            list(extracts.values()),
+        )
+        steps.append(gate)
+
+    loads = []
+    for source in sources:
+        _, table, unique_keys, _ = SOURCES[source]
+        step = Step(
+            f"load:{table}",
+            lambda table=table, keys=unique_keys: _load(table, keys),
+            [gate] if gate else [extracts[source]],
+        )
+        steps.append(step)
+        loads.append(step)
+
+    if aggregates:
+        steps.append(
+            Step(
+                f"load:{AGGREGATES_TABLE}",
+                lambda: _load(AGGREGATES_TABLE, LOAD_KEYS),
+                [aggregates] + ([gate] if gate else []),
+            )
+        )
+
+    steps.append(Step("reconcile", lambda: _reconcile(partitions, tables), loads))
+    return steps
+
+
+def format_plan(steps):
+    """
+    The graph as waves of steps that can run at the same time.
+    """
+    done, lines, wave = set(), [], 1
+    pending = list(steps)
+    while pending:
+        ready = [s for s in pending if all(d.name in done for d in s.deps)]
+        lines.append(f"wave {wave}:")
+        for s in ready:
+            deps = ", ".join(d.name for d in s.deps) or "-"
+            lines.append(f"  {s.name:<36} after {deps}")
+        done |= {s.name for s in ready}
+        pending = [s for s in pending if s not in ready]
+        wave += 1
+    return "\n".join(lines)
+
+
+# ==================== EXECUTION ====================
+def run_graph(steps, workers=None):
+    """
+    Run each step once all its dependencies have succeeded, up to `workers`
+    at a time. A failed step skips everything downstream of it while the
+    other branches carry on. Returns the wall time in seconds.
+    """
+    workers = workers or RUNNER_WORKERS
+    started = time.perf_counter()
+
+    def execute(step):
+        step.started = time.perf_counter() - started
+        try:
+            with stage("runner", step=step.name) as span:
+                step.rows = step.func()
+                if isinstance(step.rows, int):
+                    span.add(rows=step.rows)
+            step.status = "ok"
+        except Exception as e:
+            logger.error(
+                f"********************** Step {step.name} failed: {e} ************************"
+            )
+            step.status = "failed"
+            step.error = str(e)
+        step.seconds = time.perf_counter() - started - step.started
+        return step
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        running = set()
+        while True:
+            # Steps are listed after their dependencies, so one pass settles
+            # every step whose inputs are known
+            for step in steps:
+                if step.status != "pending":
+                    continue
+                if any(d.status in ("failed", "skipped") for d in step.deps):
+                    step.status = "skipped"
+                elif all(d.status == "ok" for d in step.deps):
+                    step.status = "running"
+                    running.add(pool.submit(execute, step))
+            if not running:
+                break
+            _, running = wait(running, return_when=FIRST_COMPLETED)
+
+    return time.perf_counter() - started
+
+
+def format_run_report(steps, wall_seconds):
+    """
+    Per-step timing as a fixed-width text table.
+    """
+    header = f"{'STEP':<36}{'STATUS':<9}{'START':>8}{'SECONDS':>9}{'ROWS':>12}"
+    lines = [header, "-" * len(header)]
+    for s in steps:
+        start = "-" if s.started is None else f"{s.started:.2f}"
+        rows = f"{s.rows:,}" if isinstance(s.rows, int) else "-"
+        lines.append(f"{s.name:<36}{s.status:<9}{start:>8}{s.seconds:>9.2f}{rows:>12}")
+    busy = sum(s.seconds for s in steps)
+    lines.append(
+        f"Wall time {wall_seconds:.2f}s for {busy:.2f}s of steps "
+        f"({busy / wall_seconds if wall_seconds else 0:.1f}x overlap)"
+    )
+    return "\n".join(lines)
+
+
+def run_pipeline(
+    sources=None,
+    start=None,
+    end=None,
+    workers=None,
+    load=True,
+    checks=True,
+    use_async=None,
+    dry_run=False,
+):
+    """
+    Build the run graph for `sources` (default all) over the dates from
+    `start` to `end` (default EXECUTION_DATE) and run it, or only print it
+    with `dry_run`. Returns the steps.
+    """
+    end = end or start or EXECUTION_DATE
+    dates = date_range(start or end, end)
+    steps = build_graph(
+        sources or list(SOURCES), dates, load=load, checks=checks, use_async=use_async
+    )
+    logger.info(
+        f"---------------------- Run graph: {len(steps)} steps over {dates[0]} .. {dates[-1]} ----------------------"
+    )
+    if dry_run:
+        print(format_plan(steps))
+        return steps
+
+    wall_seconds = run_graph(steps, workers)
+    print(format_run_report(steps, wall_seconds))
+    print_stage_breakdown()
+    if profiling_enabled():
+        print_profiles(current_run_id())
+    return steps
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run the pipeline's extract and load steps as a graph"
+    )
+    parser.add_argument(
+        "--sources",
+        default=",".join(SOURCES),
+        help=f"comma-separated subset of {','.join(SOURCES)}",
+    )
+    parser.add_argument("--from", dest="start", help="first date, YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", help="last date, YYYY-MM-DD")
+    parser.add_argument("--workers", type=int, default=RUNNER_WORKERS)
+    parser.add_argument(
+        "--extract-only", action="store_true", help="stage data, skip the loads"
+    )
+    parser.add_argument(
+        "--skip-checks", action="store_true", help="load without the lake checks"
+    )
+    parser.add_argument("--async", dest="use_async", action="store_true")
+    parser.add_argument("--dry-run", action="store_true", help="print the plan")
+    parser.add_argument("--profile", help="profilers: cpu, sample, memory or all")
+    args = parser.parse_args(argv)
+
+    if args.profile:
+        set_profile(args.profile)
+
+    steps = run_pipeline(
+        sources=[s.strip() for s in args.sources.split(",") if s.strip()],
+        start=args.start and datetime.strptime(args.start, "%Y-%m-%d").date(),
+        end=args.end and datetime.strptime(args.end, "%Y-%m-%d").date(),
+        workers=args.workers,
+        load=not args.extract_only,
+        checks=not args.skip_checks,
+        use_async=args.use_async or None,
+        dry_run=args.dry_run,
+    )
+    return 1 if any(s.status in ("failed", "skipped") for s in steps) else 0
+
+
+if __name__ == "__main__":
+    sys.path.insert(
+        0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "snowflakes")
+    )
+    sys.exit(main())
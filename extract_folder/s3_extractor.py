@@ -1,21 +1,44 @@
 import os
+import io
 import gc
-import json
+import time
+import hashlib
 import logging
 import boto3
+from collections import deque
+from contextlib import ExitStack, nullcontext
 from datetime import datetime
 import pandas as pd
-import awswrangler as wr
 
-from utils import SOURCE_BUCKET, EXECUTION_DATE, DEST_BUCKET
+from utils import SOURCE_BUCKET, EXECUTION_DATE
 from utils import (
     clean_column_names,
     add_metadata,
     get_new_source_files,
     mark_source_files_as_processed,
-    write_to_s3_parquet,
+    write_chunk_to_s3_parquet,
     safely_normalize_json,
+    iter_csv_chunks,
+    iter_csv_records,
+    read_csv_header,
+    BoundedStream,
 )
+from batching import batcher_for
+from checkpoint import Checkpoint
+from dedup import Deduplicator
+from cpu_pool import pool_enabled, imap as cpu_imap
+from scheduler import Throughput, plan, run_task
+from source_cache import open_source
+from compression import (
+    autodetect,
+    iter_json_items,
+    matches_extension,
+    open_decompressed,
+    strip_suffix,
+)
+from async_engine import async_enabled, run as run_async
+from log_config import configure_logging, log_sampled
+from metrics import stage, timed, iter_stage
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -31,15 +54,7 @@ session_source = boto3.Session(profile_name="source", region_name="eu-north-1")
 s3_client = session_source.client("s3")
 ssm_client = session_source.client("ssm")
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="{asctime} - {levelname} - {message}",
-    style="{",
-    datefmt="%Y-%m-%d %H:%M",
-    filename="process_etl.log",
-    encoding="utf-8",
-    filemode="a",
-)
+configure_logging(__name__)
 logger = logging.getLogger(__name__)
 
 
@@ -53,18 +68,45 @@ def _list_files(prefix, suffixes=None):
         return [
             obj["Key"]
             for obj in contents
-            if any(obj["Key"].endswith(s) for s in suffixes)
+            if any(matches_extension(obj["Key"], s) for s in suffixes)
         ]
     else:
         return [obj["Key"] for obj in contents]
 
 
-def _read_csv_from_s3(key, chunk_size=50_000):
+def _read_csv_from_s3(
+    key,
+    chunk_size=50_000,
+    start_offset=0,
+    etag=None,
+    size=None,
+    raw=False,
+    end_offset=None,
+):
+    """
+    Stream a CSV object in chunks, yielding (DataFrame, end byte offset), or
+    (header, records, end byte offset) unparsed when `raw` is set. A
+    compressed object is decompressed as it streams; its offsets count
+    decompressed bytes.
+    `chunk_size` is a row count or a batching.AdaptiveBatcher.
+    A non-zero start_offset resumes after the header without re-reading the
+    chunks before it; end_offset stops at that byte (a record boundary).
+    """
     try:
-        obj = s3_client.get_object(Bucket=SOURCE_BUCKET, Key=key)
-
-        for chunk in pd.read_csv(obj["Body"], chunksize=chunk_size, low_memory=False):
-            yield chunk
+        header = None
+        if start_offset:
+            header = read_csv_header(
+                s3_client, SOURCE_BUCKET, key, etag=etag, size=size
+            )
+        with open_decompressed(
+            s3_client, SOURCE_BUCKET, key, etag=etag, size=size, start=start_offset
+        ) as stream:
+            if end_offset is not None:
+                stream = BoundedStream(stream, end_offset - start_offset)
+            chunker = iter_csv_records if raw else iter_csv_chunks
+            yield from chunker(
+                stream, chunk_size, start_offset=start_offset, header=header
+            )
 
     except Exception as e:
         logger.error(
@@ -73,15 +115,166 @@ def _read_csv_from_s3(key, chunk_size=50_000):
         raise
 
 
-def extract_customers(chunk_size=200_000):
+def _open(file_info):
+    return open_source(
+        s3_client,
+        SOURCE_BUCKET,
+        file_info["key"],
+        etag=file_info.get("etag"),
+        size=file_info["size"],
+    )
+
+
+def _source_streams(files, table):
+    """
+    (file_info, stream) of each file, opened one at a time through the local
+    cache when it is enabled. A compressed object stays compressed; the
+    parsers decompress it as they read, so no object is read whole. Each
+    stream is only valid until the next item is requested.
+    """
+    for file_info in files:
+        with ExitStack() as stack:
+            with stage("s3_download", table=table) as span:
+                stream = stack.enter_context(_open(file_info))
+                span.add(bytes=file_info["size"], files=1)
+            yield file_info, stream
+
+
+def _customer_frame(header, data):
+    """
+    Parse and normalize one customer chunk. Runs in the CPU pool.
+    """
+    with stage("csv_parse", table="customers") as span:
+        chunk = pd.read_csv(io.BytesIO(header + data), low_memory=False)
+        span.add(rows=len(chunk), bytes=len(data))
+    with stage("normalize", table="customers"):
+        chunk = clean_column_names(chunk)
+        return add_metadata(chunk, "customers")
+
+
+def _pooled_customer_chunks(key, chunk_size, start_offset, etag, size, end_offset=None):
+    """
+    Customer chunks parsed and normalized in the CPU pool, in file order.
+    Yields (DataFrame, end byte offset) like _read_csv_from_s3.
+    """
+    offsets = deque()
+
+    def records():
+        for header, data, end in _read_csv_from_s3(
+            key, chunk_size, start_offset, etag, size, raw=True, end_offset=end_offset
+        ):
+            offsets.append(end)
+            yield header, data
+
+    for chunk in cpu_imap(_customer_frame, records()):
+        yield chunk, offsets.popleft()
+
+
+def _extract_customer_file(file_info, checkpoint, chunk_size, dedup=None):
+    """
+    Stream one customer CSV into staging chunk by chunk, resuming from the
+    checkpoint. Returns the rows extracted from the file. Without a
+    chunk_size, chunks are sized to the batching memory budget. Rows `dedup`
+    has seen staged before are dropped or flagged.
+
+    A file_info with a "range" (from scheduler.split_ranges) covers only those
+    bytes, checkpointed and named as its own part.
+    """
+    key = file_info["key"]
+    version = f"{file_info['size']}:{file_info['last_modified']}"
+    stem = os.path.splitext(os.path.basename(strip_suffix(key)))[0]
+    start, end = file_info.get("range", (0, None))
+    if "range" in file_info:
+        stem = f"{stem}-p{file_info['part']:03d}"
+        key = f"{key}@{start}"
+
+    if checkpoint.is_complete(key, version, chunk_size=chunk_size):
+        logger.info("----------------------- Already extracted: %s", key)
+        return checkpoint.resume_point(key, version, chunk_size=chunk_size)[2]
+
+    chunk_num, offset, rows_done = checkpoint.resume_point(
+        key, version, chunk_size=chunk_size
+    )
+    total_rows = rows_done
+    if chunk_num:
+        logger.info(
+            "----------------------- Resuming %s at chunk %d (byte %d)",
+            key,
+            chunk_num + 1,
+            offset,
+        )
+    else:
+        logger.info("----------------------- Processing new file: %s", key)
+        offset = start
+
+    batcher = batcher_for(f"customers:{stem}", chunk_size)
+    pooled = pool_enabled()
+    reader = _pooled_customer_chunks if pooled else _read_csv_from_s3
+    chunks = iter_stage(
+        "cpu_pool" if pooled else "csv_parse",
+        reader(
+            file_info["key"],
+            batcher,
+            offset,
+            file_info.get("etag"),
+            file_info["size"],
+            end_offset=end,
+        ),
+        table="customers",
+    )
+    for chunk, offset in chunks:
+        chunk_num += 1
+        if not pooled:
+            with stage("normalize", table="customers") as span:
+                chunk = clean_column_names(chunk)
+                chunk = add_metadata(chunk, "customers")
+                span.add(rows=len(chunk))
+        # Rows count as staged for dedup once the chunk is written
+        with dedup.batch(chunk) if dedup else nullcontext(chunk) as chunk:
+            started = time.perf_counter()
+            output = None
+            if not chunk.empty:
+                output = write_chunk_to_s3_parquet(
+                    chunk,
+                    "customers",
+                    f"{stem}-{chunk_num:05d}",
+                    partition_date=checkpoint.ingestion_date,
+                )
+                batcher.observe(chunk, time.perf_counter() - started)
+
+            row_count = len(chunk)
+            total_rows += row_count
+            checkpoint.record(key, chunk_num, offset, output, row_count)
+
+        log_sampled(
+            logger,
+            "customers_chunks",
+            "------------------------- Streamed Chunk %d: %d rows",
+            chunk_num,
+            row_count,
+            every=10,
+        )
+
+        del chunk
+        gc.collect()
+
+    checkpoint.complete(key)
+    batcher.report()
+    return total_rows
+
+
+@timed("extract_customers")
+def extract_customers(chunk_size=None, use_async=None, exec_date=None):
     """
     Extract customer CSVs from S3 and return a cleaned DataFrame.
+    Chunks are sized adaptively unless a fixed chunk_size is given. Chunks
+    are staged in, and files marked processed for, exec_date (default
+    EXECUTION_DATE).
     """
     logger.info(
         "[1/3]: ....................... Extracting Customers from S3 ......................"
     )
     prefix = "customers/"
-    path = f"s3://{DEST_BUCKET}/staging/customers/"
 
     new_files = get_new_source_files(prefix, ".csv")
     if not new_files:
@@ -90,38 +283,51 @@ def extract_customers(chunk_size=200_000):
         )
         return pd.DataFrame()
 
-    total_rows = 0
-
-    for file_info in new_files:
-        logger.info(f"----------------------- Processing new file: {file_info['key']}")
+    # Each chunk goes to its own deterministic object and is recorded in the
+    # checkpoint, so a retry overwrites rather than re-appends and restarts
+    # at the first chunk that was not written
+    checkpoint = Checkpoint.load("customers", ingestion_date=exec_date)
+    dedup = Deduplicator.load("customers")
+    dedup.restore(checkpoint.outputs())
+
+    # Largest work first; huge files are split into byte ranges
+    throughput = Throughput.load()
+    tasks = plan(
+        new_files,
+        "customers",
+        throughput,
+        client=s3_client,
+        bucket=SOURCE_BUCKET,
+        splittable=True,
+    )
 
-        for chunk_num, chunk in enumerate(
-            _read_csv_from_s3(file_info["key"], chunk_size=chunk_size), 1
-        ):
-            chunk = clean_column_names(chunk)
-            chunk = add_metadata(chunk, "customers")
-
-            wr.s3.to_parquet(
-                df=chunk,
-                path=path,
-                dataset=True,
-                mode="append",
-                partition_cols=["ingestion_date"],
-                compression="snappy",
-                boto3_session=session_dest,
+    def extract_task(task):
+        return sum(
+            run_task(
+                task,
+                lambda file_info: _extract_customer_file(
+                    file_info, checkpoint, chunk_size, dedup
+                ),
+                throughput,
             )
+        )
 
-            row_count = len(chunk)
-            total_rows += row_count
+    if async_enabled(use_async):
 
-            logger.info(
-                f"------------------------- Streamed Chunk {chunk_num}: {row_count} rows"
+        async def pipeline(engine):
+            return await engine.map(
+                lambda task: engine.blocking("download", extract_task, task), tasks
             )
 
-            del chunk
-            gc.collect()
+        total_rows = sum(run_async(pipeline, s3_client, session_source))
+    else:
+        total_rows = sum(extract_task(task) for task in tasks)
 
-    mark_source_files_as_processed(new_files, EXECUTION_DATE)
+    throughput.save()
+    dedup.commit()
+    dedup.report()
+    mark_source_files_as_processed(new_files, exec_date or EXECUTION_DATE)
+    checkpoint.clear()
 
     logger.info(
         f"Loaded {total_rows} records of customers data from {len(new_files)} new zfiles into our Data Lake (s3)......................"
@@ -130,9 +336,22 @@ def extract_customers(chunk_size=200_000):
     return pd.DataFrame({"total_rows": [total_rows]})
 
 
-def extract_call_logs():
+def _parse_call_log(stream, size):
+    """
+    Parse one call log CSV from a raw, possibly compressed, stream. Runs in
+    the CPU pool when it is enabled.
+    """
+    with stage("csv_parse", table="call_logs") as span:
+        df = pd.read_csv(autodetect(stream))
+        span.add(rows=len(df), bytes=size, files=1)
+    return df
+
+
+@timed("extract_call_logs")
+def extract_call_logs(use_async=None, exec_date=None):
     """
-    Extract call logs CSVs from S3.
+    Extract call logs CSVs from S3. Files are marked processed for exec_date
+    (default EXECUTION_DATE).
     """
     logger.info(
         "[2/3]: ....................... Extracting Call Logs from S3 ......................"
@@ -149,29 +368,240 @@ def extract_call_logs():
         )
         return pd.DataFrame()
 
-    dfs = []
-    for file_info in new_files:
-        logger.info(
-            f"---------------------- Processing new file: {file_info['key']} ---------------------"
-        )
-        obj = s3_client.get_object(Bucket=SOURCE_BUCKET, Key=file_info["key"])
-        df = pd.read_csv(obj["Body"])
-        dfs.append(df)
+    # Largest files first, tiny ones batched into shared tasks
+    throughput = Throughput.load()
+    tasks = plan(new_files, "call_logs", throughput)
 
-    df = pd.concat(dfs, ignore_index=True)
-    df = clean_column_names(df)
-    df = add_metadata(df, "call_logs")
+    if async_enabled(use_async):
+
+        async def pipeline(engine):
+            async def read(task):
+                started = time.perf_counter()
+                dfs = []
+                for file_info in task["files"]:
+                    with await engine.download(
+                        SOURCE_BUCKET, file_info, table="call_logs"
+                    ) as stream:
+                        dfs.append(
+                            await engine.parse(
+                                _parse_call_log, stream, file_info["size"]
+                            )
+                        )
+                throughput.observe(
+                    "call_logs",
+                    task["bytes"],
+                    time.perf_counter() - started,
+                    len(task["files"]),
+                )
+                return dfs
+
+            return await engine.map(read, tasks)
 
-    mark_source_files_as_processed(new_files, EXECUTION_DATE)
+        dfs = [
+            df
+            for task_dfs in run_async(pipeline, s3_client, session_source)
+            for df in task_dfs
+        ]
+        throughput.save()
+    elif pool_enabled():
+        # Downloads stay in this thread, copied block by block into the
+        # pool's handoff files; parsing fans out to the CPU pool
+        dfs = list(
+            cpu_imap(
+                _parse_call_log,
+                (
+                    (stream, file_info["size"])
+                    for file_info, stream in _source_streams(
+                        [f for task in tasks for f in task["files"]], "call_logs"
+                    )
+                ),
+            )
+        )
+    else:
+        dfs = []
+        for file_info in new_files:
+            log_sampled(
+                logger,
+                "call_logs_files",
+                "---------------------- Processing new file: %s ---------------------",
+                file_info["key"],
+            )
+            with stage("csv_parse", table="call_logs") as span:
+                with open_decompressed(
+                    s3_client,
+                    SOURCE_BUCKET,
+                    file_info["key"],
+                    etag=file_info.get("etag"),
+                    size=file_info["size"],
+                ) as stream:
+                    df = pd.read_csv(stream)
+                span.add(rows=len(df), bytes=file_info["size"], files=1)
+            dfs.append(df)
+
+    with stage("normalize", table="call_logs") as span:
+        df = pd.concat(dfs, ignore_index=True)
+        df = clean_column_names(df)
+        df = add_metadata(df, "call_logs")
+        span.add(rows=len(df))
+
+    # The caller stages the returned frame; like the processed-file marks
+    # below, the dedup index is committed when it is handed over
+    dedup = Deduplicator.load("call_logs")
+    df = dedup.apply(df)
+    dedup.commit()
+    dedup.report()
+
+    mark_source_files_as_processed(new_files, exec_date or EXECUTION_DATE)
     logger.info(
         f"Loaded {len(df)} call logs from {len(new_files)} new source files)......................"
     )
     return df
 
 
-def extract_social_media():
+def _social_media_partition_date(file_key):
+    """
+    Partition date from a media_complaint_day_YYYY-MM-DD.json file name.
+    """
+    filename = strip_suffix(file_key).split("/")[-1]
+    date_str = filename.split("_")[-1].replace(".json", "")
+    return datetime.strptime(date_str, "%Y-%m-%d").date()
+
+
+def _social_media_frame(file_key, stream, size):
+    """
+    Parse and normalize one social media JSON document from a raw stream,
+    compressed or not. Elements of a top-level array are parsed one at a time
+    and normalized as they arrive, so json_parse covers both. Returns None if
+    it produced no rows.
+    """
+    dfs = []
+    with stage("json_parse", table="social_medias") as span:
+        for item in iter_json_items(autodetect(stream)):
+            try:
+                dfs.append(safely_normalize_json(item))
+            except Exception as e:
+                log_sampled(
+                    logger,
+                    "social_media_bad_items",
+                    "Warning normalizing item in list of %s: %s",
+                    file_key,
+                    e,
+                    level=logging.WARNING,
+                )
+        span.add(bytes=size)
+
+    with stage("normalize", table="social_medias") as span:
+        df = pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
+        span.add(rows=len(df))
+
+    if df is None or df.shape[0] == 0:
+        logger.warning(
+            "No rows extracted from %s after normalization. Skipping.", file_key
+        )
+        return None
+
+    df = clean_column_names(df)
+    return add_metadata(df, "social_medias")
+
+
+def _group_by_partition(files):
+    """
+    Group social media files by the ingestion_date partition they land in.
+    """
+    groups = {}
+    for file_info in files:
+        try:
+            partition_date = _social_media_partition_date(file_info["key"])
+        except ValueError as e:
+            logger.error(
+                f"********************** Skipping {file_info['key']}: {e} ************************"
+            )
+            continue
+        groups.setdefault(partition_date, []).append(file_info)
+    # A retry must batch the files in the same order
+    return {day: sorted(files, key=lambda f: f["key"]) for day, files in groups.items()}
+
+
+def _social_media_part(files):
+    """
+    (part name, version) of one partition's files in this run: the first
+    file's stem and a digest of every file's key and version. A retry of the
+    run gets the same name; files of a later run get a new one.
+    """
+    digest = hashlib.sha1()
+    for file_info in files:
+        version = file_info.get("etag") or file_info.get("last_modified")
+        digest.update(f"{file_info['key']}:{file_info['size']}:{version}\n".encode())
+    version = digest.hexdigest()
+    stem = os.path.splitext(os.path.basename(strip_suffix(files[0]["key"])))[0]
+    return f"{stem}-{version[:8]}", version
+
+
+def _social_media_sources(files):
+    """
+    (key, stream, size) of each file; a file that fails to open is logged
+    and has stream None, so the caller still counts it.
+    """
+    for file_info in files:
+        log_sampled(logger, "social_media_files", "Processing: %s", file_info["key"])
+        with ExitStack() as stack:
+            try:
+                with stage("s3_download", table="social_medias") as span:
+                    stream = stack.enter_context(_open(file_info))
+                    span.add(bytes=file_info["size"], files=1)
+            except Exception as e:
+                logger.error(
+                    f"********************** Failed to process {file_info['key']}: {e} ************************"
+                )
+                stream = None
+            yield file_info["key"], stream, file_info["size"]
+
+
+def _try_social_media_frame(file_key, stream, size):
+    """
+    _social_media_frame, logging and skipping a malformed file instead of
+    failing its whole partition. Runs in the CPU pool when it is enabled.
+    """
+    if stream is None:
+        return None
+    try:
+        return _social_media_frame(file_key, stream, size)
+    except Exception as e:
+        logger.error(
+            f"********************** Failed to process {file_key}: {e} ************************"
+        )
+        return None
+
+
+def _write_social_media(frames, partition_date, part_name, dedup=None):
+    """
+    Write one batch of a partition's rows in a single write, to the
+    deterministic objects of `part_name`. Other runs' objects in the
+    partition are left alone, and a retried batch overwrites its earlier
+    attempt instead of appending a copy. Rows already staged are dropped
+    first. Returns (rows written, paths).
+    """
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    # Rows count as staged for dedup once the write succeeded
+    with dedup.batch(df) if dedup else nullcontext(df) as df:
+        if df.empty:
+            return 0, []
+        paths = write_chunk_to_s3_parquet(
+            df, "social_medias", part_name, partition_date=partition_date
+        )
+    return len(df), paths
+
+
+@timed("extract_social_media")
+def extract_social_media(use_async=None, chunk_size=None, exec_date=None):
     """
     Extract social media json from S3 and load to destination S3.
+    Files for the same day are combined so each partition is written once,
+    or, past the batch size (adaptive unless chunk_size is given), in as few
+    batches as fit the memory budget. Each batch is a deterministic part
+    recorded in the checkpoint, so a retried run skips the batches it wrote
+    and overwrites the rest. Files are marked processed for exec_date
+    (default EXECUTION_DATE).
     """
     logger.info(
         "[3/3]: ..................... Extracting Social Media data from S3 ....................."
@@ -186,96 +616,166 @@ def extract_social_media():
         )
         return 0
 
-    total_rows = 0
-
-    for idx, file_info in enumerate(new_files):
-        file_key = file_info["key"]
-        logger.info(f"[{idx+1}/{len(new_files)}] Processing: {file_key}")
-
-        try:
-            # Extract date from filename
-            filename = file_key.split("/")[-1]
-            date_str = filename.split("_")[-1].replace(".json", "")
-            partition_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-
-            obj = s3_client.get_object(Bucket=SOURCE_BUCKET, Key=file_key)
-            data = json.loads(obj["Body"].read())
-
-            if isinstance(data, list):
-                # normalize each element safely and concat
-                dfs = []
-                for item in data:
+    groups = _group_by_partition(new_files)
+    # Each batch of a partition is recorded with the files it covers, so a
+    # retry skips the written batches and rewrites the same objects for the
+    # rest
+    checkpoint = Checkpoint.load("social_medias")
+    dedup = Deduplicator.load("social_medias")
+    dedup.restore(checkpoint.outputs())
+    # Partitions whose write failed: their files are retried by the next run
+    failed = set()
+
+    if async_enabled(use_async):
+
+        async def pipeline(engine):
+            async def read(file_info):
+                file_key = file_info["key"]
+                try:
+                    with await engine.download(
+                        SOURCE_BUCKET, file_info, table="social_medias"
+                    ) as stream:
+                        return await engine.parse(
+                            _social_media_frame, file_key, stream, file_info["size"]
+                        )
+                except Exception as e:
+                    logger.error(
+                        f"********************** Failed to process {file_key}: {e} ************************"
+                    )
+                    return None
+
+            async def process(group):
+                partition_date, files = group
+                source = f"ingestion_date={partition_date}"
+                part, version = _social_media_part(files)
+                batch, done, rows_done = checkpoint.resume_point(source, version)
+                if checkpoint.is_complete(source, version):
+                    return rows_done
+                frames = [
+                    df for df in await engine.map(read, files[done:]) if df is not None
+                ]
+                rows = 0
+                if frames:
                     try:
-                        dfs.append(safely_normalize_json(item))
+                        rows, output = await engine.upload(
+                            _write_social_media,
+                            frames,
+                            partition_date,
+                            f"{part}-{batch + 1:03d}",
+                            dedup,
+                        )
                     except Exception as e:
-                        logger.warning(
-                            f"Warning normalizing item in list of {file_key}: {e}"
+                        logger.error(
+                            f"********************** Failed to write partition {partition_date}: {e} ************************"
                         )
-                df = pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
-            else:
-                df = safely_normalize_json(data)
+                        failed.add(partition_date)
+                        return rows_done
+                    checkpoint.record(source, batch + 1, len(files), output, rows)
+                checkpoint.complete(source)
+                return rows_done + rows
+
+            # Biggest partitions first, so the last to start is a small one
+            return await engine.map(
+                process,
+                sorted(
+                    groups.items(),
+                    key=lambda group: -sum(f["size"] for f in group[1]),
+                ),
+            )
 
-            if df is None or df.shape[0] == 0:
-                logger.warning(
-                    f"No rows extracted from {file_key} after normalization. Skipping."
-                )
+        total_rows = sum(run_async(pipeline, s3_client, session_source))
+    else:
+        # Frames of a partition are written together until they reach the
+        # batch size; each batch goes to its own part of the partition. A
+        # partition under the batch size is written once, a larger one in
+        # parts, so memory stays bounded at the cost of a few more objects
+        batcher = batcher_for("social_medias", chunk_size)
+        total_rows = 0
+
+        def flush(frames, partition_date, part_name):
+            started = time.perf_counter()
+            rows_processed, output = _write_social_media(
+                frames, partition_date, part_name, dedup
+            )
+            batcher.observe(
+                frames[0] if len(frames) == 1 else pd.concat(frames),
+                time.perf_counter() - started,
+            )
+            log_sampled(
+                logger,
+                "social_media_writes",
+                "----------------------------------- Wrote %d rows for %s from %d file(s). Total: %d",
+                rows_processed,
+                partition_date,
+                len(frames),
+                total_rows + rows_processed,
+            )
+            return rows_processed, output
+
+        for partition_date, files in sorted(groups.items()):
+            source = f"ingestion_date={partition_date}"
+            part, version = _social_media_part(files)
+            batch, done, rows_done = checkpoint.resume_point(source, version)
+            total_rows += rows_done
+            if checkpoint.is_complete(source, version):
                 continue
-
-            df = clean_column_names(df)
-            df = add_metadata(df, "social_medias")
-
-            # Check if partition already exists in destination S3
-            partition_path = f"s3://{DEST_BUCKET}/staging/social_medias/media_complaint_day_{partition_date}"
-
-            try:
-                # Try to read existing partition to check if it exists
-                existing_files = wr.s3.list_objects(partition_path)
-                partition_exists = len(existing_files) > 0
-            except:
-                partition_exists = False
-
-            if partition_exists:
-                mode = "append"
-                logger.info(
-                    f"-------------------------------- Partition {partition_date} exists: APPENDING"
-                )
-            else:
-                mode = "overwrite_partitions"
+            if batch:
                 logger.info(
-                    f"---------------------------- New partition {partition_date}: OVERWRITING"
+                    "----------------------- Resuming %s at batch %d (file %d of %d)",
+                    partition_date,
+                    batch + 1,
+                    done + 1,
+                    len(files),
                 )
 
-            write_to_s3_parquet(
-                df=df,
-                table_name="social_medias",
-                mode=mode,
-                partition_date=partition_date,
-            )
-
-            rows_processed = len(df)
-            total_rows += rows_processed
-            logger.info(
-                f"----------------------------------- Wrote {rows_processed} rows. Total: {total_rows}"
-            )
+            frames, buffered = [], 0
+            try:
+                for df in cpu_imap(
+                    _try_social_media_frame, _social_media_sources(files[done:])
+                ):
+                    done += 1
+                    if df is not None:
+                        frames.append(df)
+                        buffered += len(df)
+                    if frames and (buffered >= batcher.rows or done == len(files)):
+                        batch += 1
+                        rows, output = flush(
+                            frames, partition_date, f"{part}-{batch:03d}"
+                        )
+                        checkpoint.record(source, batch, done, output, rows)
+                        total_rows += rows
+                        frames, buffered = [], 0
+                        gc.collect()
+            except Exception as e:
+                logger.error(
+                    f"********************** Failed to write partition {partition_date}: {e} ************************"
+                )
+                failed.add(partition_date)
+                continue
+            checkpoint.complete(source)
 
-            del df, data, obj
+            del frames
             gc.collect()
+        batcher.report()
 
-        except Exception as e:
-            logger.error(
-                f"********************** Failed to process {file_key}: {e} ************************"
-            )
-            continue
+    dedup.commit()
+    dedup.report()
 
     # Mark files as processed only after successful completion
-    if total_rows > 0:
-        mark_source_files_as_processed(new_files, EXECUTION_DATE)
+    retried = {f["key"] for d in failed for f in groups[d]}
+    written = [f for f in new_files if f["key"] not in retried]
+    if written and (total_rows > 0 or dedup.duplicates):
+        mark_source_files_as_processed(written, exec_date or EXECUTION_DATE)
         logger.info(
-            f"--------------------- SUCCESS: Loaded {total_rows} records from {len(new_files)} files ------------------------"
+            f"--------------------- SUCCESS: Loaded {total_rows} records from {len(written)} files ------------------------"
         )
     else:
         logger.warning(
             "_____________________________ No rows were processed _____________________________"
         )
+    # A failed partition resumes after its written batches; once every
+    # partition is written the files are not retried from their batches
+    if not failed:
+        checkpoint.clear()
 
     return total_rows
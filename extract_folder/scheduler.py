@@ -0,0 +1,250 @@
+import os
+import json
+import time
+import heapq
+import logging
+import threading
+
+from datetime import datetime, timezone
+from log_config import configure_logging
+from source_cache import read_range
+from compression import is_compressed
+from utils import s3_client_1, DEST_BUCKET
+
+configure_logging(__name__)
+logger = logging.getLogger(__name__)
+
+
+# Scheduler Constants
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+# Files below this are batched together into one task
+SCHEDULE_SMALL_FILE_BYTES = int(
+    float(os.getenv("SCHEDULE_SMALL_FILE_MB", "1")) * 1024**2
+)
+SCHEDULE_BATCH_BYTES = int(float(os.getenv("SCHEDULE_BATCH_MB", "16")) * 1024**2)
+# Splittable files above this are cut into byte ranges of about this size.
+# Keep it unchanged between a failed run and its retry: the ranges are
+# checkpointed separately
+SCHEDULE_SPLIT_BYTES = int(float(os.getenv("SCHEDULE_SPLIT_MB", "256")) * 1024**2)
+SCHEDULE_WORKERS = int(os.getenv("SCHEDULE_WORKERS", "8"))
+# Cost model used until a source has history
+DEFAULT_BYTES_PER_SECOND = float(os.getenv("SCHEDULE_DEFAULT_MB_PER_SEC", "20")) * 1e6
+FILE_OVERHEAD_SECONDS = float(os.getenv("SCHEDULE_FILE_OVERHEAD_SECONDS", "0.05"))
+
+THROUGHPUT_KEY = "metadata/throughput.json"
+# Bytes searched after a split point for the next record boundary
+BOUNDARY_WINDOW = 1 << 16
+
+
+def scheduler_enabled(flag=None):
+    return SCHEDULER_ENABLED if flag is None else flag
+
+
+class Throughput:
+    """
+    Per-source processing rate (bytes per second of one task), learned from
+    earlier runs and persisted in the destination bucket. Turns listed sizes
+    into estimated task durations.
+    """
+
+    def __init__(self, rates=None):
+        self.rates = rates or {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls):
+        try:
+            obj = s3_client_1.get_object(Bucket=DEST_BUCKET, Key=THROUGHPUT_KEY)
+            return cls(json.loads(obj["Body"].read()).get("sources", {}))
+        except s3_client_1.exceptions.NoSuchKey:
+            return cls()
+
+    def bytes_per_second(self, source):
+        return self.rates.get(source, {}).get(
+            "bytes_per_second", DEFAULT_BYTES_PER_SECOND
+        )
+
+    def estimate(self, source, size, files=1):
+        """
+        Seconds one worker needs for `files` files totalling `size` bytes.
+        """
+        return files * FILE_OVERHEAD_SECONDS + size / self.bytes_per_second(source)
+
+    def observe(self, source, size, seconds, files=1):
+        """
+        Fold a finished task into the source's rate (exponential average).
+        """
+        working = seconds - files * FILE_OVERHEAD_SECONDS
+        if size <= 0 or working <= 0:
+            return
+        with self._lock:
+            entry = self.rates.setdefault(
+                source, {"bytes_per_second": size / working, "tasks": 0}
+            )
+            entry["bytes_per_second"] = (
+                0.7 * entry["bytes_per_second"] + 0.3 * size / working
+            )
+            entry["tasks"] += 1
+
+    def save(self):
+        with self._lock:
+            body = json.dumps(
+                {
+                    "sources": self.rates,
+                    "updated_at": datetime.now(timezone.utc).isoformat(),
+                },
+                indent=2,
+            )
+        s3_client_1.put_object(Bucket=DEST_BUCKET, Key=THROUGHPUT_KEY, Body=body)
+
+
+# ==================== PLANNING ====================
+def work_bytes(file_info):
+    """
+    Bytes a file, or the byte range of one, contributes to its task.
+    """
+    if "range" in file_info:
+        return file_info["range"][1] - file_info["range"][0]
+    return file_info["size"]
+
+
+def _task(source, files, throughput):
+    size = sum(work_bytes(f) for f in files)
+    return {
+        "source": source,
+        "files": files,
+        "bytes": size,
+        "cost": throughput.estimate(source, size, len(files)),
+    }
+
+
+def split_ranges(file_info, client, bucket, split_bytes=None):
+    """
+    Cut a newline-delimited file into pieces of about `split_bytes`, each
+    starting on a record boundary found with a small ranged GET. Returns
+    copies of file_info with "range": [start, end) and "part"; "size" stays
+    the object's size. A record boundary is the first newline after the
+    split point, so files whose quoted fields contain newlines must not be
+    split. A compressed file cannot be read from the middle and is returned
+    whole.
+    """
+    if is_compressed(client, bucket, file_info):
+        return [file_info]
+    split_bytes = split_bytes or SCHEDULE_SPLIT_BYTES
+    size = file_info["size"]
+    count = -(-size // split_bytes)
+    bounds = [0]
+    for i in range(1, count):
+        point = i * size // count
+        window = read_range(
+            client,
+            bucket,
+            file_info["key"],
+            point,
+            min(point + BOUNDARY_WINDOW, size) - 1,
+            etag=file_info.get("etag"),
+            size=size,
+        )
+        newline = window.find(b"\n")
+        if newline != -1 and point + newline + 1 < size:
+            bounds.append(point + newline + 1)
+    bounds.append(size)
+    return [
+        dict(file_info, range=[start, end], part=part)
+        for part, (start, end) in enumerate(zip(bounds, bounds[1:]))
+    ]
+
+
+def plan(
+    files,
+    source,
+    throughput=None,
+    client=None,
+    bucket=None,
+    splittable=False,
+    workers=None,
+    enabled=None,
+):
+    """
+    Turn listed files into tasks ordered longest-processing-time first, so
+    the largest work starts first and no giant file is left for the end.
+    Splittable files above SCHEDULE_SPLIT_BYTES become byte-range pieces and
+    files below SCHEDULE_SMALL_FILE_BYTES are batched into tasks of up to
+    SCHEDULE_BATCH_BYTES. With the scheduler disabled every file is its own
+    task, in listing order.
+
+    A task is {"source", "files", "bytes", "cost"}: its files are processed
+    one after another by one worker.
+    """
+    throughput = throughput or Throughput()
+    if not scheduler_enabled(enabled):
+        return [_task(source, [f], throughput) for f in files]
+
+    pieces, small = [], []
+    for file_info in files:
+        if splittable and client and file_info["size"] > SCHEDULE_SPLIT_BYTES:
+            pieces += split_ranges(file_info, client, bucket)
+        elif file_info["size"] < SCHEDULE_SMALL_FILE_BYTES:
+            small.append(file_info)
+        else:
+            pieces.append(file_info)
+
+    tasks = [_task(source, [p], throughput) for p in pieces]
+    batch = []
+    for file_info in sorted(small, key=lambda f: -f["size"]):
+        if (
+            batch
+            and sum(f["size"] for f in batch) + file_info["size"] > SCHEDULE_BATCH_BYTES
+        ):
+            tasks.append(_task(source, batch, throughput))
+            batch = []
+        batch.append(file_info)
+    if batch:
+        tasks.append(_task(source, batch, throughput))
+    tasks.sort(key=lambda t: -t["cost"])
+
+    workers = workers or SCHEDULE_WORKERS
+    listing = makespan([_task(source, [f], throughput) for f in files], workers)
+    logger.info(
+        "------------------------ Scheduled %d %s files as %d tasks (%d ranges, %d batched): "
+        "estimated makespan %.1fs on %d workers, %.1fs in listing order ------------------------",
+        len(files),
+        source,
+        len(tasks),
+        sum(1 for p in pieces if "range" in p),
+        len(small),
+        makespan(tasks, workers),
+        workers,
+        listing,
+    )
+    return tasks
+
+
+def makespan(tasks, workers):
+    """
+    Finish time of `tasks` started in order on `workers` workers, each task
+    going to the first worker that is free, as the async engine's semaphores
+    hand them out.
+    """
+    free = [0.0] * max(1, workers)
+    for task in tasks:
+        start = heapq.heappop(free)
+        heapq.heappush(free, start + task["cost"])
+    return max(free)
+
+
+def run_task(task, func, throughput=None):
+    """
+    func(file_info) for each file of the task in turn, timing the task into
+    `throughput`. Returns the list of results.
+    """
+    started = time.perf_counter()
+    results = [func(file_info) for file_info in task["files"]]
+    if throughput is not None:
+        throughput.observe(
+            task["source"],
+            task["bytes"],
+            time.perf_counter() - started,
+            len(task["files"]),
+        )
+    return results
@@ -0,0 +1,284 @@
+import os
+import io
+import mmap
+import uuid
+import fcntl
+import hashlib
+import logging
+import threading
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from contextlib import contextmanager
+from log_config import configure_logging
+from metrics import stage
+
+configure_logging(__name__)
+logger = logging.getLogger(__name__)
+
+
+# Cache Constants: unset SOURCE_CACHE_DIR keeps the cache off
+SOURCE_CACHE_DIR = os.getenv("SOURCE_CACHE_DIR")
+SOURCE_CACHE_MAX_BYTES = int(os.getenv("SOURCE_CACHE_MAX_BYTES", str(10 * 1024**3)))
+
+_DOWNLOAD_BLOCK = 8 * 1024 * 1024
+_stats_lock = threading.Lock()
+_stats = {
+    "hits": 0,
+    "misses": 0,
+    "bytes_served": 0,
+    "bytes_downloaded": 0,
+    "evictions": 0,
+}
+_cache = None
+
+
+def _count(**values):
+    with _stats_lock:
+        for name, value in values.items():
+            _stats[name] += value
+
+
+def stats():
+    """
+    Hit/miss totals for this process.
+    """
+    with _stats_lock:
+        data = dict(_stats)
+    lookups = data["hits"] + data["misses"]
+    data["hit_rate"] = round(data["hits"] / lookups, 4) if lookups else None
+    return data
+
+
+def cache_key(*parts):
+    """
+    Content address of a source version, e.g. (bucket, key, etag, size).
+    """
+    return hashlib.sha256("\x1f".join(str(p) for p in parts).encode()).hexdigest()
+
+
+class SourceCache:
+    """
+    On-disk cache of source objects under a byte budget.
+
+    Entries are immutable files named by cache_key, so a changed source object
+    (new ETag or size) simply gets a new entry. Files are published with an
+    atomic rename and read through mmap: concurrent readers never see a partial
+    file, and an entry evicted while mapped stays readable until it is closed.
+    Eviction is least-recently-used by mtime, which every hit refreshes.
+    """
+
+    def __init__(self, root, max_bytes=SOURCE_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, digest, suffix=""):
+        return os.path.join(self.root, digest[:2], digest + suffix)
+
+    def lookup(self, digest, suffix=""):
+        """
+        Path of a cached entry, refreshing its LRU position, or None.
+        """
+        path = self.path(digest, suffix)
+        try:
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            return None
+
+    def temp_path(self):
+        return os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+
+    def publish(self, tmp, digest, suffix=""):
+        """
+        Atomically move a fully written temporary file into place as an entry.
+        """
+        final = self.path(digest, suffix)
+        os.makedirs(os.path.dirname(final), exist_ok=True)
+        os.replace(tmp, final)
+        self.evict(keep=final)
+        return final
+
+    def fetch(self, client, bucket, key, etag=None, size=None):
+        """
+        Local path of an S3 object, downloading it on a miss.
+        """
+        if etag is None or size is None:
+            head = client.head_object(Bucket=bucket, Key=key)
+            etag, size = head["ETag"], head["ContentLength"]
+        digest = cache_key(bucket, key, etag, size)
+
+        with stage("source_cache", bucket=bucket) as span:
+            path = self.lookup(digest)
+            if path is not None:
+                span.add(hits=1, bytes=size)
+                _count(hits=1, bytes_served=size)
+                return path
+
+            span.add(misses=1, bytes=size)
+            _count(misses=1, bytes_downloaded=size)
+            tmp = self.temp_path()
+            try:
+                body = client.get_object(Bucket=bucket, Key=key, IfMatch=etag)["Body"]
+                with open(tmp, "wb") as f:
+                    for block in iter(lambda: body.read(_DOWNLOAD_BLOCK), b""):
+                        f.write(block)
+                return self.publish(tmp, digest)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+    def evict(self, keep=None):
+        """
+        Drop least recently used entries until the cache fits its budget,
+        sparing `keep` (the entry just written). One process evicts at a time;
+        readers are never blocked.
+        """
+        with open(os.path.join(self.root, ".lock"), "a") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+
+            entries, total = [], 0
+            for shard in os.scandir(self.root):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if entry.path == keep:
+                        continue
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+                    total += st.st_size
+            if keep is not None and os.path.exists(keep):
+                total += os.path.getsize(keep)
+
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                total -= size
+                _count(evictions=1)
+                logger.debug("Evicted %s from source cache", path)
+
+
+def get_cache():
+    """
+    The process-wide cache, or None when SOURCE_CACHE_DIR is not set.
+    """
+    global _cache
+    if _cache is None and SOURCE_CACHE_DIR:
+        _cache = SourceCache(SOURCE_CACHE_DIR)
+        logger.info(
+            "------------------------ Source cache enabled at %s (%.1f GB budget) ------------------------",
+            SOURCE_CACHE_DIR,
+            SOURCE_CACHE_MAX_BYTES / 1024**3,
+        )
+    return _cache
+
+
+def _mapped(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return io.BytesIO(b"")
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+@contextmanager
+def open_source(client, bucket, key, etag=None, size=None, start=0):
+    """
+    Readable binary stream of an S3 object positioned at byte `start`.
+
+    With the cache enabled this is a read-only memory map of the local copy;
+    otherwise it is the (ranged) S3 response body.
+    """
+    cache = get_cache()
+    if cache is not None:
+        stream = _mapped(cache.fetch(client, bucket, key, etag=etag, size=size))
+        stream.seek(start)
+    else:
+        kwargs = {"Range": f"bytes={start}-"} if start else {}
+        stream = client.get_object(Bucket=bucket, Key=key, **kwargs)["Body"]
+    try:
+        yield stream
+    finally:
+        if hasattr(stream, "close"):
+            stream.close()
+
+
+def read_range(client, bucket, key, start, end, etag=None, size=None):
+    """
+    Bytes [start, end] of an S3 object, from the cache when enabled.
+    """
+    cache = get_cache()
+    if cache is None:
+        obj = client.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end}")
+        return obj["Body"].read()
+    with open_source(client, bucket, key, etag=etag, size=size, start=start) as stream:
+        return stream.read(end - start + 1)
+
+
+def cached_frames(digest, produce, chunk_size, skip_rows=0):
+    """
+    Yield the DataFrame chunks of a query result, replaying a cached Parquet
+    copy when one exists under `digest`. On a miss the chunks come from
+    produce() and are written to the cache as they stream, so the copy is
+    published only if the whole result was read.
+    """
+    cache = get_cache()
+    if cache is None:
+        yield from produce()
+        return
+
+    with stage("source_cache", source="query") as span:
+        path = cache.lookup(digest, ".parquet")
+        span.add(**({"hits": 1} if path else {"misses": 1}))
+    _count(**({"hits": 1} if path else {"misses": 1}))
+
+    if path is not None:
+        parquet = pq.ParquetFile(path)
+        for batch in parquet.iter_batches(batch_size=chunk_size):
+            if skip_rows >= batch.num_rows:
+                skip_rows -= batch.num_rows
+                continue
+            df = batch.slice(skip_rows).to_pandas()
+            skip_rows = 0
+            _count(bytes_served=int(df.memory_usage(deep=False).sum()))
+            yield df
+        return
+
+    if skip_rows:
+        # A resumed query only sees part of the result, which must not be cached
+        yield from produce()
+        return
+
+    tmp = cache.temp_path()
+    writer = None
+    cacheable = True
+    try:
+        for df in produce():
+            if cacheable:
+                try:
+                    table = pa.Table.from_pandas(df, preserve_index=False)
+                    if writer is None:
+                        writer = pq.ParquetWriter(tmp, table.schema)
+                    writer.write_table(table.cast(writer.schema))
+                except (pa.ArrowException, ValueError) as e:
+                    logger.warning("Not caching query result %s: %s", digest, e)
+                    cacheable = False
+            yield df
+        if writer is not None:
+            writer.close()
+            writer = None
+            if cacheable:
+                cache.publish(tmp, digest, ".parquet")
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp):
+            os.remove(tmp)
@@ -1,12 +1,32 @@
 import os
+import io
 import json
+import time
+import random
 import pandas as pd
 import boto3
 import logging
+import threading
 import awswrangler as wr
+import pyarrow.parquet as pq
 
+from botocore.exceptions import ClientError
 from datetime import datetime
 from dotenv import load_dotenv
+from log_config import configure_logging, LogSummary
+from metrics import stage, incr
+from parquet_profiles import profile_for, sort_frame, writer_args, file_suffix
+from source_cache import read_range
+from compression import codec_for, matches_extension, open_decompressed, sniff
+from partitioning import layout_for
+from aggregates import (
+    AGGREGATES_PREFIX,
+    AGGREGATES_TABLE,
+    aggregates_enabled,
+    finalize,
+    merge_partials,
+    partial_aggregates,
+)
 
 load_dotenv()
 
@@ -25,15 +45,7 @@ s3_client_2 = session_source.client("s3")
 ssm_client_2 = session_source.client("ssm")
 
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="{asctime} - {levelname} - {message}",
-    style="{",
-    datefmt="%Y-%m-%d %H:%M",
-    filename="process_etl.log",
-    encoding="utf-8",
-    filemode="a",
-)
+configure_logging(__name__)
 logger = logging.getLogger(__name__)
 
 
@@ -42,26 +54,38 @@ SOURCE_BUCKET = os.getenv("SOURCE_BUCKET")
 DEST_BUCKET = os.getenv("DEST_BUCKET")
 EXECUTION_DATE = datetime.now().date()
 
+# Tracker Constants: every commit is a conditional write against the ETag
+# it read, so extractors in other processes or tasks cannot overwrite each
+# other's entries; a conflicting commit re-reads, re-applies and retries
+TRACKER_KEY = "metadata/processed_source_files.json"
+TRACKER_MAX_RETRIES = int(os.getenv("TRACKER_MAX_RETRIES", "10"))
+TRACKER_RETRY_BASE_SECONDS = float(os.getenv("TRACKER_RETRY_BASE_SECONDS", "0.05"))
+
+# Extractors running concurrently in one process queue up here instead of
+# conflicting with each other on S3
+_tracker_lock = threading.Lock()
+
 
 # ==================== SOURCE FILE TRACKING ====================
-def load_processed_files_tracker():
+def _read_tracker():
     """
-    Load the list of source files we've already processed.
+    The tracker and its ETag, or ({}, None) when there is none yet.
     """
     try:
-        obj = s3_client_1.get_object(
-            Bucket=DEST_BUCKET, Key="metadata/processed_source_files.json"
-        )
-        data = json.loads(obj["Body"].read())
+        with stage("tracker_load") as span:
+            obj = s3_client_1.get_object(Bucket=DEST_BUCKET, Key=TRACKER_KEY)
+            body = obj["Body"].read()
+            data = json.loads(body)
+            span.add(bytes=len(body), files=len(data))
         logger.info(
             f"------------------------------ Loaded tracker: {len(data)} source files already processed ------------------------"
         )
-        return data
+        return data, obj.get("ETag")
     except s3_client_1.exceptions.NoSuchKey:
         logger.info(
             f"-------------------------- No tracker file found in the destination folder: Starting fresh --------------------------"
         )
-        return {}
+        return {}, None
     except Exception as e:
         logger.exception(
             f"------------------------ Error loading tracker due to {e} --------------------------"
@@ -69,35 +93,72 @@ def load_processed_files_tracker():
         raise
 
 
-def save_processed_files_tracker(tracker_data):
-    """Save the updated tracker to S3."""
-    s3_client_1.put_object(
-        Bucket=DEST_BUCKET,
-        Key="metadata/processed_source_files.json",
-        Body=json.dumps(tracker_data, indent=2),
-        ContentType="application/json",
-    )
+def load_processed_files_tracker():
+    """
+    Load the list of source files we've already processed.
+    """
+    return _read_tracker()[0]
+
+
+def save_processed_files_tracker(tracker_data, etag=None, create=False):
+    """
+    Save the updated tracker to S3. With `etag` the write only succeeds if
+    the tracker is still that version, and with `create` only if there is
+    no tracker yet; otherwise it raises ClientError (PreconditionFailed).
+    """
+    conditions = {}
+    if etag:
+        conditions["IfMatch"] = etag
+    elif create:
+        conditions["IfNoneMatch"] = "*"
+    with stage("tracker_save") as span:
+        body = json.dumps(tracker_data, indent=2)
+        s3_client_1.put_object(
+            Bucket=DEST_BUCKET,
+            Key=TRACKER_KEY,
+            Body=body,
+            ContentType="application/json",
+            **conditions,
+        )
+        span.add(bytes=len(body), files=len(tracker_data))
     logger.info(
         f"---------------------------- Saved tracker: {len(tracker_data)} source files ------------------------"
     )
 
 
-def get_new_source_files(prefix, file_extension=None):
+def _is_write_conflict(error):
     """
-    Get only new source files that haven't been processed yet.
+    Whether a conditional put lost to another writer: 412 when the object
+    changed, 409 when S3 saw two conditional writes at the same time.
     """
-    response = s3_client_2.list_objects_v2(Bucket=SOURCE_BUCKET, Prefix=prefix)
-    all_source_files = []
+    code = error.response.get("Error", {}).get("Code")
+    status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    return code in ("PreconditionFailed", "ConditionalRequestConflict") or status in (
+        409,
+        412,
+    )
 
-    for obj in response.get("Contents", []):
-        if obj["Key"].endswith(file_extension):
-            all_source_files.append(
-                {
-                    "key": obj["Key"],
-                    "last_modified": obj["LastModified"].isoformat(),
-                    "size": obj["Size"],
-                }
-            )
+
+def get_new_source_files(prefix, file_extension=None):
+    """
+    Get only new source files that haven't been processed yet. Compressed
+    files (e.g. .csv.gz) match their uncompressed extension.
+    """
+    with stage("s3_list", prefix=prefix) as span:
+        response = s3_client_2.list_objects_v2(Bucket=SOURCE_BUCKET, Prefix=prefix)
+        all_source_files = []
+
+        for obj in response.get("Contents", []):
+            if matches_extension(obj["Key"], file_extension):
+                all_source_files.append(
+                    {
+                        "key": obj["Key"],
+                        "last_modified": obj["LastModified"].isoformat(),
+                        "size": obj["Size"],
+                        "etag": obj.get("ETag"),
+                    }
+                )
+        span.add(files=len(all_source_files))
 
     logger.info(
         f"---------------------- Total source files in {prefix}: {len(all_source_files)} ------------------------"
@@ -105,17 +166,21 @@ def get_new_source_files(prefix, file_extension=None):
 
     tracker = load_processed_files_tracker()
 
+    # One summary line each instead of a line per file: the SKIP list grows
+    # with the whole tracker history
+    new = LogSummary(logger, f"NEW files under {prefix}")
+    skipped = LogSummary(logger, f"SKIP files under {prefix} already processed")
+
     new_files = []
     for file_info in all_source_files:
         if file_info["key"] not in tracker:
             new_files.append(file_info)
-            logger.info(
-                f"-------------------------- NEW: {file_info['key']} processed -----------------------"
-            )
+            new.add(file_info["key"])
         else:
-            logger.info(
-                f"SKIP: {file_info['key']} already processed on {tracker[file_info['key']]['processed_date']})"
-            )
+            skipped.add(file_info["key"], tracker[file_info["key"]]["processed_date"])
+
+    new.flush(prefix=prefix)
+    skipped.flush(prefix=prefix)
 
     logger.info(
         f"----------------------- Result: {len(new_files)} new files to process ---------------------"
@@ -125,19 +190,38 @@ def get_new_source_files(prefix, file_extension=None):
 
 def mark_source_files_as_processed(files, execution_date):
     """
-    Mark source files as processed in the tracker.
+    Mark source files as processed in the tracker. The entries are applied
+    to the latest tracker and written back only if nobody else committed in
+    between; on a conflict they are applied again to the newer version,
+    with jittered backoff, up to TRACKER_MAX_RETRIES times.
     """
-    tracker = load_processed_files_tracker()
-
-    for file_info in files:
-        tracker[file_info["key"]] = {
+    entries = {
+        file_info["key"]: {
             "processed_date": execution_date.isoformat(),
             "processed_timestamp": datetime.now().isoformat(),
             "file_size": file_info.get("size", 0),
             "source_last_modified": file_info.get("last_modified"),
         }
-
-    save_processed_files_tracker(tracker)
+        for file_info in files
+    }
+
+    with _tracker_lock, stage("tracker_commit") as span:
+        for attempt in range(TRACKER_MAX_RETRIES + 1):
+            tracker, etag = _read_tracker()
+            tracker.update(entries)
+            try:
+                save_processed_files_tracker(tracker, etag=etag, create=etag is None)
+                break
+            except ClientError as e:
+                if not _is_write_conflict(e) or attempt == TRACKER_MAX_RETRIES:
+                    raise
+                incr("conflicts")
+                delay = TRACKER_RETRY_BASE_SECONDS * 2 ** min(attempt, 6)
+                logger.warning(
+                    f"------------------------- Tracker changed while committing, retrying ({attempt + 1}/{TRACKER_MAX_RETRIES}) -------------------------"
+                )
+                time.sleep(random.uniform(0, delay))
+        span.add(files=len(entries))
     logger.info(
         f"------------------------- Marked {len(files)} files as processed -------------------------"
     )
@@ -165,12 +249,14 @@ def add_metadata(df, source_name):
 
 def write_to_s3_parquet(df, table_name, mode=None, partition_date=None):
     """
-    Write DataFrame to S3 as Parquet. Overwrites partitions for idempotency.
+    Write DataFrame to S3 as Parquet with the table's encoding profile,
+    partitioned by ingestion_date and the levels of its partition layout.
+    Overwrites partitions for idempotency unless another mode is given.
     """
 
-    mode = "overwrite_partitions" or mode
+    mode = mode or "overwrite_partitions"
     if df is None or df.empty:
-        logger.error(f"Empty DataFrame for {table_name}, skipping...................")
+        logger.error("Empty DataFrame for %s, skipping...................", table_name)
         return
 
     if partition_date:
@@ -178,16 +264,319 @@ def write_to_s3_parquet(df, table_name, mode=None, partition_date=None):
         df["ingestion_date"] = partition_date
 
     path = f"s3://{DEST_BUCKET}/staging/{table_name}/"
-    wr.s3.to_parquet(
-        df=df,
-        path=path,
-        boto3_session=session_dest,
-        dataset=True,
-        mode=mode,
-        partition_cols=["ingestion_date"],
-        compression="snappy",
+    profile = profile_for(table_name)
+    layout = layout_for(table_name)
+    with stage("parquet_write", table=table_name) as span:
+        df = sort_frame(layout.apply(df), profile)
+        written = wr.s3.to_parquet(
+            df=df,
+            path=path,
+            boto3_session=session_dest,
+            dataset=True,
+            mode=mode,
+            partition_cols=layout.columns,
+            **writer_args(df.drop(columns=layout.columns), profile),
+        )
+        span.add(rows=len(df), files=len(written["paths"]))
+    logger.info("Successfully wrote %d rows to %s...................", len(df), path)
+
+    if aggregates_enabled(table_name):
+        write_partial_aggregates(df, table_name, mode=mode)
+
+
+def write_chunk_to_s3_parquet(df, table_name, part_name, partition_date=None):
+    """
+    Write one chunk to deterministic objects in its ingestion_date partition,
+    one per sub-partition of the table's layout. A retried chunk overwrites
+    its earlier attempt instead of appending a copy, as long as the table's
+    codec and layout are unchanged. Returns the paths written.
+    """
+    partition_date = partition_date or EXECUTION_DATE
+    profile = profile_for(table_name)
+    layout = layout_for(table_name)
+    base = f"s3://{DEST_BUCKET}/staging/{table_name}/ingestion_date={partition_date}/"
+    paths = []
+    with stage("parquet_write", table=table_name) as span:
+        df = layout.apply(df.drop(columns=["ingestion_date"], errors="ignore"))
+        for subpath, group in layout.groups(df):
+            group = sort_frame(group, profile)
+            path = f"{base}{subpath}{part_name}{file_suffix(profile)}"
+            wr.s3.to_parquet(
+                df=group,
+                path=path,
+                boto3_session=session_dest,
+                dataset=False,
+                **writer_args(group, profile),
+            )
+            paths.append(path)
+        span.add(rows=len(df), chunks=1, files=len(paths))
+
+    # Change rows update and delete what earlier batches counted, which
+    # partial aggregates cannot take back
+    if aggregates_enabled(table_name) and "_op" not in df.columns:
+        write_partial_aggregates(
+            df, table_name, part_name=part_name, partition_date=partition_date
+        )
+    return paths
+
+
+# ==================== AGGREGATES ====================
+def write_partial_aggregates(
+    df, table_name, mode=None, part_name=None, partition_date=None
+):
+    """
+    Write the partial aggregates of a staged batch under
+    aggregates/partials/{table_name}/ingestion_date=.../ the way the batch
+    itself was staged: as a dataset write with the same mode, or for a
+    chunk as one deterministic object, so a rerun or retry replaces its
+    partials along with its rows.
+    """
+    if df.empty:
+        return
+    base = f"s3://{DEST_BUCKET}/{AGGREGATES_PREFIX}/{table_name}/"
+    with stage("aggregate", table=table_name) as span:
+        if part_name is None:
+            partials = pd.concat(
+                [
+                    partial_aggregates(rows, table_name).assign(ingestion_date=str(day))
+                    for day, rows in df.groupby("ingestion_date", sort=True)
+                ],
+                ignore_index=True,
+            )
+            wr.s3.to_parquet(
+                df=partials,
+                path=base,
+                boto3_session=session_dest,
+                dataset=True,
+                mode=mode or "overwrite_partitions",
+                partition_cols=["ingestion_date"],
+            )
+        else:
+            partials = partial_aggregates(df, table_name)
+            wr.s3.to_parquet(
+                df=partials,
+                path=f"{base}ingestion_date={partition_date}/{part_name}.parquet",
+                boto3_session=session_dest,
+                dataset=False,
+            )
+        span.add(rows=len(partials))
+
+
+def _list_partials():
+    """
+    (ingestion_date, key) of every partial aggregate object.
+    """
+    paginator = s3_client_1.get_paginator("list_objects_v2")
+    listed = []
+    for page in paginator.paginate(Bucket=DEST_BUCKET, Prefix=f"{AGGREGATES_PREFIX}/"):
+        for obj in page.get("Contents", []):
+            key = obj["Key"]
+            day = key.split("ingestion_date=", 1)[-1].split("/", 1)[0]
+            if key.endswith(".parquet") and "ingestion_date=" in key:
+                listed.append((day, key))
+    return listed
+
+
+def _read_partials(keys):
+    tables = []
+    for key in keys:
+        body = s3_client_1.get_object(Bucket=DEST_BUCKET, Key=key)["Body"].read()
+        tables.append(pq.read_table(io.BytesIO(body)).to_pandas())
+    return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+
+
+def build_daily_aggregates(partitions):
+    """
+    Merge the partial aggregates into one file per event day under
+    staging/AGGREGATES_TABLE/event_date=.../, for the days that batches of
+    the given ingestion_date partitions touched. A day's events can arrive
+    in later partitions too, but not earlier ones, so every partition from
+    the earliest touched day on is merged and the day files are complete.
+    Returns the event days and rows written.
+    """
+    listed = _list_partials()
+    partitions = {str(p) for p in partitions}
+    with stage("aggregate_merge", table=AGGREGATES_TABLE) as span:
+        keys = [key for day, key in listed if day in partitions]
+        current = _read_partials(keys)
+        if current.empty:
+            logger.info(
+                "------------------------ No partial aggregates for %s ------------------------",
+                ", ".join(sorted(partitions)),
+            )
+            return {"event_dates": [], "rows": 0}
+
+        touched = set(current["event_date"])
+        since = min(partitions | {d for d in touched if d[:1].isdigit()})
+        earlier = [key for day, key in listed if day >= since and day not in partitions]
+        partials = pd.concat([current, _read_partials(earlier)], ignore_index=True)
+        partials = partials[partials["event_date"].isin(touched)]
+        daily = finalize(
+            merge_partials(partials.drop(columns=["ingestion_date"], errors="ignore"))
+        )
+        span.add(rows=len(daily), files=len(keys) + len(earlier))
+
+    with stage("parquet_write", table=AGGREGATES_TABLE) as span:
+        profile = profile_for(AGGREGATES_TABLE)
+        for day, rows in daily.groupby("event_date", sort=True):
+            wr.s3.to_parquet(
+                df=rows,
+                path=(
+                    f"s3://{DEST_BUCKET}/staging/{AGGREGATES_TABLE}/"
+                    f"event_date={day}/daily{file_suffix(profile)}"
+                ),
+                boto3_session=session_dest,
+                dataset=False,
+                **writer_args(rows, profile),
+            )
+        span.add(rows=len(daily), files=len(touched))
+
+    logger.info(
+        "------------------------ Wrote %d aggregate rows for %d event days ------------------------",
+        len(daily),
+        len(touched),
     )
-    logger.info(f"Successfully wrote {len(df)} rows to {path}...................")
+    return {"event_dates": sorted(touched), "rows": len(daily)}
+
+
+# ==================== CSV CHUNKING ====================
+def _scan_records(block, pos, needed, in_quotes):
+    """
+    Find the end of the `needed`-th CSV record in block[pos:]. Returns
+    (end, records_found, in_quotes); end is None if the block ran out first.
+    """
+    if not in_quotes and block.find(b'"', pos) == -1:
+        available = block.count(b"\n", pos)
+        if available < needed:
+            return None, available, False
+        end = pos
+        for _ in range(needed):
+            end = block.find(b"\n", end) + 1
+        return end, needed, False
+
+    records = 0
+    while records < needed:
+        newline = block.find(b"\n", pos)
+        if newline == -1:
+            return None, records, in_quotes ^ bool(block.count(b'"', pos) & 1)
+        in_quotes ^= bool(block.count(b'"', pos, newline) & 1)
+        pos = newline + 1
+        if not in_quotes:
+            records += 1
+    return pos, records, in_quotes
+
+
+def iter_csv_chunks(
+    stream, chunk_size, start_offset=0, header=None, block_size=1 << 20
+):
+    """
+    Split a CSV byte stream into DataFrames of `chunk_size` records without
+    buffering the whole object. Yields (DataFrame, end_offset), where end_offset
+    is the byte position in the object just after the chunk, so a retry can
+    restart there with a ranged GET.
+
+    When `header` is None the stream starts at byte 0 and its first line is the
+    header; otherwise the stream starts at `start_offset` and `header` is used.
+    Newlines inside quoted fields do not end a record. `chunk_size` is a row
+    count or a batching.AdaptiveBatcher, whose current size is read as each
+    chunk starts.
+    """
+    for header, data, offset in iter_csv_records(
+        stream, chunk_size, start_offset, header, block_size
+    ):
+        yield _parse_csv(header, data), offset
+
+
+def iter_csv_records(
+    stream, chunk_size, start_offset=0, header=None, block_size=1 << 20
+):
+    """
+    Like iter_csv_chunks, but yields the unparsed (header, records, end_offset)
+    so parsing can happen elsewhere, e.g. in the CPU pool.
+    """
+    blocks = iter(lambda: stream.read(block_size), b"")
+    offset = start_offset
+
+    if header is None:
+        data = b""
+        for block in blocks:
+            data += block
+            if b"\n" in data:
+                break
+        newline = data.find(b"\n")
+        if newline == -1:
+            return
+        header, first = data[: newline + 1], data[newline + 1 :]
+        offset += len(header)
+        blocks = _prepend(first, blocks)
+
+    target = getattr(chunk_size, "rows", chunk_size)
+    buffer = bytearray()
+    rows = 0
+    in_quotes = False
+    for block in blocks:
+        pos = 0
+        while True:
+            end, found, in_quotes = _scan_records(
+                block, pos, max(1, target - rows), in_quotes
+            )
+            if end is None:
+                buffer += block[pos:]
+                rows += found
+                break
+            buffer += block[pos:end]
+            offset += len(buffer)
+            yield header, bytes(buffer), offset
+            buffer = bytearray()
+            rows = 0
+            target = getattr(chunk_size, "rows", chunk_size)
+            pos = end
+
+    if buffer.strip():
+        offset += len(buffer)
+        yield header, bytes(buffer), offset
+
+
+class BoundedStream:
+    """
+    Read-only view of the next `length` bytes of a stream, e.g. one byte
+    range of a larger S3 object.
+    """
+
+    def __init__(self, stream, length):
+        self.stream = stream
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b""
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.stream.read(size)
+        self.remaining -= len(data)
+        return data
+
+
+def _prepend(first, blocks):
+    if first:
+        yield first
+    yield from blocks
+
+
+def _parse_csv(header, data):
+    return pd.read_csv(io.BytesIO(header + bytes(data)), low_memory=False)
+
+
+def read_csv_header(client, bucket, key, max_bytes=1 << 16, etag=None, size=None):
+    """
+    Fetch just the header line of a CSV object with a ranged GET, or of a
+    compressed one by decompressing its first bytes.
+    """
+    data = read_range(client, bucket, key, 0, max_bytes - 1, etag=etag, size=size)
+    if codec_for(key) or sniff(data):
+        with open_decompressed(client, bucket, key, etag=etag, size=size) as stream:
+            data = stream.read(max_bytes)
+    return data[: data.index(b"\n") + 1]
 
 
 def safely_normalize_json(data):
@@ -15,3 +15,49 @@ SNOWFLAKE_DATABASE = os.getenv("SNOWFLAKE_DATABASE", "CORETELECOMS")
 SNOWFLAKE_SCHEMA = os.getenv("SNOWFLAKE_SCHEMA", "STAGING")
 
 DEFAULT_PARTITION_COLUMN = "ingestion_date"
+
+# Warehouse-side ROW_NUMBER dedup before each MERGE; can be turned off when
+# the extractors' dedup (DEDUP_MODE=drop) already keeps duplicates out
+SNOWFLAKE_DEDUP = os.getenv("SNOWFLAKE_DEDUP", "true").lower() in ("1", "true", "yes")
+
+# Small-table fast path: a table whose staged Parquet is within both limits
+# is loaded with one bulk INSERT into a temp table and one MERGE instead of
+# INFER_SCHEMA, COPY and the warehouse dedup. Either limit at 0 turns it off
+SNOWFLAKE_SMALL_TABLE_ROWS = int(os.getenv("SNOWFLAKE_SMALL_TABLE_ROWS", "10000"))
+SNOWFLAKE_SMALL_TABLE_BYTES = int(
+    os.getenv("SNOWFLAKE_SMALL_TABLE_BYTES", str(8 * 1024 * 1024))
+)
+
+# Warehouse sizing: each load picks a size from its LIST, one step above
+# XSMALL per doubling of SNOWFLAKE_SIZING_BYTES of staged files, but no
+# larger than its file count keeps busy, within the MIN and MAX sizes. The
+# loader resizes SNOWFLAKE_WAREHOUSE, or with SNOWFLAKE_WAREHOUSES (JSON of
+# size -> warehouse name, e.g. {"XSMALL": "LOAD_XS", "LARGE": "LOAD_L"})
+# switches to the smallest listed warehouse that is big enough
+SNOWFLAKE_WAREHOUSE_SIZING = os.getenv(
+    "SNOWFLAKE_WAREHOUSE_SIZING", "false"
+).lower() in ("1", "true", "yes")
+SNOWFLAKE_WAREHOUSE_MIN_SIZE = os.getenv("SNOWFLAKE_WAREHOUSE_MIN_SIZE", "XSMALL")
+SNOWFLAKE_WAREHOUSE_MAX_SIZE = os.getenv("SNOWFLAKE_WAREHOUSE_MAX_SIZE", "LARGE")
+SNOWFLAKE_SIZING_BYTES = int(os.getenv("SNOWFLAKE_SIZING_BYTES", str(1024**3)))
+SNOWFLAKE_WAREHOUSES = os.getenv("SNOWFLAKE_WAREHOUSES", "")
+# A sized warehouse gets its own size back and is suspended once the last
+# load using it, in any process, is done; it auto-suspends after this many
+# idle seconds otherwise
+SNOWFLAKE_SUSPEND_AFTER_LOAD = os.getenv(
+    "SNOWFLAKE_SUSPEND_AFTER_LOAD", "true"
+).lower() in ("1", "true", "yes")
+SNOWFLAKE_AUTO_SUSPEND_SECONDS = int(os.getenv("SNOWFLAKE_AUTO_SUSPEND_SECONDS", "60"))
+# A load that holds a warehouse lease longer than this is taken to have
+# crashed, and no longer keeps the warehouse from being restored and suspended
+SNOWFLAKE_WAREHOUSE_LEASE_SECONDS = int(
+    os.getenv("SNOWFLAKE_WAREHOUSE_LEASE_SECONDS", str(6 * 3600))
+)
+
+# QUERY_TAG on every loader statement, as JSON with the table, run id and
+# stage, for cost and latency attribution in QUERY_HISTORY
+SNOWFLAKE_QUERY_TAGS = os.getenv("SNOWFLAKE_QUERY_TAGS", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
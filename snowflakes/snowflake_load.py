@@ -1,31 +1,146 @@
 import snowflake.connector
+import json
+import boto3
+import math
+import time
+import uuid
 import logging
+import threading
+import contextvars
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="{asctime} - {levelname} - {message}",
-    style="{",
-    datefmt="%Y-%m-%d %H:%M",
-    filename="process_etl.log",
-    encoding="utf-8",
-    filemode="a",
-)
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from botocore.exceptions import ClientError
+
+from log_config import configure_logging
+
+configure_logging(__name__)
 logger = logging.getLogger(__name__)
 
+from metrics import stage, timed, incr, current_labels, current_run_id, current_span
+from partitioning import layout_for
 from config import (
+    DEST_BUCKET,
+    AWS_REGION,
     SNOWFLAKE_ACCOUNT,
     SNOWFLAKE_USER,
     SNOWFLAKE_PASSWORD,
     SNOWFLAKE_WAREHOUSE,
     SNOWFLAKE_DATABASE,
     SNOWFLAKE_SCHEMA,
+    SNOWFLAKE_DEDUP,
+    SNOWFLAKE_SMALL_TABLE_ROWS,
+    SNOWFLAKE_SMALL_TABLE_BYTES,
+    SNOWFLAKE_WAREHOUSE_SIZING,
+    SNOWFLAKE_WAREHOUSE_MIN_SIZE,
+    SNOWFLAKE_WAREHOUSE_MAX_SIZE,
+    SNOWFLAKE_SIZING_BYTES,
+    SNOWFLAKE_WAREHOUSES,
+    SNOWFLAKE_SUSPEND_AFTER_LOAD,
+    SNOWFLAKE_AUTO_SUSPEND_SECONDS,
+    SNOWFLAKE_WAREHOUSE_LEASE_SECONDS,
+    SNOWFLAKE_QUERY_TAGS,
 )
 
 SNOWFLAKE_STAGE = "TELECOM_SNOWFLAKE_STAGE"
 
+# The loader's own client, for reading staged files back and for its load
+# records; the extractors' clients and sessions are not needed to load
+s3_client = boto3.client("s3", region_name=AWS_REGION or "eu-north-1")
+
+# Staged files loaded on either path, per table, with their ETags. COPY's
+# load metadata never sees the small-table loads, and a LIST still returns
+# every file COPY loaded before, so both paths decide on and read only the
+# files not recorded here
+LOADED_FILES_PREFIX = "metadata/loaded_files"
+
+# Snowflake accepts at most 1000 names in a COPY ... FILES list
+COPY_FILES_LIMIT = 1000
+
+# Change-capture columns written by pg_cdc; they drive the MERGE but are not
+# copied into the target table
+CDC_OP_COLUMN = "_op"
+CDC_SEQ_COLUMN = "_change_seq"
+
+# Set by the extractors' dedup in flag mode on rows that were already staged
+DEDUP_FLAG_COLUMN = "_duplicate"
+
+# What the last load of each table in this process copied and merged, for
+# reconciliation against the staged files
+LOAD_REPORTS = {}
 
-def get_connection():
-    """Create and return a new Snowflake connection."""
+# Warehouse sizes in order; COPY loads each file on one thread, and an
+# XSMALL has 8, doubling with every size
+WAREHOUSE_SIZES = [
+    "XSMALL",
+    "SMALL",
+    "MEDIUM",
+    "LARGE",
+    "XLARGE",
+    "XXLARGE",
+    "XXXLARGE",
+    "X4LARGE",
+    "X5LARGE",
+    "X6LARGE",
+]
+XSMALL_THREADS = 8
+
+# How SHOW WAREHOUSES and ALTER spell the sizes above 2X-Large
+WAREHOUSE_SIZE_ALIASES = {
+    "2XLARGE": "XXLARGE",
+    "X2LARGE": "XXLARGE",
+    "3XLARGE": "XXXLARGE",
+    "X3LARGE": "XXXLARGE",
+    "4XLARGE": "X4LARGE",
+    "5XLARGE": "X5LARGE",
+    "6XLARGE": "X6LARGE",
+}
+
+# The DAG's load tasks run in separate processes, so the loads using a
+# warehouse are recorded in a lease object per warehouse in the destination
+# bucket. Statements that size, restore or suspend the warehouse run under
+# the lock the lease carries, and only the last load out restores the size
+# the warehouse had and suspends it. A lock older than WAREHOUSE_LOCK_SECONDS
+# was left by a crashed process and is taken over
+WAREHOUSE_LEASE_PREFIX = "metadata/warehouse_leases"
+WAREHOUSE_LOCK_SECONDS = 120
+WAREHOUSE_LOCK_POLL_SECONDS = 0.2
+
+# Loads in this process queue here before taking a lease lock
+_warehouse_lock = threading.Lock()
+
+# Table of the load running on this thread or task, for statements sent
+# outside its metrics stages
+_load_table = contextvars.ContextVar("snowflake_load_table", default=None)
+
+
+def query_tag():
+    """
+    QUERY_TAG for a statement sent now: the pipeline run, with the table
+    and stage of the open metrics spans.
+    """
+    tag = {"pipeline": "coretelecom", "run": current_run_id()}
+    table = current_labels().get("table") or _load_table.get()
+    if table:
+        tag["table"] = table
+    span = current_span()
+    if span is not None:
+        tag["stage"] = span.name
+    return json.dumps(tag, separators=(",", ":"))
+
+
+def get_connection(**options):
+    """
+    Create and return a new Snowflake connection. Its session QUERY_TAG
+    carries the run, for statements not sent through _execute.
+    """
+    if SNOWFLAKE_QUERY_TAGS:
+        options.setdefault("session_parameters", {}).setdefault(
+            "QUERY_TAG", query_tag()
+        )
     conn = snowflake.connector.connect(
         account=SNOWFLAKE_ACCOUNT,
         user=SNOWFLAKE_USER,
@@ -33,99 +148,723 @@ def get_connection():
         warehouse=SNOWFLAKE_WAREHOUSE,
         database=SNOWFLAKE_DATABASE,
         schema=SNOWFLAKE_SCHEMA,
+        **options,
     )
     return conn
 
 
-def load_s3_parquet_to_snowflake(table_name, unique_keys, column_mapping=None):
+def _tagged():
+    # A statement-level parameter overrides the session's for one
+    # statement, so tagging costs no extra round trip
+    if not SNOWFLAKE_QUERY_TAGS:
+        return {}
+    return {"_statement_params": {"QUERY_TAG": query_tag()}}
+
+
+def _execute(cursor, sql):
+    """
+    Execute one statement, tagged with its table, run and stage, and count
+    it against the current stage.
+    """
+    incr("statements")
+    return cursor.execute(sql, **_tagged())
+
+
+def _execute_many(cursor, sql, rows):
+    """
+    Execute one statement bound to many rows. With qmark binding the
+    connector sends them as one array-bound statement, or for large binds
+    uploads them to a temporary stage first.
+    """
+    incr("statements")
+    return cursor.executemany(sql, rows, **_tagged())
+
+
+def load_report(table_name):
+    """
+    Counts from the last load of `table_name` in this process, or None:
+    rows loaded per staged file from the COPY results (or as read back on
+    the small-table path) and the rows the MERGE inserted, updated and
+    deleted.
+    """
+    return LOAD_REPORTS.get(table_name)
+
+
+def _merge(cursor, table_name, temp_source, cols, actual_unique_keys, unique_keys):
+    """
+    MERGE `temp_source` into `table_name` on the unique keys and return the
+    merge counts for the load report. Change rows (an `_op` column) delete
+    target rows for 'D' and upsert the rest.
+    """
+    # Change rows: the latest change per key decides delete or upsert
+    is_cdc = CDC_OP_COLUMN in cols
+    if is_cdc:
+        cols = [c for c in cols if c not in (CDC_OP_COLUMN, CDC_SEQ_COLUMN)]
+    delete_clause = (
+        f"WHEN MATCHED AND s.\"{CDC_OP_COLUMN}\" = 'D' THEN DELETE" if is_cdc else ""
+    )
+    insert_cond = f" AND s.\"{CDC_OP_COLUMN}\" IS DISTINCT FROM 'D'" if is_cdc else ""
+
+    update_cols = [c for c in cols if c.upper() not in [k.upper() for k in unique_keys]]
+
+    # Build merge statement
+    if not update_cols:
+        merge_sql = f"""
+        MERGE INTO {table_name} t
+        USING {temp_source} s
+        ON {" AND ".join([f't."{col}"=s."{col}"' for col in actual_unique_keys])}
+        {delete_clause}
+        WHEN NOT MATCHED{insert_cond} THEN INSERT ({",".join([f'"{c}"' for c in cols])})
+        VALUES ({",".join([f's."{c}"' for c in cols])})
+        """
+    else:
+        update_sql = ", ".join([f't."{c}"=s."{c}"' for c in update_cols])
+        join_cond = " AND ".join([f't."{col}"=s."{col}"' for col in actual_unique_keys])
+        merge_sql = f"""
+        MERGE INTO {table_name} t
+        USING {temp_source} s
+        ON {join_cond}
+        {delete_clause}
+        WHEN MATCHED THEN UPDATE SET {update_sql}
+        WHEN NOT MATCHED{insert_cond} THEN INSERT ({",".join([f'"{c}"' for c in cols])})
+        VALUES ({",".join([f's."{c}"' for c in cols])})
+        """
+
+    logger.info(
+        f"........................... Executing MERGE for {table_name}..............................."
+    )
+    with stage("sf_merge", table=table_name) as span:
+        _execute(cursor, merge_sql)
+        rows_affected = cursor.rowcount if cursor.rowcount is not None else 0
+        # Inserted, updated and (with a DELETE clause) deleted rows
+        merged = list(cursor.fetchone() or ()) + [0, 0, 0]
+        logger.info(f"[{table_name}] Successfully merged ~{rows_affected} rows")
+        span.add(rows=rows_affected)
+
+    return {
+        "merged_rows": rows_affected,
+        "inserted": int(merged[0] or 0),
+        "updated": int(merged[1] or 0),
+        "deleted": int(merged[2] or 0) if is_cdc else 0,
+    }
+
+
+# ==================== WAREHOUSE ====================
+def _warehouse_size(size):
+    """
+    WAREHOUSE_SIZES name of a size as written in SQL or shown by SHOW
+    WAREHOUSES, e.g. 'X-Small' or '2X-Large'.
+    """
+    size = str(size).upper().replace("-", "")
+    return WAREHOUSE_SIZE_ALIASES.get(size, size)
+
+
+def _size_index(size):
+    size = _warehouse_size(size)
+    if size not in WAREHOUSE_SIZES:
+        raise ValueError(f"Unknown warehouse size {size!r}; use {WAREHOUSE_SIZES}")
+    return WAREHOUSE_SIZES.index(size)
+
+
+def choose_warehouse_size(size_bytes, file_count):
+    """
+    Warehouse size for loading `file_count` staged files of `size_bytes`:
+    one step above XSMALL per doubling of SNOWFLAKE_SIZING_BYTES, but no
+    more steps than the files fill threads, kept within
+    SNOWFLAKE_WAREHOUSE_MIN_SIZE and SNOWFLAKE_WAREHOUSE_MAX_SIZE.
+    """
+    by_bytes = math.ceil(math.log2(max(size_bytes / SNOWFLAKE_SIZING_BYTES, 1)))
+    by_files = math.ceil(math.log2(max(file_count / XSMALL_THREADS, 1)))
+    low = _size_index(SNOWFLAKE_WAREHOUSE_MIN_SIZE)
+    high = _size_index(SNOWFLAKE_WAREHOUSE_MAX_SIZE)
+    return WAREHOUSE_SIZES[min(max(min(by_bytes, by_files), low), high)]
+
+
+def _mapped_warehouses():
+    if not SNOWFLAKE_WAREHOUSES:
+        return {}
+    try:
+        mapped = json.loads(SNOWFLAKE_WAREHOUSES)
+    except json.JSONDecodeError:
+        logger.error("SNOWFLAKE_WAREHOUSES is not valid JSON; resizing instead")
+        return {}
+    return {WAREHOUSE_SIZES[_size_index(k)]: v for k, v in mapped.items()}
+
+
+def _pick_warehouse(size):
+    """
+    (warehouse, size, resize): the smallest SNOWFLAKE_WAREHOUSES entry of
+    at least `size` (else the largest), or SNOWFLAKE_WAREHOUSE to be resized.
+    """
+    mapped = _mapped_warehouses()
+    if not mapped:
+        return SNOWFLAKE_WAREHOUSE, size, True
+    ordered = sorted(mapped, key=_size_index)
+    fits = [s for s in ordered if _size_index(s) >= _size_index(size)]
+    chosen = fits[0] if fits else ordered[-1]
+    return mapped[chosen], chosen, False
+
+
+def _show_warehouse(cursor, warehouse):
+    """
+    {"size": ..., "auto_suspend": ...} of `warehouse` from SHOW WAREHOUSES,
+    or None when it is not shown.
+    """
+    _execute(cursor, f"SHOW WAREHOUSES LIKE '{warehouse}'")
+    names = [column[0].lower() for column in cursor.description or ()]
+    for row in cursor.fetchall():
+        shown = dict(zip(names, row))
+        if str(shown.get("name", "")).upper() == warehouse.upper():
+            return {
+                "size": _warehouse_size(shown["size"]),
+                "auto_suspend": shown.get("auto_suspend"),
+            }
+    return None
+
+
+def _is_write_conflict(error):
+    code = error.response.get("Error", {}).get("Code")
+    status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    return code in ("PreconditionFailed", "ConditionalRequestConflict") or status in (
+        409,
+        412,
+    )
+
+
+def _read_lease(warehouse):
+    try:
+        obj = s3_client.get_object(
+            Bucket=DEST_BUCKET, Key=f"{WAREHOUSE_LEASE_PREFIX}/{warehouse}.json"
+        )
+        return json.loads(obj["Body"].read()), obj.get("ETag")
+    except s3_client.exceptions.NoSuchKey:
+        return {"loads": {}}, None
+
+
+def _write_lease(warehouse, lease, etag):
+    """
+    Write the lease if it is still at `etag` (or still absent); returns the
+    new ETag or raises ClientError.
+    """
+    conditions = {"IfMatch": etag} if etag else {"IfNoneMatch": "*"}
+    written = s3_client.put_object(
+        Bucket=DEST_BUCKET,
+        Key=f"{WAREHOUSE_LEASE_PREFIX}/{warehouse}.json",
+        Body=json.dumps(lease, indent=2, sort_keys=True).encode(),
+        ContentType="application/json",
+        **conditions,
+    )
+    return written["ETag"]
+
+
+@contextmanager
+def _warehouse_lease(warehouse):
+    """
+    Lock the lease of `warehouse` against loads in every process and yield
+    it: the live loads by id, and while any load is live, the size and
+    auto-suspend to restore and the size last set. Changes are written back
+    when the lock is released.
+    """
+    warehouse = warehouse.upper()
+    holder = uuid.uuid4().hex
+    with _warehouse_lock:
+        while True:
+            lease, etag = _read_lease(warehouse)
+            locked = lease.get("locked")
+            if locked and time.time() - locked["at"] < WAREHOUSE_LOCK_SECONDS:
+                time.sleep(WAREHOUSE_LOCK_POLL_SECONDS)
+                continue
+            lease["locked"] = {"by": holder, "at": time.time()}
+            try:
+                etag = _write_lease(warehouse, lease, etag)
+                break
+            except ClientError as e:
+                if not _is_write_conflict(e):
+                    raise
+        # Loads that outlived SNOWFLAKE_WAREHOUSE_LEASE_SECONDS crashed
+        lease["loads"] = {
+            load_id: load
+            for load_id, load in lease.get("loads", {}).items()
+            if time.time() - load["at"] < SNOWFLAKE_WAREHOUSE_LEASE_SECONDS
+        }
+        try:
+            yield lease
+        finally:
+            del lease["locked"]
+            _write_lease(warehouse, lease, etag)
+
+
+def _acquire_warehouse(cursor, table_name, size_bytes, file_count):
+    """
+    Size the warehouse for one load and switch the session to it. Returns
+    (warehouse, size, lease id), or None when SNOWFLAKE_WAREHOUSE_SIZING is
+    off. A shared warehouse is only ever grown while other loads, in this
+    process or another, use it, never shrunk under them.
+    """
+    if not SNOWFLAKE_WAREHOUSE_SIZING:
+        return None
+    wanted = choose_warehouse_size(size_bytes, file_count)
+    warehouse, size, resize = _pick_warehouse(wanted)
+    if not warehouse:
+        logger.warning("SNOWFLAKE_WAREHOUSE is not set; warehouse not sized")
+        return None
+    load_id = uuid.uuid4().hex
+    with stage("sf_warehouse", table=table_name):
+        with _warehouse_lease(warehouse) as lease:
+            if resize and not lease["loads"] and "original" not in lease:
+                # First load in: what the last one out restores
+                lease["original"] = _show_warehouse(cursor, warehouse)
+                lease["size"] = (lease["original"] or {}).get("size")
+            lease["loads"][load_id] = {
+                "table": table_name,
+                "size": size,
+                "at": time.time(),
+            }
+            target = max((l["size"] for l in lease["loads"].values()), key=_size_index)
+            if resize and lease.get("size") != target:
+                _execute(
+                    cursor,
+                    f"ALTER WAREHOUSE {warehouse} SET WAREHOUSE_SIZE = '{target}' "
+                    f"AUTO_SUSPEND = {SNOWFLAKE_AUTO_SUSPEND_SECONDS}",
+                )
+                lease["size"] = target
+        if warehouse != SNOWFLAKE_WAREHOUSE:
+            _execute(cursor, f"USE WAREHOUSE {warehouse}")
+    logger.info(
+        f"----------------------------- {table_name}: {file_count} file(s), {size_bytes} bytes -> {size} warehouse {warehouse} -----------------------------"
+    )
+    return warehouse, size, load_id
+
+
+def _release_warehouse(cursor, table_name, acquired):
+    """
+    Give back a warehouse from _acquire_warehouse. Once no load in any
+    process uses it, a resized warehouse gets back the size and auto-suspend
+    it had, and with SNOWFLAKE_SUSPEND_AFTER_LOAD it is suspended.
+    """
+    if not acquired:
+        return
+    warehouse, _, load_id = acquired
+    with stage("sf_warehouse", table=table_name), _warehouse_lease(warehouse) as lease:
+        lease["loads"].pop(load_id, None)
+        if lease["loads"]:
+            return
+        original = lease.get("original")
+        if original and lease.get("size") != original["size"]:
+            restore = (
+                f"ALTER WAREHOUSE {warehouse} SET WAREHOUSE_SIZE = '{original['size']}'"
+            )
+            if isinstance(original.get("auto_suspend"), int):
+                restore += f" AUTO_SUSPEND = {original['auto_suspend']}"
+            _execute(cursor, restore)
+        lease.pop("original", None)
+        lease.pop("size", None)
+        if not SNOWFLAKE_SUSPEND_AFTER_LOAD:
+            return
+        try:
+            _execute(cursor, f"ALTER WAREHOUSE {warehouse} SUSPEND")
+        except Exception as e:
+            # Already suspended, e.g. by AUTO_SUSPEND
+            logger.debug(f"Warehouse {warehouse} not suspended: {e}")
+
+
+# ==================== SMALL TABLES ====================
+def is_small_table(rows, size):
+    """
+    Whether `rows` rows in `size` staged bytes are within the small-table
+    limits, so the table is loaded without COPY.
+    """
+    return (
+        SNOWFLAKE_SMALL_TABLE_ROWS > 0
+        and SNOWFLAKE_SMALL_TABLE_BYTES > 0
+        and rows <= SNOWFLAKE_SMALL_TABLE_ROWS
+        and size <= SNOWFLAKE_SMALL_TABLE_BYTES
+    )
+
+
+def _snowflake_type(arrow_type):
+    """
+    Column type for an Arrow type, as INFER_SCHEMA would choose it.
+    """
+    if pa.types.is_dictionary(arrow_type):
+        return _snowflake_type(arrow_type.value_type)
+    if pa.types.is_boolean(arrow_type):
+        return "BOOLEAN"
+    if pa.types.is_integer(arrow_type):
+        return "NUMBER(38,0)"
+    if pa.types.is_floating(arrow_type):
+        return "FLOAT"
+    if pa.types.is_decimal(arrow_type):
+        return f"NUMBER({arrow_type.precision},{arrow_type.scale})"
+    if pa.types.is_timestamp(arrow_type):
+        return "TIMESTAMP_TZ" if arrow_type.tz else "TIMESTAMP_NTZ"
+    if pa.types.is_date(arrow_type):
+        return "DATE"
+    if pa.types.is_binary(arrow_type) or pa.types.is_large_binary(arrow_type):
+        return "BINARY"
+    return "VARCHAR"
+
+
+def _read_staged(listed):
+    """
+    Read the files of a stage LIST (s3 url, size, ...) into one Arrow
+    table. Returns the table and the rows of each file.
+    """
+    tables, counts = [], {}
+    for row in listed:
+        bucket, key = row[0].split("://", 1)[-1].split("/", 1)
+        body = s3_client.get_object(Bucket=bucket, Key=key)["Body"].read()
+        table = pq.read_table(pa.BufferReader(body))
+        tables.append(table)
+        counts[row[0]] = table.num_rows
+    return pa.concat_tables(tables, promote_options="permissive"), counts
+
+
+def _loaded_files(table_name):
+    """
+    {s3 url: ETag} of the staged files loaded before, on either path.
+    """
+    try:
+        obj = s3_client.get_object(
+            Bucket=DEST_BUCKET, Key=f"{LOADED_FILES_PREFIX}/{table_name}.json"
+        )
+        return json.loads(obj["Body"].read())
+    except s3_client.exceptions.NoSuchKey:
+        return {}
+
+
+def _record_loaded_files(table_name, loaded, listed):
+    """
+    Add the files of a stage LIST to the loaded files of `table_name`.
+    """
+    loaded = dict(loaded, **{row[0]: str(row[2]).strip('"') for row in listed})
+    s3_client.put_object(
+        Bucket=DEST_BUCKET,
+        Key=f"{LOADED_FILES_PREFIX}/{table_name}.json",
+        Body=json.dumps(loaded, indent=2, sort_keys=True).encode(),
+    )
+
+
+def _not_loaded(listed, loaded):
+    """
+    Files of a stage LIST not loaded before. Like COPY's load metadata, a
+    file rewritten with a new ETag counts as new.
+    """
+    return [row for row in listed if loaded.get(row[0]) != str(row[2]).strip('"')]
+
+
+def _latest_rows(table, keys):
+    """
+    Client-side version of the warehouse dedup: drop rows flagged
+    `_duplicate`, then keep the latest row per key by change sequence or
+    ingestion timestamp, else the last one read.
+    """
+    if DEDUP_FLAG_COLUMN in table.column_names:
+        flagged = pc.fill_null(table[DEDUP_FLAG_COLUMN], False)
+        table = table.filter(pc.invert(flagged)).drop_columns([DEDUP_FLAG_COLUMN])
+
+    for order in (CDC_SEQ_COLUMN, "ingestion_timestamp"):
+        if order in table.column_names:
+            # Arrow sorts are stable, so ties keep the order they were read in
+            table = table.sort_by([(order, "ascending")])
+            break
+    table = table.append_column("__row", pa.array(range(table.num_rows), pa.int64()))
+    last = table.group_by(keys, use_threads=False).aggregate([("__row", "max")])
+    rows = pc.take(last["__row_max"], pc.sort_indices(last["__row_max"]))
+    return table.take(rows).drop_columns(["__row"])
+
+
+def _load_arrow(cursor, table, table_name, unique_keys):
+    """
+    Create {table_name}_TEMP from the Arrow schema, fill it with one
+    array-bound INSERT and MERGE it into `table_name`. The rows are always
+    deduplicated on the client, since a MERGE source must not repeat a key.
+    """
+    upper_keys = [k.upper() for k in unique_keys]
+    actual_unique_keys = [c for c in table.column_names if c.upper() in upper_keys]
+    missing = set(upper_keys) - {c.upper() for c in table.column_names}
+    if missing:
+        raise ValueError(f"Unique keys not found in staged data: {missing}")
+
+    staged_rows = table.num_rows
+    table = _latest_rows(table, actual_unique_keys)
+    if table.num_rows != staged_rows:
+        logger.warning(
+            f"--------------------------------- Removed {staged_rows - table.num_rows} duplicate rows from {table_name}"
+        )
+
+    temp_table = f"{table_name}_TEMP"
+    columns = ", ".join(f'"{f.name}" {_snowflake_type(f.type)}' for f in table.schema)
+    _execute(cursor, f"CREATE OR REPLACE TEMPORARY TABLE {temp_table} ({columns})")
+
+    logger.info(
+        f"..................Bulk inserting {table.num_rows} rows into {temp_table}.................."
+    )
+    with stage("sf_bulk_insert", table=table_name) as span:
+        if table.num_rows:
+            names = ", ".join(f'"{c}"' for c in table.column_names)
+            marks = ", ".join("?" for _ in table.column_names)
+            _execute_many(
+                cursor,
+                f"INSERT INTO {temp_table} ({names}) VALUES ({marks})",
+                list(zip(*(column.to_pylist() for column in table.columns))),
+            )
+        span.add(rows=table.num_rows, bytes=table.nbytes)
+
+    _execute(cursor, f"CREATE TABLE IF NOT EXISTS {table_name} LIKE {temp_table}")
+    return _merge(
+        cursor,
+        table_name,
+        temp_table,
+        table.column_names,
+        actual_unique_keys,
+        unique_keys,
+    )
+
+
+@timed("load_arrow_to_snowflake")
+def load_arrow_to_snowflake(table, table_name, unique_keys):
+    """
+    Load an in-memory Arrow table (pa.Table.from_pandas for a DataFrame)
+    into `table_name` with one bulk INSERT and one MERGE, without staging
+    it in S3 first. Meant for tables within the small-table limits.
+    """
+    report = {
+        "table": table_name,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "path": "small_table",
+        "files": {},
+        "copied_rows": table.num_rows,
+    }
+    token = _load_table.set(table_name)
+    conn = get_connection(paramstyle="qmark")
+    cursor = conn.cursor()
+    acquired = None
+    try:
+        acquired = _acquire_warehouse(cursor, table_name, table.nbytes, 1)
+        report.update(_load_arrow(cursor, table, table_name, unique_keys))
+        LOAD_REPORTS[table_name] = report
+        return report["merged_rows"]
+    finally:
+        try:
+            _release_warehouse(cursor, table_name, acquired)
+        except Exception:
+            pass
+        try:
+            cursor.close()
+        except Exception:
+            pass
+        try:
+            conn.close()
+        except Exception:
+            pass
+        _load_table.reset(token)
+
+
+@timed("load_s3_parquet_to_snowflake")
+def load_s3_parquet_to_snowflake(
+    table_name,
+    unique_keys,
+    column_mapping=None,
+    files=None,
+    dedup=None,
+    partitions=None,
+    folder=None,
+):
     """
     Load parquet files from stage into Snowflake:
-    - Find stage path variant
+    - Find stage path variant (or, with `files`, load only those paths
+      relative to the table's stage folder, e.g. for micro-batches). The
+      stage folder is `folder` when it is named differently from the table.
+      `partitions` maps partition columns of the table's layout to the
+      values to load, e.g. {"event_date": ["2025-11-20"]}; LIST and COPY
+      then only see those partitions through a PATTERN
     - Use INFER_SCHEMA table function directly in TEMPLATE to create a temp table
     - COPY INTO temp table (FORCE=FALSE for idempotency)
-    - MERGE into main table
+    - Deduplicate on the unique keys, unless `dedup` (default
+      SNOWFLAKE_DEDUP) is off; change rows are always deduplicated. Rows
+      flagged `_duplicate` by the extractors are skipped either way
+    - MERGE into main table; staged change rows (an `_op` column) delete
+      target rows for 'D' and upsert the rest
+    Listed files not loaded before are recorded once merged. When those
+    new files are within the small-table limits (SNOWFLAKE_SMALL_TABLE_ROWS
+    and SNOWFLAKE_SMALL_TABLE_BYTES) they skip INFER_SCHEMA, COPY and the
+    dedup: they are read into Arrow, bulk-inserted into the temp table and
+    merged.
+    With SNOWFLAKE_WAREHOUSE_SIZING, the bytes and count of the listed files
+    not loaded yet pick the warehouse size, and the warehouse is suspended after the load
     """
-    conn = get_connection()
+    dedup = SNOWFLAKE_DEDUP if dedup is None else dedup
+    folder = folder or table_name
+    pattern = layout_for(folder).pattern(partitions) if partitions else None
+    pattern_clause = f"PATTERN = '{pattern}'" if pattern and not files else ""
+    report = {
+        "table": table_name,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "path": "copy",
+        "files": {},
+        "copied_rows": 0,
+    }
+    token = _load_table.set(table_name)
+    conn = get_connection(paramstyle="qmark")
     cursor = conn.cursor()
+    acquired = None
 
     try:
         possible_paths = [
-            f"@{SNOWFLAKE_STAGE}/{table_name}/",
-            f"@{SNOWFLAKE_STAGE}/{table_name}",
-            f"@{SNOWFLAKE_STAGE}/{table_name.upper()}/",
-            f"@{SNOWFLAKE_STAGE}/{table_name.lower()}/",
+            f"@{SNOWFLAKE_STAGE}/{folder}/",
+            f"@{SNOWFLAKE_STAGE}/{folder}",
+            f"@{SNOWFLAKE_STAGE}/{folder.upper()}/",
+            f"@{SNOWFLAKE_STAGE}/{folder.lower()}/",
         ]
 
-        s3_path = None
-        files = []
-        logger.info(
-            f"----------------------------- Searching for {table_name} files in stage --------------------------"
-        )
-        for path in possible_paths:
-            try:
-                logger.info(f" --------------------------------------- Trying: {path}")
-                cursor.execute(f"LIST {path}")
-                temp_files = cursor.fetchall()
-                if temp_files:
-                    s3_path = path
-                    files = temp_files
-                    logger.info(
-                        f" ----------------------------- Found {len(files)} file(s) at {path} -----------------------------"
-                    )
-                    break
-            except Exception as e:
-                logger.debug(f"  Path {path} not accessible: {str(e)}")
-
-        if not s3_path or not files:
-            logger.error(
-                f"********************** No files found for table '{table_name}' in any path variants **********************"
+        if files:
+            s3_path = f"@{SNOWFLAKE_STAGE}/{folder}/"
+            copy_batches = [
+                files[i : i + COPY_FILES_LIMIT]
+                for i in range(0, len(files), COPY_FILES_LIMIT)
+            ]
+        else:
+            copy_batches = [None]
+            s3_path = None
+            files = []
+            logger.info(
+                f"----------------------------- Searching for {table_name} files in stage --------------------------"
             )
-            try:
-                cursor.execute(f"LIST @{SNOWFLAKE_STAGE}/")
-                root_items = cursor.fetchall()
-                available = [item[0] for item in root_items if "/" in item[0]]
+            with stage("sf_list", table=table_name) as span:
+                for path in possible_paths:
+                    try:
+                        logger.info(
+                            f" --------------------------------------- Trying: {path}"
+                        )
+                        _execute(cursor, f"LIST {path} {pattern_clause}".strip())
+                        temp_files = cursor.fetchall()
+                        if temp_files:
+                            s3_path = path
+                            files = temp_files
+                            logger.info(
+                                f" ----------------------------- Found {len(files)} file(s) at {path} -----------------------------"
+                            )
+                            break
+                    except Exception as e:
+                        logger.debug(f"  Path {path} not accessible: {str(e)}")
+                span.add(files=len(files), bytes=sum(int(f[1]) for f in files))
+
+            if not s3_path or not files:
                 logger.error(
-                    f"************************* Available paths at stage root (sample): {available[:10]}"
+                    f"********************** No files found for table '{table_name}' in any path variants **********************"
+                )
+                try:
+                    _execute(cursor, f"LIST @{SNOWFLAKE_STAGE}/")
+                    root_items = cursor.fetchall()
+                    available = [item[0] for item in root_items if "/" in item[0]]
+                    logger.error(
+                        f"************************* Available paths at stage root (sample): {available[:10]}"
+                    )
+                except Exception:
+                    pass
+                raise ValueError(
+                    f"No files found at any variation of @{SNOWFLAKE_STAGE}/{folder}/. "
+                    f"Tried: {', '.join(possible_paths)}."
                 )
-            except Exception:
-                pass
-            raise ValueError(
-                f"No files found at any variation of @{SNOWFLAKE_STAGE}/{table_name}/. "
-                f"Tried: {', '.join(possible_paths)}."
-            )
 
         logger.info(f"Found {len(files)} file(s) at {s3_path}")
 
+        # Files an earlier load merged are left out before the path is
+        # chosen, so the small-table limits apply to the new files only
+        listed = not copy_batches[0]
+        if listed:
+            loaded = _loaded_files(table_name)
+            new_files = _not_loaded(files, loaded)
+            if not new_files:
+                logger.info(
+                    f"----------------------------- Every {table_name} file was already loaded -----------------------------"
+                )
+                report.update(
+                    path="small_table",
+                    merged_rows=0,
+                    inserted=0,
+                    updated=0,
+                    deleted=0,
+                )
+                LOAD_REPORTS[table_name] = report
+                return 0
+            if len(new_files) < len(files):
+                logger.info(
+                    f"Skipping {len(files) - len(new_files)} file(s) loaded before"
+                )
+                listed_folder = s3_path.split("/", 1)[1].strip("/")
+                names = [row[0].split(f"/{listed_folder}/", 1)[1] for row in new_files]
+                copy_batches = [
+                    names[i : i + COPY_FILES_LIMIT]
+                    for i in range(0, len(names), COPY_FILES_LIMIT)
+                ]
+            files = new_files
+
+        # Small tables are read back from the new files and merged
+        # straight from Arrow, skipping INFER_SCHEMA, COPY and the
+        # warehouse dedup
+        size = sum(int(f[1]) for f in files) if listed else 0
+
+        # Sized from the files this load will read, not the table's history
+        # in the LIST. An explicit file list has no LIST sizes; it gets the
+        # smallest size
+        acquired = _acquire_warehouse(cursor, table_name, size, len(files))
+        if acquired:
+            report.update(warehouse=acquired[0], warehouse_size=acquired[1])
+        if listed and not column_mapping and is_small_table(0, size):
+            with stage("sf_read_staged", table=table_name) as span:
+                staged, counts = _read_staged(files)
+                span.add(rows=staged.num_rows, bytes=size, files=len(files))
+            if is_small_table(staged.num_rows, size):
+                logger.info(
+                    f"----------------------------- {table_name} is small ({staged.num_rows} rows, {size} bytes): loading without COPY -----------------------------"
+                )
+                report.update(
+                    path="small_table", files=counts, copied_rows=staged.num_rows
+                )
+                report.update(_load_arrow(cursor, staged, table_name, unique_keys))
+                _record_loaded_files(table_name, loaded, files)
+                LOAD_REPORTS[table_name] = report
+                return report["merged_rows"]
+
         # -------------------------
         # Use INFER_SCHEMA table function with ARRAY_AGG
         # -------------------------
         logger.info(
             f"................. Creating TEMP table {table_name}_TEMP using INFER_SCHEMA template ................."
         )
-        create_temp_sql = f"""
-        CREATE OR REPLACE TEMPORARY TABLE {table_name}_TEMP
-        USING TEMPLATE (
-            SELECT ARRAY_AGG(OBJECT_CONSTRUCT(*))
-            FROM TABLE(
-                INFER_SCHEMA(
-                    LOCATION => '{s3_path}',
-                    FILE_FORMAT => 'MY_PARQUET_FORMAT'
+        with stage("sf_infer_schema", table=table_name):
+            infer_files = (
+                f",\n                        FILES => ('{copy_batches[0][0]}')"
+                if copy_batches[0]
+                else ""
+            )
+            create_temp_sql = f"""
+            CREATE OR REPLACE TEMPORARY TABLE {table_name}_TEMP
+            USING TEMPLATE (
+                SELECT ARRAY_AGG(OBJECT_CONSTRUCT(*))
+                FROM TABLE(
+                    INFER_SCHEMA(
+                        LOCATION => '{s3_path}',
+                        FILE_FORMAT => 'MY_PARQUET_FORMAT'{infer_files}
+                    )
                 )
             )
-        )
-        """
-        cursor.execute(create_temp_sql)
-        logger.info(
-            f"---------------------------- Temporary table {table_name}_TEMP created (template from infer schema)"
-        )
+            """
+            _execute(cursor, create_temp_sql)
+            logger.info(
+                f"---------------------------- Temporary table {table_name}_TEMP created (template from infer schema)"
+            )
 
         # Column mapping
         if column_mapping:
             logger.info(f"Applying column mapping: {column_mapping}")
             for old_name, new_name in column_mapping.items():
                 try:
-                    cursor.execute(
-                        f'ALTER TABLE {table_name}_TEMP RENAME COLUMN "{old_name}" TO "{new_name}"'
+                    _execute(
+                        cursor,
+                        f'ALTER TABLE {table_name}_TEMP RENAME COLUMN "{old_name}" TO "{new_name}"',
                     )
                     logger.info(
                         f"---------------------------- Renamed column {old_name} >> {new_name}"
@@ -134,38 +873,55 @@ def load_s3_parquet_to_snowflake(table_name, unique_keys, column_mapping=None):
                     logger.warning(f"Could not rename {old_name} to {new_name}: {e}")
 
         # Ensuring main table exists with same structure
-        cursor.execute(
-            f"CREATE TABLE IF NOT EXISTS {table_name} LIKE {table_name}_TEMP"
+        _execute(
+            cursor, f"CREATE TABLE IF NOT EXISTS {table_name} LIKE {table_name}_TEMP"
         )
         logger.info(
             f"Main table {table_name} verified/created (LIKE {table_name}_TEMP)"
         )
 
         # Empty temp table
-        cursor.execute(f"TRUNCATE TABLE {table_name}_TEMP")
+        _execute(cursor, f"TRUNCATE TABLE {table_name}_TEMP")
 
         # COPY INTO temp table
         logger.info(
             f"..................Copying data from {s3_path} to {table_name}_TEMP (FORCE=FALSE).................."
         )
-        copy_sql = f"""
-        COPY INTO {table_name}_TEMP
-        FROM '{s3_path}'
-        FILE_FORMAT = 'MY_PARQUET_FORMAT'
-        MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE
-        FORCE = FALSE
-        """
-        cursor.execute(copy_sql)
-        try:
-            copy_result = cursor.fetchone()
-            logger.info(f"COPY INTO result: {copy_result}")
-        except Exception:
-            logger.debug(
-                "                   No fetchable COPY result (connector/version behaviour)                        "
+        with stage("sf_copy", table=table_name) as span:
+            for batch in copy_batches:
+                files_clause = (
+                    "FILES = (" + ", ".join(f"'{f}'" for f in batch) + ")"
+                    if batch
+                    else pattern_clause
+                )
+                copy_sql = f"""
+                COPY INTO {table_name}_TEMP
+                FROM '{s3_path}'
+                {files_clause}
+                FILE_FORMAT = 'MY_PARQUET_FORMAT'
+                MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE
+                FORCE = FALSE
+                """
+                _execute(cursor, copy_sql)
+                try:
+                    copy_results = cursor.fetchall()
+                except Exception:
+                    copy_results = []
+                    logger.debug(
+                        "                   No fetchable COPY result (connector/version behaviour)                        "
+                    )
+                # One row per file: file, status, rows_parsed, rows_loaded, ...
+                for row in copy_results:
+                    if len(row) >= 4 and isinstance(row[3], int):
+                        report["files"][row[0]] = row[3]
+                        report["copied_rows"] += row[3]
+            logger.info(
+                f"COPY INTO loaded {report['copied_rows']} rows from {len(report['files'])} file(s)"
             )
+            span.add(rows=report["copied_rows"], files=len(report["files"]))
 
         # Get columns for MERGE
-        cursor.execute(f"DESCRIBE TABLE {table_name}_TEMP")
+        _execute(cursor, f"DESCRIBE TABLE {table_name}_TEMP")
         cols = [row[0] for row in cursor.fetchall()]
         logger.info(f"----------------------------- Columns in temp table: {cols}")
 
@@ -177,84 +933,86 @@ def load_s3_parquet_to_snowflake(table_name, unique_keys, column_mapping=None):
         if missing:
             raise ValueError(f"Unique keys not found in temp table: {missing}")
 
-        # Deduplicate temp table, keeping only the latest row per unique key
-        logger.info(
-            f"............................... Deduplicating {table_name}_TEMP on keys: {actual_unique_keys} ..............................."
-        )
-        dedup_table = f"{table_name}_TEMP_DEDUP"
+        # Rows the extractors flagged as already staged never reach the MERGE
+        flagged = DEDUP_FLAG_COLUMN in cols
+        where = f'WHERE "{DEDUP_FLAG_COLUMN}" IS DISTINCT FROM TRUE' if flagged else ""
+        if flagged:
+            cols = [c for c in cols if c != DEDUP_FLAG_COLUMN]
+        temp_source = f"{table_name}_TEMP"
 
-        # Create deduplicated table using row_number to keep latest row
-        partition_by = ", ".join([f'"{k}"' for k in actual_unique_keys])
-        order_by = (
-            '"ingestion_timestamp" DESC' if "ingestion_timestamp" in cols else "1"
-        )
+        if dedup or CDC_SEQ_COLUMN in cols:
+            # Deduplicate temp table, keeping only the latest row per unique key
+            logger.info(
+                f"............................... Deduplicating {table_name}_TEMP on keys: {actual_unique_keys} ..............................."
+            )
+            dedup_table = f"{table_name}_TEMP_DEDUP"
 
-        dedup_sql = f"""
-        CREATE OR REPLACE TEMPORARY TABLE {dedup_table} AS
-        SELECT * FROM (
-            SELECT *, ROW_NUMBER() OVER (PARTITION BY {partition_by} ORDER BY {order_by}) as rn
-            FROM {table_name}_TEMP
-        )
-        WHERE rn = 1
-        """
-        cursor.execute(dedup_sql)
+            # Create deduplicated table using row_number to keep latest row
+            partition_by = ", ".join([f'"{k}"' for k in actual_unique_keys])
+            if CDC_SEQ_COLUMN in cols:
+                order_by = f'"{CDC_SEQ_COLUMN}" DESC'
+            elif "ingestion_timestamp" in cols:
+                order_by = '"ingestion_timestamp" DESC'
+            else:
+                order_by = "1"
+
+            with stage("sf_dedup", table=table_name) as span:
+                dedup_sql = f"""
+                CREATE OR REPLACE TEMPORARY TABLE {dedup_table} AS
+                SELECT * FROM (
+                    SELECT *, ROW_NUMBER() OVER (PARTITION BY {partition_by} ORDER BY {order_by}) as rn
+                    FROM {table_name}_TEMP
+                    {where}
+                )
+                WHERE rn = 1
+                """
+                _execute(cursor, dedup_sql)
 
-        # Drop the row_number column
-        cursor.execute(f"ALTER TABLE {dedup_table} DROP COLUMN rn")
+                # Drop the row_number column
+                _execute(cursor, f"ALTER TABLE {dedup_table} DROP COLUMN rn")
 
-        # Get row counts for logging
-        cursor.execute(f"SELECT COUNT(*) FROM {table_name}_TEMP")
-        original_count = cursor.fetchone()[0]
-        cursor.execute(f"SELECT COUNT(*) FROM {dedup_table}")
-        dedup_count = cursor.fetchone()[0]
+                # Get row counts for logging
+                _execute(cursor, f"SELECT COUNT(*) FROM {table_name}_TEMP")
+                original_count = cursor.fetchone()[0]
+                _execute(cursor, f"SELECT COUNT(*) FROM {dedup_table}")
+                dedup_count = cursor.fetchone()[0]
 
-        if original_count != dedup_count:
-            logger.warning(
-                f"--------------------------------- Removed {original_count - dedup_count} duplicate rows from {table_name}_TEMP"
+                if original_count != dedup_count:
+                    logger.warning(
+                        f"--------------------------------- Removed {original_count - dedup_count} duplicate rows from {table_name}_TEMP"
+                    )
+                else:
+                    logger.info(
+                        f"------------------------------- No duplicates found in {table_name}_TEMP"
+                    )
+                span.add(rows=original_count)
+
+            # Use deduplicated table for merge
+            temp_source = dedup_table
+        elif flagged:
+            logger.info(
+                f"............................... Skipping rows flagged as duplicates in {table_name}_TEMP ..............................."
+            )
+            temp_source = f"{table_name}_TEMP_NEW"
+            _execute(
+                cursor,
+                f"CREATE OR REPLACE TEMPORARY TABLE {temp_source} AS "
+                f"SELECT * FROM {table_name}_TEMP {where}",
             )
         else:
             logger.info(
-                f"------------------------------- No duplicates found in {table_name}_TEMP"
+                f"------------------------------- Warehouse dedup off: merging {table_name}_TEMP as staged"
             )
 
-        # Use deduplicated table for merge
-        temp_source = dedup_table
-
-        update_cols = [
-            c for c in cols if c.upper() not in [k.upper() for k in unique_keys]
-        ]
-
-        # Build merge statement
-        if not update_cols:
-            merge_sql = f"""
-            MERGE INTO {table_name} t
-            USING {temp_source} s
-            ON {" AND ".join([f't."{col}"=s."{col}"' for col in actual_unique_keys])}
-            WHEN NOT MATCHED THEN INSERT ({",".join([f'"{c}"' for c in cols])})
-            VALUES ({",".join([f's."{c}"' for c in cols])})
-            """
-        else:
-            update_sql = ", ".join([f't."{c}"=s."{c}"' for c in update_cols])
-            join_cond = " AND ".join(
-                [f't."{col}"=s."{col}"' for col in actual_unique_keys]
+        report.update(
+            _merge(
+                cursor, table_name, temp_source, cols, actual_unique_keys, unique_keys
             )
-            merge_sql = f"""
-            MERGE INTO {table_name} t
-            USING {temp_source} s
-            ON {join_cond}
-            WHEN MATCHED THEN UPDATE SET {update_sql}
-            WHEN NOT MATCHED THEN INSERT ({",".join([f'"{c}"' for c in cols])})
-            VALUES ({",".join([f's."{c}"' for c in cols])})
-            """
-
-        logger.info(
-            f"........................... Executing MERGE for {table_name}..............................."
         )
-        cursor.execute(merge_sql)
-        rows_affected = cursor.rowcount if cursor.rowcount is not None else 0
-        logger.info(f"[{table_name}] Successfully merged ~{rows_affected} rows")
-
-        return rows_affected
+        if listed:
+            _record_loaded_files(table_name, loaded, files)
+        LOAD_REPORTS[table_name] = report
+        return report["merged_rows"]
 
     except Exception as e:
         logger.exception(
@@ -263,6 +1021,10 @@ def load_s3_parquet_to_snowflake(table_name, unique_keys, column_mapping=None):
         raise
 
     finally:
+        try:
+            _release_warehouse(cursor, table_name, acquired)
+        except Exception:
+            pass
         try:
             cursor.close()
         except Exception:
@@ -271,3 +1033,4 @@ def load_s3_parquet_to_snowflake(table_name, unique_keys, column_mapping=None):
             conn.close()
         except Exception:
             pass
+        _load_table.reset(token)
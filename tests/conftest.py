@@ -0,0 +1,91 @@
+"""
+Run the pipeline modules against the benchmark stand-ins: a local-disk S3,
+a fake SSM and a recording Snowflake connection. The pipeline reads its
+settings at import time, so the environment is prepared once, before any
+test imports a pipeline module; tests change module constants with
+monkeypatch instead of the environment.
+"""
+
+import sys
+import shutil
+import sqlite3
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from benchmarks.harness import DEST_BUCKET, install, prepare_environment  # noqa: E402
+
+WORK_DIR = Path(tempfile.mkdtemp(prefix="pipeline-tests-"))
+SOURCE_DIR = WORK_DIR / "data" / "source"
+SOURCE_DIR.mkdir(parents=True)
+prepare_environment(WORK_DIR, "tests")
+
+
+@pytest.fixture
+def standins():
+    """
+    Fresh stand-ins over an empty source bucket and an empty lake.
+    """
+    for folder in (SOURCE_DIR, WORK_DIR / "s3" / DEST_BUCKET):
+        shutil.rmtree(folder, ignore_errors=True)
+        folder.mkdir(parents=True)
+    return install(WORK_DIR)
+
+
+@pytest.fixture
+def source(standins):
+    """
+    put(key, data) writes an object to the source bucket.
+    """
+
+    def put(key, data):
+        path = SOURCE_DIR / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data if isinstance(data, bytes) else data.encode())
+        return key
+
+    return put
+
+
+@pytest.fixture
+def lake(standins):
+    """
+    Local directory of the destination bucket.
+    """
+    return WORK_DIR / "s3" / DEST_BUCKET
+
+
+@pytest.fixture
+def postgres(standins):
+    """
+    sqlite connection to an empty database that the pipeline's Postgres
+    connections open as the customer_complaints schema.
+    """
+    path = WORK_DIR / "data" / "postgres.db"
+    path.unlink(missing_ok=True)
+    conn = sqlite3.connect(path)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def staged(lake):
+    """
+    staged(table) -> (Parquet files under staging/<table>, their rows).
+    """
+
+    def read(table):
+        files = sorted((lake / "staging" / table).rglob("*.parquet"))
+        return files, sum(len(pd.read_parquet(f)) for f in files)
+
+    return read
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
@@ -0,0 +1,84 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.generators import call_logs_frame
+
+DAY = date(2025, 11, 20)
+
+
+@pytest.fixture
+def frame():
+    from utils import add_metadata, clean_column_names
+
+    frame = call_logs_frame(np.random.default_rng(21), 0, 2_000, DAY, 400)
+    return add_metadata(clean_column_names(frame), "call_logs")
+
+
+def daily(*batches):
+    from aggregates import finalize, merge_partials, partial_aggregates
+
+    partials = pd.concat(
+        [partial_aggregates(b, "call_logs") for b in batches], ignore_index=True
+    )
+    return finalize(merge_partials(partials)).set_index(
+        ["event_date", "dimension", "value"]
+    )
+
+
+def test_merged_batches_match_one_batch(frame):
+    split = daily(frame.iloc[:700], frame.iloc[700:])
+    whole = daily(frame)
+    pd.testing.assert_frame_equal(split, whole)
+
+
+def test_daily_rows_against_exact_values(frame):
+    result = daily(frame).loc[(str(DAY), "all", "all")]
+    assert result["complaints"] == len(frame)
+    assert (
+        result["resolved"] == frame["resolutionstatus"].str.lower().eq("resolved").sum()
+    )
+
+    exact = frame["customer_id"].nunique()
+    assert abs(result["distinct_customers"] - exact) <= 0.1 * exact
+
+    seconds = (frame["call_end_time"] - frame["call_start_time"]).dt.total_seconds()
+    assert result["min_duration_seconds"] == seconds.min()
+    assert result["max_duration_seconds"] == seconds.max()
+    assert result["p50_duration_seconds"] == pytest.approx(seconds.median(), rel=0.06)
+    assert result["p90_duration_seconds"] == pytest.approx(
+        seconds.quantile(0.9), rel=0.06
+    )
+
+    by_agent = daily(frame).xs((str(DAY), "agent"), level=["event_date", "dimension"])
+    expected = frame["agent_id"].astype(str).value_counts()
+    assert by_agent["complaints"].to_dict() == expected.to_dict()
+
+
+def test_flagged_duplicates_are_not_counted(frame):
+    flagged = frame.assign(_duplicate=[i % 4 == 0 for i in range(len(frame))])
+    result = daily(flagged).loc[(str(DAY), "all", "all")]
+    assert result["complaints"] == len(frame) - len(frame) // 4
+
+
+def test_daily_file_merges_every_partition_of_the_day(
+    frame, standins, lake, monkeypatch
+):
+    import aggregates
+    from utils import build_daily_aggregates, write_to_s3_parquet
+
+    monkeypatch.setattr(aggregates, "AGGREGATES_ENABLED", True)
+    write_to_s3_parquet(frame.iloc[:1200], "call_logs", partition_date="2025-11-20")
+    write_to_s3_parquet(frame.iloc[1200:], "call_logs", partition_date="2025-11-21")
+
+    # Only the later partition ran today, but the day file covers both
+    built = build_daily_aggregates(["2025-11-21"])
+    assert built["event_dates"] == [str(DAY)]
+
+    [path] = (lake / "staging" / aggregates.AGGREGATES_TABLE).rglob("*.parquet")
+    assert f"event_date={DAY}" in path.as_posix()
+    rows = pd.read_parquet(path)
+    total = rows[(rows["dimension"] == "all")]["complaints"].sum()
+    assert total == len(frame)
@@ -0,0 +1,89 @@
+import io
+import json
+import time
+import threading
+from datetime import date
+
+import numpy as np
+import pytest
+
+from benchmarks.generators import customers_frame, social_media_records
+
+DAY = date(2025, 11, 20)
+
+
+def test_stage_limits_bound_concurrency(standins):
+    import async_engine
+
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def fetch(i):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.1)
+        with lock:
+            active[0] -= 1
+        return i
+
+    async def pipeline(engine):
+        return await engine.map(
+            lambda i: engine.blocking("download", fetch, i), range(6)
+        )
+
+    started = time.perf_counter()
+    results = async_engine.run(pipeline, standins["s3"], limits={"download": 2})
+    wall = time.perf_counter() - started
+
+    assert results == list(range(6))
+    assert peak[0] == 2
+    assert wall < 0.5
+
+
+def test_downloads_are_spooled_and_parsed_off_the_loop(standins, source):
+    import async_engine
+    from utils import SOURCE_BUCKET
+
+    body = b"customer_id,name\n" * 1_000
+    source("customers/big.csv", body)
+
+    async def pipeline(engine):
+        f = await engine.download(SOURCE_BUCKET, {"key": "customers/big.csv"})
+        with f:
+            data = await engine.parse(lambda f, n: f.read(n), f, n=len(body) + 1)
+        loop_thread = threading.get_ident()
+        parse_thread = await engine.parse(threading.get_ident)
+        return data, loop_thread != parse_thread
+
+    data, off_loop = async_engine.run(pipeline, standins["s3"])
+    assert data == body and off_loop
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_customers_stage_every_row(source, staged, use_async):
+    import s3_extractor
+
+    rng = np.random.default_rng(11)
+    for i in range(3):
+        frame = customers_frame(rng, i * 300, 300)
+        source(f"customers/customers_{i}.csv", frame.to_csv(index=False))
+
+    s3_extractor.extract_customers(use_async=use_async)
+    files, rows = staged("customers")
+    assert rows == 900 and len(files) == 3
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_social_media_stages_every_row(source, staged, use_async):
+    import s3_extractor
+
+    rng = np.random.default_rng(12)
+    expected = 0
+    for i in range(3):
+        body = json.dumps(social_media_records(rng, i * 40, 40, DAY, 300)).encode()
+        key = source(f"social_medias/drop{i}/media_complaint_day_{DAY}.json", body)
+        expected += len(s3_extractor._social_media_frame(key, io.BytesIO(body), 0))
+
+    assert s3_extractor.extract_social_media(use_async=use_async) == expected
+    assert staged("social_medias")[1] == expected
@@ -0,0 +1,81 @@
+import json
+import sqlite3
+import subprocess
+import sys
+
+import pandas as pd
+
+from benchmarks.harness import REPO_ROOT
+
+
+def test_generators_are_seeded(tmp_path):
+    from benchmarks.generators import generate_all
+
+    first = generate_all(tmp_path / "a", 300, days=2, seed=7)
+    second = generate_all(tmp_path / "b", 300, days=2, seed=7)
+    assert first["call_logs"] == second["call_logs"]
+    for key in first["call_logs"] + first["social_media"] + first["customers"]:
+        a = (tmp_path / "a" / "source" / key).read_bytes()
+        assert a == (tmp_path / "b" / "source" / key).read_bytes()
+
+    calls = sum(
+        len(pd.read_csv(tmp_path / "a" / "source" / k)) for k in first["call_logs"]
+    )
+    assert calls == 300
+    assert len(pd.read_csv(tmp_path / "a" / "source" / first["customers"][0])) == 30
+
+    [day] = first["social_media"][-1:]
+    records = json.loads((tmp_path / "a" / "source" / day).read_text())
+    assert isinstance(records[0]["user"], dict) and "tags" in records[0]
+
+    conn = sqlite3.connect(tmp_path / "a" / "postgres.db")
+    counts = [
+        conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+        for t in first["web_forms"]
+    ]
+    conn.close()
+    assert len(counts) == 2 and sum(counts) == 300
+
+
+def test_compare_flags_regressions_by_direction():
+    from benchmarks.run import compare
+
+    baseline = {"load": {"rows_per_sec": 1000, "peak_rss_mb": 100, "statements": 10}}
+    current = {"load": {"rows_per_sec": 800, "peak_rss_mb": 80, "statements": 10}}
+    verdicts = {c[1]: c[-1] for c in compare(current, baseline, 0.15)}
+    assert verdicts == {
+        "rows_per_sec": "REGRESSION",
+        "peak_rss_mb": "improved",
+        "statements": "ok",
+    }
+
+
+def bench(*args):
+    return subprocess.run(
+        [sys.executable, "-m", "benchmarks.run", "--rows", "500", "--days", "2"]
+        + ["--stages", "call_logs,snowflake_load", *map(str, args)],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+    )
+
+
+def test_runs_are_measured_and_compared_with_the_baseline(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    work_dir = tmp_path / "work"
+    saved = bench("--work-dir", work_dir, "--baseline", baseline, "--save-baseline")
+    assert saved.returncode == 0, saved.stderr
+
+    [(scale, stages)] = json.loads(baseline.read_text()).items()
+    assert scale == "rows=500,days=2,files=1,seed=42"
+    assert stages["call_logs"]["rows"] == 500
+    assert stages["snowflake_load"]["statements"] > 0
+    assert all(s["rows_per_sec"] > 0 and s["peak_rss_mb"] > 0 for s in stages.values())
+
+    stages["call_logs"]["rows_per_sec"] *= 100
+    baseline.write_text(json.dumps({scale: stages}))
+    rerun = bench(
+        "--work-dir", work_dir, "--baseline", baseline, "--fail-on-regression"
+    )
+    assert rerun.returncode == 1
+    assert "REGRESSION" in rerun.stdout
@@ -0,0 +1,103 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.generators import customers_frame, web_forms_frame
+
+
+def test_checkpoint_round_trip(standins):
+    from checkpoint import Checkpoint
+
+    checkpoint = Checkpoint.load("tests")
+    assert checkpoint.resume_point("a.csv", "v1", chunk_size=3) == (0, 0, 0)
+    checkpoint.record("a.csv", 1, 120, ["part-1"], 3)
+    checkpoint.record("a.csv", 2, 250, ["part-2"], 3)
+
+    again = Checkpoint.load("tests")
+    assert again.resume_point("a.csv", "v1", chunk_size=3) == (2, 250, 6)
+    assert not again.is_complete("a.csv", "v1", chunk_size=3)
+    # A changed object or chunk size starts over
+    assert again.resume_point("a.csv", "v2", chunk_size=3) == (0, 0, 0)
+
+    again.clear()
+    assert Checkpoint.load("tests").sources == {}
+
+
+def test_retried_extract_resumes_at_the_failed_chunk(source, staged, monkeypatch):
+    import s3_extractor
+
+    frame = customers_frame(np.random.default_rng(0), 0, 10)
+    source("customers/customers_dataset.csv", frame.to_csv(index=False))
+
+    write = s3_extractor.write_chunk_to_s3_parquet
+    parts = []
+
+    def failing_write(df, table, part_name, partition_date=None):
+        if len(parts) == 2:
+            raise SystemExit("worker killed")
+        parts.append(part_name)
+        return write(df, table, part_name, partition_date=partition_date)
+
+    monkeypatch.setattr(s3_extractor, "write_chunk_to_s3_parquet", failing_write)
+    with pytest.raises(SystemExit):
+        s3_extractor.extract_customers(chunk_size=3)
+    assert parts == ["customers_dataset-00001", "customers_dataset-00002"]
+
+    def counting_write(df, table, part_name, partition_date=None):
+        parts.append(part_name)
+        return write(df, table, part_name, partition_date=partition_date)
+
+    monkeypatch.setattr(s3_extractor, "write_chunk_to_s3_parquet", counting_write)
+    result = s3_extractor.extract_customers(chunk_size=3)
+
+    assert int(result["total_rows"].iloc[0]) == 10
+    assert parts[2:] == ["customers_dataset-00003", "customers_dataset-00004"]
+    files, rows = staged("customers")
+    assert len(files) == 4 and rows == 10
+
+
+def test_web_forms_resume_after_the_last_key_written(postgres, staged, monkeypatch):
+    import pg_extractor
+
+    day = date(2025, 11, 20)
+    table = f"web_form_request_{day:%Y_%m_%d}"
+    rng = np.random.default_rng(1)
+    web_forms_frame(rng, 0, 10, day, 5).to_sql(table, postgres, index=False)
+    postgres.commit()
+
+    write = pg_extractor.write_chunk_to_s3_parquet
+    parts = []
+
+    def failing_write(df, table_name, part_name, partition_date=None):
+        if len(parts) == 1:
+            raise SystemExit("worker killed")
+        parts.append(part_name)
+        return write(df, table_name, part_name, partition_date=partition_date)
+
+    monkeypatch.setattr(pg_extractor, "write_chunk_to_s3_parquet", failing_write)
+    with pytest.raises(SystemExit):
+        pg_extractor.extract_web_forms(exec_date=day, chunk_size=3)
+
+    # The table moves on between the attempts: a row offset would now skip WF3
+    postgres.execute(f"DELETE FROM {table} WHERE request_id = 'WF0'")
+    web_forms_frame(rng, 10, 1, day, 5).to_sql(
+        table, postgres, if_exists="append", index=False
+    )
+    postgres.commit()
+
+    monkeypatch.setattr(pg_extractor, "write_chunk_to_s3_parquet", write)
+    assert pg_extractor.extract_web_forms(exec_date=day, chunk_size=3) == 11
+
+    files, rows = staged("web_forms")
+    ids = pd.concat(pd.read_parquet(f) for f in files)["request_id"]
+    assert rows == 11 and sorted(ids) == sorted(f"WF{n}" for n in range(11))
+
+
+def test_web_forms_need_a_key_column(postgres, monkeypatch):
+    import pg_extractor
+
+    monkeypatch.setattr(pg_extractor, "WEB_FORMS_KEY_COLUMN", "")
+    with pytest.raises(ValueError, match="WEB_FORMS_KEY_COLUMN"):
+        pg_extractor.extract_web_forms(exec_date=date(2025, 11, 20))
@@ -0,0 +1,102 @@
+import bz2
+import gzip
+import io
+import os
+from datetime import date
+
+import numpy as np
+import pytest
+
+from benchmarks.generators import call_logs_frame
+
+CODECS = {"": bytes, ".gz": gzip.compress, ".bz2": bz2.compress}
+try:
+    import zstandard
+
+    CODECS[".zst"] = zstandard.ZstdCompressor().compress
+except ImportError:
+    pass
+
+
+@pytest.fixture
+def call_logs(source):
+    """
+    call_logs(suffix) puts two call log CSVs compressed with the codec of
+    `suffix` in the source bucket and returns their rows.
+    """
+
+    def put(suffix):
+        rng = np.random.default_rng(5)
+        rows = 0
+        for i in range(2):
+            frame = call_logs_frame(rng, i * 200, 200, date(2025, 11, 20), 50)
+            data = CODECS[suffix](frame.to_csv(index=False).encode())
+            source(f"call logs/call_logs_day_{i}.csv{suffix}", data)
+            rows += len(frame)
+        return rows
+
+    return put
+
+
+@pytest.mark.parametrize("suffix", sorted(CODECS))
+@pytest.mark.parametrize("use_async", [False, True])
+def test_compressed_call_logs_are_read_as_streams(call_logs, suffix, use_async):
+    import s3_extractor
+
+    rows = call_logs(suffix)
+    df = s3_extractor.extract_call_logs(use_async=use_async)
+
+    assert len(df) == rows
+    assert df["call_id"].is_unique
+
+
+@pytest.fixture
+def pooled(monkeypatch):
+    """
+    A two-worker CPU pool for the duration of the test.
+    """
+    import cpu_pool
+
+    monkeypatch.setattr(cpu_pool, "CPU_POOL_WORKERS", 2)
+    monkeypatch.setattr(cpu_pool, "_pool", None)
+    yield
+    if cpu_pool._pool is not None:
+        cpu_pool._pool.close()
+
+
+@pytest.mark.parametrize("suffix", [".gz", ""])
+def test_pooled_call_logs_are_parsed_from_streams(pooled, call_logs, suffix):
+    import s3_extractor
+
+    rows = call_logs(suffix)
+    assert len(s3_extractor.extract_call_logs(use_async=False)) == rows
+
+
+def test_pool_handoff_copies_a_stream_without_reading_it_whole(tmp_path, monkeypatch):
+    import cpu_pool
+
+    monkeypatch.setattr(cpu_pool, "CPU_POOL_COPY_BYTES", 1024)
+    reads = []
+
+    class Source(io.BytesIO):
+        def read(self, size=-1):
+            reads.append(size)
+            return super().read(size)
+
+    payload = os.urandom(10_000)
+    handoff = cpu_pool._pack(Source(payload), str(tmp_path))
+
+    assert handoff.kind == "stream"
+    assert reads and all(0 < size <= 1024 for size in reads)
+    with cpu_pool._unpack(handoff) as received:
+        assert not os.path.exists(handoff.path)
+        assert received.read() == payload
+
+
+def test_spooled_download_is_removed_when_closed(monkeypatch, tmp_path):
+    import cpu_pool
+
+    monkeypatch.setattr(cpu_pool, "CPU_POOL_DIR", str(tmp_path))
+    with cpu_pool.spool(io.BytesIO(b"a,b\n1,2\n")) as f:
+        assert f.read() == b"a,b\n1,2\n"
+    assert os.listdir(tmp_path) == []
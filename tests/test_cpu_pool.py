@@ -0,0 +1,63 @@
+import os
+
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def pool(standins, tmp_path):
+    """
+    A two-worker pool handing off through tmp_path.
+    """
+    import cpu_pool
+
+    pool = cpu_pool.CpuPool(workers=2, directory=str(tmp_path))
+    yield pool
+    pool.close()
+
+
+def test_frames_cross_as_arrow_files(tmp_path):
+    import cpu_pool
+
+    frame = pd.DataFrame({"Call ID": ["CALL1", "CALL2"], "Agent": [3, 4]})
+    handoff = cpu_pool._pack(frame, str(tmp_path))
+    assert handoff.kind == "arrow" and os.path.exists(handoff.path)
+
+    pd.testing.assert_frame_equal(cpu_pool._unpack(handoff), frame)
+    assert not os.path.exists(handoff.path)
+    # Small payloads are cheaper to pickle than to park in a file
+    assert cpu_pool._pack(b"abc", str(tmp_path)) == b"abc"
+
+
+def test_results_keep_input_order(pool):
+    from utils import clean_column_names
+
+    frames = [
+        pd.DataFrame({f"Column {i}": range(i * 1_000)}) for i in (30, 1, 20, 2, 10)
+    ]
+    results = list(pool.imap(clean_column_names, [(f,) for f in frames], inflight=3))
+
+    assert [r.columns[0] for r in results] == [
+        f"column_{i}" for i in (30, 1, 20, 2, 10)
+    ]
+    assert [len(r) for r in results] == [len(f) for f in frames]
+    assert os.listdir(pool.directory) == []
+
+
+def test_a_failing_transform_raises_and_leaves_no_files(pool):
+    from utils import add_metadata
+
+    future = pool.submit(add_metadata, pd.DataFrame({"a": range(10)}), None)
+    assert "source_system" in future.result()
+
+    with pytest.raises(AttributeError):
+        pool.submit(add_metadata, b"x" * 100_000, "call_logs").result()
+    assert os.listdir(pool.directory) == []
+
+
+def test_disabled_pool_runs_inline(monkeypatch):
+    import cpu_pool
+
+    monkeypatch.setattr(cpu_pool, "CPU_POOL_WORKERS", 1)
+    assert cpu_pool.get_pool() is None
+    assert list(cpu_pool.imap(len, [("ab",), ("abc",)])) == [2, 3]
@@ -0,0 +1,63 @@
+import re
+
+import pytest
+
+from benchmarks.harness import REPO_ROOT
+
+DBT_DIR = REPO_ROOT / "dbt" / "telecom_dbt"
+MODELS = sorted((DBT_DIR / "models" / "source").glob("*.sql"))
+
+
+def loader_keys():
+    """
+    Table -> merge key of the DAG's load tasks.
+    """
+    dag = (REPO_ROOT / "airflow" / "dags" / "telecom_dag.py").read_text()
+    calls = re.findall(
+        r'load_s3_parquet_to_snowflake\("(\w+)", unique_keys=\["(\w+)"\]\)', dag
+    )
+    return {table: key.lower() for table, key in calls}
+
+
+@pytest.mark.parametrize("model", MODELS, ids=lambda p: p.stem)
+def test_models_merge_on_the_loader_key(model):
+    sql = model.read_text()
+    table = re.search(r'source\("staging", "(\w+)"\)', sql).group(1)
+
+    # The folder config in dbt_project.yml is the only other setting
+    [config] = re.findall(r"config\((.*?)\)", sql, re.S)
+    assert re.fullmatch(r'unique_key="(\w+)"', config.strip()).group(1) == (
+        loader_keys()[table]
+    )
+    assert "{{ incremental_window() }}" in sql
+
+
+def test_source_models_are_incremental_merges():
+    yaml = pytest.importorskip("yaml")
+
+    project = yaml.safe_load((DBT_DIR / "dbt_project.yml").read_text())
+    source = project["models"]["telecom_dbt"]["source"]
+    assert source["+materialized"] == "incremental"
+    assert source["+incremental_strategy"] == "merge"
+
+
+def test_source_tests_are_scoped_to_the_run_window():
+    yaml = pytest.importorskip("yaml")
+
+    sources = yaml.safe_load(
+        (DBT_DIR / "models" / "source" / "_custom_source.yml").read_text()
+    )
+    tests = [
+        test
+        for table in sources["sources"][0]["tables"]
+        for column in table.get("columns", [])
+        for test in column.get("tests", [])
+    ]
+    assert tests
+    for test in tests:
+        [(name, options)] = test.items()
+        assert "test_window_start" in options["config"]["where"], name
+
+    # The DAG narrows the window to the run date
+    dag = (REPO_ROOT / "airflow" / "dags" / "telecom_dag.py").read_text()
+    assert '"test_window_start": "{{ ds }}"' in dag
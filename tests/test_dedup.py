@@ -0,0 +1,163 @@
+import json
+
+import pandas as pd
+import pytest
+
+
+def batch(ids, status="open", ingested="2025-11-20"):
+    return pd.DataFrame(
+        {
+            "call_id": [f"CALL{i}" for i in ids],
+            "status": status,
+            "ingestion_date": ingested,
+        }
+    )
+
+
+@pytest.mark.parametrize("kind", ["exact", "bloom"])
+def test_rows_staged_by_an_earlier_run_are_dropped(standins, kind):
+    from dedup import Deduplicator
+
+    first = Deduplicator.load("call_logs", mode="drop", kind=kind)
+    assert len(first.apply(batch(range(10)))) == 10
+    first.commit()
+
+    # A rerun a day later stages only the new rows
+    second = Deduplicator.load("call_logs", mode="drop", kind=kind)
+    kept = second.apply(batch(range(5, 15), ingested="2025-11-21"))
+    assert list(kept["call_id"]) == [f"CALL{i}" for i in range(10, 15)]
+    assert second.summary()["duplicates"] == 5
+
+
+def test_repeats_in_a_batch_and_across_batches(standins):
+    from dedup import Deduplicator
+
+    dedup = Deduplicator.load("call_logs", mode="drop", kind="exact")
+    assert len(dedup.apply(batch([1, 1, 2]))) == 2
+    assert len(dedup.apply(batch([2, 3]))) == 1
+
+
+def test_a_changed_row_is_kept_as_an_update(standins):
+    from dedup import Deduplicator
+
+    dedup = Deduplicator.load("call_logs", mode="drop", kind="exact")
+    dedup.apply(batch([1, 2]))
+    dedup.commit()
+    again = Deduplicator.load("call_logs", mode="drop", kind="exact")
+    kept = again.apply(pd.concat([batch([1]), batch([2], status="resolved")]))
+    assert list(kept["call_id"]) == ["CALL2"]
+
+
+def test_flag_mode_marks_instead_of_dropping(standins):
+    from dedup import DEDUP_FLAG_COLUMN, Deduplicator
+
+    dedup = Deduplicator.load("call_logs", mode="flag", kind="exact")
+    flagged = dedup.apply(batch([1, 1, 2]))
+    assert list(flagged[DEDUP_FLAG_COLUMN]) == [False, True, False]
+
+
+def test_rollback_forgets_an_unwritten_batch(standins):
+    from dedup import Deduplicator
+
+    dedup = Deduplicator.load("call_logs", mode="drop", kind="exact")
+    dedup.apply(batch([1, 2]))
+    # The write failed: the retry must not see its own rows as staged
+    dedup.rollback()
+    assert len(dedup.apply(batch([1, 2]))) == 2
+
+
+def test_off_passes_rows_through(standins):
+    from dedup import Deduplicator
+
+    dedup = Deduplicator.load("call_logs", mode="off")
+    assert len(dedup.apply(batch([1, 1]))) == 2
+
+
+def test_flagged_rows_never_reach_the_merge(standins):
+    import snowflake_load
+    from dedup import Deduplicator
+    from utils import add_metadata, write_to_s3_parquet
+
+    dedup = Deduplicator.load("call_logs", mode="flag", kind="exact")
+    write_to_s3_parquet(
+        add_metadata(dedup.apply(batch([1, 1, 2, 3, 3])), "call_logs"), "call_logs"
+    )
+    snowflake_load.load_s3_parquet_to_snowflake("call_logs", unique_keys=["CALL_ID"])
+
+    assert snowflake_load.load_report("call_logs")["copied_rows"] == 5
+    assert standins["snowflake"].tables["CALL_LOGS_TEMP"]["rows"] == 3
+
+
+def test_a_failed_write_adds_nothing_to_the_index(standins):
+    from dedup import Deduplicator
+
+    dedup = Deduplicator.load("call_logs", mode="drop", kind="exact")
+    with pytest.raises(OSError):
+        with dedup.batch(batch([1, 2])):
+            raise OSError("write failed")
+    with dedup.batch(batch([1, 2, 3])) as kept:
+        assert len(kept) == 3
+    assert len(dedup.apply(batch([1, 2, 3]))) == 0
+
+
+@pytest.fixture
+def dropping(monkeypatch):
+    import dedup
+
+    monkeypatch.setattr(dedup, "DEDUP_MODE", "drop")
+
+
+def test_a_failed_partition_is_staged_by_the_next_run(
+    dropping, source, staged, monkeypatch
+):
+    import s3_extractor
+
+    records = [
+        {"complaint_id": f"SM{i}", "request_date": "2025-11-20", "status": "open"}
+        for i in range(14)
+    ]
+    for day, rows in (("2025-11-19", records[:4]), ("2025-11-20", records[4:])):
+        source(f"social_medias/media_complaint_day_{day}.json", json.dumps(rows))
+
+    write = s3_extractor.write_chunk_to_s3_parquet
+
+    def fail_second_day(df, table, part_name, partition_date=None):
+        if str(partition_date) == "2025-11-20":
+            raise OSError("write failed")
+        return write(df, table, part_name, partition_date)
+
+    monkeypatch.setattr(s3_extractor, "write_chunk_to_s3_parquet", fail_second_day)
+    assert s3_extractor.extract_social_media(use_async=False) == 4
+
+    monkeypatch.setattr(s3_extractor, "write_chunk_to_s3_parquet", write)
+    assert s3_extractor.extract_social_media(use_async=False) == 10
+    assert staged("social_medias")[1] == 14
+
+
+def test_a_resumed_run_dedups_against_chunks_already_written(
+    dropping, source, staged, monkeypatch
+):
+    import s3_extractor
+
+    # Half of the second chunk repeats the first
+    ids = [*range(10), *range(5), *range(10, 15)]
+    rows = "".join(f"CUST{i},Customer {i}\n" for i in ids)
+    source("customers/customers.csv", "customer_id,name\n" + rows)
+
+    write = s3_extractor.write_chunk_to_s3_parquet
+    calls = []
+
+    def crash_on_second(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 2:
+            raise SystemExit("worker killed")
+        return write(*args, **kwargs)
+
+    monkeypatch.setattr(s3_extractor, "write_chunk_to_s3_parquet", crash_on_second)
+    with pytest.raises(SystemExit):
+        s3_extractor.extract_customers(chunk_size=10, use_async=False)
+
+    monkeypatch.setattr(s3_extractor, "write_chunk_to_s3_parquet", write)
+    s3_extractor.extract_customers(chunk_size=10, use_async=False)
+    files, staged_rows = staged("customers")
+    assert len(files) == 2 and staged_rows == 15
@@ -0,0 +1,99 @@
+import logging
+
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def stage_rows(standins):
+    """
+    stage_rows(table, records) writes records to today's partition.
+    """
+    from utils import add_metadata, write_to_s3_parquet
+
+    def write(table, records):
+        write_to_s3_parquet(add_metadata(pd.DataFrame(records), table), table)
+
+    return write
+
+
+def checks_of(result, table):
+    return {r["check"]: r for r in result["checks"] if r["table"] == table}
+
+
+def test_exploded_social_media_rows_are_not_duplicates(stage_rows):
+    import lake_checks
+    from utils import EXECUTION_DATE
+
+    stage_rows(
+        "social_medias",
+        [
+            {"complaint_id": "SM1", "customer_id": "C1", "tags": "billing"},
+            {"complaint_id": "SM1", "customer_id": "C1", "tags": "network"},
+            {"complaint_id": "SM2", "customer_id": "C2", "tags": "billing"},
+        ],
+    )
+    result = lake_checks.run_lake_checks([EXECUTION_DATE], tables=["social_medias"])
+
+    unique = checks_of(result, "social_medias")["unique(complaint_id + content)"]
+    assert unique["status"] == "ok" and unique["rows"] == 3
+
+
+def test_rows_flagged_as_duplicates_are_skipped(stage_rows):
+    import lake_checks
+    from utils import EXECUTION_DATE
+
+    stage_rows(
+        "call_logs",
+        [
+            {"call_id": "CL1", "customer_id": "C1", "_duplicate": False},
+            {"call_id": "CL1", "customer_id": "C1", "_duplicate": True},
+            {"call_id": "CL2", "customer_id": "C2", "_duplicate": False},
+        ],
+    )
+    result = lake_checks.run_lake_checks([EXECUTION_DATE], tables=["call_logs"])
+
+    unique = checks_of(result, "call_logs")["unique(call_id)"]
+    assert unique["status"] == "ok" and unique["rows"] == 2
+
+
+@pytest.fixture
+def duplicate_key(stage_rows):
+    from utils import EXECUTION_DATE
+
+    stage_rows(
+        "call_logs",
+        [
+            {"call_id": "CL1", "customer_id": "C1"},
+            {"call_id": "CL1", "customer_id": "C1"},
+        ],
+    )
+    return EXECUTION_DATE
+
+
+def test_repeated_key_fails_the_check(duplicate_key):
+    import lake_checks
+
+    result = lake_checks.run_lake_checks([duplicate_key], tables=["call_logs"])
+
+    unique = checks_of(result, "call_logs")["unique(call_id)"]
+    assert unique["status"] == "failed"
+    assert unique["detail"] == {"duplicates": 1}
+
+
+def test_failed_checks_only_warn_by_default(duplicate_key, caplog):
+    import runner
+
+    with caplog.at_level(logging.WARNING, logger="runner"):
+        runner._lake_checks([duplicate_key], ["call_logs"])
+
+    assert "Staging lake checks failed" in caplog.text
+
+
+def test_failed_checks_block_the_load_when_strict(duplicate_key, monkeypatch):
+    import lake_checks
+    import runner
+
+    monkeypatch.setattr(lake_checks, "LAKE_CHECKS_STRICT", True)
+    with pytest.raises(ValueError, match="lake checks failed"):
+        runner._lake_checks([duplicate_key], ["call_logs"])
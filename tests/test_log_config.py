@@ -0,0 +1,89 @@
+import logging
+
+import pytest
+
+import log_config
+
+
+@pytest.fixture
+def fresh(tmp_path, monkeypatch):
+    """
+    log_config as a new process sees it, writing synchronously to a temp
+    file, over a root logger whose handlers and level are restored after.
+    """
+    root = logging.getLogger()
+    monkeypatch.setattr(root, "handlers", list(root.handlers))
+    monkeypatch.setattr(root, "level", logging.WARNING)
+    for name, value in {
+        "LOG_FILE": str(tmp_path / "etl.log"),
+        "LOG_ASYNC": False,
+        "_configured": False,
+        "_front": None,
+        "_listener": None,
+        "_owns_root": False,
+        "_attached": set(),
+    }.items():
+        monkeypatch.setattr(log_config, name, value)
+    loggers = []
+    yield lambda name: loggers.append(logging.getLogger(name)) or loggers[-1]
+    for logger in loggers:
+        logger.handlers = [h for h in logger.handlers if h is not log_config._front]
+        logger.setLevel(logging.NOTSET)
+
+
+def bare_root(*handlers):
+    """
+    The root logger with only `handlers`; pytest's capture handlers are
+    added after fixtures run, so this is done inside the test.
+    """
+    root = logging.getLogger()
+    root.handlers[:] = handlers
+    return root
+
+
+def test_unconfigured_root_gets_the_pipeline_handler(fresh):
+    root = bare_root()
+    module = fresh("tests.pipeline_module")
+    log_config.configure_logging(module.name)
+
+    assert log_config._front in root.handlers
+    assert root.level == logging.getLevelName(log_config.LOG_LEVEL)
+    assert log_config._front not in module.handlers
+
+
+def test_host_root_logger_is_left_alone(fresh):
+    host = logging.StreamHandler()
+    root = bare_root(host)
+
+    module = fresh("tests.pipeline_module")
+    log_config.configure_logging(module.name)
+
+    assert root.handlers == [host]
+    assert root.level == logging.WARNING
+    assert log_config._front in module.handlers
+    assert module.level == logging.getLevelName(log_config.LOG_LEVEL)
+
+
+def test_main_script_takes_over_the_root_logger(fresh):
+    host = logging.StreamHandler()
+    root = bare_root(host)
+    module = fresh("tests.pipeline_module")
+    log_config.configure_logging(module.name)
+
+    log_config.configure_logging("__main__")
+
+    assert host in root.handlers and log_config._front in root.handlers
+    assert log_config._front not in module.handlers
+
+
+def test_log_sampled_logs_the_first_and_every_nth(caplog):
+    logger = logging.getLogger("tests.sampled")
+    with caplog.at_level(logging.INFO, logger=logger.name):
+        for i in range(1, 8):
+            log_config.log_sampled(logger, "tests-sampled", "file %d", i, every=3)
+
+    assert [r.getMessage() for r in caplog.records] == [
+        "file 1 (#1)",
+        "file 3 (#3)",
+        "file 6 (#6)",
+    ]
@@ -0,0 +1,56 @@
+import types
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def records(tmp_path, monkeypatch):
+    path = tmp_path / "metrics.jsonl"
+    monkeypatch.setattr(metrics, "METRICS_FILE", str(path))
+    return lambda: metrics.load_run_records(path=str(path))
+
+
+def test_iter_stage_consumed_to_the_end_is_ok(records):
+    assert list(metrics.iter_stage("read", iter([[1, 2], [3]]))) == [[1, 2], [3]]
+
+    (record,) = records()
+    assert record["status"] == "ok"
+    assert record["rows"] == 3
+
+
+def test_iter_stage_closed_early_is_ok(records):
+    chunks = metrics.iter_stage("read", iter([[1], [2], [3]]))
+    next(chunks)
+    chunks.close()
+
+    (record,) = records()
+    assert record["status"] == "ok"
+    assert record["chunks"] == 1
+
+
+def test_iter_stage_failing_source_is_an_error(records):
+    def failing():
+        yield [1]
+        raise ValueError("broken chunk")
+
+    with pytest.raises(ValueError):
+        list(metrics.iter_stage("read", failing()))
+
+    (record,) = records()
+    assert record["status"] == "error"
+
+
+@pytest.mark.parametrize(
+    "platform, reported, expected",
+    [("linux", 3 * 1024**2, 3 * 1024**3), ("darwin", 3 * 1024**2, 3 * 1024**2)],
+)
+def test_peak_rss_units_follow_the_platform(monkeypatch, platform, reported, expected):
+    monkeypatch.setattr(metrics.sys, "platform", platform)
+    monkeypatch.setattr(
+        metrics.resource,
+        "getrusage",
+        lambda who: types.SimpleNamespace(ru_maxrss=reported),
+    )
+    assert metrics.peak_rss_bytes() == expected
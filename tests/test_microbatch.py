@@ -0,0 +1,165 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from benchmarks.generators import call_logs_frame, web_forms_frame
+
+QUEUE_URL = "https://sqs.local/000000000000/source-events"
+
+
+def today():
+    return datetime.now(timezone.utc).date()
+
+
+def call_log(seq, rows=50):
+    frame = call_logs_frame(np.random.default_rng(seq), seq * rows, rows, today(), 20)
+    return f"call logs/call_logs_{seq:03d}.csv", frame.to_csv(index=False)
+
+
+def batcher(sources, **kwargs):
+    import microbatch
+
+    # Merge keys of the generated data
+    unique_keys = {"web_forms": ["REQUEST_ID"], "social_media": ["COMPLAINT_ID"]}
+    return microbatch.MicroBatcher(sources, unique_keys=unique_keys, **kwargs)
+
+
+def test_flush_when_the_interval_or_the_size_is_reached(standins):
+    batch = batcher([], interval=60, max_bytes=1_000)
+    assert not batch.due()
+    batch.pending = [{"size": 400, "discovered": 0.0}]
+    assert batch.due()
+
+    batch.interval = 10**9
+    assert not batch.due()
+    batch.pending.append({"size": 600, "discovered": float("inf")})
+    assert batch.due()
+
+
+def test_new_files_are_staged_and_loaded_once(source, staged, standins):
+    import microbatch
+    import snowflake_load
+
+    for seq in range(2):
+        source(*call_log(seq))
+    source("call logs/notes.txt", "not a call log")
+    batch = batcher([microbatch.S3Poller()])
+
+    batch.poll()
+    summary = batch.flush()
+    assert (summary["items"], summary["rows"]) == (2, 100)
+    assert staged("call_logs")[1] == 100
+    assert snowflake_load.load_report("call_logs")["copied_rows"] == 100
+
+    # Seen files are not picked up again, by this process or a restarted one
+    source(*call_log(2))
+    batch.poll()
+    assert [i["key"] for i in batch.pending] == [call_log(2)[0]]
+    assert [i["key"] for i in microbatch.S3Poller().poll()] == [call_log(2)[0]]
+
+
+def test_a_failed_flush_is_retried(source, staged, standins, monkeypatch):
+    import microbatch
+
+    # The retry runs seconds later; part names must not depend on the clock
+    clock = iter(range(10**6))
+    start = datetime.now(timezone.utc).replace(hour=12)
+    monkeypatch.setattr(
+        microbatch, "_now", lambda: start + timedelta(seconds=next(clock) * 5)
+    )
+
+    source(*call_log(0))
+    batch = batcher([microbatch.S3Poller()])
+    batch.poll()
+
+    load = microbatch.load_s3_parquet_to_snowflake
+
+    def unavailable(*args, **kwargs):
+        raise RuntimeError("warehouse unavailable")
+
+    monkeypatch.setattr(microbatch, "load_s3_parquet_to_snowflake", unavailable)
+    with pytest.raises(RuntimeError):
+        batch.flush()
+    assert len(batch.pending) == 1
+
+    monkeypatch.setattr(microbatch, "load_s3_parquet_to_snowflake", load)
+    assert batch.flush()["rows"] == 50
+    # The retry overwrites the first attempt's object instead of doubling it
+    assert staged("call_logs")[1] == 50
+
+
+def test_queue_messages_are_deleted_after_the_load(standins, tmp_path, monkeypatch):
+    import microbatch
+    from benchmarks.standins import LocalQueue
+    from utils import SOURCE_BUCKET
+
+    s3 = standins["s3"]
+    queue = LocalQueue(tmp_path / "queue")
+    s3.notify(SOURCE_BUCKET, queue, QUEUE_URL)
+    monkeypatch.setattr(microbatch, "sqs_client", queue)
+
+    key, body = call_log(0)
+    s3.put_object(Bucket=SOURCE_BUCKET, Key=key, Body=body)
+    s3.put_object(Bucket=SOURCE_BUCKET, Key="agents/agents.csv", Body="id\n1\n")
+    batch = batcher([microbatch.QueuePoller(QUEUE_URL)])
+
+    batch.poll()
+    assert [i["key"] for i in batch.pending] == [key]
+    # The unmatched event is gone, the matched one is in flight until loaded
+    assert queue.calls["delete_message_batch"] == 1
+    batch.flush()
+    assert queue.calls["delete_message_batch"] == 2
+    assert queue.receive_message(QueueUrl=QUEUE_URL).get("Messages", []) == []
+
+
+def test_web_form_rows_are_read_incrementally(standins, postgres, staged):
+    import microbatch
+
+    table = f"web_form_request_{today():%Y_%m_%d}"
+    rng = np.random.default_rng(3)
+
+    def append(start, rows):
+        web_forms_frame(rng, start, rows, today(), 20).to_sql(
+            table, postgres, if_exists="append", index=False
+        )
+        postgres.commit()
+
+    append(0, 30)
+    batch = batcher([microbatch.WebFormsPoller(max_rows=20)])
+    batch.poll()
+    batch.poll()
+    assert batch.flush()["rows"] == 30
+
+    append(30, 5)
+    # Deleted rows do not shift where a restarted process resumes
+    postgres.execute(f"DELETE FROM {table} WHERE request_id IN ('WF0', 'WF1')")
+    postgres.commit()
+    restarted = batcher([microbatch.WebFormsPoller()])
+    restarted.poll()
+    assert restarted.flush()["rows"] == 5
+    assert staged("web_forms")[1] == 35
+
+
+def test_social_media_loads_into_its_warehouse_table(source, staged, standins):
+    import microbatch
+    import snowflake_load
+    from benchmarks.generators import social_media_records
+
+    records = social_media_records(np.random.default_rng(2), 0, 20, today(), 20)
+    source(
+        f"social_medias/media_complaint_day_{today()}.json",
+        json.dumps(records),
+    )
+    batch = batcher([microbatch.S3Poller()])
+    batch.poll()
+    batch.flush()
+
+    rows = staged("social_medias")[1]
+    assert snowflake_load.load_report("social_media")["copied_rows"] == rows
+    assert snowflake_load.load_report("social_medias") is None
+    copy = next(
+        s for s in standins["snowflake"].statements if s.lstrip().startswith("COPY")
+    )
+    assert "INTO social_media_TEMP" in copy and "/social_medias/" in copy
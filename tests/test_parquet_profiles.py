@@ -0,0 +1,87 @@
+import json
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from benchmarks.generators import call_logs_frame
+
+DAY = date(2025, 11, 20)
+
+
+@pytest.fixture
+def frame():
+    from utils import add_metadata, clean_column_names
+
+    frame = call_logs_frame(np.random.default_rng(8), 0, 3_000, DAY, 100)
+    # Listed out of key order, as sources arrive
+    return add_metadata(clean_column_names(frame), "call_logs").sample(
+        frac=1, random_state=1
+    )
+
+
+def test_overrides_and_unknown_codecs(monkeypatch):
+    import parquet_profiles
+
+    assert parquet_profiles.profile_for("call_logs")["compression"] == "snappy"
+
+    monkeypatch.setattr(
+        parquet_profiles,
+        "PARQUET_PROFILES",
+        json.dumps({"call_logs": {"compression": "gzip", "compression_level": 6}}),
+    )
+    profile = parquet_profiles.profile_for("call_logs")
+    assert (profile["compression"], profile["sort_by"]) == ("gzip", ["call_id"])
+    assert parquet_profiles.file_suffix(profile) == ".gz.parquet"
+    options = parquet_profiles.writer_args(pd.DataFrame({"a": [1]}), profile)
+    assert options["pyarrow_additional_kwargs"]["compression_level"] == 6
+
+    monkeypatch.setattr(
+        parquet_profiles,
+        "PARQUET_PROFILES",
+        json.dumps({"agents": {"compression": "lz9"}}),
+    )
+    with pytest.raises(ValueError):
+        parquet_profiles.profile_for("agents")
+
+
+def test_dictionary_only_for_low_cardinality_columns(frame):
+    from parquet_profiles import dictionary_columns, profile_for
+
+    columns = dictionary_columns(frame, profile_for("call_logs"))
+    assert "complaint_catego_ry" in columns and "resolutionstatus" in columns
+    assert "call_id" not in columns
+
+
+def test_staged_files_follow_the_profile(frame, staged, monkeypatch):
+    import parquet_profiles
+    from utils import write_to_s3_parquet
+
+    monkeypatch.setitem(parquet_profiles.DEFAULT_PROFILE, "row_group_rows", 1_000)
+    # zstd is enabled per table
+    monkeypatch.setattr(
+        parquet_profiles, "PARQUET_PROFILES", '{"call_logs": {"compression": "zstd"}}'
+    )
+    write_to_s3_parquet(frame, "call_logs")
+    [path], rows = staged("call_logs")
+    assert rows == len(frame) and path.name.endswith(".zstd.parquet")
+
+    parquet = pq.ParquetFile(path)
+    assert parquet.metadata.num_row_groups == 3
+    ids = parquet.read(columns=["call_id"]).column(0).to_pylist()
+    assert ids == sorted(ids)
+
+    chunks, second = (
+        {
+            group.column(i).path_in_schema: group.column(i)
+            for i in range(group.num_columns)
+        }
+        for group in map(parquet.metadata.row_group, (0, 1))
+    )
+    assert chunks["call_id"].compression == "ZSTD"
+    # Sorted row groups do not overlap, so their statistics prune
+    assert chunks["call_id"].statistics.max < second["call_id"].statistics.min
+    assert "RLE_DICTIONARY" in chunks["resolutionstatus"].encodings
+    assert "RLE_DICTIONARY" not in chunks["call_id"].encodings
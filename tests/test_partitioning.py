@@ -0,0 +1,106 @@
+import json
+import re
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.generators import call_logs_frame
+
+DAY = date(2025, 11, 20)
+LAYOUT = {"call_logs": {"event_date": True, "hour": True, "buckets": 4}}
+
+
+@pytest.fixture
+def frame():
+    from utils import add_metadata, clean_column_names
+
+    frame = call_logs_frame(np.random.default_rng(11), 0, 400, DAY, 60)
+    return add_metadata(clean_column_names(frame), "call_logs")
+
+
+@pytest.fixture
+def layout(standins, monkeypatch):
+    """
+    Call logs partitioned by event date, hour and 4 customer buckets.
+    """
+    import partitioning
+
+    monkeypatch.setattr(partitioning, "PARTITION_LAYOUTS", json.dumps(LAYOUT))
+    return partitioning.layout_for("call_logs")
+
+
+def test_layout_levels(layout):
+    import partitioning
+
+    assert layout.columns == ["ingestion_date", "event_date", "event_hour", "bucket"]
+    assert not partitioning.layout_for("web_forms").nested
+    with pytest.raises(ValueError):
+        layout.matches("staging/call_logs/x.parquet", {"region": ["eu"]})
+    with pytest.raises(ValueError):
+        layout.pattern({"event_hour": ["09'; DROP"]})
+
+
+def test_rows_land_in_their_partitions(layout, frame, staged):
+    from partitioning import bucket_for
+    from utils import write_to_s3_parquet
+
+    write_to_s3_parquet(frame, "call_logs")
+    files, rows = staged("call_logs")
+    assert rows == len(frame)
+
+    row = frame.iloc[0]
+    start = pd.Timestamp(row["call_start_time"])
+    expected = (
+        f"event_date={start:%Y-%m-%d}/event_hour={start:%H}/"
+        f"bucket={bucket_for(row['customer_id'], 4)}/"
+    )
+    holding = [f for f in files if row["call_id"] in set(pd.read_parquet(f)["call_id"])]
+    assert len(holding) == 1 and expected in holding[0].as_posix()
+
+
+def test_listing_prunes_to_the_selected_hours(layout, frame):
+    import lake_checks
+    from partitioning import EVENT_COLUMNS
+    from utils import EXECUTION_DATE, write_to_s3_parquet
+
+    write_to_s3_parquet(frame, "call_logs")
+    hour = f"{pd.Timestamp(frame[EVENT_COLUMNS['call_logs']].iloc[0]):%H}"
+    files = lake_checks.partition_files(
+        "call_logs", [EXECUTION_DATE], where={"event_hour": [hour]}
+    )
+    everything = lake_checks.partition_files("call_logs", [EXECUTION_DATE])
+    assert 0 < len(files) < len(everything)
+    assert all(f"/event_hour={hour}/" in f for f in files)
+
+    in_hour = pd.to_datetime(frame["call_start_time"]).dt.strftime("%H") == hour
+    assert sum(len(pd.read_parquet(f)) for f in files) == in_hour.sum()
+
+    pattern = layout.pattern({"event_hour": [hour]})
+    assert all(re.fullmatch(pattern, f"s3://bucket/{f}") for f in files)
+    assert not any(
+        re.fullmatch(pattern, f"s3://bucket/{f}") for f in set(everything) - set(files)
+    )
+
+
+def test_loader_copies_only_the_selected_partitions(
+    layout, frame, standins, monkeypatch
+):
+    import snowflake_load
+    from partitioning import bucket_values
+    from utils import write_to_s3_parquet
+
+    monkeypatch.setattr(snowflake_load, "SNOWFLAKE_SMALL_TABLE_ROWS", 0)
+    write_to_s3_parquet(frame, "call_logs")
+    buckets = ["0", "2"]
+    snowflake_load.load_s3_parquet_to_snowflake(
+        "call_logs", unique_keys=["CALL_ID"], partitions={"bucket": buckets}
+    )
+
+    selected = bucket_values(frame["customer_id"], 4).isin(buckets).sum()
+    report = snowflake_load.load_report("call_logs")
+    assert report["copied_rows"] == selected < len(frame)
+    assert all(re.search(r"/bucket=[02]/", url) for url in report["files"])
+    copy = next(s for s in standins["snowflake"].statements if s.startswith("COPY"))
+    assert "PATTERN = '" in copy
@@ -0,0 +1,116 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.generators import web_forms_frame
+
+DAY = date(2025, 11, 20)
+TABLE = f"web_form_request_{DAY:%Y_%m_%d}"
+
+
+@pytest.fixture
+def web_forms(postgres, monkeypatch):
+    """
+    Today's web form table with 20 rows, read without lookback.
+    """
+    import pg_cdc
+
+    monkeypatch.setattr(pg_cdc, "WEB_FORMS_CDC_LOOKBACK_DAYS", 0)
+    frame = web_forms_frame(np.random.default_rng(4), 0, 20, DAY, 10)
+    frame.to_sql(TABLE, postgres, index=False)
+    postgres.commit()
+    return postgres
+
+
+def changes(lake, before=()):
+    """
+    The staged change files not in `before`, and their rows.
+    """
+    files = set((lake / "staging" / "web_forms").rglob("cdc-*.parquet"))
+    new = sorted(files - set(before))
+    rows = pd.concat([pd.read_parquet(f) for f in new]) if new else pd.DataFrame()
+    return files, rows
+
+
+def test_watermark_reads_only_rows_changed_since_the_last_run(
+    web_forms, lake, monkeypatch
+):
+    import pg_cdc
+
+    assert pg_cdc.extract_web_forms_cdc(exec_date=DAY, mode="watermark") == 20
+    seen, rows = changes(lake)
+    assert set(rows["_op"]) == {"I"} and len(rows) == 20
+    assert pg_cdc.extract_web_forms_cdc(exec_date=DAY, mode="watermark") == 0
+
+    web_forms.execute(
+        f"UPDATE {TABLE} SET resolution_status = 'Resolved', "
+        "updated_at = '2025-11-21 08:00:00' WHERE request_id = 'WF3'"
+    )
+    web_forms.commit()
+    monkeypatch.setattr(pg_cdc, "WEB_FORMS_CDC_CREATED_COLUMN", "request_date")
+    assert pg_cdc.extract_web_forms_cdc(exec_date=DAY, mode="watermark") == 1
+    _, rows = changes(lake, seen)
+    assert list(rows["request_id"]) == ["WF3"]
+    assert list(rows["_op"]) == ["U"]
+
+
+def test_trigger_mode_emits_inserts_updates_and_deletes(web_forms, lake):
+    import pg_cdc
+    from benchmarks.bench_cdc import sqlite_change_capture
+    from conftest import WORK_DIR
+
+    sqlite_change_capture(
+        WORK_DIR / "data" / "postgres.db", [TABLE], pg_cdc.WEB_FORMS_CDC_CHANGE_TABLE
+    )
+    late = web_forms_frame(np.random.default_rng(5), 100, 1, DAY, 10)
+    late.to_sql(TABLE, web_forms, if_exists="append", index=False)
+    web_forms.execute(f"UPDATE {TABLE} SET agent_id = 7 WHERE request_id = 'WF1'")
+    web_forms.execute(f"DELETE FROM {TABLE} WHERE request_id = 'WF2'")
+    web_forms.commit()
+
+    assert pg_cdc.extract_web_forms_cdc(exec_date=DAY, mode="trigger") == 3
+    _, rows = changes(lake)
+    rows = rows.sort_values("_change_seq")
+    assert list(rows["_op"]) == ["I", "U", "D"]
+    assert list(rows["request_id"]) == ["WF100", "WF1", "WF2"]
+    assert pg_cdc.extract_web_forms_cdc(exec_date=DAY, mode="trigger") == 0
+    # Staged changes are purged from the change table
+    change_table = pg_cdc.WEB_FORMS_CDC_CHANGE_TABLE
+    assert web_forms.execute(f"SELECT COUNT(*) FROM {change_table}").fetchone() == (0,)
+
+
+def test_mode_resolution(web_forms):
+    import pg_cdc
+    from conftest import WORK_DIR
+    from benchmarks.standins import sqlite_postgres
+
+    conn = sqlite_postgres(WORK_DIR / "data" / "postgres.db")()
+    # Neither a replication slot nor a change table can be probed here
+    assert pg_cdc.resolve_mode(conn, "auto") == "watermark"
+    with pytest.raises(ValueError):
+        pg_cdc.resolve_mode(conn, "binlog")
+    assert not pg_cdc.cdc_enabled("full") and pg_cdc.cdc_enabled("watermark")
+
+
+def test_switching_modes_starts_from_scratch(web_forms):
+    import pg_cdc
+
+    pg_cdc.extract_web_forms_cdc(exec_date=DAY, mode="watermark")
+    assert pg_cdc.Watermark.load("web_forms", "watermark").get(TABLE)
+    assert pg_cdc.Watermark.load("web_forms", "trigger").positions == {}
+
+
+def test_deltas_merge_with_deletes(web_forms, lake, standins):
+    import pg_cdc
+    import snowflake_load
+
+    pg_cdc.extract_web_forms_cdc(exec_date=DAY, mode="watermark")
+    snowflake_load.load_s3_parquet_to_snowflake("web_forms", unique_keys=["REQUEST_ID"])
+
+    merge = next(
+        s for s in standins["snowflake"].statements if s.lstrip().startswith("MERGE")
+    )
+    assert "\"_op\" = 'D' THEN DELETE" in merge
+    assert "_change_seq" not in merge.split("INSERT", 1)[1]
@@ -0,0 +1,76 @@
+import pytest
+
+
+@pytest.fixture
+def profiling(tmp_path, monkeypatch):
+    """
+    The profiling module writing under a temporary PROFILE_DIR, with every
+    profiler on.
+    """
+    import profiling
+
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling, "_modes", profiling.parse_modes("all"))
+    monkeypatch.setattr(profiling, "PROFILE_TRACEMALLOC_FRAMES", 1)
+    return profiling
+
+
+def busy():
+    blocks = [bytearray(64 * 1024) for _ in range(64)]
+    return sum(i * i for i in range(200_000)) + len(blocks)
+
+
+def test_modes():
+    import profiling
+
+    assert profiling.parse_modes("cpu, memory") == {"cpu", "memory"}
+    assert profiling.parse_modes("all") == set(profiling.MODES)
+    assert profiling.parse_modes("") == set()
+    with pytest.raises(ValueError):
+        profiling.parse_modes("gpu")
+
+
+def test_off_writes_nothing(tmp_path, monkeypatch):
+    import profiling
+
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling, "_modes", set())
+    with profiling.profile("extract_call_logs", "run-1"):
+        busy()
+    assert not any(tmp_path.iterdir())
+
+
+def test_profiled_block_writes_artifacts_and_summary(profiling):
+    with profiling.profile("extract_call_logs", "run/1"):
+        busy()
+
+    [record] = profiling.load_profiles("run/1")
+    assert record["stage"] == "extract_call_logs"
+    suffixes = sorted(a.rsplit(".", 1)[-1] for a in record["artifacts"])
+    assert suffixes == ["folded", "pstats", "tracemalloc"]
+    assert any(h["function"] == "busy" for h in record["cpu_hotspots"])
+    assert record["samples"] > 0
+    assert record["memory"]["peak_traced_bytes"] >= 64 * 64 * 1024
+    assert "extract_call_logs" in profiling.format_profiles([record])
+
+
+def test_nested_blocks_are_profiled_once(profiling, monkeypatch):
+    monkeypatch.setattr(profiling, "_modes", {"cpu"})
+    with profiling.profile("outer", "run-2"):
+        with profiling.profile("inner", "run-2"):
+            busy()
+    assert [r["stage"] for r in profiling.load_profiles("run-2")] == ["outer"]
+
+
+def test_timed_stages_are_profiled(profiling, monkeypatch):
+    import metrics
+
+    monkeypatch.setattr(profiling, "_modes", {"cpu"})
+
+    @metrics.timed("load_call_logs")
+    def load():
+        return busy()
+
+    load()
+    records = profiling.load_profiles(metrics.current_run_id())
+    assert records[-1]["stage"] == "load_call_logs"
@@ -0,0 +1,85 @@
+import logging
+from datetime import date
+
+import numpy as np
+import pytest
+
+from benchmarks.generators import call_logs_frame
+
+DAY = date(2025, 11, 20)
+
+
+@pytest.fixture
+def loaded(standins):
+    """
+    Stage 300 call logs, load them, and return the partition and the report.
+    """
+    import snowflake_load
+    from utils import (
+        EXECUTION_DATE,
+        add_metadata,
+        clean_column_names,
+        write_to_s3_parquet,
+    )
+
+    frame = add_metadata(
+        clean_column_names(call_logs_frame(np.random.default_rng(3), 0, 300, DAY, 50)),
+        "call_logs",
+    )
+    write_to_s3_parquet(frame, "call_logs")
+    snowflake_load.load_s3_parquet_to_snowflake("call_logs", unique_keys=["CALL_ID"])
+    return EXECUTION_DATE, snowflake_load.load_report("call_logs")
+
+
+def test_footer_rows_match_the_staged_rows(loaded):
+    import reconcile
+
+    partition, _ = loaded
+    objects = reconcile.list_partition("call_logs", partition)
+    assert objects
+    assert sum(reconcile.footer_rows(key, size)[0] for key, size in objects) == 300
+
+
+def test_matching_load_reconciles(loaded):
+    import reconcile
+
+    partition, report = loaded
+    result = reconcile.reconcile(
+        [partition], {"call_logs": report}, tables=["call_logs"]
+    )
+    entry = result["tables"]["call_logs"]
+    assert entry["status"] == "ok"
+    assert entry["staged_rows"] == entry["copied_rows"] == 300
+
+
+@pytest.fixture
+def short_copy(loaded, monkeypatch):
+    """
+    The load report with one row fewer copied from the first file, as when
+    COPY rejects a row.
+    """
+    partition, report = loaded
+    files = dict(report["files"])
+    first = next(iter(files))
+    files[first] -= 1
+    monkeypatch.setitem(report, "files", files)
+    return partition
+
+
+def test_mismatch_only_warns_by_default(short_copy, caplog):
+    import runner
+
+    with caplog.at_level(logging.WARNING, logger="runner"):
+        staged = runner._reconcile([short_copy], ["call_logs"])
+
+    assert staged == 300
+    assert "Loaded rows differ from staged rows" in caplog.text
+
+
+def test_mismatch_fails_when_strict(short_copy, monkeypatch):
+    import reconcile
+    import runner
+
+    monkeypatch.setattr(reconcile, "RECONCILE_STRICT", True)
+    with pytest.raises(ValueError, match="Loaded rows differ"):
+        runner._reconcile([short_copy], ["call_logs"])
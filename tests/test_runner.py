@@ -0,0 +1,112 @@
+import time
+from datetime import date
+
+import numpy as np
+import pytest
+
+from benchmarks.generators import customers_frame
+
+DAYS = [date(2025, 11, 19), date(2025, 11, 20)]
+
+
+def by_name(steps):
+    return {s.name: s for s in steps}
+
+
+def deps(step):
+    return sorted(d.name for d in step.deps)
+
+
+def test_graph_dependencies(standins, monkeypatch):
+    import runner
+
+    monkeypatch.setattr(runner, "aggregates_enabled", lambda table=None: True)
+    steps = by_name(runner.build_graph(["call_logs", "web_forms"], DAYS))
+
+    # Per-date sources run their dates in order; the others run once
+    assert deps(steps["extract:web_forms@2025-11-20"]) == [
+        "extract:web_forms@2025-11-19"
+    ]
+    assert "extract:call_logs@2025-11-19" not in steps
+    assert deps(steps["lake_checks"]) == [
+        "extract:call_logs",
+        "extract:web_forms@2025-11-20",
+    ]
+    assert (
+        deps(steps["load:call_logs"])
+        == deps(steps["load:web_forms"])
+        == ["lake_checks"]
+    )
+    assert deps(steps["aggregates"]) == deps(steps["lake_checks"])
+    assert deps(steps["load:complaint_aggregates"]) == ["aggregates", "lake_checks"]
+    assert deps(steps["reconcile"]) == ["load:call_logs", "load:web_forms"]
+
+
+def test_extract_only_and_unknown_sources(standins):
+    import runner
+
+    steps = runner.build_graph(["agents"], DAYS[-1:], load=False)
+    assert [s.name for s in steps] == ["extract:agents"]
+    unchecked = by_name(runner.build_graph(["agents"], DAYS[-1:], checks=False))
+    assert deps(unchecked["load:agents"]) == ["extract:agents"]
+    with pytest.raises(ValueError):
+        runner.build_graph(["faxes"], DAYS)
+    with pytest.raises(ValueError):
+        runner.date_range(DAYS[1], DAYS[0])
+
+
+def test_steps_use_the_run_date(source, staged, monkeypatch):
+    import runner
+
+    source(
+        "customers/customers_dataset.csv",
+        customers_frame(np.random.default_rng(0), 0, 10).to_csv(index=False),
+    )
+    checked = {}
+
+    def lake_checks(partitions, tables):
+        checked[tuple(tables)] = partitions
+        return 0
+
+    monkeypatch.setattr(runner, "_lake_checks", lake_checks)
+    monkeypatch.setattr(runner, "_load", lambda table, keys: 0)
+    monkeypatch.setattr(runner, "_reconcile", lambda partitions, tables: 0)
+    steps = runner.run_pipeline(["customers"], start=DAYS[0], end=DAYS[1])
+
+    assert all(s.status == "ok" for s in steps)
+    # Neither the checks nor the staged rows follow the wall clock
+    assert checked == {("customers",): ["2025-11-19", "2025-11-20"]}
+    files, rows = staged("customers")
+    assert rows == 10
+    assert {f.parent.name for f in files} == {"ingestion_date=2025-11-20"}
+
+
+def test_a_failure_skips_only_its_branch(standins):
+    import runner
+
+    def fail():
+        raise RuntimeError("source unreachable")
+
+    broken = runner.Step("extract:a", fail)
+    healthy = runner.Step("extract:b", lambda: 3)
+    steps = [
+        broken,
+        healthy,
+        runner.Step("load:a", lambda: 1, [broken]),
+        runner.Step("load:b", lambda: 2, [healthy]),
+    ]
+    runner.run_graph(steps, workers=2)
+    assert [s.status for s in steps] == ["failed", "ok", "skipped", "ok"]
+    assert broken.error == "source unreachable" and steps[3].rows == 2
+
+
+def test_independent_steps_overlap(standins):
+    import runner
+
+    steps = [runner.Step(f"extract:{i}", lambda: time.sleep(0.2)) for i in range(4)]
+    wall = runner.run_graph(steps, workers=4)
+    assert all(s.status == "ok" for s in steps)
+    assert wall < 0.6
+
+    plan = runner.format_plan(steps + [runner.Step("reconcile", None, steps)])
+    assert plan.splitlines()[0] == "wave 1:" and "wave 2:" in plan
@@ -0,0 +1,73 @@
+import pytest
+
+
+def listed(*sizes):
+    return [{"key": f"f{i}.csv", "size": size} for i, size in enumerate(sizes)]
+
+
+@pytest.fixture
+def scheduler(standins, monkeypatch):
+    """
+    The scheduler with files under 100 bytes batched into 250-byte tasks.
+    """
+    import scheduler
+
+    monkeypatch.setattr(scheduler, "SCHEDULE_SMALL_FILE_BYTES", 100)
+    monkeypatch.setattr(scheduler, "SCHEDULE_BATCH_BYTES", 250)
+    monkeypatch.setattr(scheduler, "FILE_OVERHEAD_SECONDS", 0)
+    return scheduler
+
+
+def test_largest_first_with_small_files_batched(scheduler):
+    files = listed(300, 90, 5_000, 80, 1_000, 70, 60)
+    tasks = scheduler.plan(files, "call_logs", enabled=True)
+
+    assert [t["bytes"] for t in tasks[:3]] == [5_000, 1_000, 300]
+    batches = [[f["size"] for f in t["files"]] for t in tasks[3:]]
+    assert sorted(sum(batches, [])) == [60, 70, 80, 90]
+    assert all(sum(b) <= 250 for b in batches)
+    costs = [t["cost"] for t in tasks]
+    assert costs == sorted(costs, reverse=True)
+
+
+def test_disabled_keeps_listing_order(scheduler):
+    files = listed(10, 5_000, 20)
+    tasks = scheduler.plan(files, "call_logs", enabled=False)
+    assert [t["files"] for t in tasks] == [[f] for f in files]
+
+
+def test_largest_first_shortens_the_makespan(scheduler):
+    throughput = scheduler.Throughput()
+    files = listed(*[200] * 4, 2_000)
+    in_order = [scheduler._task("call_logs", [f], throughput) for f in files]
+    tasks = scheduler.plan(files, "call_logs", throughput, workers=2, enabled=True)
+    assert scheduler.makespan(tasks, 2) < scheduler.makespan(in_order, 2)
+
+
+def test_split_ranges_cut_on_record_boundaries(scheduler, source, standins):
+    from utils import SOURCE_BUCKET
+
+    body = "".join(f"CALL{i},agent {i % 7},resolved\n" for i in range(500)).encode()
+    source("call logs/big.csv", body)
+    file_info = {"key": "call logs/big.csv", "size": len(body)}
+
+    pieces = scheduler.split_ranges(
+        file_info, standins["s3"], SOURCE_BUCKET, split_bytes=2_000
+    )
+    assert len(pieces) > 3
+    assert pieces[0]["range"][0] == 0 and pieces[-1]["range"][1] == len(body)
+    for piece, following in zip(pieces, pieces[1:]):
+        assert piece["range"][1] == following["range"][0]
+        assert body[following["range"][0] - 1 : following["range"][0]] == b"\n"
+    assert [p["part"] for p in pieces] == list(range(len(pieces)))
+
+
+def test_throughput_is_learned_and_persisted(scheduler):
+    throughput = scheduler.Throughput()
+    default = throughput.estimate("call_logs", 10**6)
+    throughput.observe("call_logs", 10**6, 2.0)
+    throughput.save()
+
+    learned = scheduler.Throughput.load()
+    assert learned.bytes_per_second("call_logs") == pytest.approx(5 * 10**5)
+    assert learned.estimate("call_logs", 10**6) > default
@@ -0,0 +1,102 @@
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+from benchmarks.harness import REPO_ROOT
+
+
+@pytest.fixture
+def stage_agents(standins):
+    """
+    stage(first, rows) appends one staged file of agents with ids from `first`.
+    """
+    from utils import add_metadata, clean_column_names, write_to_s3_parquet
+
+    def stage(first, rows):
+        df = pd.DataFrame(
+            {
+                "id": range(first, first + rows),
+                "name": [f"Agent {i}" for i in range(first, first + rows)],
+            }
+        )
+        write_to_s3_parquet(
+            add_metadata(clean_column_names(df), "agents"), "agents", mode="append"
+        )
+
+    return stage
+
+
+def load():
+    import snowflake_load
+
+    merged = snowflake_load.load_s3_parquet_to_snowflake("agents", ["ID"])
+    return merged, snowflake_load.load_report("agents")
+
+
+def test_small_table_loads_only_new_files(stage_agents, standins):
+    stage_agents(1, 20)
+    merged, report = load()
+    assert (merged, report["path"], len(report["files"])) == (20, "small_table", 1)
+
+    stage_agents(21, 5)
+    merged, report = load()
+    assert report["path"] == "small_table"
+    assert list(report["files"].values()) == [5]
+    assert report["copied_rows"] == 5
+
+    statements = len(standins["snowflake"].statements)
+    merged, report = load()
+    assert merged == 0 and report["files"] == {}
+    # Only the LIST ran
+    assert len(standins["snowflake"].statements) == statements + 1
+
+
+def test_copy_skips_files_loaded_as_a_small_table(stage_agents, standins, monkeypatch):
+    import snowflake_load
+
+    stage_agents(1, 20)
+    _, first = load()
+
+    monkeypatch.setattr(snowflake_load, "SNOWFLAKE_SMALL_TABLE_ROWS", 10)
+    stage_agents(21, 30)
+    _, report = load()
+    assert report["path"] == "copy"
+    assert report["copied_rows"] == 30
+    assert not set(report["files"]) & set(first["files"])
+    copy = [s for s in standins["snowflake"].statements if s.startswith("COPY INTO")]
+    assert "FILES = (" in copy[-1]
+
+
+def test_files_copied_before_do_not_count_against_the_limits(
+    stage_agents, standins, monkeypatch
+):
+    import snowflake_load
+
+    monkeypatch.setattr(snowflake_load, "SNOWFLAKE_SMALL_TABLE_ROWS", 10)
+    stage_agents(1, 30)
+    _, first = load()
+    assert first["path"] == "copy"
+
+    # 35 rows are staged, but only the 5 new ones are read and merged
+    stage_agents(31, 5)
+    _, report = load()
+    assert report["path"] == "small_table"
+    assert list(report["files"].values()) == [5]
+    assert not set(report["files"]) & set(first["files"])
+
+
+def test_loader_does_not_import_the_extractor_clients():
+    code = "import sys, snowflake_load; sys.exit('utils' in sys.modules)"
+    path = os.pathsep.join(
+        str(REPO_ROOT / folder) for folder in ("snowflakes", "extract_folder")
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        env=dict(os.environ, PYTHONPATH=path),
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
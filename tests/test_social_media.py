@@ -0,0 +1,101 @@
+import io
+import json
+from datetime import date
+
+import numpy as np
+import pytest
+
+from benchmarks.generators import social_media_records
+
+DAY = date(2025, 11, 20)
+
+
+@pytest.fixture
+def social_files(source):
+    """
+    files(count, per_file) puts `count` JSON files of `per_file` complaints,
+    all for DAY, in the source bucket and returns the expected staged rows.
+    """
+
+    def put(count, per_file):
+        import s3_extractor
+
+        rng = np.random.default_rng(7)
+        rows = 0
+        for i in range(count):
+            body = json.dumps(
+                social_media_records(rng, i * per_file, per_file, DAY, 50)
+            ).encode()
+            key = source(f"social_medias/drop{i}/media_complaint_day_{DAY}.json", body)
+            rows += len(s3_extractor._social_media_frame(key, io.BytesIO(body), 0))
+        return rows
+
+    return put
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    """
+    Part names passed to _write_social_media, in order.
+    """
+    import s3_extractor
+
+    write = s3_extractor._write_social_media
+    parts = []
+
+    def recording(frames, partition_date, part_name, dedup=None):
+        parts.append(part_name)
+        return write(frames, partition_date, part_name, dedup)
+
+    monkeypatch.setattr(s3_extractor, "_write_social_media", recording)
+    return parts
+
+
+def test_partition_under_the_batch_size_is_written_once(social_files, writes, staged):
+    import s3_extractor
+
+    expected = social_files(4, 5)
+    rows = s3_extractor.extract_social_media(use_async=False, chunk_size=10_000)
+
+    assert len(writes) == 1
+    assert rows == expected == staged("social_medias")[1]
+
+
+def test_partition_over_the_batch_size_is_written_in_parts(
+    social_files, writes, staged
+):
+    import s3_extractor
+
+    expected = social_files(4, 5)
+    rows = s3_extractor.extract_social_media(use_async=False, chunk_size=8)
+
+    # Each part holds the files read until the batch size was reached
+    assert len(writes) == 2
+    assert [p[-4:] for p in writes] == ["-001", "-002"]
+    assert rows == expected == staged("social_medias")[1]
+
+
+def test_retry_rewrites_the_same_parts(social_files, writes, staged, monkeypatch):
+    import s3_extractor
+
+    expected = social_files(4, 5)
+    recording = s3_extractor._write_social_media
+
+    def crash_on_second(frames, partition_date, part_name, dedup=None):
+        if len(writes) == 1:
+            raise SystemExit("worker killed")
+        return recording(frames, partition_date, part_name, dedup)
+
+    monkeypatch.setattr(s3_extractor, "_write_social_media", crash_on_second)
+    with pytest.raises(SystemExit):
+        s3_extractor.extract_social_media(use_async=False, chunk_size=8)
+    first_attempt = staged("social_medias")[0]
+
+    monkeypatch.setattr(s3_extractor, "_write_social_media", recording)
+    rows = s3_extractor.extract_social_media(use_async=False, chunk_size=8)
+
+    files, staged_rows = staged("social_medias")
+    # The written batch is skipped, the failed one written; nothing is doubled
+    assert writes[1:] == [writes[0][:-4] + "-002"]
+    assert set(first_attempt) <= set(files)
+    assert rows == staged_rows == expected
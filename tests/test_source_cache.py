@@ -0,0 +1,152 @@
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+KEY = "call logs/day.csv"
+BODY = b"".join(b"CALL%d,resolved\n" % i for i in range(200))
+
+
+@pytest.fixture
+def cache(standins, tmp_path, monkeypatch):
+    """
+    The source cache switched on under tmp_path.
+    """
+    import source_cache
+
+    monkeypatch.setattr(source_cache, "SOURCE_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(source_cache, "_cache", None)
+    return source_cache
+
+
+def test_second_read_is_served_locally(cache, source, standins):
+    from utils import SOURCE_BUCKET
+
+    s3 = standins["s3"]
+    source(KEY, BODY)
+    before = cache.stats()
+    for _ in range(2):
+        with cache.open_source(s3, SOURCE_BUCKET, KEY) as stream:
+            assert stream.read() == BODY
+
+    after = cache.stats()
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 1
+    assert s3.calls["get_object"] == 1
+
+
+def test_a_changed_object_gets_a_new_entry(cache, source, standins):
+    from utils import SOURCE_BUCKET
+
+    s3 = standins["s3"]
+    source(KEY, BODY)
+    first = cache.get_cache().fetch(s3, SOURCE_BUCKET, KEY)
+    source(KEY, BODY + b"CALL200,open\n")
+    second = cache.get_cache().fetch(s3, SOURCE_BUCKET, KEY)
+
+    assert first != second
+    with open(second, "rb") as f:
+        assert f.read().endswith(b"CALL200,open\n")
+
+
+def test_least_recently_used_entries_are_evicted(cache, source, standins):
+    from utils import SOURCE_BUCKET
+
+    s3 = standins["s3"]
+    store = cache.get_cache()
+    store.max_bytes = 2 * len(BODY)
+    paths = {}
+    for name in ("a", "b"):
+        paths[name] = store.fetch(s3, SOURCE_BUCKET, source(f"{name}.csv", BODY))
+    # Reading "a" again makes "b" the oldest entry
+    assert store.fetch(s3, SOURCE_BUCKET, "a.csv") == paths["a"]
+    paths["c"] = store.fetch(s3, SOURCE_BUCKET, source("c.csv", BODY))
+
+    assert [n for n, p in paths.items() if os.path.exists(p)] == ["a", "c"]
+
+
+def test_ranges_read_the_same_bytes_with_and_without_cache(
+    cache, source, standins, monkeypatch
+):
+    from utils import SOURCE_BUCKET
+
+    s3 = standins["s3"]
+    source(KEY, BODY)
+    cached = cache.read_range(s3, SOURCE_BUCKET, KEY, 100, 199)
+    with cache.open_source(s3, SOURCE_BUCKET, KEY, start=100) as stream:
+        tail = stream.read()
+
+    monkeypatch.setattr(cache, "SOURCE_CACHE_DIR", None)
+    monkeypatch.setattr(cache, "_cache", None)
+    assert cached == cache.read_range(s3, SOURCE_BUCKET, KEY, 100, 199)
+    assert cached == BODY[100:200] and tail == BODY[100:]
+
+
+def chunks(calls):
+    def produce():
+        calls.append(1)
+        for start in range(0, 30, 10):
+            yield pd.DataFrame({"call_id": range(start, start + 10)})
+
+    return produce
+
+
+def test_query_results_replay_from_the_cache(cache):
+    calls = []
+    digest = cache.cache_key("postgres", "select * from web_forms")
+    first = pd.concat(cache.cached_frames(digest, chunks(calls), 10))
+    again = pd.concat(cache.cached_frames(digest, chunks(calls), 10))
+
+    assert len(calls) == 1
+    pd.testing.assert_frame_equal(
+        again.reset_index(drop=True), first.reset_index(drop=True)
+    )
+    resumed = pd.concat(cache.cached_frames(digest, chunks(calls), 10, skip_rows=15))
+    assert list(resumed["call_id"]) == list(range(15, 30))
+
+
+def test_partial_or_resumed_reads_are_not_cached(cache):
+    calls = []
+    digest = cache.cache_key("postgres", "select * from web_forms")
+    frames = cache.cached_frames(digest, chunks(calls), 10)
+    next(frames)
+    frames.close()
+    list(cache.cached_frames(digest, chunks(calls), 10, skip_rows=10))
+
+    assert cache.get_cache().lookup(digest, ".parquet") is None
+    list(cache.cached_frames(digest, chunks(calls), 10))
+    assert cache.get_cache().lookup(digest, ".parquet") is not None
+
+
+def test_web_forms_are_cached_until_the_table_changes(cache, postgres, staged):
+    import pg_extractor
+    from benchmarks.generators import web_forms_frame
+
+    day = date(2025, 11, 20)
+    table = f"web_form_request_{day:%Y_%m_%d}"
+    web_forms_frame(np.random.default_rng(6), 0, 10, day, 5).to_sql(
+        table, postgres, index=False
+    )
+    postgres.commit()
+
+    def extract():
+        before = cache.stats()
+        pg_extractor.extract_web_forms(exec_date=day, chunk_size=4)
+        after = cache.stats()
+        return after["hits"] - before["hits"], after["misses"] - before["misses"]
+
+    assert extract() == (0, 1)
+    assert extract() == (1, 0)
+
+    # Same row count and keys, but a row was updated in place
+    postgres.execute(
+        f"UPDATE {table} SET resolution_status = 'Resolved', "
+        "updated_at = '2025-11-21 09:00:00' WHERE request_id = 'WF4'"
+    )
+    postgres.commit()
+    assert extract() == (0, 1)
+    files, _ = staged("web_forms")
+    rows = pd.concat(pd.read_parquet(f) for f in files).set_index("request_id")
+    assert rows.loc["WF4", "resolution_status"] == "Resolved"
@@ -0,0 +1,88 @@
+import contextlib
+import threading
+from datetime import date
+
+import pytest
+from botocore.exceptions import ClientError
+
+from benchmarks.standins import PreconditionFailed
+
+DAY = date(2025, 11, 20)
+
+
+def files(prefix, count):
+    return [{"key": f"{prefix}/{i}.csv", "size": i} for i in range(count)]
+
+
+@pytest.fixture
+def tracker(standins, monkeypatch):
+    """
+    The tracker module with no backoff between retries.
+    """
+    import utils
+
+    monkeypatch.setattr(utils, "TRACKER_RETRY_BASE_SECONDS", 0)
+    return utils
+
+
+def test_first_commit_creates_the_tracker(tracker):
+    tracker.mark_source_files_as_processed(files("call logs", 2), DAY)
+    data = tracker.load_processed_files_tracker()
+    assert sorted(data) == ["call logs/0.csv", "call logs/1.csv"]
+    assert data["call logs/1.csv"]["processed_date"] == "2025-11-20"
+
+
+def test_a_conflicting_commit_is_reapplied(tracker, standins, monkeypatch):
+    tracker.mark_source_files_as_processed(files("web", 1), DAY)
+    read = tracker._read_tracker
+    calls = []
+
+    def read_then_lose_the_race():
+        data, etag = read()
+        if not calls:
+            # Another task commits between this read and the write
+            other, _ = read()
+            other["social/0.json"] = {"processed_date": "2025-11-20"}
+            tracker.save_processed_files_tracker(other, etag=etag)
+        calls.append(etag)
+        return data, etag
+
+    monkeypatch.setattr(tracker, "_read_tracker", read_then_lose_the_race)
+    tracker.mark_source_files_as_processed(files("call logs", 1), DAY)
+
+    assert len(calls) == 2
+    assert sorted(read()[0]) == ["call logs/0.csv", "social/0.json", "web/0.csv"]
+
+
+def test_concurrent_commits_keep_every_entry(tracker, monkeypatch):
+    # Without the in-process lock the writers race on S3 as separate
+    # processes would
+    monkeypatch.setattr(tracker, "_tracker_lock", contextlib.nullcontext())
+    # With no backoff one writer can lose more races than the default allows
+    monkeypatch.setattr(tracker, "TRACKER_MAX_RETRIES", 100)
+    writers = [
+        threading.Thread(
+            target=tracker.mark_source_files_as_processed,
+            args=(files(f"writer{w}", 5), DAY),
+        )
+        for w in range(8)
+    ]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+    assert len(tracker.load_processed_files_tracker()) == 40
+
+
+def test_gives_up_after_the_retries(tracker, standins, monkeypatch):
+    monkeypatch.setattr(tracker, "TRACKER_MAX_RETRIES", 2)
+    attempts = []
+
+    def conflict(Bucket, Key, **kwargs):
+        attempts.append(kwargs.get("IfMatch") or kwargs.get("IfNoneMatch"))
+        raise PreconditionFailed(Key)
+
+    monkeypatch.setattr(standins["s3"], "put_object", conflict)
+    with pytest.raises(ClientError):
+        tracker.mark_source_files_as_processed(files("call logs", 1), DAY)
+    assert attempts == ["*", "*", "*"]
@@ -0,0 +1,194 @@
+import json
+import time
+from datetime import date
+
+import numpy as np
+import pytest
+
+from benchmarks.generators import call_logs_frame
+
+DAY = date(2025, 11, 20)
+
+
+@pytest.fixture
+def sizing(standins, monkeypatch):
+    """
+    Sizing on for LOAD_WH, a MEDIUM warehouse with a 300 s auto-suspend.
+    Returns the stand-in warehouse.
+    """
+    import snowflake_load
+
+    monkeypatch.setattr(snowflake_load, "SNOWFLAKE_WAREHOUSE_SIZING", True)
+    monkeypatch.setattr(snowflake_load, "SNOWFLAKE_WAREHOUSE", "LOAD_WH")
+    monkeypatch.setattr(snowflake_load, "SNOWFLAKE_WAREHOUSES", "")
+    monkeypatch.setattr(snowflake_load, "SNOWFLAKE_SIZING_BYTES", 1024)
+    monkeypatch.setattr(snowflake_load, "XSMALL_THREADS", 1)
+    warehouse = standins["snowflake"]
+    warehouse.warehouse("LOAD_WH").update(size="MEDIUM", auto_suspend=300)
+    return warehouse
+
+
+def other_load(size, at=None):
+    """
+    Record a load of another process in the LOAD_WH lease.
+    """
+    import snowflake_load
+
+    with snowflake_load._warehouse_lease("LOAD_WH") as lease:
+        lease["loads"]["other"] = {
+            "table": "web_forms",
+            "size": size,
+            "at": time.time() if at is None else at,
+        }
+
+
+def test_sizes_from_bytes_and_files(sizing):
+    import snowflake_load
+
+    assert snowflake_load.choose_warehouse_size(1024, 100) == "XSMALL"
+    assert snowflake_load.choose_warehouse_size(4096, 100) == "MEDIUM"
+    # Two files keep no more than a SMALL busy
+    assert snowflake_load.choose_warehouse_size(1024**2, 2) == "SMALL"
+    assert snowflake_load.choose_warehouse_size(1024**3, 10**6) == "LARGE"
+    assert snowflake_load._warehouse_size("2X-Large") == "XXLARGE"
+
+
+def test_release_restores_the_size_and_suspends(sizing):
+    import snowflake_load
+
+    cursor = sizing.cursor()
+    acquired = snowflake_load._acquire_warehouse(cursor, "call_logs", 1024, 1)
+    assert acquired[:2] == ("LOAD_WH", "XSMALL")
+    assert sizing.warehouse("LOAD_WH")["size"] == "XSMALL"
+
+    snowflake_load._release_warehouse(cursor, "call_logs", acquired)
+    state = sizing.warehouse("LOAD_WH")
+    assert (state["size"], state["auto_suspend"]) == ("MEDIUM", 300)
+    assert state["state"] == "SUSPENDED"
+    assert sizing.statements[-2:] == [
+        "ALTER WAREHOUSE LOAD_WH SET WAREHOUSE_SIZE = 'MEDIUM' AUTO_SUSPEND = 300",
+        "ALTER WAREHOUSE LOAD_WH SUSPEND",
+    ]
+
+
+def test_another_process_keeps_the_warehouse(sizing, lake):
+    import snowflake_load
+
+    cursor = sizing.cursor()
+    acquired = snowflake_load._acquire_warehouse(cursor, "call_logs", 8192, 1)
+    other_load("LARGE")
+    sizing.statements.clear()
+
+    # Another load still holds a lease: no restore and no suspend
+    snowflake_load._release_warehouse(cursor, "call_logs", acquired)
+    assert sizing.statements == []
+
+    snowflake_load._release_warehouse(
+        cursor, "web_forms", ("LOAD_WH", "LARGE", "other")
+    )
+    assert sizing.warehouse("LOAD_WH")["size"] == "MEDIUM"
+    assert sizing.statements[-1] == "ALTER WAREHOUSE LOAD_WH SUSPEND"
+    lease = json.loads((lake / "metadata/warehouse_leases/LOAD_WH.json").read_text())
+    assert lease == {"loads": {}}
+
+
+def test_a_larger_load_is_not_shrunk(sizing):
+    import snowflake_load
+
+    cursor = sizing.cursor()
+    other_load("LARGE")
+    with snowflake_load._warehouse_lease("LOAD_WH") as lease:
+        lease.update(original={"size": "MEDIUM", "auto_suspend": 300}, size="LARGE")
+    snowflake_load._acquire_warehouse(cursor, "call_logs", 1024, 1)
+    assert not any("SET WAREHOUSE_SIZE" in s for s in sizing.statements)
+
+
+def test_crashed_leases_and_locks_are_taken_over(sizing):
+    import snowflake_load
+
+    other_load(
+        "LARGE", at=time.time() - snowflake_load.SNOWFLAKE_WAREHOUSE_LEASE_SECONDS
+    )
+    lease, etag = snowflake_load._read_lease("LOAD_WH")
+    snowflake_load._write_lease(
+        "LOAD_WH", dict(lease, locked={"by": "crashed", "at": time.time() - 3600}), etag
+    )
+    cursor = sizing.cursor()
+    acquired = snowflake_load._acquire_warehouse(cursor, "call_logs", 1024, 1)
+    snowflake_load._release_warehouse(cursor, "call_logs", acquired)
+    assert sizing.warehouse("LOAD_WH")["state"] == "SUSPENDED"
+
+
+def test_a_held_lock_is_waited_for(sizing, monkeypatch):
+    import snowflake_load
+
+    lease, etag = snowflake_load._read_lease("LOAD_WH")
+    snowflake_load._write_lease(
+        "LOAD_WH", dict(lease, locked={"by": "other", "at": time.time()}), etag
+    )
+    waits = []
+
+    def sleep(seconds):
+        # The other process finishes with the lease
+        waits.append(seconds)
+        held, etag = snowflake_load._read_lease("LOAD_WH")
+        del held["locked"]
+        snowflake_load._write_lease("LOAD_WH", held, etag)
+
+    monkeypatch.setattr(snowflake_load.time, "sleep", sleep)
+    snowflake_load._acquire_warehouse(sizing.cursor(), "call_logs", 1024, 1)
+    assert waits == [snowflake_load.WAREHOUSE_LOCK_POLL_SECONDS]
+
+
+def test_load_statements_carry_query_tags(sizing, monkeypatch):
+    import snowflake_load
+    from utils import add_metadata, clean_column_names, write_to_s3_parquet
+
+    monkeypatch.setattr(snowflake_load, "SNOWFLAKE_SMALL_TABLE_ROWS", 0)
+    frame = call_logs_frame(np.random.default_rng(5), 0, 200, date(2025, 11, 20), 20)
+    write_to_s3_parquet(
+        add_metadata(clean_column_names(frame), "call_logs"), "call_logs"
+    )
+    snowflake_load.load_s3_parquet_to_snowflake("call_logs", unique_keys=["CALL_ID"])
+
+    tags = [json.loads(tag) for tag in sizing.tags]
+    assert all(tag["run"] and tag["table"] == "call_logs" for tag in tags)
+    stages = {
+        statement.split()[0]: tag.get("stage")
+        for statement, tag in zip(sizing.statements, tags)
+    }
+    assert stages["SHOW"] == "sf_warehouse"
+    assert stages["COPY"] == "sf_copy"
+    report = snowflake_load.load_report("call_logs")
+    assert report["warehouse"] == "LOAD_WH"
+    assert sizing.warehouse("LOAD_WH")["size"] == "MEDIUM"
+
+
+def test_sizes_from_the_files_not_loaded_yet(sizing, staged, monkeypatch):
+    import snowflake_load
+    from utils import add_metadata, clean_column_names, write_chunk_to_s3_parquet
+
+    monkeypatch.setattr(snowflake_load, "SNOWFLAKE_SMALL_TABLE_ROWS", 0)
+    acquire = snowflake_load._acquire_warehouse
+    sized = []
+
+    def recording(cursor, table_name, size_bytes, file_count):
+        sized.append((size_bytes, file_count))
+        return acquire(cursor, table_name, size_bytes, file_count)
+
+    monkeypatch.setattr(snowflake_load, "_acquire_warehouse", recording)
+
+    def stage(part):
+        frame = call_logs_frame(np.random.default_rng(part), part * 100, 100, DAY, 20)
+        df = add_metadata(clean_column_names(frame), "call_logs")
+        write_chunk_to_s3_parquet(df, "call_logs", f"part-{part}", DAY)
+
+    for part in range(3):
+        stage(part)
+    snowflake_load.load_s3_parquet_to_snowflake("call_logs", unique_keys=["CALL_ID"])
+    stage(3)
+    snowflake_load.load_s3_parquet_to_snowflake("call_logs", unique_keys=["CALL_ID"])
+
+    [new] = [f for f in staged("call_logs")[0] if f.name.startswith("part-3")]
+    assert sized[0][1] == 3
+    assert sized[1] == (new.stat().st_size, 1)